@@ -0,0 +1,199 @@
+"""
+Atualização em segundo plano dos snapshots do Bitrix24.
+
+Sem ela, o primeiro usuário depois que o cache expira paga o download completo dentro
+da própria requisição. Aqui uma thread do servidor (ou um processo separado, com
+`python -m api.background_refresh`) mantém os snapshots em disco atualizados:
+
+- Varredura periódica: a cada BITRIX_REFRESH_INTERVAL segundos, os snapshots usados
+  por alguma página nas últimas BITRIX_REFRESH_HOT_WINDOW segundos ("quentes") e com
+  mais de BITRIX_REFRESH_AHEAD x TTL de idade são baixados/sincronizados de novo,
+  antes de vencerem
+- Stale-while-revalidate: se uma página encontra um snapshot vencido, recebe a versão
+  anterior na hora e a atualização entra na fila desta thread (ver
+  bitrix_connector._read_or_sync_table)
+
+O snapshot novo é gravado de forma atômica (snapshot_cache._atomic_write) e o lock por
+tabela evita que vários processos baixem a mesma tabela ao mesmo tempo.
+"""
+import argparse
+import os
+import threading
+import time
+
+try:
+    from api.snapshot_cache import SNAPSHOT_ENABLED, SNAPSHOT_TTL, list_snapshot_metas, snapshot_key, snapshot_last_access
+except ImportError:
+    from snapshot_cache import SNAPSHOT_ENABLED, SNAPSHOT_TTL, list_snapshot_metas, snapshot_key, snapshot_last_access
+
+# Varredura periódica dentro do servidor (desligar quando rodar o processo separado)
+BACKGROUND_REFRESH_ENABLED = os.getenv('BITRIX_BACKGROUND_REFRESH', '1') != '0'
+# Servir snapshot vencido enquanto ele é atualizado
+STALE_WHILE_REVALIDATE = os.getenv('BITRIX_STALE_WHILE_REVALIDATE', '1') != '0'
+
+REFRESH_INTERVAL = int(os.getenv('BITRIX_REFRESH_INTERVAL', 300))  # 5 minutos
+REFRESH_AHEAD = float(os.getenv('BITRIX_REFRESH_AHEAD', 0.8))  # fração do TTL
+REFRESH_HOT_WINDOW = int(os.getenv('BITRIX_REFRESH_HOT_WINDOW', 24 * 3600))  # 1 dia
+
+_pending = {}
+_pending_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+_status = {'runs': 0, 'refreshed': 0, 'skipped': 0, 'errors': 0, 'last_run_at': None, 'last_error': None}
+
+
+def _table_url(table):
+    """URL do BI connector para a tabela (com o token atual)."""
+    try:
+        from api.bitrix_connector import get_credentials
+    except ImportError:
+        from bitrix_connector import get_credentials
+    token, base_url = get_credentials()
+    return f"{base_url}/bitrix/tools/biconnector/pbi.php?token={token}&table={table}"
+
+
+def schedule_refresh(url, filters=None):
+    """
+    Coloca a atualização de (tabela, filtros) na fila da thread de segundo plano.
+
+    Pedidos repetidos para o mesmo snapshot são agrupados em um só.
+    """
+    try:
+        from api.snapshot_cache import table_name_from_url
+    except ImportError:
+        from snapshot_cache import table_name_from_url
+    table = table_name_from_url(url)
+    with _pending_lock:
+        _pending[snapshot_key(table, filters)] = (url, table, filters)
+    _ensure_worker()
+    _wake.set()
+
+
+def due_snapshots(now=None):
+    """
+    Snapshots quentes que devem ser atualizados antes de vencer.
+
+    Snapshots gravados antes dos filtros irem para os metadados são ignorados até o
+    próximo download normal.
+
+    Returns:
+        list: [(chave, tabela, filtros)]
+    """
+    if not SNAPSHOT_TTL:
+        return []
+    now = now or time.time()
+    due = []
+    for key, meta in list_snapshot_metas().items():
+        if 'filters' not in meta or not meta.get('table'):
+            continue
+        if now - snapshot_last_access(key) > REFRESH_HOT_WINDOW:
+            continue
+        if now - meta.get('created_at', 0) >= REFRESH_AHEAD * SNAPSHOT_TTL:
+            due.append((key, meta['table'], meta['filters']))
+    return due
+
+
+def refresh_once(scan=True):
+    """
+    Processa a fila de atualizações e, se scan=True, os snapshots quentes a vencer.
+
+    Returns:
+        int: Quantidade de snapshots baixados/sincronizados
+    """
+    try:
+        from api.bitrix_connector import refresh_bitrix_table
+    except ImportError:
+        from bitrix_connector import refresh_bitrix_table
+
+    with _pending_lock:
+        jobs = dict(_pending)
+        _pending.clear()
+    if scan:
+        for key, table, filters in due_snapshots():
+            if key not in jobs:
+                jobs[key] = (None, table, filters)
+
+    refreshed = 0
+    for key, (url, table, filters) in jobs.items():
+        start = time.time()
+        try:
+            done = refresh_bitrix_table(url or _table_url(table), filters=filters, min_age=REFRESH_AHEAD * SNAPSHOT_TTL)
+        except Exception as e:
+            _status['errors'] += 1
+            _status['last_error'] = f"{key}: {e}"
+            print(f"[WARN] Atualização em segundo plano de {key} falhou: {e}")
+            continue
+        if done:
+            refreshed += 1
+            print(f"[INFO] Snapshot {key} atualizado em segundo plano em {time.time() - start:.1f}s")
+        else:
+            _status['skipped'] += 1
+
+    _status['runs'] += 1
+    _status['refreshed'] += refreshed
+    _status['last_run_at'] = time.time()
+    return refreshed
+
+
+def _run_loop(scan):
+    while True:
+        try:
+            refresh_once(scan=scan)
+        except Exception as e:
+            _status['errors'] += 1
+            _status['last_error'] = str(e)
+            print(f"[WARN] Erro na atualização em segundo plano: {e}")
+        _wake.wait(REFRESH_INTERVAL)
+        _wake.clear()
+
+
+def _ensure_worker():
+    global _worker
+    if not SNAPSHOT_ENABLED:
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_loop, args=(BACKGROUND_REFRESH_ENABLED,),
+                                       name="bitrix-background-refresh", daemon=True)
+            _worker.start()
+
+
+def start_background_refresh():
+    """
+    Inicia a thread de atualização em segundo plano (uma por processo).
+
+    Pode ser chamada a cada execução do script do Streamlit: só a primeira cria a thread.
+    Com BITRIX_BACKGROUND_REFRESH=0 a thread só atende a fila do stale-while-revalidate.
+    """
+    if BACKGROUND_REFRESH_ENABLED:
+        _ensure_worker()
+
+
+def get_refresh_status():
+    """
+    Situação da atualização em segundo plano neste processo.
+
+    Returns:
+        dict: {'running', 'pending', 'runs', 'refreshed', 'skipped', 'errors', 'last_run_at', 'last_error'}
+    """
+    with _pending_lock:
+        pending = len(_pending)
+    return {**_status, 'running': _worker is not None and _worker.is_alive(), 'pending': pending}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantém os snapshots do Bitrix24 atualizados em segundo plano.")
+    parser.add_argument('--once', action='store_true', help="Executa uma única varredura e sai")
+    args = parser.parse_args(argv)
+    if args.once:
+        print(f"[INFO] {refresh_once()} snapshots atualizados")
+        return
+    print(f"[INFO] Atualização em segundo plano a cada {REFRESH_INTERVAL}s "
+          f"(antecipação de {REFRESH_AHEAD:.0%} do TTL de {SNAPSHOT_TTL}s)")
+    _run_loop(scan=True)
+
+
+if __name__ == "__main__":
+    main()
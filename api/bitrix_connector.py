@@ -5,6 +5,9 @@ import streamlit as st
 from datetime import datetime
 import time
 import os
+import itertools
+import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import sys
 from pathlib import Path
@@ -15,6 +18,28 @@ sys.path.insert(0, str(utils_path))
 
 # Agora importa diretamente do arquivo animation_utils
 from animation_utils import update_progress
+from single_flight import SingleFlight
+
+try:
+    from api.snapshot_cache import (table_name_from_url, snapshot_key, read_snapshot, read_snapshot_meta, write_snapshot, snapshot_lock,
+                                    mark_snapshot_access, stamp_snapshot_version, frame_versions, project_columns, VERSIONS_ATTR, SNAPSHOT_STALE_TTL,
+                                    refresh_if_stale)
+    from api.bitrix_sync import is_sync_table, last_sync_request, sync_table
+    from api.background_refresh import schedule_refresh, STALE_WHILE_REVALIDATE
+    from api.http_client import http_request, backoff_delay
+    from api.schema_registry import apply_schema
+    from api.dataset_catalog import is_catalog_table, serve_from_catalog
+    from api.merged_cache import get_merged, store_merged
+except ImportError:
+    from snapshot_cache import (table_name_from_url, snapshot_key, read_snapshot, read_snapshot_meta, write_snapshot, snapshot_lock,
+                                mark_snapshot_access, stamp_snapshot_version, frame_versions, project_columns, VERSIONS_ATTR, SNAPSHOT_STALE_TTL,
+                                refresh_if_stale)
+    from bitrix_sync import is_sync_table, last_sync_request, sync_table
+    from background_refresh import schedule_refresh, STALE_WHILE_REVALIDATE
+    from http_client import http_request, backoff_delay
+    from schema_registry import apply_schema
+    from dataset_catalog import is_catalog_table, serve_from_catalog
+    from merged_cache import get_merged, store_merged
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -87,27 +112,374 @@ else:
 # Variável de controle para logs de depuração
 SHOW_DEBUG_INFO = False
 
+# Tamanho dos blocos lidos da resposta do BI connector (modo streaming)
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Agrupa consultas simultâneas à mesma tabela/filtros feitas por sessões diferentes
+_bitrix_flights = SingleFlight("Bitrix")
+
+_JSON_WHITESPACE = ' \t\n\r'
+_SEM_ITENS = object()
+# Tipos deduplicados na leitura (ver _append_batch)
+_TIPOS_INTERNADOS = frozenset({str, type(None)})
+
+def _iter_json_array(chunks):
+    """
+    Itera os elementos de um array JSON de nível superior à medida que os blocos chegam.
+    
+    Cada elemento é decodificado assim que fica completo no buffer, de modo que o texto
+    integral da resposta nunca é mantido em memória.
+    
+    Args:
+        chunks (iterable): Blocos de texto (str) da resposta
+        
+    Yields:
+        Elementos do array, um de cada vez
+        
+    Raises:
+        json.JSONDecodeError: Se o conteúdo não for um array JSON válido ou estiver truncado
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+    state = 'start'  # start -> first -> (value -> after_value)* -> end
+
+    def read_more():
+        nonlocal buffer, pos, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        else:
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if exhausted:
+                raise json.JSONDecodeError("Array JSON incompleto", buffer, pos)
+            read_more()
+            continue
+
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise json.JSONDecodeError("Esperado array JSON", buffer, pos)
+            state = 'first'
+            pos += 1
+        elif char == ']' and state in ('first', 'after_value'):
+            return
+        elif char == ',' and state == 'after_value':
+            state = 'value'
+            pos += 1
+        elif state in ('first', 'value'):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                read_more()  # Elemento ainda incompleto no buffer
+                continue
+            if end == len(buffer) and not exhausted and not isinstance(item, (list, dict)):
+                read_more()  # Um escalar no fim do buffer pode estar truncado
+                continue
+            pos = end
+            state = 'after_value'
+            yield item
+        else:
+            raise json.JSONDecodeError("Separador inesperado no array JSON", buffer, pos)
+
+def _append_batch(columns, memos, batch):
+    """
+    Transpõe um lote de linhas para as listas de colunas.
+    
+    Em colunas de texto de baixa cardinalidade os valores repetidos passam a compartilhar
+    o mesmo objeto; colunas quase sempre distintas (IDs, nomes) deixam de ser deduplicadas.
+    Só texto e nulos são deduplicados: em um dicionário 1, 1.0 e True são a mesma chave,
+    e o valor devolvido seria o primeiro deles.
+    """
+    for i, values in enumerate(zip(*batch)):
+        column = columns[i]
+        memo = memos[i]
+        if memo is None:
+            column.extend(values)
+            continue
+        size, known = len(column), len(memo)
+        try:
+            column.extend(map(memo.setdefault, values, values))
+            # Um valor que não é texto sempre entra como chave nova no memo
+            novos_tipos = set(map(type, itertools.islice(memo, known, None)))
+        except TypeError: # Valor não hashable (lista/dict aninhado)
+            novos_tipos = {list}
+        if not _TIPOS_INTERNADOS.issuperset(novos_tipos):
+            del column[size:]
+            column.extend(values)
+            memos[i] = None
+        elif len(memo) > len(column) // 2:
+            memos[i] = None
+
+def _dataframe_from_rows(first_item, items, batch_size=5000):
+    """
+    Monta o DataFrame a partir do primeiro elemento do array e do iterador com os demais.
+    
+    No layout do BI connector (cabeçalhos na primeira linha) as linhas são transpostas em
+    lotes diretamente para listas por coluna, sem lista intermediária com todas as linhas.
+    Valores repetidos (SIM/NÃO, estágios, datas) passam a compartilhar o mesmo objeto,
+    o que reduz bastante a memória das colunas do tipo object.
+    """
+    if isinstance(first_item, list): # Cabeçalhos na primeira linha
+        headers = first_item
+        n_cols = len(headers)
+        columns = [[] for _ in range(n_cols)]
+        memos = [{} for _ in range(n_cols)]
+        batch = []
+        for row in items:
+            if len(row) != n_cols:
+                # Preencher com None linhas curtas e truncar linhas longas
+                row = list(row[:n_cols]) + [None] * (n_cols - len(row))
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _append_batch(columns, memos, batch)
+                batch = []
+        if batch:
+            _append_batch(columns, memos, batch)
+        del batch, memos
+        if not columns or not columns[0]:
+            return pd.DataFrame(columns=headers)
+        df = pd.DataFrame(dict(enumerate(columns)))
+        del columns
+        df.columns = headers
+        return df
+    # Lista de dicionários ou de outros tipos (improvável para API tabular)
+    return pd.DataFrame([first_item, *items])
+
+def parse_bitrix_response(response, show_logs=False):
+    """
+    Converte a resposta do BI connector (pbi.php) em DataFrame lendo-a em blocos.
+    
+    O pico de memória fica próximo do tamanho do DataFrame final, em vez de manter
+    ao mesmo tempo o texto da resposta, a lista de listas decodificada e a cópia
+    com as linhas ajustadas. Em troca, a leitura é mais lenta que json.loads +
+    DataFrame (transposição e deduplicação em Python; ver tests/bench_bitrix_parse.py),
+    o que é pequeno perto do tempo de download do BI connector.
+    
+    Args:
+        response (requests.Response): Resposta obtida com stream=True
+        show_logs (bool): Se deve exibir logs de depuração
+        
+    Returns:
+        pandas.DataFrame | None: DataFrame com os dados, ou None se a API retornou dados vazios
+        
+    Raises:
+        json.JSONDecodeError: Se a resposta não for um JSON válido
+    """
+    if response.encoding is None:
+        response.encoding = 'utf-8'
+    chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)
+    
+    # Ler até o primeiro caractere significativo para identificar o formato
+    head = ''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    
+    if not head.lstrip().startswith('['):
+        # Objeto único (ex: erro da API) ou escalar: decodificar de uma vez
+        data = json.loads(head + ''.join(chunks)) if head.strip() else None
+        if not data:
+            return None
+        if show_logs:
+            st.write(f"DEBUG: 'data' não é lista. Tipo: {type(data)}. Amostra: {str(data)[:500]}")
+        return pd.DataFrame([data])
+    
+    items = _iter_json_array(itertools.chain([head], chunks))
+    first_item = next(items, _SEM_ITENS)
+    if first_item is _SEM_ITENS:
+        if show_logs: st.write("DEBUG: 'data' é uma lista vazia.")
+        return None
+    if show_logs:
+        st.write(f"DEBUG: Primeiro item de 'data': {str(first_item)[:500]}")
+    return _dataframe_from_rows(first_item, items)
+
 # Função para carregar os dados do Bitrix com cache do Streamlit
-@st.cache_data(ttl=3600)  # Cache válido por 1 hora
-def load_bitrix_data(url, filters=None, show_logs=False, force_reload=False):
+def load_bitrix_data(url, filters=None, show_logs=False, force_reload=False, columns=None):
     """
     Carrega dados do Bitrix24 via API.
     
+    Antes de consultar a API, procura um snapshot em disco (compartilhado entre
+    processos e reinícios) para a mesma tabela e filtros. Downloads bem-sucedidos
+    são gravados como novo snapshot. Tabelas com data de modificação (ver
+    api/bitrix_sync.py) são atualizadas de forma incremental, inclusive com
+    force_reload=True. O resultado fica no st.cache_data, mas uma entrada cujo
+    snapshot de origem já mudou em disco é descartada e recarregada.
+    
     Args:
         url (str): URL da API Bitrix24
         filters (dict, optional): Filtros para a consulta
         show_logs (bool): Se deve exibir logs de depuração
         force_reload (bool): Se deve ignorar o cache e forçar recarregamento
+        columns (list, optional): Colunas usadas pelo consumidor. O snapshot em disco
+            continua com a tabela inteira (compartilhado entre as páginas), mas só estas
+            colunas são lidas dele e guardadas no cache em memória
         
     Returns:
         pandas.DataFrame: DataFrame com os dados obtidos
     """
+    return refresh_if_stale(_load_bitrix_data_cached, url, filters=filters, show_logs=show_logs,
+                            force_reload=force_reload, columns=columns)
+
+@st.cache_data(ttl=3600)  # Cache válido por 1 hora
+def _load_bitrix_data_cached(url, filters=None, show_logs=False, force_reload=False, columns=None):
+    """Cache em memória de load_bitrix_data."""
     # Se estiver forçando recarregamento, invalidar o cache para esta chamada
     if force_reload:
-        load_bitrix_data.clear()
+        _load_bitrix_data_cached.clear()
         if show_logs:
             st.info("Cache invalidado para forçar recarregamento")
     
+    return _load_bitrix_table(url, filters=filters, show_logs=show_logs, force_reload=force_reload, columns=columns)
+
+# O botão de atualização e os módulos limpam o cache por load_bitrix_data.clear()
+load_bitrix_data.clear = _load_bitrix_data_cached.clear
+
+def _load_bitrix_table(url, filters=None, show_logs=False, force_reload=False, columns=None):
+    """
+    Carrega uma tabela passando pelo snapshot em disco e pela sincronização incremental,
+    sem o cache em memória do Streamlit (pode ser chamada de threads auxiliares).
+    
+    O DataFrame devolvido leva em df.attrs a versão do snapshot de origem. Chamadas
+    simultâneas para a mesma tabela e filtros (ex: várias sessões após o cache expirar)
+    são agrupadas: só uma consulta é feita e as demais recebem uma cópia do resultado.
+    Tabelas do catálogo (crm_deal, crm_dynamic_items_1052, crm_status) são sempre
+    carregadas inteiras e os filtros suportados são aplicados localmente. Com columns,
+    o resultado traz só as colunas pedidas (as ausentes na tabela são ignoradas).
+    """
+    table = table_name_from_url(url)
+    if is_catalog_table(table):
+        # Pedido filtrado respondido a partir da tabela inteira (ver api/dataset_catalog.py)
+        df = serve_from_catalog(
+            table, filters,
+            lambda needed: _load_snapshot_table(url, table, None, show_logs, force_reload, needed),
+            columns=columns)
+        if df is not None:
+            return df
+    return _load_snapshot_table(url, table, filters, show_logs, force_reload, columns)
+
+def _load_snapshot_table(url, table, filters=None, show_logs=False, force_reload=False, columns=None):
+    """Snapshot de (tabela, filtros), com as chamadas simultâneas agrupadas."""
+    columns = sorted(set(columns)) if columns is not None else None
+    return _bitrix_flights.do(
+        (snapshot_key(table, filters), bool(force_reload), tuple(columns) if columns is not None else None),
+        lambda: stamp_snapshot_version(
+            _read_or_sync_table(url, table, filters, show_logs=show_logs, force_reload=force_reload, columns=columns),
+            table, filters),
+        label=table,
+        share=lambda df: df.copy() if df is not None else df,
+    )
+
+def get_fetch_dedup_stats():
+    """
+    Consultas ao Bitrix agrupadas por tabela (ver utils/single_flight.py).
+
+    Returns:
+        dict: {tabela: {'calls', 'executed', 'shared', 'seconds_waited'}}
+    """
+    return _bitrix_flights.stats()
+
+def _read_or_sync_table(url, table, filters=None, show_logs=False, force_reload=False, columns=None):
+    """
+    Lê o snapshot em disco ou baixa/sincroniza a tabela (ver _load_bitrix_table).
+    O download é sempre da tabela inteira; columns só limita o que é lido/devolvido.
+    """
+    # Um pedido de atualização invalida os snapshots anteriores (as tabelas sincronizáveis
+    # buscam só o delta; as demais são baixadas de novo)
+    not_before = last_sync_request()
+    mark_snapshot_access(table, filters)
+    if not force_reload:
+        df = read_snapshot(table, filters, not_before=not_before, columns=columns)
+        if df is not None:
+            # Snapshots gravados antes do registro de tipos são convertidos aqui
+            df = apply_schema(df, table)
+            if show_logs:
+                st.info(f"Dados de {table} carregados do snapshot em disco ({len(df)} linhas)")
+            return df
+        if STALE_WHILE_REVALIDATE:
+            # Snapshot vencido: servir a versão anterior e atualizar em segundo plano
+            df = read_snapshot(table, filters, ttl=SNAPSHOT_STALE_TTL, not_before=not_before, columns=columns)
+            if df is not None:
+                schedule_refresh(url, filters)
+                print(f"[INFO] Snapshot vencido de {table} servido enquanto é atualizado em segundo plano")
+                return apply_schema(df, table)
+    
+    with snapshot_lock(table, filters):
+        if not force_reload:
+            # Outro processo pode ter gravado o snapshot enquanto aguardávamos o lock
+            df = read_snapshot(table, filters, not_before=not_before, columns=columns)
+            if df is not None:
+                return apply_schema(df, table)
+        df = _download_table(url, table, filters, show_logs=show_logs)
+    # Colunas não pedidas são descartadas logo após o download (o snapshot fica completo)
+    return project_columns(df, columns)
+
+def _download_table(url, table, filters=None, show_logs=False):
+    """
+    Baixa (ou sincroniza, se a tabela tiver delta) e grava o snapshot. Deve ser chamada
+    com o snapshot_lock de (tabela, filtros) obtido.
+    """
+    if is_sync_table(table):
+        # Busca apenas as linhas modificadas desde o último download e mescla ao snapshot
+        # (o delta é tipado antes da mesclagem para não misturar texto e tipos compactos)
+        df = sync_table(
+            table, filters,
+            fetch=lambda f: apply_schema(_fetch_bitrix_data(url, filters=f, show_logs=show_logs), table, show_logs=show_logs),
+            show_logs=show_logs
+        )
+        return apply_schema(df, table)
+    df = apply_schema(_fetch_bitrix_data(url, filters=filters, show_logs=show_logs), table, show_logs=show_logs)
+    if not df.empty:
+        write_snapshot(table, filters, df)
+    return df
+
+def refresh_bitrix_table(url, filters=None, min_age=0):
+    """
+    Atualiza o snapshot de uma tabela fora do caminho das páginas (atualização em
+    segundo plano). O snapshot novo substitui o anterior de forma atômica; enquanto
+    isso, as leituras continuam recebendo a versão anterior.
+    
+    Args:
+        url (str): URL da API Bitrix24
+        filters (dict, optional): Filtros do snapshot
+        min_age (float): Não atualiza se o snapshot tiver menos que min_age segundos
+            (outro processo pode tê-lo atualizado enquanto aguardávamos o lock)
+        
+    Returns:
+        bool: True se a tabela foi baixada/sincronizada
+    """
+    table = table_name_from_url(url)
+    not_before = last_sync_request()
+    with snapshot_lock(table, filters):
+        meta = read_snapshot_meta(table, filters)
+        if meta and meta.get('created_at', 0) >= not_before and time.time() - meta.get('created_at', 0) < min_age:
+            return False
+        _download_table(url, table, filters)
+    return True
+
+def _fetch_bitrix_data(url, filters=None, show_logs=False):
+    """
+    Baixa os dados de uma tabela do Bitrix24 diretamente do BI connector (sem cache).
+    
+    Args:
+        url (str): URL da API Bitrix24
+        filters (dict, optional): Filtros para a consulta
+        show_logs (bool): Se deve exibir logs de depuração
+        
+    Returns:
+        pandas.DataFrame: DataFrame com os dados obtidos (vazio em caso de falha)
+    """
     try:
         if show_logs:
             st.info(f"Tentando acessar: {url}")
@@ -122,113 +494,56 @@ def load_bitrix_data(url, filters=None, show_logs=False, force_reload=False):
                 if filters:
                     if show_logs:
                         st.write(f"Enviando filtros: {json.dumps(filters)}")
-                    response = requests.post(url, data=json.dumps(filters), headers=headers, timeout=30)
+                    response = http_request("POST", url, data=json.dumps(filters), headers=headers, timeout=30, stream=True)
                 else:
-                    response = requests.get(url, timeout=30)
+                    response = http_request("GET", url, timeout=30, stream=True)
                 
-                if response.status_code == 200:
-                    if show_logs:
-                        st.write(f"DEBUG: Status 200 OK para {url}.")
-                        st.write(f"DEBUG: Primeiros 500 chars da resposta bruta (response.text): {response.text[:500]}")
-                    try:
-                        data = response.json()
+                # Fechar a resposta devolve a conexão ao pool mesmo se a leitura for interrompida
+                with response:
+                    if response.status_code == 200:
                         if show_logs:
-                            st.write(f"DEBUG: response.json() bem-sucedido. Tipo de 'data': {type(data)}")
-                            if isinstance(data, list) and len(data) > 0:
-                                st.write(f"DEBUG: 'data' é uma lista. Tamanho: {len(data)}. Tipo do primeiro item: {type(data[0])}")
-                                st.write(f"DEBUG: Primeiro item de 'data' (data[0]): {str(data[0])[:500]}") # Mostrar amostra do primeiro item
-                                if len(data) > 1:
-                                    st.write(f"DEBUG: Segundo item de 'data' (data[1]): {str(data[1])[:500]}") # Mostrar amostra do segundo item
-                            elif isinstance(data, dict):
-                                st.write(f"DEBUG: 'data' é um dicionário. Chaves: {list(data.keys())}")
-                                st.write(f"DEBUG: Amostra do dicionário 'data': {str(data)[:1000]}")
-                            else:
-                                st.write(f"DEBUG: 'data' não é lista nem dicionário. Conteúdo (amostra): {str(data)[:500]}")
-                        
-                        df = pd.DataFrame() # Inicializar df como DataFrame vazio
-                        if data: # Se data não for None, [], {}, etc.
-                            if isinstance(data, list):
-                                if len(data) > 0:
-                                    first_item = data[0]
-                                    if isinstance(first_item, list): # Cabeçalhos na primeira linha
-                                        if show_logs: st.write("DEBUG: Interpretando como lista de listas (cabeçalhos na primeira linha).")
-                                        headers = data[0]
-                                        rows_data = data[1:]
-                                        # Garantir que todas as linhas tenham o mesmo número de colunas que os cabeçalhos
-                                        # e preencher com None se faltar, para evitar erros no DataFrame
-                                        processed_rows = []
-                                        for r_idx, row_item in enumerate(rows_data):
-                                            if len(row_item) < len(headers):
-                                                # if show_logs: st.write(f"WARN: Linha {r_idx+1} tem {len(row_item)} colunas, cabeçalho tem {len(headers)}. Preenchendo com None.")
-                                                processed_rows.append(list(row_item) + [None] * (len(headers) - len(row_item)))
-                                            elif len(row_item) > len(headers):
-                                                # if show_logs: st.write(f"WARN: Linha {r_idx+1} tem {len(row_item)} colunas, cabeçalho tem {len(headers)}. Truncando.")
-                                                processed_rows.append(list(row_item)[:len(headers)])
-                                            else:
-                                                processed_rows.append(row_item)
-                                        df = pd.DataFrame(processed_rows, columns=headers)
-                                    elif isinstance(first_item, dict): # Lista de dicionários
-                                        if show_logs: st.write("DEBUG: Interpretando como lista de dicionários.")
-                                        df = pd.DataFrame(data)
-                                    else: # Lista de outros tipos (improvável para API tabular)
-                                        if show_logs: st.write("DEBUG: 'data' é uma lista, mas o primeiro item não é lista nem dict. Tentando pd.DataFrame(data).")
-                                        try: df = pd.DataFrame(data)
-                                        except Exception as e_df: 
-                                            if show_logs: st.write(f"DEBUG: Falha ao criar DataFrame de lista de itens não-dict/list: {e_df}")
-                                else: # Lista vazia
-                                    if show_logs: st.write("DEBUG: 'data' é uma lista vazia. Criando DataFrame vazio.")
-                                    # df já é um DataFrame vazio aqui
-                            elif isinstance(data, dict): # Resposta é um único dicionário
-                                # Pode ser um objeto de erro, ou um objeto único de dados
-                                if 'error' in data or 'errors' in data: # Heurística para erro
-                                     if show_logs: st.write(f"DEBUG: 'data' é um dicionário e parece ser um erro: {data}")
-                                     df = pd.DataFrame([data]) # Transforma o erro em um DataFrame de 1 linha
-                                else:
-                                     if show_logs: st.write("DEBUG: Interpretando como dicionário único. Criando DataFrame de 1 linha.")
-                                     df = pd.DataFrame([data])
-                            else: # Nenhum dos formatos esperados
-                                if show_logs: st.write(f"DEBUG: 'data' não é lista nem dicionário. Tentando pd.DataFrame([data]). Tipo: {type(data)}.")
-                                try: df = pd.DataFrame([data]) # Tenta criar um df de 1 linha
-                                except Exception as e_df_single:
-                                    if show_logs: st.write(f"DEBUG: Falha ao criar DataFrame de item único não-dict/list: {e_df_single}")
-                            
-                            if show_logs and not df.empty:
-                                st.write(f"DEBUG: DataFrame criado. Colunas: {df.columns.tolist()}")
-                                st.write(f"DEBUG: Amostra do DataFrame (head(1)):\n{df.head(1)}")
-                            elif show_logs and df.empty:
-                                st.write("DEBUG: DataFrame resultante está vazio (após processamento de 'data').")
+                            st.write(f"DEBUG: Status 200 OK para {url}.")
+                        try:
+                            # Leitura em blocos: o DataFrame é montado coluna a coluna sem
+                            # materializar response.text nem a lista de linhas completa
+                            df = parse_bitrix_response(response, show_logs=show_logs)
+                            if df is not None:
+                                if show_logs and not df.empty:
+                                    st.write(f"DEBUG: DataFrame criado. Colunas: {df.columns.tolist()}")
+                                    st.write(f"DEBUG: Amostra do DataFrame (head(1)):\n{df.head(1)}")
+                                elif show_logs and df.empty:
+                                    st.write("DEBUG: DataFrame resultante está vazio (após processamento de 'data').")
                                 
-                            # Log específico para crm_dynamic_items_1098 (repetido para garantir o ponto exato)
-                            if "crm_dynamic_items_1098" in url and show_logs:
-                                st.write(f"DEBUG_CREATE_DF (crm_dynamic_items_1098) Colunas: {df.columns.tolist() if not df.empty else 'Vazio'}")
+                                # Log específico para crm_dynamic_items_1098 (repetido para garantir o ponto exato)
+                                if "crm_dynamic_items_1098" in url and show_logs:
+                                    st.write(f"DEBUG_CREATE_DF (crm_dynamic_items_1098) Colunas: {df.columns.tolist() if not df.empty else 'Vazio'}")
 
-                            return df # Retorna o DataFrame criado
-                        else: # data é None, ou avalia para False (ex: {}, [])
+                                return df # Retorna o DataFrame criado
+                            else: # A API retornou dados vazios (ex: [], {}, null)
+                                if show_logs:
+                                    st.warning(f"DEBUG: A API retornou 'data' vazia ou nula para {url} na tentativa {attempt + 1}.")
+                                if attempt < max_attempts - 1:
+                                    time.sleep(backoff_delay(attempt))
+                                else:
+                                    return pd.DataFrame() # Retorna DF vazio se todas as tentativas resultarem em 'data' vazia
+                        except json.JSONDecodeError as je:
                             if show_logs:
-                                st.warning(f"DEBUG: A API retornou 'data' vazia ou nula para {url} na tentativa {attempt + 1}. Tipo de data: {type(data)}")
-                            # df já é um DataFrame vazio, pode retornar ele ou continuar o loop
-                            if attempt < max_attempts - 1:
-                                time.sleep(2)
-                            else:
-                                return pd.DataFrame() # Retorna DF vazio se todas as tentativas resultarem em 'data' vazia
-                    except json.JSONDecodeError as je:
-                        if show_logs:
-                            st.error(f"Erro ao decodificar JSON: {str(je)}")
-                            st.write(f"Resposta da API (primeiros 500 caracteres): {response.text[:500]}")
-                        return pd.DataFrame()
-                else:
-                    if show_logs:
-                        st.error(f"Erro ao acessar a API Bitrix24 na tentativa {attempt + 1}: Código {response.status_code}")
-                        st.write(f"Resposta da API: {response.text[:500]}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(2)  # Aguardar antes de tentar novamente
+                                st.error(f"Erro ao decodificar JSON: {str(je)}")
+                                st.write(f"Trecho da resposta próximo ao erro: {je.doc[max(je.pos - 250, 0):je.pos + 250]}")
+                            return pd.DataFrame()
                     else:
-                        return pd.DataFrame()
+                        if show_logs:
+                            st.error(f"Erro ao acessar a API Bitrix24 na tentativa {attempt + 1}: Código {response.status_code}")
+                            st.write(f"Resposta da API: {response.text[:500]}")
+                        if attempt < max_attempts - 1:
+                            time.sleep(backoff_delay(attempt))  # Backoff exponencial com jitter
+                        else:
+                            return pd.DataFrame()
             except requests.exceptions.RequestException as re:
                 if show_logs:
                     st.error(f"Erro de conexão na tentativa {attempt + 1}: {str(re)}")
                 if attempt < max_attempts - 1:
-                    time.sleep(2)  # Aguardar antes de tentar novamente
+                    time.sleep(backoff_delay(attempt))  # Backoff exponencial com jitter
                 else:
                     return pd.DataFrame()
         
@@ -261,10 +576,140 @@ def load_bitrix_data(url, filters=None, show_logs=False, force_reload=False):
         print(f"[WARN] load_bitrix_data: 'df' não é um DataFrame ou não foi definido. URL: {url}")
         return pd.DataFrame()
 
-def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=None, debug=False, progress_bar=None, message_container=None, force_reload=False):
+# Configuração da busca de tabelas filtradas por listas grandes de IDs
+ID_CHUNK_SIZE = int(os.getenv('BITRIX_ID_CHUNK_SIZE', 500))
+ID_FETCH_WORKERS = int(os.getenv('BITRIX_ID_FETCH_WORKERS', 4))
+ID_CHUNK_RETRIES = 2
+
+class BitrixFetchError(Exception):
+    """Parte dos dados não pôde ser baixada do Bitrix24 (o resultado parcial não é usado)."""
+
+def _sorted_ids(ids):
+    """Remove duplicados e ordena os IDs (numericamente quando possível) como strings."""
+    unique_ids = {str(i).strip() for i in ids if i is not None and str(i).strip() not in ('', 'nan', 'None')}
+    return sorted(unique_ids, key=lambda v: (0, int(v), v) if v.isdigit() else (1, 0, v))
+
+def load_bitrix_data_by_ids(url, id_field, ids, base_filters=None, chunk_size=None, max_workers=None, show_logs=False, force_reload=False, columns=None):
+    """
+    Carrega uma tabela do Bitrix24 filtrada por uma lista (possivelmente grande) de IDs.
+    
+    Em vez de um único POST com todos os IDs, a lista é ordenada e dividida em lotes
+    de chunk_size, buscados em paralelo por um pool limitado de threads. Cada lote tem
+    seu próprio snapshot em disco e suas próprias tentativas: um lote lento ou com
+    falha não obriga a baixar a tabela inteira novamente. Como os IDs novos são
+    maiores, os lotes iniciais se mantêm estáveis e continuam reaproveitando o cache.
+    Como em load_bitrix_data, o resultado em memória é descartado se algum snapshot de
+    lote mudou em disco.
+    
+    Lotes que falharem no pool são tentados de novo, um de cada vez, depois dos demais.
+    Se algum ainda falhar, nada é devolvido nem guardado em cache (um resultado parcial
+    deixaria esses IDs sem os campos da tabela até o fim do TTL): BitrixFetchError.
+    
+    Args:
+        url (str): URL da API Bitrix24 (tabela)
+        id_field (str): Campo usado no filtro (ex: 'DEAL_ID', 'ID')
+        ids (list): IDs a buscar
+        base_filters (dict, optional): Filtros adicionais aplicados a todos os lotes
+        chunk_size (int, optional): Quantidade de IDs por lote (padrão: ID_CHUNK_SIZE)
+        max_workers (int, optional): Threads simultâneas (padrão: ID_FETCH_WORKERS)
+        show_logs (bool): Se deve exibir logs de depuração
+        force_reload (bool): Se deve ignorar o cache e forçar recarregamento
+        columns (list, optional): Colunas usadas pelo consumidor (id_field é sempre mantido)
+        
+    Returns:
+        pandas.DataFrame: Linhas de todos os lotes concatenadas
+        
+    Raises:
+        BitrixFetchError: Se algum lote não pôde ser carregado
+    """
+    return refresh_if_stale(_load_bitrix_data_by_ids_cached, url, id_field, ids, base_filters=base_filters,
+                            chunk_size=chunk_size, max_workers=max_workers, show_logs=show_logs,
+                            force_reload=force_reload, columns=columns)
+
+@st.cache_data(ttl=3600)  # Cache válido por 1 hora
+def _load_bitrix_data_by_ids_cached(url, id_field, ids, base_filters=None, chunk_size=None, max_workers=None, show_logs=False, force_reload=False, columns=None):
+    """Cache em memória de load_bitrix_data_by_ids."""
+    if force_reload:
+        _load_bitrix_data_by_ids_cached.clear()
+    
+    id_list = _sorted_ids(ids or [])
+    if not id_list:
+        return pd.DataFrame()
+    chunk_size = chunk_size or ID_CHUNK_SIZE
+    if columns is not None:
+        columns = list(dict.fromkeys([id_field, *columns]))
+    chunks = [id_list[i:i + chunk_size] for i in range(0, len(id_list), chunk_size)]
+    
+    def chunk_filters(chunk):
+        chunk_filter = copy.deepcopy(base_filters) if base_filters else {"dimensionsFilters": [[]]}
+        groups = chunk_filter.setdefault("dimensionsFilters", [[]])
+        if not groups:
+            groups.append([])
+        groups[0].append({
+            "fieldName": id_field,
+            "values": chunk,
+            "type": "INCLUDE",
+            "operator": "EQUALS"
+        })
+        return chunk_filter
+    
+    def fetch_chunk(index, chunk):
+        start = time.time()
+        for attempt in range(ID_CHUNK_RETRIES):
+            df_chunk = _load_bitrix_table(url, filters=chunk_filters(chunk), force_reload=force_reload, columns=columns)
+            # DataFrame sem colunas indica falha; com colunas e sem linhas é um resultado válido
+            if len(df_chunk.columns) > 0:
+                break
+            time.sleep(backoff_delay(attempt))
+        print(f"[INFO] Lote {index + 1}/{len(chunks)} de {table_name_from_url(url)} ({len(chunk)} IDs): "
+              f"{len(df_chunk)} linhas em {time.time() - start:.1f}s")
+        return index, df_chunk
+    
+    results = [None] * len(chunks)
+    workers = max(1, min(max_workers or ID_FETCH_WORKERS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch_chunk, i, chunk) for i, chunk in enumerate(chunks)]
+        for future in as_completed(futures):
+            index, df_chunk = future.result()
+            results[index] = df_chunk
+    
+    table = table_name_from_url(url)
+    failed = [i for i, df_chunk in enumerate(results) if len(df_chunk.columns) == 0]
+    if failed:
+        # Sem a concorrência do pool, um lote por vez
+        print(f"[WARN] {table}: lotes {[i + 1 for i in failed]} de {len(chunks)} falharam; tentando de novo um a um")
+        for i in failed:
+            results[i] = fetch_chunk(i, chunks[i])[1]
+        failed = [i + 1 for i, df_chunk in enumerate(results) if len(df_chunk.columns) == 0]
+    if failed:
+        message = (f"{len(failed)} de {len(chunks)} lotes de {id_field} de {table} não puderam ser carregados: "
+                   f"{failed}")
+        print(f"[WARN] {message}")
+        if show_logs:
+            st.warning(message)
+        raise BitrixFetchError(message)
+    
+    df = pd.concat(results, ignore_index=True)
+    # Versões de todos os lotes (o concat só preserva attrs idênticos)
+    df.attrs[VERSIONS_ATTR] = frame_versions(*results)
+    return df
+
+load_bitrix_data_by_ids.clear = _load_bitrix_data_by_ids_cached.clear
+
+# Campo de crm_deal usado no filtro de período de load_merged_data
+MERGED_DATE_FIELD = 'UF_CRM_1741206763'
+# Colunas sempre mantidas por load_merged_data quando o consumidor declara as suas
+# (o campo de data permite responder subperíodos a partir do cache de resultados)
+MERGED_REQUIRED_COLUMNS = ['ID', 'DEAL_ID', 'CATEGORY_ID', 'ASSIGNED_BY_NAME', 'ASSIGNED_BY', MERGED_DATE_FIELD]
+
+def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=None, debug=False, progress_bar=None, message_container=None, force_reload=False, columns=None):
     """
     Carrega e mescla dados das tabelas crm_deal e crm_deal_uf.
     
+    O resultado mesclado fica em cache enquanto os snapshots de origem não mudarem
+    (ver api/merged_cache.py); um período contido em outro já carregado é respondido
+    filtrando o resultado maior. force_reload e debug sempre refazem a mesclagem.
+    
     Args:
         category_id (int, optional): ID da categoria para filtrar
         date_from (str, optional): Data inicial para filtro
@@ -274,10 +719,32 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
         progress_bar: Placeholder da barra de progresso (opcional)
         message_container: Placeholder da mensagem (opcional)
         force_reload (bool): Se deve ignorar o cache e forçar recarregamento completo
+        columns (list, optional): Colunas (de crm_deal ou crm_deal_uf) usadas pelo
+            consumidor. As demais são descartadas antes do cache e da mesclagem; as
+            chaves (ID/DEAL_ID), CATEGORY_ID, o responsável, o campo de data e os
+            campos de higienização são sempre mantidos
         
     Returns:
         pandas.DataFrame: DataFrame com os dados mesclados
     """
+    # Colunas lidas das duas tabelas (as que não existirem em uma delas são ignoradas)
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, *MERGED_REQUIRED_COLUMNS, *get_higilizacao_fields().keys()]))
+    
+    if not (force_reload or debug):
+        cached = get_merged(category_id, date_from, date_to, deal_ids, columns, MERGED_DATE_FIELD)
+        if cached is not None:
+            if progress_bar:
+                update_progress(progress_bar, 1.0, message_container, "Dados carregados com sucesso!")
+            return cached
+    
+    merged_df = _build_merged_data(category_id, date_from, date_to, deal_ids, debug, progress_bar,
+                                   message_container, force_reload, columns)
+    store_merged(category_id, date_from, date_to, deal_ids, columns, merged_df)
+    return merged_df
+
+def _build_merged_data(category_id, date_from, date_to, deal_ids, debug, progress_bar, message_container, force_reload, columns):
+    """Carrega as duas tabelas e faz a mesclagem (ver load_merged_data)."""
     global SHOW_DEBUG_INFO
     SHOW_DEBUG_INFO = debug
     
@@ -331,7 +798,7 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
         if date_from and date_to:
             if api_filters is None: api_filters = {"dimensionsFilters": [[]]}
             api_filters["dimensionsFilters"][0].append({
-                "fieldName": "UF_CRM_1741206763",
+                "fieldName": MERGED_DATE_FIELD,
                 "values": [date_from, date_to],
                 "type": "INCLUDE",
                 "operator": "BETWEEN"
@@ -342,14 +809,13 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
             st.write(f"Filtros de API para crm_deal: {api_filters}")
             st.write(f"Filtro local de categoria para crm_deal: {local_filter_category_id}")
 
-        df_deal = load_bitrix_data(BITRIX_CRM_DEAL_URL, filters=api_filters, show_logs=debug, force_reload=force_reload)
+        df_deal = load_bitrix_data(BITRIX_CRM_DEAL_URL, filters=api_filters, show_logs=debug, force_reload=force_reload, columns=columns)
         
         # Aplicar filtro local de CATEGORY_ID se necessário (após o carregamento)
         if local_filter_category_id and not df_deal.empty and 'CATEGORY_ID' in df_deal.columns:
             if debug: st.write(f"INFO: Aplicando filtro local para CATEGORY_ID = {local_filter_category_id} em df_deal.")
-            # Certificar que a coluna CATEGORY_ID é string para a comparação, como nos filtros da API
-            df_deal['CATEGORY_ID'] = df_deal['CATEGORY_ID'].astype(str)
-            df_deal = df_deal[df_deal['CATEGORY_ID'] == local_filter_category_id]
+            # CATEGORY_ID já vem como Int64 do schema_registry: compara com inteiro e mantém o dtype
+            df_deal = df_deal[df_deal['CATEGORY_ID'] == int(local_filter_category_id)]
             if debug: st.write(f"INFO: df_deal após filtro local: {len(df_deal)} linhas.")
         elif local_filter_category_id and ('CATEGORY_ID' not in df_deal.columns and not df_deal.empty):
             if debug: st.warning(f"WARN: Filtro local de CATEGORY_ID={local_filter_category_id} não aplicado pois a coluna 'CATEGORY_ID' não existe em df_deal.")
@@ -379,7 +845,7 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
         if df_deal.empty:
             if debug:
                 st.warning("Falha ao carregar dados com filtros. Tentando sem filtros...")
-            df_deal = load_bitrix_data(BITRIX_CRM_DEAL_URL, show_logs=debug, force_reload=force_reload)
+            df_deal = load_bitrix_data(BITRIX_CRM_DEAL_URL, show_logs=debug, force_reload=force_reload, columns=columns)
         
         # Verificar se temos dados
         if df_deal.empty:
@@ -404,38 +870,23 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
         if progress_bar:
             update_progress(progress_bar, 0.5, message_container, "Carregando tabela de campos personalizados...")
         
-        # Preparar filtro para a tabela UF com base nos IDs encontrados
+        # IDs para filtrar a tabela UF: os IDs específicos, se informados, ou todos os encontrados
         if not df_deal.empty and 'ID' in df_deal.columns:
-            # Obter IDs da tabela principal para filtrar a tabela UF
             if deal_ids is None or len(deal_ids) == 0:
-                # Usar todos os IDs encontrados
-                sample_ids = df_deal['ID'].astype(str).tolist()
-                
-                # Atualizar o filtro para usar todos os IDs encontrados
-                deal_filter = {"dimensionsFilters": [[]]}
-                deal_filter["dimensionsFilters"][0].append({
-                    "fieldName": "DEAL_ID", 
-                    "values": sample_ids, 
-                    "type": "INCLUDE", 
-                    "operator": "EQUALS"
-                })
+                uf_ids = df_deal['ID'].astype(str).tolist()
             else:
-                # Se já temos IDs específicos, usar eles
-                deal_filter = {"dimensionsFilters": [[]]}
-                deal_filter["dimensionsFilters"][0].append({
-                    "fieldName": "DEAL_ID", 
-                    "values": [str(id) for id in deal_ids],  # Já está convertendo para string, o que é correto
-                    "type": "INCLUDE", 
-                    "operator": "EQUALS"
-                })
+                uf_ids = [str(id) for id in deal_ids]
         else:
-            deal_filter = filters
+            uf_ids = []
         
-        # Carregar dados personalizados com filtro otimizado
+        # Carregar dados personalizados em lotes paralelos de DEAL_ID
         if debug:
             st.subheader(f"Carregando tabela crm_deal_uf (Categoria: {category_id})")
-            # st.write("Filtro para crm_deal_uf:", deal_filter) # Já existia
-        df_deal_uf = load_bitrix_data(BITRIX_CRM_DEAL_UF_URL, deal_filter, show_logs=debug, force_reload=force_reload)
+            st.write(f"crm_deal_uf: {len(uf_ids)} DEAL_IDs em lotes de {ID_CHUNK_SIZE}")
+        if uf_ids:
+            df_deal_uf = load_bitrix_data_by_ids(BITRIX_CRM_DEAL_UF_URL, "DEAL_ID", uf_ids, show_logs=debug, force_reload=force_reload, columns=columns)
+        else:
+            df_deal_uf = pd.DataFrame()
         
         # Logs para df_deal_uf especificamente para category_id 46
         if category_id == 46 and debug:
@@ -673,8 +1124,16 @@ def load_merged_data(category_id=None, date_from=None, date_to=None, deal_ids=No
                          st.write(f"INFO: Coluna '{col_chk_m}_deal' ENCONTRADA em merged_df (veio de df_deal).")
             st.write("--- DEBUG FICHA FAMÍLIA (merged_df) --- END ---")
 
+        # Versões dos snapshots de origem (o merge não preserva df.attrs)
+        merged_df.attrs[VERSIONS_ATTR] = frame_versions(df_deal, df_deal_uf)
         return merged_df
         
+    except BitrixFetchError as e:
+        # Sempre visível: sem isso a página mostraria negócios sem os campos personalizados
+        st.warning(f"Dados incompletos do Bitrix24, tente atualizar em instantes: {e}")
+        if progress_bar:
+            update_progress(progress_bar, 1.0, message_container, "Erro ao carregar dados!")
+        return pd.DataFrame()
     except Exception as e:
         if debug:
             st.error(f"Erro ao processar os dados: {str(e)}")
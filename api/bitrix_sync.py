@@ -0,0 +1,161 @@
+"""
+Sincronização incremental (delta) das tabelas do Bitrix24.
+
+Em vez de baixar a tabela inteira a cada expiração do cache, guarda no snapshot em
+disco (ver snapshot_cache) a maior data de modificação já vista (high-water mark) e
+pede ao BI connector apenas as linhas alteradas desde então. As linhas recebidas são
+mescladas ao snapshot pela chave (ID) e, periodicamente, uma carga completa
+(reconciliação) remove registros excluídos ou que saíram do filtro.
+
+Tabelas sem coluna de data de modificação (ex: crm_deal_uf, crm_status) continuam
+sendo baixadas por completo.
+"""
+import copy
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    from api.snapshot_cache import (last_sync_request, read_snapshot, read_snapshot_meta, request_sync,
+                                    write_snapshot, touch_snapshot)
+except ImportError:
+    from snapshot_cache import (last_sync_request, read_snapshot, read_snapshot_meta, request_sync,
+                                write_snapshot, touch_snapshot)
+
+# Tabelas com sincronização incremental: chave primária e coluna de data de modificação
+SYNC_TABLES = {
+    'crm_deal': {'key': 'ID', 'watermark': 'DATE_MODIFY'},
+    'crm_dynamic_items_1052': {'key': 'ID', 'watermark': 'UPDATED_TIME'},
+    'crm_dynamic_items_1086': {'key': 'ID', 'watermark': 'UPDATED_TIME'},
+    'crm_dynamic_items_1098': {'key': 'ID', 'watermark': 'UPDATED_TIME'},
+}
+
+# Intervalo entre cargas completas (reconciliação de exclusões)
+RECONCILE_INTERVAL = int(os.getenv('BITRIX_RECONCILE_INTERVAL', 6 * 3600))  # 6 horas
+
+def is_sync_table(table):
+    """Indica se a tabela tem sincronização incremental configurada."""
+    return table in SYNC_TABLES
+
+
+def _max_watermark(df, column):
+    """Maior data de modificação presente no DataFrame, no formato AAAA-MM-DD HH:MM:SS."""
+    if column not in df.columns or df.empty:
+        return None
+    max_value = pd.to_datetime(df[column], errors='coerce').max()
+    if pd.isna(max_value):
+        return None
+    return max_value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _with_watermark_filter(filters, column, watermark):
+    """
+    Acrescenta aos filtros originais a condição "modificado desde o watermark".
+
+    A condição vai em um grupo próprio de dimensionsFilters (AND com os demais grupos).
+    A comparação é feita por dia, então o dia do watermark é sempre buscado de novo;
+    as linhas repetidas são descartadas na mesclagem.
+    """
+    delta_filters = copy.deepcopy(filters) if filters else {}
+    groups = delta_filters.setdefault('dimensionsFilters', [])
+    groups[:] = [group for group in groups if group]
+    date_from = watermark[:10]
+    date_to = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    groups.append([{
+        "fieldName": column,
+        "values": [date_from, date_to],
+        "type": "INCLUDE",
+        "operator": "BETWEEN"
+    }])
+    return delta_filters
+
+
+def merge_delta(stored, delta, key):
+    """
+    Mescla as linhas alteradas ao snapshot: linhas com a mesma chave são substituídas.
+
+    Args:
+        stored (pandas.DataFrame): Snapshot atual
+        delta (pandas.DataFrame): Linhas modificadas desde o watermark
+        key (str): Coluna chave (ID)
+
+    Returns:
+        pandas.DataFrame: Snapshot atualizado
+    """
+    if key not in stored.columns or key not in delta.columns:
+        return stored
+    merged = pd.concat([stored, delta], ignore_index=True)
+    keep = ~merged[key].astype(str).duplicated(keep='last')
+    return merged[keep].reset_index(drop=True)
+
+
+def sync_table(table, filters, fetch, show_logs=False, force_full=False):
+    """
+    Atualiza o snapshot de (tabela, filtros) de forma incremental.
+
+    Faz carga completa quando não há snapshot/watermark, quando a reconciliação
+    periódica venceu ou quando force_full=True; caso contrário busca apenas o delta.
+    Se o download falhar, o snapshot anterior (mesmo expirado) é devolvido.
+
+    Args:
+        table (str): Nome da tabela (precisa estar em SYNC_TABLES)
+        filters (dict | None): Filtros originais da consulta
+        fetch (callable): Função fetch(filters) -> DataFrame que consulta a API
+        show_logs (bool): Se deve imprimir logs de depuração
+        force_full (bool): Se deve ignorar o delta e fazer carga completa
+
+    Returns:
+        pandas.DataFrame: Dados atualizados da tabela
+    """
+    config = SYNC_TABLES[table]
+    key, column = config['key'], config['watermark']
+    now = time.time()
+
+    meta = read_snapshot_meta(table, filters)
+    # O snapshot anterior ao pedido de sincronização é justamente a base do delta
+    stored = read_snapshot(table, filters, ttl=0, not_before=0) if meta else None
+    watermark = meta.get('watermark') if meta else None
+    reconcile_due = not meta or now - meta.get('reconciled_at', 0) > RECONCILE_INTERVAL
+
+    if force_full or stored is None or not watermark or reconcile_due:
+        start = time.time()
+        df = fetch(filters)
+        if df.empty:
+            return stored if stored is not None else df
+        write_snapshot(table, filters, df, extra_meta={
+            'watermark': _max_watermark(df, column),
+            'reconciled_at': now,
+            'sync_mode': 'full',
+        })
+        if show_logs:
+            print(f"[SYNC] {table}: carga completa de {len(df)} linhas em {time.time() - start:.1f}s")
+        return df
+
+    start = time.time()
+    delta = fetch(_with_watermark_filter(filters, column, watermark))
+    if len(delta.columns) == 0:
+        # Falha na consulta (timeout, erro HTTP, JSON inválido): um delta realmente vazio
+        # ainda traz a linha de cabeçalhos. O snapshot não é renovado, para que o próximo
+        # pedido tente de novo em vez de servir dados antigos como atualizados.
+        print(f"[WARN] {table}: falha ao buscar alterações desde {watermark}; "
+              f"snapshot anterior mantido sem renovar a validade")
+        return stored
+    if delta.empty:
+        touch_snapshot(table, filters, extra_meta={'sync_mode': 'delta', 'delta_rows': 0})
+        if show_logs:
+            print(f"[SYNC] {table}: nenhuma alteração desde {watermark} ({time.time() - start:.1f}s)")
+        return stored
+
+    merged = merge_delta(stored, delta, key)
+    new_watermark = max(filter(None, [watermark, _max_watermark(delta, column)]))
+    write_snapshot(table, filters, merged, extra_meta={
+        'watermark': new_watermark,
+        'reconciled_at': meta.get('reconciled_at', now),
+        'sync_mode': 'delta',
+        'delta_rows': int(len(delta)),
+    })
+    if show_logs:
+        print(f"[SYNC] {table}: {len(delta)} linhas alteradas desde {watermark} mescladas em {time.time() - start:.1f}s")
+    return merged
@@ -0,0 +1,241 @@
+"""
+Catálogo de conjuntos de dados canônicos do Bitrix24.
+
+Várias páginas pedem a mesma tabela com filtros diferentes (crm_deal inteira no
+load_merged_data e só a categoria 46 no cartorio_new; crm_dynamic_items_1052 inteira no
+cartório e por categoria no comune). Como o snapshot em disco e o st.cache_data usam os
+filtros como chave, cada formato virava um download próprio. Aqui cada tabela registrada
+tem um único conjunto canônico (a tabela sem filtros, mantido pelo snapshot e pela
+sincronização incremental) e os pedidos mais estreitos são respondidos filtrando esse
+snapshot localmente:
+
+- INCLUDE/EQUALS (categoria, IDs, estágios): valores comparados como número nas
+  colunas numéricas e como texto nas demais
+- INCLUDE/BETWEEN (datas): comparação por dia, com os dois extremos inclusivos
+- Grupos de dimensionsFilters: todas as condições precisam ser atendidas (AND)
+
+Filtros em formatos não reconhecidos, campos ausentes do snapshot ou uma falha ao obter
+o conjunto canônico seguem para a consulta filtrada de antes. Cada pedido é registrado
+por consumidor (arquivo:função da página que chamou), com a taxa de acerto: pedidos
+atendidos pelo snapshot existente sem nova consulta ao Bitrix.
+"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+try:
+    from api.snapshot_cache import project_columns, read_snapshot_meta
+except ImportError:
+    from snapshot_cache import project_columns, read_snapshot_meta
+
+CATALOG_ENABLED = os.getenv('BITRIX_DATASET_CATALOG', '1') != '0'
+# Tabelas servidas a partir do conjunto canônico (tabela inteira)
+CATALOG_TABLES = {t.strip() for t in os.getenv('BITRIX_CATALOG_TABLES', 'crm_deal,crm_dynamic_items_1052,crm_status').split(',') if t.strip()}
+# Filtros de data (BETWEEN) respondidos localmente
+CATALOG_LOCAL_DATES = os.getenv('BITRIX_CATALOG_LOCAL_DATES', '1') != '0'
+
+_PROJECT_DIR = str(Path(__file__).parents[1])
+_API_DIR = str(Path(__file__).parent)
+# Módulos intermediários que não identificam a página consumidora
+_PASS_THROUGH = ('single_flight.py', 'parallel_loader.py', 'derived_cache.py')
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def is_catalog_table(table):
+    """Indica se a tabela é servida pelo catálogo."""
+    return CATALOG_ENABLED and table in CATALOG_TABLES
+
+
+def parse_filters(filters):
+    """
+    Converte os filtros do BI connector em condições avaliáveis localmente.
+
+    Returns:
+        list | None: [(campo, operador, valores)] (lista vazia = sem filtro), ou None se
+            algum filtro não puder ser avaliado localmente
+    """
+    if not filters:
+        return []
+    if not isinstance(filters, dict) or set(filters) - {'dimensionsFilters'}:
+        return None
+    conditions = []
+    for group in filters.get('dimensionsFilters') or []:
+        for condition in group or []:
+            field = condition.get('fieldName')
+            operator = condition.get('operator')
+            values = condition.get('values')
+            if not field or condition.get('type', 'INCLUDE') != 'INCLUDE' or not isinstance(values, list):
+                return None
+            if operator == 'EQUALS':
+                conditions.append((field, operator, values))
+            elif operator == 'BETWEEN' and CATALOG_LOCAL_DATES and len(values) == 2:
+                conditions.append((field, operator, values))
+            else:
+                return None
+    return conditions
+
+
+def _equals_mask(column, values):
+    if is_bool_dtype(column) or is_datetime64_any_dtype(column):
+        return None
+    if is_numeric_dtype(column):
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').dropna()
+        return column.isin(numbers.tolist()).fillna(False).to_numpy(dtype=bool)
+    texts = {str(v).strip() for v in values}
+    return (column.notna() & column.astype(str).str.strip().isin(texts)).to_numpy(dtype=bool)
+
+
+def _days(column):
+    """Data (sem hora) de cada valor, ou None se a coluna não contiver datas reconhecíveis."""
+    if is_datetime64_any_dtype(column):
+        if getattr(column.dt, 'tz', None) is not None:
+            column = column.dt.tz_localize(None)
+        return column.dt.normalize()
+    days = pd.to_datetime(column.astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    if column.notna().any() and days.notna().sum() < column.notna().sum() / 2:
+        return None
+    return days
+
+
+def _between_mask(column, values):
+    try:
+        start, end = (pd.Timestamp(v).normalize() for v in values)
+    except (ValueError, TypeError):
+        return None
+    days = _days(column)
+    if days is None:
+        return None
+    return ((days >= start) & (days <= end)).fillna(False).to_numpy(dtype=bool)
+
+
+def filter_locally(df, conditions):
+    """
+    Aplica as condições ao conjunto canônico.
+
+    Returns:
+        pandas.DataFrame | None: Linhas que atendem a todas as condições (índice novo),
+            ou None se alguma condição não puder ser avaliada neste DataFrame
+    """
+    if not conditions:
+        return df
+    mask = None
+    for field, operator, values in conditions:
+        if field not in df.columns:
+            return None
+        column = df[field]
+        condition_mask = _equals_mask(column, values) if operator == 'EQUALS' else _between_mask(column, values)
+        if condition_mask is None:
+            return None
+        mask = condition_mask if mask is None else mask & condition_mask
+    result = df[mask].reset_index(drop=True)
+    result.attrs = dict(df.attrs)
+    return result
+
+
+def _consumer():
+    """Página que fez o pedido: primeiro arquivo do projeto fora de api/ na pilha de chamadas."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(_PROJECT_DIR) and not filename.startswith(_API_DIR)
+                and not filename.endswith(_PASS_THROUGH)):
+            return f"{os.path.relpath(filename, _PROJECT_DIR)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'segundo plano'
+
+
+def _record(consumer, table, outcome, rows=0, seconds=0.0):
+    with _stats_lock:
+        stats = _stats.setdefault((consumer, table), {
+            'requests': 0, 'hits': 0, 'misses': 0, 'fallbacks': 0, 'rows_served': 0, 'seconds': 0.0})
+        stats['requests'] += 1
+        stats[outcome] += 1
+        stats['rows_served'] += rows
+        stats['seconds'] += seconds
+
+
+def serve_from_catalog(table, filters, load_canonical, columns=None):
+    """
+    Responde ao pedido (tabela, filtros) a partir do conjunto canônico da tabela.
+
+    Args:
+        table (str): Nome da tabela do Bitrix
+        filters (dict | None): Filtros do pedido
+        load_canonical (callable): Função que recebe as colunas a ler (None = todas) e
+            carrega a tabela sem filtros (snapshot em disco / sincronização incremental)
+        columns (list, optional): Colunas pedidas pelo consumidor; os campos dos filtros
+            também são lidos, para a filtragem local, e descartados em seguida
+
+    Returns:
+        pandas.DataFrame | None: Dados filtrados, ou None se o pedido deve seguir para a
+            consulta filtrada (tabela fora do catálogo, filtro não suportado ou falha)
+    """
+    if not is_catalog_table(table):
+        return None
+    conditions = parse_filters(filters)
+    consumer = _consumer()
+    if conditions is None:
+        _record(consumer, table, 'fallbacks')
+        return None
+
+    before = read_snapshot_meta(table, None)
+    start = time.time()
+    needed = None if columns is None else list(dict.fromkeys([*columns, *(field for field, _, _ in conditions)]))
+    canonical = load_canonical(needed)
+    if canonical is None or len(canonical.columns) == 0:
+        _record(consumer, table, 'fallbacks', seconds=time.time() - start)
+        print(f"[WARN] Catálogo: conjunto canônico de {table} indisponível; consultando com filtros ({consumer})")
+        return None
+    result = filter_locally(canonical, conditions)
+    if result is None:
+        _record(consumer, table, 'fallbacks', seconds=time.time() - start)
+        print(f"[INFO] Catálogo: filtro de {table} não avaliável localmente; consultando com filtros ({consumer})")
+        return None
+    result = project_columns(result, columns)
+
+    # Acerto: o snapshot canônico já existia e não precisou ser baixado/sincronizado
+    after = read_snapshot_meta(table, None)
+    hit = before is not None and after is not None and before.get('created_at') == after.get('created_at')
+    elapsed = time.time() - start
+    _record(consumer, table, 'hits' if hit else 'misses', rows=len(result), seconds=elapsed)
+    if conditions:
+        print(f"[INFO] Catálogo: {table} filtrado localmente ({len(result)} de {len(canonical)} linhas) "
+              f"para {consumer} em {elapsed:.2f}s")
+    return result
+
+
+def get_catalog_stats():
+    """
+    Pedidos atendidos pelo catálogo neste processo, por consumidor e por tabela.
+
+    Returns:
+        dict: {'consumers': {consumidor: {...}}, 'tables': {tabela: {...}}}, cada um com
+            'requests', 'hits', 'misses', 'fallbacks', 'rows_served', 'seconds' e 'hit_rate'
+            (fração dos pedidos atendidos pelo snapshot existente)
+    """
+    with _stats_lock:
+        items = [(consumer, table, dict(stats)) for (consumer, table), stats in _stats.items()]
+
+    def add(target, stats):
+        for field, value in stats.items():
+            target[field] = target.get(field, 0) + value
+
+    consumers, tables = {}, {}
+    for consumer, table, stats in items:
+        add(consumers.setdefault(consumer, {}), stats)
+        consumers[consumer].setdefault('tables', set()).add(table)
+        add(tables.setdefault(table, {}), stats)
+    for group in (consumers, tables):
+        for stats in group.values():
+            stats['hit_rate'] = stats['hits'] / stats['requests'] if stats['requests'] else 0.0
+            stats['seconds'] = round(stats['seconds'], 3)
+            if 'tables' in stats:
+                stats['tables'] = sorted(stats['tables'])
+    return {'consumers': consumers, 'tables': tables}
@@ -0,0 +1,150 @@
+"""
+Cliente HTTP compartilhado para todas as chamadas externas (Bitrix24, Supabase, planilhas).
+
+Uma única requests.Session com pool de conexões mantém as conexões TCP/TLS abertas
+(keep-alive) entre as chamadas, então uma página que faz várias consultas ao Bitrix
+paga o handshake apenas uma vez por host. Também centraliza:
+
+- Accept-Encoding com compressão (gzip/deflate, e br quando o brotli está instalado)
+- Backoff exponencial com jitter entre tentativas (em vez de um sleep fixo)
+- Métricas de tempo por endpoint (sem expor tokens das URLs)
+"""
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Tamanho do pool de conexões por host (deve cobrir as threads de busca em paralelo)
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 16
+
+# Backoff entre tentativas: BASE * 2^tentativa, limitado a MAX, com jitter aleatório
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 20.0
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_session = None
+_session_lock = threading.Lock()
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Retorna a sessão HTTP compartilhada pelo processo (criada na primeira chamada).
+
+    Returns:
+        requests.Session: Sessão com pool de conexões e keep-alive
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                    "Connection": "keep-alive",
+                })
+                _session = session
+    return _session
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Tempo de espera antes da próxima tentativa (backoff exponencial com "equal jitter").
+
+    Metade do intervalo é fixa e a outra metade aleatória, para que várias sessões
+    que falharam juntas não tentem novamente no mesmo instante.
+
+    Args:
+        attempt (int): Número da tentativa que falhou (0 = primeira)
+
+    Returns:
+        float: Segundos a aguardar
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def metric_label(url):
+    """
+    Nome do endpoint usado nas métricas: host + caminho (+ tabela do BI connector).
+    Parâmetros da URL, como o token do Bitrix, nunca fazem parte do nome.
+    """
+    parsed = urlparse(url)
+    label = f"{parsed.netloc}{parsed.path}"
+    table = parse_qs(parsed.query).get('table')
+    if table:
+        label += f"?table={table[0]}"
+    return label
+
+
+def _record_metric(label, elapsed, ok):
+    with _metrics_lock:
+        metric = _metrics.setdefault(label, {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        metric['count'] += 1
+        metric['total_seconds'] += elapsed
+        metric['max_seconds'] = max(metric['max_seconds'], elapsed)
+        metric['last_seconds'] = elapsed
+        if not ok:
+            metric['errors'] += 1
+
+
+def http_request(method, url, **kwargs):
+    """
+    Executa uma requisição pela sessão compartilhada e registra o tempo de resposta.
+
+    Aceita os mesmos argumentos de requests.Session.request. Com stream=True, o tempo
+    medido é até a chegada dos cabeçalhos (o corpo é lido depois pelo chamador).
+
+    Returns:
+        requests.Response: Resposta obtida
+
+    Raises:
+        requests.exceptions.RequestException: Em caso de erro de conexão/timeout
+    """
+    label = metric_label(url)
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        elapsed = time.perf_counter() - start
+        _record_metric(label, elapsed, ok=False)
+        print(f"[HTTP] {method} {label} falhou após {elapsed:.2f}s")
+        raise
+    elapsed = time.perf_counter() - start
+    _record_metric(label, elapsed, ok=response.status_code < 400)
+    print(f"[HTTP] {method} {label} -> {response.status_code} em {elapsed:.2f}s")
+    return response
+
+
+def get_request_metrics():
+    """
+    Métricas acumuladas por endpoint desde o início do processo.
+
+    Returns:
+        dict: {endpoint: {'count', 'errors', 'total_seconds', 'max_seconds', 'last_seconds', 'avg_seconds'}}
+    """
+    with _metrics_lock:
+        return {
+            label: {**metric, 'avg_seconds': metric['total_seconds'] / metric['count'] if metric['count'] else 0.0}
+            for label, metric in _metrics.items()
+        }
+
+
+def reset_request_metrics():
+    """Zera as métricas acumuladas."""
+    with _metrics_lock:
+        _metrics.clear()
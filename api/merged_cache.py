@@ -0,0 +1,201 @@
+"""
+Cache dos resultados de load_merged_data (crm_deal + crm_deal_uf já mesclados).
+
+As duas consultas já passam pelo st.cache_data e pelos snapshots em disco, mas cada
+chamada de load_merged_data refazia a lista de IDs, os reparos de colunas e o pd.merge.
+Aqui o DataFrame mesclado fica em memória junto com as versões dos snapshots de origem:
+
+- Chave: categoria, lista de IDs específicos, período (campo de data do filtro) e conjunto
+  de colunas pedidas; os logs e as estatísticas usam um rótulo curto com as contagens
+- Validade: as versões de origem continuam iguais às gravadas em disco (uma
+  sincronização ou novo download, em qualquer processo, invalida a entrada) e a
+  entrada está dentro do TTL e foi criada depois do último pedido de sincronização
+  (botão de atualização, em qualquer processo). A remontagem não volta a usar dados antigos do
+  st.cache_data: load_bitrix_data descarta a entrada em memória cujo snapshot mudou
+  (ver refresh_if_stale em api/snapshot_cache.py)
+- Subperíodos: um período contido no de uma entrada (ou um pedido atendido por uma
+  entrada sem filtro de data) é respondido filtrando as linhas da entrada pela data,
+  com a mesma comparação por dia do catálogo (ver api/dataset_catalog.py)
+- Colunas: uma entrada com todas as colunas (ou com mais colunas) atende pedidos com menos
+- As entradas são limitadas (LRU): a menos usada recentemente é descartada
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    from api.snapshot_cache import VERSIONS_ATTR, last_sync_request, project_columns, versions_current
+    from api.dataset_catalog import filter_locally
+except ImportError:
+    from snapshot_cache import VERSIONS_ATTR, last_sync_request, project_columns, versions_current
+    from dataset_catalog import filter_locally
+
+MERGED_CACHE_ENABLED = os.getenv('BITRIX_MERGED_CACHE', '1') != '0'
+# Validade das entradas (igual ao st.cache_data das consultas) e limite de entradas
+MERGED_CACHE_TTL = int(os.getenv('BITRIX_MERGED_CACHE_TTL', 3600))
+MERGED_CACHE_MAX_ENTRIES = int(os.getenv('BITRIX_MERGED_CACHE_MAX_ENTRIES', 6))
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+_stats = {'hits': 0, 'subrange_hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+
+def _base_key(category_id, deal_ids):
+    ids = tuple(sorted({str(i) for i in deal_ids})) if deal_ids else None
+    # Com IDs específicos a categoria não é usada no filtro
+    return (None if ids else (str(category_id) if category_id else None), ids)
+
+
+def _period(date_from, date_to):
+    """Período (dias inclusivos) do filtro de datas, ou None se não houver filtro."""
+    if not (date_from and date_to):
+        return None
+    return pd.Timestamp(date_from).normalize(), pd.Timestamp(date_to).normalize()
+
+
+def _entry_key(base, period, columns):
+    return base, period, frozenset(columns) if columns is not None else None
+
+
+def _label(key):
+    """Rótulo legível da entrada (contagens + resumo da chave completa) para logs e estatísticas."""
+    (category, ids), period, columns = key
+    resumo = hashlib.sha1(repr((ids, sorted(columns) if columns is not None else None)).encode('utf-8')).hexdigest()[:8]
+    return (f"cat={category} ids={len(ids) if ids else 0} "
+            f"periodo={'-'.join(str(d.date()) for d in period) if period else 'todos'} "
+            f"colunas={len(columns) if columns is not None else 'todas'} #{resumo}")
+
+
+def _covers(entry, period, columns):
+    if entry['period'] is not None and (period is None or period[0] < entry['period'][0] or period[1] > entry['period'][1]):
+        return False
+    if entry['columns'] is None:
+        return True
+    return columns is not None and set(columns) <= entry['columns']
+
+
+def _is_valid(entry):
+    if time.time() - entry['created_at'] > MERGED_CACHE_TTL:
+        return False
+    # Pedido de sincronização posterior à entrada: os snapshots de origem estão desatualizados
+    if entry['created_at'] < last_sync_request():
+        return False
+    return versions_current(entry['versions'])
+
+
+def get_merged(category_id, date_from, date_to, deal_ids, columns, date_field):
+    """
+    Procura o resultado mesclado em cache (mesmo pedido ou um que o contenha).
+
+    Args:
+        category_id, date_from, date_to, deal_ids: Parâmetros de load_merged_data
+        columns (list | None): Colunas pedidas (None = todas)
+        date_field (str): Campo usado pelo filtro de período
+
+    Returns:
+        pandas.DataFrame | None: Cópia do resultado, ou None se precisa ser montado
+    """
+    if not MERGED_CACHE_ENABLED:
+        return None
+    base = _base_key(category_id, deal_ids)
+    try:
+        period = _period(date_from, date_to)
+    except (ValueError, TypeError):
+        return None
+    with _entries_lock:
+        candidates = [(key, entry) for key, entry in reversed(_entries.items())
+                      if entry['base'] == base and _covers(entry, period, columns)]
+    # Preferir a entrada do mesmo período; depois, a com menos linhas a filtrar
+    candidates.sort(key=lambda item: (item[1]['period'] != period, len(item[1]['value'])))
+
+    for key, entry in candidates:
+        if not _is_valid(entry):
+            with _entries_lock:
+                if _entries.pop(key, None) is not None:
+                    _stats['invalidations'] += 1
+            print(f"[INFO] Resultado mesclado {entry['label']} desatualizado: snapshots de origem mudaram, sincronização pedida ou TTL venceu")
+            continue
+        df = entry['value']
+        subrange = entry['period'] != period
+        if subrange:
+            df = filter_locally(df, [(date_field, 'BETWEEN', [str(period[0].date()), str(period[1].date())])])
+            # Período sem linhas segue o caminho normal (que tem seus próprios fallbacks)
+            if df is None or df.empty:
+                continue
+        df = project_columns(df, columns).copy()
+        with _entries_lock:
+            if key in _entries:
+                _entries.move_to_end(key)
+            entry['hits'] += 1
+            _stats['subrange_hits' if subrange else 'hits'] += 1
+        print(f"[INFO] Resultado mesclado reaproveitado de {entry['label']}{' (subperíodo)' if subrange else ''}: {len(df)} linhas")
+        return df
+
+    with _entries_lock:
+        _stats['misses'] += 1
+    return None
+
+
+def store_merged(category_id, date_from, date_to, deal_ids, columns, df):
+    """
+    Guarda o resultado mesclado. Resultados vazios ou sem versões de origem (sem
+    snapshot em disco) não são guardados, porque não haveria como validá-los.
+    """
+    versions = df.attrs.get(VERSIONS_ATTR) if df is not None else None
+    if not MERGED_CACHE_ENABLED or df is None or df.empty or not versions:
+        return
+    base = _base_key(category_id, deal_ids)
+    try:
+        period = _period(date_from, date_to)
+    except (ValueError, TypeError):
+        return
+    key = _entry_key(base, period, columns)
+    with _entries_lock:
+        _entries[key] = {
+            'label': _label(key),
+            'base': base,
+            'period': period,
+            'columns': set(columns) if columns is not None else None,
+            'value': df.copy(),
+            'versions': dict(versions),
+            'created_at': time.time(),
+            'hits': 0,
+        }
+        _entries.move_to_end(key)
+        while len(_entries) > MERGED_CACHE_MAX_ENTRIES:
+            _, evicted = _entries.popitem(last=False)
+            _stats['evictions'] += 1
+            print(f"[INFO] Resultado mesclado {evicted['label']} descartado do cache (limite de {MERGED_CACHE_MAX_ENTRIES} entradas)")
+
+
+def clear_merged_cache():
+    """Remove todos os resultados mesclados guardados."""
+    with _entries_lock:
+        _entries.clear()
+
+
+def get_merged_cache_stats():
+    """
+    Estatísticas do cache de resultados mesclados.
+
+    Returns:
+        dict: Contadores (hits, subrange_hits, misses, invalidations, evictions) e, por
+            entrada (pelo rótulo), {'rows', 'columns', 'sources', 'hits', 'age_seconds'}
+    """
+    with _entries_lock:
+        now = time.time()
+        entries = {
+            entry['label']: {
+                'rows': len(entry['value']),
+                'columns': len(entry['value'].columns),
+                'sources': len(entry['versions']),
+                'hits': entry['hits'],
+                'age_seconds': round(now - entry['created_at'], 1),
+            }
+            for entry in _entries.values()
+        }
+        return {**_stats, 'entries': entries}
@@ -0,0 +1,176 @@
+"""
+Registro de tipos (schema) das tabelas do Bitrix24.
+
+O BI connector devolve todas as colunas como texto, então cada DataFrame chega com
+dtype object mesmo para categorias, datas e flags Y/N. Aqui cada tabela declara os
+tipos compactos das suas colunas, aplicados uma única vez na ingestão (antes de gravar
+o snapshot e de entrar no cache do Streamlit):
+
+- 'int'      -> Int64 (inteiro que aceita nulos)
+- 'datetime' -> datetime64[ns]
+- 'bool'     -> boolean (Y/N do Bitrix, aceita nulos)
+- 'category' -> category
+
+Somente colunas cujo uso nas páginas foi conferido entram no registro. Colunas como
+STAGE_ID, ASSIGNED_BY_NAME, IDs e os campos UF_CRM_* SIM/NÃO continuam como texto,
+pois as páginas fazem .map(...).fillna(coluna), groupby e comparações com strings
+que mudariam de comportamento com category/boolean. Nesses casos, a deduplicação de
+strings feita no parser (ver bitrix_connector._append_batch) já reduz a memória.
+
+Uma conversão só é aplicada se não perder valores: se algum texto não puder ser
+convertido, a coluna fica como estava.
+"""
+import time
+
+import pandas as pd
+
+_DEAL_COLUMNS = {
+    'CATEGORY_ID': 'int',
+    'DATE_CREATE': 'datetime',
+    'DATE_MODIFY': 'datetime',
+    'BEGINDATE': 'datetime',
+    'CLOSEDATE': 'datetime',
+    'OPENED': 'bool',
+    'CLOSED': 'bool',
+    'IS_RETURN_CUSTOMER': 'bool',
+    'IS_REPEATED_APPROACH': 'bool',
+    'IS_MANUAL_OPPORTUNITY': 'bool',
+    'CURRENCY_ID': 'category',
+    'TYPE_ID': 'category',
+    'SOURCE_ID': 'category',
+    'STAGE_SEMANTIC_ID': 'category',
+}
+
+_DYNAMIC_ITEM_COLUMNS = {
+    'CATEGORY_ID': 'int',
+    'CREATED_TIME': 'datetime',
+    'UPDATED_TIME': 'datetime',
+    'MOVED_TIME': 'datetime',
+    'OPENED': 'bool',
+    'CURRENCY_ID': 'category',
+    'SOURCE_ID': 'category',
+}
+
+# Tipos por tabela: {tabela: {coluna: tipo}}
+TABLE_SCHEMAS = {
+    'crm_deal': _DEAL_COLUMNS,
+    'crm_dynamic_items_1052': _DYNAMIC_ITEM_COLUMNS,
+    'crm_dynamic_items_1086': _DYNAMIC_ITEM_COLUMNS,
+    'crm_dynamic_items_1098': _DYNAMIC_ITEM_COLUMNS,
+}
+
+_TARGET_DTYPES = {
+    'int': 'Int64',
+    'datetime': 'datetime64[ns]',
+    'bool': 'boolean',
+    'category': 'category',
+}
+
+_BOOL_VALUES = {'Y': True, 'N': False}
+
+# Último relatório de memória por tabela (consultado pela página de diagnóstico/logs)
+_memory_reports = {}
+
+
+def _is_converted(series, kind):
+    return str(series.dtype) == _TARGET_DTYPES[kind]
+
+
+def _convert(series, kind):
+    """
+    Converte uma coluna para o tipo do registro.
+
+    Returns:
+        pandas.Series | None: Coluna convertida, ou None se a conversão perderia valores
+    """
+    present = series.notna() & (series.astype(str).str.strip() != '')
+    if kind == 'int':
+        converted = pd.to_numeric(series.where(present), errors='coerce')
+        if converted[present].isna().any() or (converted.dropna() % 1 != 0).any():
+            return None
+        return converted.astype('Int64')
+    if kind == 'datetime':
+        converted = pd.to_datetime(series.where(present), errors='coerce')
+        if converted[present].isna().any():
+            # Formatos diferentes na mesma coluna (ex: data e data/hora): inferir linha a linha
+            converted = pd.to_datetime(series.where(present), errors='coerce', format='mixed')
+        if converted[present].isna().any() or getattr(converted.dt, 'tz', None) is not None:
+            return None
+        return converted.astype('datetime64[ns]')
+    if kind == 'bool':
+        converted = series.where(present).map(_BOOL_VALUES)
+        if converted[present].isna().any():
+            return None
+        return converted.astype('boolean')
+    if kind == 'category':
+        return series.where(present).astype('category')
+    raise ValueError(f"Tipo de coluna desconhecido no schema: {kind}")
+
+
+def memory_usage_mb(df):
+    """Memória ocupada pelo DataFrame (incluindo o conteúdo das strings), em MB."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def apply_schema(df, table, show_logs=False):
+    """
+    Aplica ao DataFrame os tipos declarados para a tabela em TABLE_SCHEMAS.
+
+    Colunas ausentes ou já convertidas são ignoradas, então a função pode ser chamada
+    de novo sobre um snapshot já tipado sem custo relevante.
+
+    Args:
+        df (pandas.DataFrame): Dados como vieram do BI connector
+        table (str): Nome da tabela do Bitrix
+        show_logs (bool): Se deve imprimir o relatório de memória
+
+    Returns:
+        pandas.DataFrame: DataFrame com os tipos compactos
+    """
+    schema = TABLE_SCHEMAS.get(table)
+    if df is None or df.empty or not schema:
+        return df
+    pending = {col: kind for col, kind in schema.items() if col in df.columns and not _is_converted(df[col], kind)}
+    if not pending:
+        return df
+
+    start = time.time()
+    before_mb = memory_usage_mb(df)
+    df = df.copy(deep=False)
+    converted, skipped = [], []
+    for col, kind in pending.items():
+        try:
+            series = _convert(df[col], kind)
+        except (TypeError, ValueError) as e:
+            print(f"[WARN] Falha ao converter {table}.{col} para {kind}: {e}")
+            series = None
+        if series is None:
+            skipped.append(col)
+            continue
+        df[col] = series
+        converted.append(col)
+
+    after_mb = memory_usage_mb(df)
+    _memory_reports[table] = {
+        'rows': int(len(df)),
+        'before_mb': round(before_mb, 2),
+        'after_mb': round(after_mb, 2),
+        'converted': converted,
+        'skipped': skipped,
+        'seconds': round(time.time() - start, 3),
+    }
+    if show_logs or skipped:
+        print(f"[INFO] Schema {table}: {len(converted)} colunas tipadas, "
+              f"{before_mb:.1f} MB -> {after_mb:.1f} MB em {time.time() - start:.2f}s"
+              + (f" (mantidas como texto: {skipped})" if skipped else ""))
+    return df
+
+
+def get_memory_report():
+    """
+    Relatório da última aplicação do schema em cada tabela.
+
+    Returns:
+        dict: {tabela: {'rows', 'before_mb', 'after_mb', 'converted', 'skipped', 'seconds'}}
+    """
+    return {table: dict(report) for table, report in _memory_reports.items()}
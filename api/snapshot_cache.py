@@ -0,0 +1,545 @@
+"""
+Cache persistente em disco para as tabelas do Bitrix24.
+
+Cada combinação (tabela, filtros) é gravada como um snapshot colunar (Parquet quando
+o pyarrow está disponível - ele já vem com o Streamlit - ou pickle do pandas como
+alternativa), acompanhado de um arquivo .json com os metadados. Assim, todos os
+processos/réplicas do Streamlit e os reinícios do servidor reaproveitam o mesmo
+download em vez de consultar novamente o BI connector.
+
+- Escritas atômicas: o arquivo é gravado em um temporário e movido com os.replace. Os
+  dados são gravados antes dos metadados, e a versão vai nos dois arquivos: um leitor
+  que pegue os dados novos com os metadados antigos (ou o contrário) descarta a leitura
+- TTL: snapshots mais antigos que SNAPSHOT_TTL segundos são ignorados, assim como os
+  criados antes do último pedido de sincronização (botão de atualizar, request_sync)
+- Lock em arquivo: enquanto um processo baixa uma tabela, os demais aguardam e
+  reaproveitam o snapshot gravado por ele. O dono renova o mtime do lock durante o
+  download; o lock só é tomado se o processo dono morreu ou parou de renová-lo
+- Stale-while-revalidate: um snapshot vencido (até SNAPSHOT_STALE_TTL) ainda pode ser
+  servido enquanto a atualização roda em segundo plano (ver api/background_refresh.py),
+  que usa os filtros gravados nos metadados e o registro de último acesso
+- Versões: cada DataFrame entregue pelo conector leva em df.attrs a versão do
+  snapshot de origem (usada pelo cache de dados derivados em utils/derived_cache.py)
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Diretório e validade dos snapshots (configuráveis por variável de ambiente)
+SNAPSHOT_DIR = Path(os.getenv('BITRIX_SNAPSHOT_DIR', Path(__file__).parents[1] / '.cache' / 'bitrix_snapshots'))
+SNAPSHOT_TTL = int(os.getenv('BITRIX_SNAPSHOT_TTL', 3600))  # 1 hora, igual ao st.cache_data
+SNAPSHOT_ENABLED = os.getenv('BITRIX_SNAPSHOT_CACHE', '1') != '0'
+# Idade máxima de um snapshot vencido que ainda pode ser servido enquanto é atualizado
+SNAPSHOT_STALE_TTL = int(os.getenv('BITRIX_SNAPSHOT_STALE_TTL', 6 * 3600))  # 6 horas
+
+# Lock sem renovação há mais que isso é considerado abandonado; o dono renova o mtime
+# a cada LOCK_HEARTBEAT_INTERVAL enquanto baixa a tabela
+LOCK_TIMEOUT = 180
+LOCK_HEARTBEAT_INTERVAL = 30
+LOCK_POLL_INTERVAL = 0.25
+
+# Chave de df.attrs com as versões dos snapshots que deram origem ao DataFrame
+VERSIONS_ATTR = 'snapshot_versions'
+# Chave de df.attrs, dentro do arquivo de dados, com a versão gravada nos metadados
+_FILE_VERSION_ATTR = 'snapshot_file_version'
+
+# Arquivo cujo mtime marca o último pedido explícito de sincronização (botão de atualizar)
+_SYNC_REQUEST_FILE = SNAPSHOT_DIR / '_sync_requested_at'
+
+try:
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def request_sync():
+    """
+    Marca todos os snapshots gravados até agora como desatualizados.
+
+    Na próxima leitura, as tabelas com sincronização incremental buscam só o delta
+    (ver api/bitrix_sync.py) e as demais são baixadas de novo. Vale para todos os processos.
+    """
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        _SYNC_REQUEST_FILE.touch()
+        os.utime(_SYNC_REQUEST_FILE, None)
+    except OSError as e:
+        print(f"[WARN] Não foi possível registrar o pedido de sincronização: {e}")
+
+
+def last_sync_request():
+    """Timestamp do último pedido de sincronização (0 se nunca houve)."""
+    try:
+        return _SYNC_REQUEST_FILE.stat().st_mtime
+    except OSError:
+        return 0
+
+
+def table_name_from_url(url):
+    """
+    Extrai o nome da tabela (parâmetro 'table') da URL do BI connector.
+
+    Args:
+        url (str): URL do pbi.php
+
+    Returns:
+        str: Nome da tabela ou 'desconhecida'
+    """
+    try:
+        return parse_qs(urlparse(url).query).get('table', ['desconhecida'])[0]
+    except Exception:
+        return 'desconhecida'
+
+
+def filters_hash(filters):
+    """
+    Gera um hash estável para o dicionário de filtros (independente da ordem das chaves).
+    """
+    payload = json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def snapshot_key(table, filters=None):
+    """Chave do snapshot: nome da tabela + hash dos filtros."""
+    return f"{table}__{filters_hash(filters)}"
+
+
+def _paths(key):
+    return {
+        'parquet': SNAPSHOT_DIR / f"{key}.parquet",
+        'pickle': SNAPSHOT_DIR / f"{key}.pkl",
+        'meta': SNAPSHOT_DIR / f"{key}.json",
+        'lock': SNAPSHOT_DIR / f"{key}.lock",
+        'access': SNAPSHOT_DIR / f"{key}.access",
+    }
+
+
+def read_snapshot_meta(table, filters=None):
+    """
+    Lê os metadados de um snapshot.
+
+    Returns:
+        dict | None: Metadados (created_at, rows, format, version...) ou None se não existir
+    """
+    try:
+        with open(_paths(snapshot_key(table, filters))['meta'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_version(key):
+    """
+    Versão atual em disco do snapshot de uma chave (como as de df.attrs[VERSIONS_ATTR]).
+
+    Returns:
+        str | None: Versão gravada nos metadados, ou None se o snapshot não existir
+    """
+    try:
+        with open(_paths(key)['meta'], 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+def versions_current(versions):
+    """
+    Indica se as versões de origem (como as de df.attrs[VERSIONS_ATTR]) continuam
+    iguais às gravadas em disco. Fontes sem snapshot em disco não têm versão mais nova
+    para comparar e não invalidam o resultado.
+    """
+    for key, version in (versions or {}).items():
+        current = snapshot_version(key)
+        if current is not None and current != version:
+            return False
+    return True
+
+
+def refresh_if_stale(cached_func, *args, **kwargs):
+    """
+    Chama uma função com st.cache_data que devolve um DataFrame do Bitrix e descarta a
+    entrada em memória se o snapshot de origem já mudou em disco (atualização em segundo
+    plano, sincronização em outro processo).
+
+    Sem isso o st.cache_data continuaria entregando os dados antigos até o próprio TTL,
+    enquanto os caches validados pela versão em disco (dados derivados, resultados
+    mesclados) seriam refeitos a cada chamada com esses mesmos dados antigos.
+
+    Returns:
+        Resultado de cached_func(*args, **kwargs), recarregado se estava desatualizado
+    """
+    df = cached_func(*args, **kwargs)
+    if df is not None and not versions_current(frame_versions(df)):
+        print(f"[INFO] Snapshot de origem mudou em disco; descartando o resultado em memória de {cached_func.__name__}")
+        # A chave do st.cache_data depende da forma da chamada: mesmos args e kwargs
+        cached_func.clear(*args, **kwargs)
+        df = cached_func(*args, **kwargs)
+    return df
+
+
+def read_snapshot(table, filters=None, ttl=None, not_before=None, columns=None):
+    """
+    Carrega o snapshot de (tabela, filtros) se existir e estiver dentro do TTL.
+
+    Args:
+        table (str): Nome da tabela do Bitrix
+        filters (dict, optional): Filtros usados no download
+        ttl (int, optional): Validade em segundos (padrão: SNAPSHOT_TTL; 0 = sem expiração)
+        not_before (float, optional): Timestamp mínimo de criação aceito (padrão: o último
+            pedido de sincronização; 0 = aceitar snapshots anteriores a ele, como a base
+            que a sincronização incremental atualiza)
+        columns (list, optional): Colunas a ler (as ausentes no snapshot são ignoradas);
+            no Parquet, as demais colunas nem são lidas do disco
+
+    Returns:
+        pandas.DataFrame | None: DataFrame do snapshot, ou None se ausente/expirado/corrompido
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+    ttl = SNAPSHOT_TTL if ttl is None else ttl
+    not_before = last_sync_request() if not_before is None else not_before
+    # Uma segunda tentativa cobre a leitura feita entre a troca dos dados e a dos metadados
+    for _ in range(2):
+        meta = read_snapshot_meta(table, filters)
+        if not meta:
+            return None
+        created_at = meta.get('created_at', 0)
+        if (ttl and time.time() - created_at > ttl) or created_at < not_before:
+            return None
+        df = _read_data(table, filters, meta, columns)
+        if df is None:
+            return None
+        file_version = df.attrs.pop(_FILE_VERSION_ATTR, None)
+        # Arquivos gravados antes da versão nos dados não têm com o que comparar
+        if file_version is None or file_version == meta.get('version'):
+            return df
+    print(f"[WARN] Snapshot de {table} sendo regravado (dados e metadados de versões diferentes). Ignorando.")
+    return None
+
+
+def _read_data(table, filters, meta, columns):
+    path = _paths(snapshot_key(table, filters))[meta.get('format', 'pickle')]
+    try:
+        if meta.get('format') == 'parquet':
+            if columns is not None:
+                wanted = set(columns)
+                columns = [c for c in pq.read_schema(path).names if c in wanted]
+            return pd.read_parquet(path, columns=columns)
+        return project_columns(pd.read_pickle(path), columns)
+    except Exception as e:
+        print(f"[WARN] Snapshot de {table} ilegível ({path.name}): {e}. Ignorando.")
+        return None
+
+
+def project_columns(df, columns):
+    """
+    Mantém apenas as colunas pedidas que existem no DataFrame (na ordem original).
+
+    Args:
+        df (pandas.DataFrame | None): Dados completos
+        columns (list | None): Colunas desejadas (None = todas)
+
+    Returns:
+        pandas.DataFrame | None: DataFrame só com as colunas pedidas (attrs preservados)
+    """
+    if df is None or columns is None:
+        return df
+    wanted = set(columns)
+    keep = [c for c in df.columns if c in wanted]
+    if len(keep) == len(df.columns):
+        return df
+    projected = df[keep]
+    projected.attrs = dict(df.attrs)
+    return projected
+
+
+def _atomic_write(path, writer):
+    """Grava em um arquivo temporário no mesmo diretório e substitui o destino atomicamente."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def write_snapshot(table, filters, df, extra_meta=None):
+    """
+    Grava o DataFrame como snapshot de (tabela, filtros).
+
+    Tenta Parquet e recorre ao pickle quando o pyarrow não está disponível ou quando
+    alguma coluna tem tipos mistos que o Parquet não aceita.
+
+    Args:
+        table (str): Nome da tabela do Bitrix
+        filters (dict | None): Filtros usados no download
+        df (pandas.DataFrame): Dados a gravar
+        extra_meta (dict, optional): Metadados adicionais guardados no .json
+
+    Returns:
+        dict | None: Metadados gravados, ou None se a gravação falhou
+    """
+    if not SNAPSHOT_ENABLED or df is None:
+        return None
+    key = snapshot_key(table, filters)
+    paths = _paths(key)
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        created_at = time.time()
+        version = f"{key}@{created_at:.6f}"
+        # A versão vai também no arquivo de dados (df.attrs é gravado no Parquet e no pickle)
+        data = df.copy(deep=False)
+        data.attrs = {_FILE_VERSION_ATTR: version}
+        fmt = 'pickle'
+        if PARQUET_AVAILABLE:
+            try:
+                _atomic_write(paths['parquet'], lambda p: data.to_parquet(p, index=False))
+                fmt = 'parquet'
+            except Exception:
+                fmt = 'pickle'
+        if fmt == 'pickle':
+            _atomic_write(paths['pickle'], lambda p: data.to_pickle(p))
+
+        meta = {
+            'table': table,
+            'filters_hash': filters_hash(filters),
+            'format': fmt,
+            'rows': int(len(df)),
+            'columns': int(len(df.columns)),
+            'created_at': created_at,
+            'version': version,
+            # Filtros originais, para que a atualização em segundo plano refaça a consulta
+            'filters': filters,
+        }
+        if extra_meta:
+            meta.update(extra_meta)
+        # Metadados por último: até aqui, os leitores seguem com os dados e metadados anteriores
+        _atomic_write(paths['meta'], lambda p: p.write_text(json.dumps(meta, ensure_ascii=False, default=str), encoding='utf-8'))
+
+        # Remover o arquivo do outro formato, se sobrou de uma gravação anterior
+        other = paths['pickle'] if fmt == 'parquet' else paths['parquet']
+        if other.exists():
+            other.unlink()
+        return meta
+    except Exception as e:
+        print(f"[WARN] Não foi possível gravar o snapshot de {table}: {e}")
+        return None
+
+
+def touch_snapshot(table, filters=None, extra_meta=None):
+    """
+    Renova a data de criação de um snapshot sem regravar os dados.
+
+    Usado quando uma sincronização confirma que nada mudou: o TTL é reiniciado e a
+    'version' é mantida, pois o conteúdo continua o mesmo.
+
+    Returns:
+        dict | None: Metadados atualizados, ou None se o snapshot não existir
+    """
+    meta = read_snapshot_meta(table, filters)
+    if not meta:
+        return None
+    meta['created_at'] = time.time()
+    if extra_meta:
+        meta.update(extra_meta)
+    try:
+        _atomic_write(_paths(snapshot_key(table, filters))['meta'],
+                      lambda p: p.write_text(json.dumps(meta, ensure_ascii=False, default=str), encoding='utf-8'))
+    except OSError as e:
+        print(f"[WARN] Não foi possível renovar o snapshot de {table}: {e}")
+    return meta
+
+
+def mark_snapshot_access(table, filters=None):
+    """
+    Registra que o snapshot de (tabela, filtros) foi usado por uma página.
+
+    O mtime do arquivo .access indica quais snapshots estão "quentes" e devem ser
+    mantidos atualizados pela atualização em segundo plano.
+    """
+    if not SNAPSHOT_ENABLED:
+        return
+    path = _paths(snapshot_key(table, filters))['access']
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        path.touch()
+        os.utime(path, None)
+    except OSError as e:
+        print(f"[WARN] Não foi possível registrar o acesso ao snapshot de {table}: {e}")
+
+
+def snapshot_last_access(key):
+    """Timestamp do último uso do snapshot por uma página (0 se nunca foi registrado)."""
+    try:
+        return _paths(key)['access'].stat().st_mtime
+    except OSError:
+        return 0
+
+
+def list_snapshot_metas():
+    """
+    Metadados de todos os snapshots gravados.
+
+    Returns:
+        dict: {chave do snapshot: metadados}
+    """
+    metas = {}
+    if not SNAPSHOT_DIR.exists():
+        return metas
+    for meta_path in SNAPSHOT_DIR.glob("*.json"):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metas[meta_path.stem] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return metas
+
+
+def invalidate_snapshots(table=None):
+    """
+    Remove os snapshots gravados (de uma tabela ou de todas).
+
+    Args:
+        table (str, optional): Nome da tabela; se None, remove todos
+
+    Returns:
+        int: Quantidade de snapshots removidos
+    """
+    if not SNAPSHOT_DIR.exists():
+        return 0
+    pattern = f"{table}__*.json" if table else "*.json"
+    removed = 0
+    for meta_path in SNAPSHOT_DIR.glob(pattern):
+        for path in _paths(meta_path.stem).values():
+            if path.suffix != '.lock' and path.exists():
+                path.unlink()
+        removed += 1
+    return removed
+
+
+def stamp_snapshot_version(df, table, filters=None):
+    """
+    Grava em df.attrs a versão do snapshot de (tabela, filtros) que originou o DataFrame.
+
+    O df.attrs sobrevive ao pickle do st.cache_data. Sem snapshot gravado (ex: download
+    vazio ou com falha), é usada uma versão única, de modo que o dado nunca seja
+    considerado igual a outro.
+
+    Returns:
+        pandas.DataFrame: O próprio DataFrame, com df.attrs atualizado
+    """
+    if df is None:
+        return df
+    key = snapshot_key(table, filters)
+    meta = read_snapshot_meta(table, filters) if SNAPSHOT_ENABLED else None
+    version = meta.get('version') if meta else None
+    if not version:
+        version = f"{key}@sem-snapshot-{time.time():.6f}"
+    df.attrs[VERSIONS_ATTR] = {key: version}
+    return df
+
+
+def frame_versions(*dfs):
+    """
+    Versões dos snapshots de origem de um ou mais DataFrames (lidas de df.attrs).
+
+    Returns:
+        dict: {chave do snapshot: versão}
+    """
+    versions = {}
+    for df in dfs:
+        if df is not None:
+            versions.update(getattr(df, 'attrs', {}).get(VERSIONS_ATTR) or {})
+    return versions
+
+
+def _lock_owner_dead(lock_path):
+    """Indica se o lock é de um processo desta máquina que já terminou."""
+    try:
+        pid, host = lock_path.read_text().split('@')[:2]
+        if host != socket.gethostname():
+            return False
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        return False
+    return False
+
+
+def _heartbeat(lock_path, stop):
+    """Renova o mtime do lock enquanto o dono baixa a tabela."""
+    while not stop.wait(LOCK_HEARTBEAT_INTERVAL):
+        try:
+            os.utime(lock_path, None)
+        except OSError:
+            return
+
+
+@contextmanager
+def snapshot_lock(table, filters=None, timeout=LOCK_TIMEOUT):
+    """
+    Lock entre processos para o download de (tabela, filtros).
+
+    Usa a criação exclusiva de um arquivo .lock (funciona em Linux e Windows), com o
+    PID e a máquina do dono. Enquanto o lock está obtido, uma thread renova o mtime a
+    cada LOCK_HEARTBEAT_INTERVAL; os demais processos aguardam enquanto o lock estiver
+    vivo, e só o tomam se o dono (nesta máquina) terminou ou se o lock ficou sem
+    renovação por mais que o timeout.
+
+    Yields:
+        bool: True se o lock foi obtido
+    """
+    if not SNAPSHOT_ENABLED:
+        yield False
+        return
+    lock_path = _paths(snapshot_key(table, filters))['lock']
+    token = f"{os.getpid()}@{socket.gethostname()}@{uuid.uuid4().hex}"
+    acquired = False
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, token.encode())
+                os.close(fd)
+                acquired = True
+                break
+            except FileExistsError:
+                try:
+                    if _lock_owner_dead(lock_path) or time.time() - lock_path.stat().st_mtime > timeout:
+                        print(f"[WARN] Lock abandonado do snapshot de {table} removido")
+                        lock_path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(LOCK_POLL_INTERVAL)
+    except OSError as e:
+        print(f"[WARN] Não foi possível criar o lock do snapshot de {table}: {e}")
+
+    stop = threading.Event()
+    if acquired:
+        threading.Thread(target=_heartbeat, args=(lock_path, stop), daemon=True,
+                         name=f"snapshot-lock-{table}").start()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            stop.set()
+            try:
+                # Só remove o lock se ainda for o nosso
+                if lock_path.read_text() == token:
+                    lock_path.unlink()
+            except FileNotFoundError:
+                pass
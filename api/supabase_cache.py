@@ -0,0 +1,381 @@
+"""
+Cache em disco, por dia, dos resultados das funções RPC do Supabase.
+
+Os relatórios de produção consultam a RPC com um período (data inicial e final). Antes,
+cada renderização pedia o período inteiro de novo; em visões de um mês ou de um ano, quase
+tudo eram dias que já não mudam mais. Aqui o resultado de cada dia é guardado em um
+arquivo próprio e só os dias ausentes (ou ainda abertos) vão ao Supabase:
+
+- Dias fechados: um dia buscado depois do seu fim (+ SUPABASE_CLOSE_GRACE) não é mais
+  consultado; dias ainda abertos (o dia atual) são reaproveitados por SUPABASE_OPEN_DAY_TTL
+- Faixas: os dias que faltam são agrupados em intervalos contínuos, e cada intervalo é
+  pedido em uma única chamada à RPC, paginada com o cabeçalho Range do PostgREST
+  (SUPABASE_PAGE_SIZE registros por página). A ordenação precisa ser única (coluna de data
+  + colunas de desempate, ex: card e estágio): com empates no timestamp, o OFFSET de uma
+  página para a outra repetiria ou pularia registros
+- Separação por dia: os registros de um intervalo são distribuídos pela data da coluna de
+  data no fuso usado pelo filtro da RPC (SUPABASE_RPC_TIMEZONE); timestamps com offset
+  são convertidos para esse fuso antes de tirar a data. Se algum registro ainda cair fora
+  do intervalo pedido (ou tiver data ilegível), o intervalo é buscado de novo dia a dia
+- Arquivos: Parquet (ou pickle) + .json de metadados por dia, gravados de forma atômica,
+  em um diretório por RPC e projeto do Supabase
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+try:
+    from api.http_client import http_request
+    from api.snapshot_cache import PARQUET_AVAILABLE, _atomic_write
+except ImportError:
+    from http_client import http_request
+    from snapshot_cache import PARQUET_AVAILABLE, _atomic_write
+
+try:
+    from utils.single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+# Diretório e ativação do cache (configuráveis por variável de ambiente)
+SUPABASE_CACHE_DIR = Path(os.getenv('SUPABASE_CACHE_DIR', Path(__file__).parents[1] / '.cache' / 'supabase_rpc'))
+SUPABASE_CACHE_ENABLED = os.getenv('SUPABASE_CACHE', '1') != '0'
+# Registros por página da RPC (o Supabase limita cada resposta a 1000 por padrão)
+SUPABASE_PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', 1000))
+# Reaproveitamento de um dia ainda aberto (ex: o dia atual) entre renderizações
+SUPABASE_OPEN_DAY_TTL = int(os.getenv('SUPABASE_OPEN_DAY_TTL', 60))
+# Margem após o fim do dia (hora local) para considerá-lo fechado; cobre a diferença de
+# fuso com o banco e registros que chegam com atraso
+SUPABASE_CLOSE_GRACE = int(os.getenv('SUPABASE_CLOSE_GRACE', 6 * 3600))  # 6 horas
+# Fuso em que a RPC compara o filtro de período (o Postgres do Supabase usa UTC por padrão)
+SUPABASE_RPC_TIMEZONE = ZoneInfo(os.getenv('SUPABASE_RPC_TIMEZONE', 'UTC'))
+# Dias mantidos em memória (evita reler os arquivos a cada renderização)
+SUPABASE_MEMORY_DAYS = int(os.getenv('SUPABASE_MEMORY_DAYS', 1500))
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_single_flight = SingleFlight("Supabase")
+
+_stats = {'days_cached': 0, 'days_fetched': 0, 'rpc_calls': 0, 'pages': 0, 'rows_fetched': 0, 'day_fallbacks': 0}
+_stats_lock = threading.Lock()
+
+
+class _RegistroForaDoPeriodo(Exception):
+    """Registro devolvido pela RPC com data fora do intervalo pedido."""
+
+
+def _count(**fields):
+    with _stats_lock:
+        for field, value in fields.items():
+            _stats[field] += value
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+
+def _rpc_dir(base_url, rpc):
+    # O fuso entra no nome: dias separados com outro fuso não podem ser reaproveitados
+    projeto = hashlib.sha1(f"{base_url}|{SUPABASE_RPC_TIMEZONE.key}".encode('utf-8')).hexdigest()[:8]
+    return SUPABASE_CACHE_DIR / f"{rpc}__{projeto}"
+
+
+def _day_paths(directory, day):
+    nome = day.isoformat()
+    return {
+        'parquet': directory / f"{nome}.parquet",
+        'pickle': directory / f"{nome}.pkl",
+        'meta': directory / f"{nome}.json",
+    }
+
+
+def _day_closed_at(day):
+    """Timestamp a partir do qual o dia (em SUPABASE_RPC_TIMEZONE) é considerado fechado."""
+    fim_do_dia = datetime.combine(day + timedelta(days=1), datetime.min.time(),
+                                  tzinfo=SUPABASE_RPC_TIMEZONE).timestamp()
+    return fim_do_dia + SUPABASE_CLOSE_GRACE
+
+
+def _is_fresh(meta, day, now):
+    fetched_at = meta.get('fetched_at', 0)
+    return fetched_at >= _day_closed_at(day) or now - fetched_at < SUPABASE_OPEN_DAY_TTL
+
+
+def _read_meta(paths):
+    try:
+        with open(paths['meta'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remember(key, df):
+    with _memory_lock:
+        _memory[key] = df
+        _memory.move_to_end(key)
+        while len(_memory) > SUPABASE_MEMORY_DAYS:
+            _memory.popitem(last=False)
+
+
+def _load_day(directory, day, now):
+    """
+    Registros guardados do dia, se ainda válidos.
+
+    Returns:
+        pandas.DataFrame | None: Registros do dia (pode ser vazio) ou None se for preciso buscar
+    """
+    paths = _day_paths(directory, day)
+    meta = _read_meta(paths)
+    if not meta or not _is_fresh(meta, day, now):
+        return None
+    key = (str(directory), day, meta.get('fetched_at'))
+    with _memory_lock:
+        df = _memory.get(key)
+        if df is not None:
+            _memory.move_to_end(key)
+            return df
+    try:
+        if meta.get('format') == 'parquet':
+            df = pd.read_parquet(paths['parquet'])
+        else:
+            df = pd.read_pickle(paths['pickle'])
+    except Exception as e:
+        print(f"[WARN] Cache do Supabase de {day} ilegível: {e}. Buscando novamente.")
+        return None
+    _remember(key, df)
+    return df
+
+
+def _write_day(directory, day, df, fetched_at):
+    """Grava os registros do dia (Parquet, ou pickle se o Parquet não aceitar os tipos)."""
+    key = (str(directory), day, fetched_at)
+    _remember(key, df)
+    if not SUPABASE_CACHE_ENABLED:
+        return
+    paths = _day_paths(directory, day)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fmt = 'pickle'
+        if PARQUET_AVAILABLE and len(df.columns):
+            try:
+                _atomic_write(paths['parquet'], lambda p: df.to_parquet(p, index=False))
+                fmt = 'parquet'
+            except Exception:
+                fmt = 'pickle'
+        if fmt == 'pickle':
+            _atomic_write(paths['pickle'], lambda p: df.to_pickle(p))
+        meta = {'day': day.isoformat(), 'rows': int(len(df)), 'format': fmt, 'fetched_at': fetched_at,
+                'closed': fetched_at >= _day_closed_at(day)}
+        _atomic_write(paths['meta'], lambda p: p.write_text(json.dumps(meta), encoding='utf-8'))
+        other = paths['pickle'] if fmt == 'parquet' else paths['parquet']
+        if other.exists():
+            other.unlink()
+    except Exception as e:
+        print(f"[WARN] Não foi possível gravar o cache do Supabase de {day}: {e}")
+
+
+def _content_range_total(response):
+    """Total de registros informado no Content-Range ("0-999/5234"), ou None."""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def _iter_pages(url, headers, params, order):
+    """
+    Percorre o resultado da RPC em páginas de SUPABASE_PAGE_SIZE registros (Range do PostgREST).
+
+    Yields:
+        list: Registros (dicts) de cada página
+    """
+    inicio = 0
+    while True:
+        fim = inicio + SUPABASE_PAGE_SIZE - 1
+        page_headers = {**headers, 'Prefer': 'count=exact', 'Range-Unit': 'items', 'Range': f"{inicio}-{fim}"}
+        response = http_request("POST", url, headers=page_headers, json=params,
+                                params={'order': order} if order else None, timeout=60)
+        if response.status_code == 416:  # início além do total
+            return
+        response.raise_for_status()
+        registros = response.json()
+        if not isinstance(registros, list):
+            raise ValueError(f"Resposta inesperada da API Supabase: {type(registros)}")
+        _count(pages=1, rows_fetched=len(registros))
+        if registros:
+            yield registros
+        inicio += len(registros)
+        total = _content_range_total(response)
+        if not registros or (total is not None and inicio >= total) or (total is None and len(registros) < SUPABASE_PAGE_SIZE):
+            return
+
+
+def _record_day(valor):
+    """
+    Dia do registro no fuso do filtro da RPC.
+
+    Timestamps sem offset já estão nesse fuso; com offset (ex: '2024-01-31T23:30:00-03:00'),
+    são convertidos para SUPABASE_RPC_TIMEZONE antes de tirar a data.
+
+    Returns:
+        date | None: Dia do registro, ou None se a data for ilegível
+    """
+    try:
+        momento = datetime.fromisoformat(str(valor))
+    except ValueError:
+        return None
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(SUPABASE_RPC_TIMEZONE)
+    return momento.date()
+
+
+def _fetch_span(url, headers, inicio, fim, date_field, param_inicio, param_fim, order, split_days=True):
+    """
+    Busca o intervalo [inicio, fim] na RPC e separa os registros por dia.
+
+    Returns:
+        dict: {dia: pandas.DataFrame} com todos os dias do intervalo (vazios inclusive)
+    """
+    params = {param_inicio: inicio.isoformat(), param_fim: fim.isoformat()}
+    _count(rpc_calls=1)
+    por_dia = {dia: [] for dia in _dias(inicio, fim)}
+    for registros in _iter_pages(url, headers, params, order):
+        if not split_days:
+            por_dia[inicio].extend(registros)
+            continue
+        for registro in registros:
+            dia = _record_day(registro.get(date_field))
+            if dia not in por_dia:
+                raise _RegistroForaDoPeriodo(f"{date_field}={registro.get(date_field)!r} fora de {inicio}..{fim}")
+            por_dia[dia].append(registro)
+    return {dia: pd.DataFrame(registros) for dia, registros in por_dia.items()}
+
+
+def _dias(inicio, fim):
+    return [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+
+def _missing_spans(dias):
+    """Agrupa dias ordenados em intervalos contínuos [(inicio, fim)]."""
+    spans = []
+    for dia in dias:
+        if spans and dia == spans[-1][1] + timedelta(days=1):
+            spans[-1][1] = dia
+        else:
+            spans.append([dia, dia])
+    return [tuple(span) for span in spans]
+
+
+def _fetch_period(base_url, headers, rpc, inicio, fim, date_field, param_inicio, param_fim, order):
+    directory = _rpc_dir(base_url, rpc)
+    url = f"{base_url}/rest/v1/rpc/{rpc}"
+    now = time.time()
+    dias = _dias(inicio, fim)
+    frames = {}
+    for dia in dias:
+        df = _load_day(directory, dia, now)
+        if df is not None:
+            frames[dia] = df
+    faltando = [dia for dia in dias if dia not in frames]
+    _count(days_cached=len(frames), days_fetched=len(faltando))
+
+    for span_inicio, span_fim in _missing_spans(faltando):
+        fetched_at = time.time()
+        try:
+            buscados = _fetch_span(url, headers, span_inicio, span_fim, date_field, param_inicio, param_fim, order)
+        except _RegistroForaDoPeriodo as e:
+            print(f"[WARN] {rpc}: {e}; buscando {span_inicio}..{span_fim} dia a dia")
+            _count(day_fallbacks=1)
+            buscados = {}
+            for dia in _dias(span_inicio, span_fim):
+                buscados.update(_fetch_span(url, headers, dia, dia, date_field, param_inicio, param_fim, order,
+                                            split_days=False))
+        for dia, df in buscados.items():
+            _write_day(directory, dia, df, fetched_at)
+            frames[dia] = df
+
+    print(f"[INFO] {rpc} {inicio}..{fim}: {len(dias) - len(faltando)} dias do cache, "
+          f"{len(faltando)} dias buscados em {len(_missing_spans(faltando))} intervalos")
+    nao_vazios = [frames[dia] for dia in dias if len(frames[dia])]
+    if not nao_vazios:
+        return pd.DataFrame()
+    return pd.concat(nao_vazios, ignore_index=True)
+
+
+def fetch_rpc_period(base_url, headers, rpc, data_inicio, data_fim, date_field='timestamp',
+                     param_inicio='p_data_inicio', param_fim='p_data_fim', tiebreakers=()):
+    """
+    Resultado da RPC para o período [data_inicio, data_fim] (datas inclusivas), usando o
+    cache por dia e buscando no Supabase apenas os dias ausentes ou ainda abertos.
+
+    Chamadas simultâneas para o mesmo período (várias sessões) fazem uma única busca.
+
+    Args:
+        base_url (str): URL do projeto Supabase
+        headers (dict): Cabeçalhos de autenticação (apikey, Authorization)
+        rpc (str): Nome da função RPC
+        data_inicio, data_fim (str | date): Período (ex: '2024-01-31')
+        date_field (str): Coluna de data/hora dos registros (separação por dia e ordenação)
+        param_inicio, param_fim (str): Nomes dos parâmetros de período da RPC
+        tiebreakers (tuple): Colunas que, junto com date_field, identificam cada registro;
+            completam a ordenação da paginação para que ela seja estável
+
+    Returns:
+        pandas.DataFrame: Registros do período, em ordem de dia (vazio se não houver)
+
+    Raises:
+        requests.exceptions.RequestException: Em caso de erro na consulta ao Supabase
+    """
+    inicio, fim = _to_date(data_inicio), _to_date(data_fim)
+    if inicio > fim:
+        return pd.DataFrame()
+    if not tiebreakers:
+        print(f"[WARN] {rpc}: paginação ordenada só por {date_field}; "
+              f"registros com o mesmo timestamp podem se repetir ou faltar entre páginas")
+    order = ','.join([date_field, *tiebreakers])
+    key = (str(base_url), rpc, inicio, fim)
+    return _single_flight.do(
+        key,
+        lambda: _fetch_period(base_url, headers, rpc, inicio, fim, date_field, param_inicio, param_fim, order),
+        label=rpc,
+        share=lambda df: df.copy(),
+    )
+
+
+def clear_supabase_cache():
+    """Remove os dias guardados (em memória e em disco) de todas as RPCs."""
+    with _memory_lock:
+        _memory.clear()
+    if SUPABASE_CACHE_DIR.exists():
+        for path in SUPABASE_CACHE_DIR.glob('*/*'):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def get_supabase_cache_stats():
+    """
+    Estatísticas do cache de RPCs do Supabase neste processo.
+
+    Returns:
+        dict: {'days_cached', 'days_fetched', 'rpc_calls', 'pages', 'rows_fetched',
+            'day_fallbacks', 'memory_days', 'hit_rate'} - hit_rate é a fração de dias
+            servidos pelo cache
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    with _memory_lock:
+        stats['memory_days'] = len(_memory)
+    total = stats['days_cached'] + stats['days_fetched']
+    stats['hit_rate'] = stats['days_cached'] / total if total else 0.0
+    return stats
@@ -1,6 +1,26 @@
 import streamlit as st
 from utils.refresh_utils import clear_file_cache
 
+def request_bitrix_sync():
+    """
+    Pede a sincronização incremental das tabelas do Bitrix24.
+    
+    Marca os snapshots em disco como desatualizados e limpa o cache em memória de
+    load_bitrix_data, dos resultados mesclados e dos dados derivados, de modo que a próxima leitura busque
+    apenas as linhas modificadas (delta) em vez da tabela inteira.
+    """
+    try:
+        from api.bitrix_sync import request_sync
+        from api.bitrix_connector import load_bitrix_data
+        from api.merged_cache import clear_merged_cache
+        from utils.derived_cache import clear_derived_cache
+        request_sync()
+        load_bitrix_data.clear()
+        clear_merged_cache()
+        clear_derived_cache()
+    except Exception as e:
+        print(f"Não foi possível solicitar a sincronização do Bitrix: {e}")
+
 def render_refresh_button():
     """
     Renderiza um botão grande de atualização flutuante no canto da tela
@@ -57,6 +77,9 @@ def render_refresh_button():
             # Limpar cache de arquivos
             clear_file_cache()
             
+            # Sincronizar (delta) as tabelas do Bitrix
+            request_bitrix_sync()
+            
             # Registrar no log
             print("Botão de atualização acionado - recarregando dados")
             
@@ -166,6 +189,9 @@ def render_sidebar_refresh_button():
         # Limpar cache de arquivos usando a função dedicada
         clear_file_cache()
         
+        # Sincronizar (delta) as tabelas do Bitrix
+        request_bitrix_sync()
+        
         # Definir flag de sucesso para mostrar mensagem após recarregar
         st.session_state['refresh_success'] = True
         
@@ -3,8 +3,8 @@ import pandas as pd
 import os
 from datetime import datetime
 
-# Importar a função de obter credenciais do helper
-from utils.secrets_helper import get_google_credentials
+# Leitura da planilha pela camada de acesso ao Google Sheets
+from utils.google_sheets_connector import get_sheet_values
 
 def load_conclusao_data(start_date=None, end_date=None):
     """
@@ -20,24 +20,12 @@ def load_conclusao_data(start_date=None, end_date=None):
                           por responsável e mesa, ou None em caso de erro.
     """
     try:
-        # Obter credenciais usando o helper
-        try:
-            credentials = get_google_credentials()
-            if credentials is None:
-                print("Erro: Não foi possível obter as credenciais do Google via helper.")
-                return None
-        except Exception as e:
-            print(f"Erro ao obter credenciais via helper: {str(e)}")
-            return None
-
-        client = gspread.authorize(credentials)
-
-        # Abre a planilha pelo URL fornecido
+        # Cliente único e cache por data de modificação da planilha (só baixa quando ela muda)
         sheet_url = "https://docs.google.com/spreadsheets/d/1mOQY1Rc22KnjJDlB054G0ZvWV_l5v5SIRoMBJllRZQ0/edit#gid=0"
-        sheet = client.open_by_url(sheet_url).sheet1
-
-        # Pega todos os dados da planilha como lista de listas
-        all_values = sheet.get_all_values()
+        all_values = get_sheet_values(sheet_url, worksheet=0)
+        if all_values is None:
+            print("Erro: Não foi possível obter o cliente do Google Sheets.")
+            return None
 
         # Imprimir os primeiros valores da planilha para debug
         print("[DEBUG] Verificando formato da planilha:")
@@ -35,6 +35,10 @@ from components.search_component import show_search_box
 from components.table_of_contents import render_toc
 from components.refresh_button import render_refresh_button, render_sidebar_refresh_button
 from components.quick_links import show_quick_links, show_page_links_sidebar
+from api.background_refresh import start_background_refresh
+
+# Manter os snapshots do Bitrix atualizados fora do caminho das páginas (uma thread por processo)
+start_background_refresh()
 
 # Mapeamento de rotas para páginas
 ROTAS = {
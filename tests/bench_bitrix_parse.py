@@ -0,0 +1,109 @@
+"""
+Benchmark da leitura da resposta do BI connector (pbi.php).
+
+Compara a leitura antiga (response.json() + lista de linhas ajustadas + DataFrame)
+com parse_bitrix_response (leitura em blocos, transposição por lotes). Usa uma
+resposta sintética no layout do pbi.php (cabeçalhos na primeira linha), com colunas
+de baixa cardinalidade (SIM/NÃO, estágios, datas) e colunas distintas (IDs, nomes).
+
+Cada leitura roda em um processo próprio, e o pico de RSS (ru_maxrss) é medido a partir
+do texto da resposta já carregado; os DataFrames resultantes são comparados no fim.
+
+Uso:
+    python tests/bench_bitrix_parse.py [linhas] [colunas]
+"""
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from api.bitrix_connector import STREAM_CHUNK_SIZE, parse_bitrix_response
+
+
+class RespostaFalsa:
+    """Imita requests.Response com stream=True sobre um texto já pronto."""
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.encoding = 'utf-8'
+
+    def iter_content(self, chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True):
+        for inicio in range(0, len(self.texto), chunk_size):
+            yield self.texto[inicio:inicio + chunk_size]
+
+    def json(self):
+        return json.loads(self.texto)
+
+
+def gerar_resposta(linhas, colunas):
+    rng = np.random.default_rng(0)
+    cabecalhos = ['ID', 'TITLE'] + [f'UF_CRM_{i}' for i in range(colunas - 2)]
+    valores_baixos = ['SIM', 'NÃO', None, 'DT1098_92:NEW', 'DT1098_92:SUCCESS', '2025-03-01 10:00:00']
+    escolhas = rng.integers(0, len(valores_baixos), size=(linhas, colunas - 2))
+    dados = [cabecalhos]
+    for i in range(linhas):
+        dados.append([str(i), f'Família {i}'] + [valores_baixos[j] for j in escolhas[i]])
+    return json.dumps(dados, ensure_ascii=False)
+
+
+def leitura_antiga(response):
+    """Caminho de load_bitrix_data antes da leitura em blocos."""
+    data = response.json()
+    headers = data[0]
+    processed_rows = []
+    for row_item in data[1:]:
+        if len(row_item) < len(headers):
+            processed_rows.append(list(row_item) + [None] * (len(headers) - len(row_item)))
+        elif len(row_item) > len(headers):
+            processed_rows.append(list(row_item)[:len(headers)])
+        else:
+            processed_rows.append(row_item)
+    return pd.DataFrame(processed_rows, columns=headers)
+
+
+LEITURAS = {'antiga': leitura_antiga, 'blocos': parse_bitrix_response}
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB no Linux
+
+
+def medir_no_processo(nome, arquivo_texto, arquivo_saida):
+    """Lê a resposta com a leitura escolhida (chamado no processo filho)."""
+    texto = Path(arquivo_texto).read_text(encoding='utf-8')
+    base = _rss_mb()
+    inicio = time.perf_counter()
+    df = LEITURAS[nome](RespostaFalsa(texto))
+    tempo = time.perf_counter() - inicio
+    pico = _rss_mb() - base
+    print(f"{nome:<8} pico de RSS +{pico:6.0f} MB | {tempo:5.2f}s", flush=True)
+    df.to_pickle(arquivo_saida)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--filho':
+        medir_no_processo(*sys.argv[2:5])
+        sys.exit(0)
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    colunas = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    texto = gerar_resposta(linhas, colunas)
+    print(f"Resposta sintética: {linhas} linhas x {colunas} colunas, {len(texto) / 2**20:.0f} MB de texto")
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_texto = Path(pasta) / 'resposta.json'
+        arquivo_texto.write_text(texto, encoding='utf-8')
+        del texto
+        saidas = {}
+        for nome in LEITURAS:
+            saidas[nome] = Path(pasta) / f'{nome}.pkl'
+            subprocess.run([sys.executable, __file__, '--filho', nome, str(arquivo_texto), str(saidas[nome])],
+                           check=True, stderr=subprocess.DEVNULL)
+        pd.testing.assert_frame_equal(pd.read_pickle(saidas['antiga']), pd.read_pickle(saidas['blocos']))
+    print("Resultados iguais")
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark do mapeamento de STAGE_ID para estágio legível e categoria.
+
+Compara:
+- .apply com o dicionário de estágios recriado a cada chamada (como antes)
+- .apply com o dicionário no nível do módulo (simplificar_nome_estagio atual)
+- mapear_estagios + categorizar_estagios (uma chamada por valor distinto)
+
+Uso:
+    python tests/bench_estagios.py [linhas]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from views.cartorio_new.utils import (
+    MAPEAMENTO_ESTAGIOS, categorizar_estagio, categorizar_estagios, mapear_estagios,
+    simplificar_nome_estagio,
+)
+
+
+def simplificar_com_dicionario_recriado(nome):
+    """simplificar_nome_estagio pagando a montagem do dicionário em toda chamada."""
+    dict(MAPEAMENTO_ESTAGIOS)
+    return simplificar_nome_estagio(nome)
+
+
+def medir(funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = np.random.default_rng(0)
+    valores = list(MAPEAMENTO_ESTAGIOS) + ['DT1098_92:UC_DESCONHECIDO', 'OUTRO', '', None]
+    serie = pd.Series(np.array(valores, dtype=object)[rng.integers(0, len(valores), linhas)])
+
+    (legivel_a, categoria_a), t_antigo = medir(lambda: (
+        (legivel := serie.apply(simplificar_com_dicionario_recriado)), legivel.apply(categorizar_estagio)))
+    (legivel_b, categoria_b), t_apply = medir(lambda: (
+        (legivel := serie.apply(simplificar_nome_estagio)), legivel.apply(categorizar_estagio)))
+    (legivel_c, categoria_c), t_vetor = medir(lambda: (
+        (legivel := mapear_estagios(serie)), categorizar_estagios(legivel)))
+
+    assert legivel_a.equals(legivel_b) and categoria_a.equals(categoria_b)
+    assert legivel_c.astype(object).equals(legivel_a) and categoria_c.astype(object).equals(categoria_a)
+
+    print(f"{linhas} valores de STAGE_ID ({serie.nunique()} distintos)")
+    print(f"apply, dicionário recriado por chamada   {t_antigo * 1000:7.1f} ms")
+    print(f"apply, dicionário no módulo              {t_apply * 1000:7.1f} ms")
+    print(f"mapear_estagios + categorizar_estagios   {t_vetor * 1000:7.1f} ms  (~{t_antigo / t_vetor:.0f}x)")
+    print(f"Coluna legível: {legivel_a.memory_usage(deep=True) / 2**20:.1f} MB object -> "
+          f"{legivel_c.memory_usage(deep=True) / 2**20:.1f} MB category")
@@ -0,0 +1,107 @@
+"""
+Benchmark do status de conclusão da higienização e da tabela de status por responsável
+(utils/data_processor).
+
+Compara:
+- df.apply(get_completion_status, axis=1) com compute_completion_status
+- pd.crosstab (implementação anterior de create_responsible_status_table) com a contagem
+  por bincount atual
+- groupby/unstack do relatório "Status por Responsável" (views/producao.py, antes) com a
+  tabela de create_responsible_status_table usada agora pelo relatório
+
+Usa negócios sintéticos com os valores que aparecem nos campos (SIM/sim/NÃO, nulos,
+booleanos) e um dos campos de higienização ausente.
+
+Uso:
+    python tests/bench_status_higienizacao.py [negocios]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import (
+    RESPONSIBLE_STATUS_COLUMNS, STATUS_FIELD, compute_completion_status, create_responsible_status_table,
+    get_completion_status,
+)
+
+CAMPOS = [f'UF_CRM_HIG_{i}' for i in range(8)] + [STATUS_FIELD]
+
+
+def tabela_crosstab(df, responsible_column='ASSIGNED_BY_NAME'):
+    """create_responsible_status_table antes da contagem por bincount."""
+    if df.empty or responsible_column not in df.columns or STATUS_FIELD not in df.columns:
+        return pd.DataFrame()
+    df[STATUS_FIELD] = df[STATUS_FIELD].fillna('PENDENCIA')
+    cross_tab = pd.crosstab(index=df[responsible_column], columns=df[STATUS_FIELD].str.upper(),
+                            margins=True, margins_name='Total')
+    for status in RESPONSIBLE_STATUS_COLUMNS:
+        if status not in cross_tab.columns:
+            cross_tab[status] = 0
+    ordered_columns = [col for col in RESPONSIBLE_STATUS_COLUMNS + ['Total'] if col in cross_tab.columns]
+    return cross_tab[ordered_columns]
+
+
+def relatorio_groupby(df):
+    """Contagem do relatório "Status por Responsável" antes de usar a tabela do utils."""
+    df = df.copy()
+    df[STATUS_FIELD] = df[STATUS_FIELD].fillna('PENDENCIA')
+    status_counts = df.groupby(['ASSIGNED_BY_NAME', STATUS_FIELD]).size().unstack(fill_value=0)
+    display_df = status_counts[RESPONSIBLE_STATUS_COLUMNS].copy()
+    display_df.columns.name = None
+    return display_df.reset_index()
+
+
+def relatorio_tabela(df):
+    display_df = create_responsible_status_table(df).drop(index='Total')[RESPONSIBLE_STATUS_COLUMNS].copy()
+    display_df.columns.name = None
+    return display_df.reset_index()
+
+
+def gerar_negocios(negocios):
+    rng = np.random.default_rng(0)
+    valores = np.array(['SIM', 'sim', 'Sim', 'NÃO', 'NAO', '', None, np.nan, True], dtype=object)
+    dados = {campo: valores[rng.integers(0, len(valores), negocios)] for campo in CAMPOS[1:-1]}
+    responsaveis = np.array([f'Responsável {i}' for i in range(60)] + [None], dtype=object)
+    dados['ASSIGNED_BY_NAME'] = responsaveis[rng.integers(0, len(responsaveis), negocios)]
+    status = np.array(['COMPLETO', 'INCOMPLETO', 'PENDENCIA', None], dtype=object)
+    dados[STATUS_FIELD] = status[rng.integers(0, len(status), negocios)]
+    return pd.DataFrame(dados)
+
+
+def medir(funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor
+
+
+if __name__ == '__main__':
+    negocios = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    df = gerar_negocios(negocios)
+    print(f"{negocios} negócios, {len(CAMPOS) - 1} campos de higienização (1 ausente)")
+
+    antigo, t_apply = medir(lambda: df.apply(get_completion_status, axis=1, higilizacao_fields=CAMPOS), repeticoes=1)
+    novo, t_vetor = medir(lambda: compute_completion_status(df, CAMPOS))
+    assert novo.astype(object).equals(antigo)
+    print(f"status: apply(get_completion_status)  {t_apply:7.3f}s")
+    print(f"status: compute_completion_status     {t_vetor:7.3f}s  (~{t_apply / t_vetor:.0f}x)")
+
+    antiga, t_crosstab = medir(lambda: tabela_crosstab(df.copy()))
+    atual, t_bincount = medir(lambda: create_responsible_status_table(df))
+    pd.testing.assert_frame_equal(atual, antiga, check_names=False, check_dtype=False)
+    print(f"tabela: crosstab                      {t_crosstab:7.3f}s")
+    print(f"tabela: bincount                      {t_bincount:7.3f}s  (~{t_crosstab / t_bincount:.0f}x)")
+
+    antigo, t_groupby = medir(lambda: relatorio_groupby(df))
+    atual, t_relatorio = medir(lambda: relatorio_tabela(df))
+    pd.testing.assert_frame_equal(atual, antigo, check_dtype=False)
+    print(f"relatório: groupby/unstack            {t_groupby:7.3f}s")
+    print(f"relatório: create_responsible_status  {t_relatorio:7.3f}s")
+    print("Resultados iguais")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do projeto são importados a partir da raiz (api., utils., views.)
+sys.path.insert(0, str(Path(__file__).parents[1]))
@@ -0,0 +1,80 @@
+"""
+Saída de referência das regras de conclusão e de precedência do pipeline 104
+(views/cartorio_new): as versões vetorizadas precisam dar o mesmo resultado das
+versões linha a linha / por família de antes.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from views.cartorio_new.acompanhamento import calcular_conclusao_por_pipeline, calcular_conclusao_vetorizada
+from views.cartorio_new.utils import MAPEAMENTO_ESTAGIOS, adicionar_colunas_estagio
+
+PIPELINES = [92, 94, 102, 104, None]
+STAGES = [s for s in MAPEAMENTO_ESTAGIOS if s.startswith('DT1098_')] + ['DT1098_92:UC_DESCONHECIDO', None]
+
+
+@pytest.fixture(params=['object', 'Int64'])
+def df_cartorio(request):
+    """Certidões sintéticas: pipelines nulos, famílias nulas e estágios desconhecidos."""
+    rng = np.random.default_rng(42)
+    n = 3000
+    category_id = pd.Series(np.array(PIPELINES, dtype=object)[rng.integers(0, len(PIPELINES), n)])
+    if request.param == 'Int64':
+        category_id = category_id.astype('Int64')
+    familias = np.array([f'FAM{i}' for i in range(400)] + [None], dtype=object)
+    df = pd.DataFrame({
+        'CATEGORY_ID': category_id,
+        'STAGE_ID': np.array(STAGES, dtype=object)[rng.integers(0, len(STAGES), n)],
+        'UF_CRM_34_ID_FAMILIA': familias[rng.integers(0, len(familias), n)],
+        'UF_CRM_34_ID_REQUERENTE': familias[rng.integers(0, len(familias), n)],
+    })
+    return adicionar_colunas_estagio(df, 'STAGE_ID')
+
+
+def precedencia_104_higienizacao_por_familia(df):
+    """Implementação anterior (um filtro sobre o DataFrame inteiro por família)."""
+    if 'CATEGORY_ID' not in df.columns or 'UF_CRM_34_ID_FAMILIA' not in df.columns:
+        return df
+    df_processado = df.copy()
+    familias_104 = df_processado[df_processado['CATEGORY_ID'].astype(str) == '104']['UF_CRM_34_ID_FAMILIA'].unique()
+    if len(familias_104) == 0:
+        return df_processado
+    familias_para_remover = []
+    for id_familia in familias_104:
+        registros_familia = df_processado[df_processado['UF_CRM_34_ID_FAMILIA'] == id_familia]
+        registros_104 = registros_familia[registros_familia['CATEGORY_ID'].astype(str) == '104']
+        registros_superiores = registros_familia[registros_familia['CATEGORY_ID'].astype(str).isin(['92', '94', '102'])]
+        if not registros_superiores.empty and not registros_104.empty:
+            if (registros_104['STAGE_ID'].str.contains('SUCCESS', na=False).any()
+                    and registros_superiores['STAGE_ID'].str.contains('SUCCESS', na=False).any()):
+                familias_para_remover.append(id_familia)
+    if familias_para_remover:
+        mask_remover = (
+            df_processado['UF_CRM_34_ID_FAMILIA'].isin(familias_para_remover) &
+            (df_processado['CATEGORY_ID'].astype(str) == '104')
+        )
+        df_processado = df_processado[~mask_remover].copy()
+    return df_processado
+
+
+def test_conclusao_vetorizada_igual_por_linha(df_cartorio):
+    esperado = df_cartorio.apply(calcular_conclusao_por_pipeline, axis=1).astype(bool)
+    resultado = calcular_conclusao_vetorizada(df_cartorio)
+    pd.testing.assert_series_equal(resultado, esperado, check_names=False)
+
+
+def test_conclusao_vetorizada_sem_colunas():
+    df = pd.DataFrame({'STAGE_ID': ['DT1098_92:SUCCESS']})
+    assert calcular_conclusao_vetorizada(df).tolist() == [False]
+
+
+def test_precedencia_104_higienizacao_igual_por_familia(df_cartorio):
+    # O módulo depende do gspread (planilha de conclusões da higienização)
+    pytest.importorskip('gspread')
+    from views.cartorio_new.higienizacao_desempenho import aplicar_logica_precedencia_pipeline_104_higienizacao
+
+    esperado = precedencia_104_higienizacao_por_familia(df_cartorio)
+    resultado = aplicar_logica_precedencia_pipeline_104_higienizacao(df_cartorio)
+    assert len(resultado) < len(df_cartorio)  # O fixture tem famílias com duplicação clara
+    pd.testing.assert_frame_equal(resultado, esperado)
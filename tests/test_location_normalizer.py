@@ -0,0 +1,63 @@
+"""
+A normalização compilada de localização (utils/location_normalizer) precisa dar o mesmo
+resultado da normalização anterior (tests/normalizacao_comune_antiga.py) nos nomes de
+comune, província e região de comuni-italiani-main, puros e nos formatos em que aparecem
+nos cards (prefixos de certidão e de igreja, sigla da província, maiúsculas, acentos).
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalizacao_comune_antiga as antiga
+from views.comune import data_loader as comune
+from views.comune_new import data_loader as comune_new
+
+DADOS = Path(__file__).parents[1] / 'comuni-italiani-main' / 'dati'
+
+# Formatos dos campos de comune/paróquia preenchidos nos cards
+FORMATOS = [
+    'Comune di {comune} ({sigla})',
+    'natti - Parrocchia di San {comune}, {den_prov}',
+    'MATRI: Chiesa Matrice di {comune_upper}/{sigla}',
+    '-matri Santa Maria del {comune} [{den_reg}]',
+    'Nascita: Ufficio di Stato Civile di {comune}; {den_prov}',
+    'certidao de  Frazione  {comune}  - {den_prov}',
+    "Sant'{comune} d'{den_prov}",
+    'Curia Vescovile di {den_prov} prov. di {sigla}',
+]
+EXTRAS = ['', ' ', 'nan', 'None', 'null', '-', '(TV)', 'Ñandú – “Città” di Forlì‐Cesena', 'São Paulo']
+
+
+@pytest.fixture(scope='module')
+def localizacoes():
+    """Nomes puros de comuni-italiani-main + uma amostra fixa nos formatos dos cards."""
+    df = pd.read_csv(DADOS / 'comuni.csv', dtype=str, keep_default_na=False)
+    puros = pd.concat([df['comune'], df['den_prov'], df['den_reg'], df['sigla']]).drop_duplicates()
+    amostra = df.sample(n=500, random_state=0)
+    formatados = [
+        formato.format(comune_upper=linha['comune'].upper(), **linha)
+        for linha in amostra.to_dict('records')
+        for formato in FORMATOS
+    ]
+    valores = list(puros) + formatados + EXTRAS
+    serie = pd.Series(valores, dtype=object)
+    # Valores nulos no meio da coluna, como vêm do Bitrix
+    serie[np.arange(0, len(serie), 97)] = None
+    return serie
+
+
+@pytest.mark.parametrize('novo_modulo, limpar_antigo, normalizar_antigo', [
+    (comune, antiga.limpar_antes_normalizar_comune, antiga.normalizar_localizacao_comune),
+    (comune_new, antiga.limpar_antes_normalizar_comune_new, antiga.normalizar_localizacao_comune_new),
+], ids=['comune', 'comune_new'])
+def test_normalizacao_igual_a_anterior(localizacoes, novo_modulo, limpar_antigo, normalizar_antigo):
+    pd.testing.assert_series_equal(
+        novo_modulo._limpar_antes_normalizar(localizacoes), limpar_antigo(localizacoes))
+    pd.testing.assert_series_equal(
+        novo_modulo._normalizar_localizacao(localizacoes), normalizar_antigo(localizacoes))
+    # Caminho usado no carregamento: limpeza seguida da normalização
+    pd.testing.assert_series_equal(
+        novo_modulo._normalizar_localizacao(novo_modulo._limpar_antes_normalizar(localizacoes)),
+        normalizar_antigo(limpar_antigo(localizacoes)))
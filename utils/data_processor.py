@@ -2,6 +2,13 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+STATUS_FIELD = 'UF_CRM_HIGILIZACAO_STATUS'
+# Categorias do status de conclusão (códigos 0, 1 e 2 do Categorical)
+COMPLETION_STATUSES = ['PENDENCIA', 'INCOMPLETO', 'COMPLETO']
+COMPLETION_STATUS_DTYPE = pd.CategoricalDtype(COMPLETION_STATUSES)
+# Ordem das colunas da tabela de status por responsável
+RESPONSIBLE_STATUS_COLUMNS = ['COMPLETO', 'INCOMPLETO', 'PENDENCIA']
+
 def format_status_text(value):
     """
     Formata o texto de status para exibição
@@ -155,6 +162,10 @@ def get_completion_status(row, higilizacao_fields):
     """
     Determina o status de conclusão com base nos campos de higienização
     
+    Para o DataFrame inteiro, use compute_completion_status (mesmo resultado, sem
+    percorrer as linhas). Nenhum relatório chama esta função hoje: o status exibido
+    vem pronto do Bitrix, no campo UF_CRM_HIGILIZACAO_STATUS.
+    
     Args:
         row (pandas.Series): Linha do DataFrame
         higilizacao_fields (list): Lista de campos de higienização
@@ -163,7 +174,7 @@ def get_completion_status(row, higilizacao_fields):
         str: Status de conclusão
     """
     # Remover UF_CRM_HIGILIZACAO_STATUS da lista de verificação
-    fields_to_check = [f for f in higilizacao_fields if f != 'UF_CRM_HIGILIZACAO_STATUS']
+    fields_to_check = [f for f in higilizacao_fields if f != STATUS_FIELD]
     
     # Contar quantos campos estão preenchidos com 'sim'
     completed = sum(1 for field in fields_to_check if str(row.get(field, '')).upper() == 'SIM')
@@ -176,10 +187,56 @@ def get_completion_status(row, higilizacao_fields):
     else:
         return 'COMPLETO'
 
+def _map_unique_values(series, func):
+    """
+    Aplica func a cada valor distinto da Series (os campos de status têm poucos valores)
+    
+    Returns:
+        numpy.ndarray: Resultado por linha
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.array([func(value) for value in uniques])
+    return mapped[codes] if len(mapped) else np.empty(0, dtype=mapped.dtype)
+
+def compute_completion_status(df, higilizacao_fields):
+    """
+    Status de conclusão de todas as linhas de uma vez (versão vetorizada de
+    get_completion_status)
+    
+    Cada campo vira uma coluna booleana ('SIM' após upper), a matriz é somada por linha
+    e o total de campos marcados define a categoria.
+    
+    Não substitui nenhum df.apply(get_completion_status) em produção (não há chamada
+    linha a linha; os relatórios usam UF_CRM_HIGILIZACAO_STATUS). Fica para uso em lote,
+    quando o status precisar ser derivado dos campos.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados
+        higilizacao_fields (list | dict): Campos de higienização (ex.: get_higilizacao_fields())
+        
+    Returns:
+        pandas.Series: Categorical PENDENCIA/INCOMPLETO/COMPLETO com o índice de df
+    """
+    fields_to_check = [f for f in higilizacao_fields if f != STATUS_FIELD]
+    
+    # Matriz linhas x campos: o campo está marcado como 'SIM'? (campo ausente = não)
+    done = np.zeros((len(df), len(fields_to_check)), dtype=bool)
+    for i, field in enumerate(fields_to_check):
+        if field in df.columns:
+            done[:, i] = _map_unique_values(df[field], lambda value: str(value).upper() == 'SIM')
+    completed = done.sum(axis=1)
+    
+    # 0 = PENDENCIA (nenhum campo), 1 = INCOMPLETO (alguns), 2 = COMPLETO (todos)
+    codes = np.where(completed == 0, 0, np.where(completed < len(fields_to_check), 1, 2))
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=COMPLETION_STATUS_DTYPE), index=df.index, name=STATUS_FIELD)
+
 def create_responsible_status_table(df, responsible_column='ASSIGNED_BY_NAME'):
     """
     Cria tabela de status por responsável
     
+    A contagem é feita sobre os códigos do responsável e do status (bincount), sem
+    alterar o DataFrame recebido.
+    
     Args:
         df (pandas.DataFrame): DataFrame com os dados
         responsible_column (str): Nome da coluna de responsável
@@ -187,25 +244,42 @@ def create_responsible_status_table(df, responsible_column='ASSIGNED_BY_NAME'):
     Returns:
         pandas.DataFrame: Tabela cruzada de responsáveis por status
     """
-    if df.empty or responsible_column not in df.columns or 'UF_CRM_HIGILIZACAO_STATUS' not in df.columns:
+    if df.empty or responsible_column not in df.columns or STATUS_FIELD not in df.columns:
         return pd.DataFrame()
     
-    # Substituir valores nulos no status por 'PENDENCIA'
-    df['UF_CRM_HIGILIZACAO_STATUS'] = df['UF_CRM_HIGILIZACAO_STATUS'].fillna('PENDENCIA')
+    # Status nulo conta como 'PENDENCIA'; os demais textos em maiúsculas (valores que não
+    # são texto ficam de fora, como no .str.upper() do crosstab)
+    known = {status: code for code, status in enumerate(RESPONSIBLE_STATUS_COLUMNS)}
+    other = len(known)  # status não reconhecido: entra só no Total
     
-    # Criar tabela cruzada
-    cross_tab = pd.crosstab(
-        index=df[responsible_column], 
-        columns=df['UF_CRM_HIGILIZACAO_STATUS'].str.upper(), 
-        margins=True,
-        margins_name='Total'
-    )
+    def status_code(value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return known['PENDENCIA']
+        if not isinstance(value, str):
+            return -1
+        return known.get(value.upper(), other)
     
-    # Certificar que todas as colunas de status existem
-    for status in ['COMPLETO', 'INCOMPLETO', 'PENDENCIA']:
-        if status not in cross_tab.columns:
-            cross_tab[status] = 0
+    status_codes = _map_unique_values(df[STATUS_FIELD], status_code).astype(np.int64)
+    # Responsáveis ordenados (como no crosstab); nulos ficam de fora
+    responsible_codes, responsibles = pd.factorize(df[responsible_column], sort=True)
     
-    # Reordenar as colunas
-    ordered_columns = [col for col in ['COMPLETO', 'INCOMPLETO', 'PENDENCIA', 'Total'] if col in cross_tab.columns]
-    return cross_tab[ordered_columns] 
\ No newline at end of file
+    valid = (responsible_codes >= 0) & (status_codes >= 0)
+    if not valid.any():
+        return pd.DataFrame()
+    width = other + 1
+    counts = np.bincount(
+        responsible_codes[valid] * width + status_codes[valid],
+        minlength=len(responsibles) * width
+    ).reshape(len(responsibles), width)
+    present = counts.sum(axis=1) > 0
+    counts = counts[present]
+    
+    cross_tab = pd.DataFrame(
+        counts[:, :other],
+        index=pd.Index(responsibles[present], name=responsible_column),
+        columns=pd.Index(RESPONSIBLE_STATUS_COLUMNS, name=STATUS_FIELD)
+    )
+    cross_tab['Total'] = counts.sum(axis=1)
+    # Linha de total (inclui os status não reconhecidos na coluna Total)
+    cross_tab.loc['Total'] = [*counts[:, :other].sum(axis=0), counts.sum()]
+    return cross_tab
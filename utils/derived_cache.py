@@ -0,0 +1,169 @@
+"""
+Cache em memória de dados derivados (DataFrames já processados a partir do Bitrix).
+
+As consultas ao Bitrix já passam pelo st.cache_data e pelos snapshots em disco, mas o
+pós-processamento (merges, deduplicação, limpezas com regex, agregações) era refeito a
+cada interação com os widgets. Aqui o resultado processado é guardado junto com as
+versões dos snapshots de origem (ver snapshot_cache.stamp_snapshot_version):
+
+- Cada tabela entregue pelos carregadores durante uma montagem é registrada
+  (record_sources) como fonte dessa montagem
+- Em uma nova chamada, o resultado é reaproveitado se a entrada está dentro do TTL e
+  as versões das fontes continuam iguais às gravadas em disco (lidas a cada chamada)
+- Quando uma tabela muda (sincronização, atualização em segundo plano, novo download
+  em outro processo), a entrada é refeita. Os carregadores do Bitrix descartam do
+  st.cache_data os resultados cujo snapshot mudou (ver snapshot_cache.refresh_if_stale),
+  então a nova montagem já recebe os dados atuais
+- As entradas são limitadas (LRU): a menos usada recentemente é descartada
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    from api.snapshot_cache import frame_versions, versions_current
+except ImportError:
+    from snapshot_cache import frame_versions, versions_current
+
+# Validade das entradas (igual ao st.cache_data das consultas) e limite de entradas
+DERIVED_CACHE_TTL = int(os.getenv('DERIVED_CACHE_TTL', 3600))
+DERIVED_CACHE_MAX_ENTRIES = int(os.getenv('DERIVED_CACHE_MAX_ENTRIES', 8))
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+
+# Montagens em andamento: cada uma acumula as versões das fontes carregadas.
+# As consultas rodam em threads do parallel_loader, então o registro é global (e não
+# por thread): uma montagem pode herdar fontes de outra simultânea, o que só torna a
+# validação mais restrita.
+_active_builds = []
+_builds_lock = threading.Lock()
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+
+def record_sources(df):
+    """
+    Registra o DataFrame como fonte das montagens em andamento.
+
+    Deve ser chamada pelos carregadores logo após obter os dados do Bitrix (inclusive
+    quando vêm do st.cache_data, que preserva df.attrs).
+
+    Returns:
+        pandas.DataFrame: O próprio DataFrame (para uso em linha)
+    """
+    versions = frame_versions(df)
+    if versions:
+        with _builds_lock:
+            for build in _active_builds:
+                build.update(versions)
+    return df
+
+
+def _is_valid(entry, ttl):
+    if time.time() - entry['created_at'] > ttl:
+        return False
+    return versions_current(entry['versions'])
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, pd.DataFrame) else value
+
+
+def cached_derived(name, builder, ttl=None):
+    """
+    Devolve o resultado de builder() reaproveitando a última montagem enquanto os
+    snapshots de origem em disco não mudarem.
+
+    Resultados vazios ou sem nenhuma fonte registrada não são guardados (indicam falha
+    no carregamento). DataFrames são devolvidos como cópia, para que as páginas possam
+    alterá-los sem afetar o cache.
+
+    Args:
+        name (str): Nome do conjunto de dados (chave do cache)
+        builder (callable): Função sem argumentos que carrega e processa os dados
+        ttl (int, optional): Validade em segundos (padrão: DERIVED_CACHE_TTL)
+
+    Returns:
+        Resultado de builder()
+    """
+    ttl = DERIVED_CACHE_TTL if ttl is None else ttl
+    with _entries_lock:
+        entry = _entries.get(name)
+        if entry is not None:
+            if _is_valid(entry, ttl):
+                _entries.move_to_end(name)
+                entry['hits'] += 1
+                _stats['hits'] += 1
+                print(f"[INFO] Dados derivados '{name}' reaproveitados (fontes inalteradas)")
+                return _copy(entry['value'])
+            del _entries[name]
+            _stats['invalidations'] += 1
+            print(f"[INFO] Dados derivados '{name}' desatualizados: fontes mudaram ou TTL venceu")
+        _stats['misses'] += 1
+
+    versions = {}
+    with _builds_lock:
+        _active_builds.append(versions)
+    start = time.time()
+    try:
+        value = builder()
+    finally:
+        with _builds_lock:
+            _active_builds.remove(versions)
+    elapsed = time.time() - start
+
+    empty = value is None or (isinstance(value, pd.DataFrame) and value.empty)
+    if empty or not versions:
+        return value
+
+    with _entries_lock:
+        _entries[name] = {
+            'value': value,
+            'versions': dict(versions),
+            'created_at': time.time(),
+            'build_seconds': elapsed,
+            'hits': 0,
+        }
+        _entries.move_to_end(name)
+        while len(_entries) > DERIVED_CACHE_MAX_ENTRIES:
+            evicted, _ = _entries.popitem(last=False)
+            _stats['evictions'] += 1
+            print(f"[INFO] Dados derivados '{evicted}' descartados do cache (limite de {DERIVED_CACHE_MAX_ENTRIES} entradas)")
+    print(f"[INFO] Dados derivados '{name}' montados em {elapsed:.2f}s a partir de {len(versions)} snapshots")
+    return _copy(value)
+
+
+def clear_derived_cache(name=None):
+    """Remove uma entrada (ou todas) do cache de dados derivados."""
+    with _entries_lock:
+        if name is None:
+            _entries.clear()
+        else:
+            _entries.pop(name, None)
+
+
+def get_derived_cache_stats():
+    """
+    Estatísticas do cache de dados derivados.
+
+    Returns:
+        dict: Contadores (hits, misses, invalidations, evictions) e, por entrada,
+            {'rows', 'sources', 'hits', 'age_seconds', 'build_seconds'}
+    """
+    with _entries_lock:
+        now = time.time()
+        entries = {
+            name: {
+                'rows': len(entry['value']) if isinstance(entry['value'], pd.DataFrame) else None,
+                'sources': len(entry['versions']),
+                'hits': entry['hits'],
+                'age_seconds': round(now - entry['created_at'], 1),
+                'build_seconds': round(entry['build_seconds'], 3),
+            }
+            for name, entry in _entries.items()
+        }
+        return {**_stats, 'entries': entries}
@@ -0,0 +1,316 @@
+"""
+Geração dos arquivos de download (CSV/XLSX) das páginas.
+
+Antes, cada download montava o arquivo inteiro em memória (to_csv() + encode, ou um
+BytesIO com o ExcelWriter) a cada execução da página, mesmo quando os dados eram os
+mesmos da execução anterior. Aqui os arquivos são gravados em disco e reaproveitados:
+
+- CSV: as linhas são gravadas em blocos de EXPORT_CHUNK_ROWS direto no arquivo, sem
+  montar o texto completo nem concatenar os DataFrames de entrada
+- XLSX: xlsxwriter em modo constant_memory (cada linha vai para o disco assim que é
+  escrita); as células seguem as mesmas regras do DataFrame.to_excel (vazios, datas,
+  cabeçalho em negrito com borda)
+- Cache por conteúdo: o nome do arquivo é o hash dos dados (colunas, tipos e valores),
+  então repetir um download idêntico não gera o arquivo de novo
+- Os arquivos mais antigos que EXPORT_CACHE_TTL ou além de EXPORT_CACHE_MAX_FILES
+  são removidos a cada nova exportação, exceto os gerados ou reaproveitados nos últimos
+  EXPORT_CLEANUP_GRACE segundos: outra sessão pode ter acabado de receber o caminho e
+  ainda não ter aberto o arquivo no download_export
+"""
+import datetime
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_float_dtype, is_integer_dtype
+
+try:
+    from api.snapshot_cache import _atomic_write
+except ImportError:
+    from snapshot_cache import _atomic_write
+from utils.single_flight import SingleFlight
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+EXPORT_DIR = Path(os.getenv('EXPORT_CACHE_DIR', Path(__file__).parents[1] / '.cache' / 'exports'))
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 20000))
+EXPORT_CACHE_TTL = int(os.getenv('EXPORT_CACHE_TTL', 3600))
+EXPORT_CACHE_MAX_FILES = int(os.getenv('EXPORT_CACHE_MAX_FILES', 30))
+# Arquivos tocados há menos que isso não são removidos (mesmo além do limite de arquivos)
+EXPORT_CLEANUP_GRACE = int(os.getenv('EXPORT_CLEANUP_GRACE', 120))
+
+# Limites de uma planilha do Excel (iguais aos verificados pelo to_excel)
+_EXCEL_MAX_ROWS = 1048576
+_EXCEL_MAX_COLS = 16384
+
+_stats = {'hits': 0, 'misses': 0, 'bytes_written': 0, 'seconds': 0.0}
+_stats_lock = threading.Lock()
+# Sessões pedindo o mesmo arquivo ao mesmo tempo aguardam uma única gravação
+_export_flights = SingleFlight("Exportação")
+
+
+def _as_frames(data):
+    if isinstance(data, pd.DataFrame):
+        return [data]
+    return [df for df in data if df is not None]
+
+
+def _content_hash(kind, sheets, extra=''):
+    """Hash do conteúdo exportado, ou None se algum valor não puder ser hasheado."""
+    digest = hashlib.sha1(f"{kind}\x1e{extra}".encode())
+    try:
+        for name, df in sheets:
+            digest.update(f"\x1e{name}\x1f{list(df.columns)}\x1f{[str(t) for t in df.dtypes]}\x1f{len(df)}".encode())
+            if len(df) and len(df.columns):
+                digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        return None
+    return digest.hexdigest()[:24]
+
+
+def _cached_path(content_hash, suffix):
+    """Arquivo já gerado para o hash (renovando seu prazo), ou None."""
+    if content_hash is None:
+        return None
+    path = EXPORT_DIR / f"{content_hash}{suffix}"
+    try:
+        if time.time() - path.stat().st_mtime <= EXPORT_CACHE_TTL:
+            os.utime(path)
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def _cleanup():
+    """Remove arquivos vencidos e os excedentes (mais antigos primeiro), poupando os recentes."""
+    try:
+        files = sorted((p for p in EXPORT_DIR.iterdir() if p.suffix in ('.csv', '.xlsx')),
+                       key=lambda p: p.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    now = time.time()
+    for i, path in enumerate(files):
+        try:
+            # mtime relido: o arquivo pode ter sido reaproveitado (os.utime) depois da listagem
+            age = now - path.stat().st_mtime
+            if age > EXPORT_CLEANUP_GRACE and (i >= EXPORT_CACHE_MAX_FILES or age > EXPORT_CACHE_TTL):
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _export(kind, suffix, sheets, writer, extra=''):
+    content_hash = _content_hash(kind, sheets, extra)
+    if content_hash is None:
+        return _write_export(kind, suffix, sheets, writer, None)
+    return _export_flights.do(content_hash, lambda: _write_export(kind, suffix, sheets, writer, content_hash), label=kind)
+
+
+def _write_export(kind, suffix, sheets, writer, content_hash):
+    path = _cached_path(content_hash, suffix)
+    if path is not None:
+        with _stats_lock:
+            _stats['hits'] += 1
+        print(f"[INFO] Exportação {kind} reaproveitada ({path.name})")
+        return path
+
+    start = time.time()
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = EXPORT_DIR / f"{content_hash or uuid.uuid4().hex}{suffix}"
+    _atomic_write(path, writer)
+    elapsed = time.time() - start
+    size = path.stat().st_size
+    with _stats_lock:
+        _stats['misses'] += 1
+        _stats['bytes_written'] += size
+        _stats['seconds'] += elapsed
+    rows = sum(len(df) for _, df in sheets)
+    print(f"[INFO] Exportação {kind} gerada: {rows} linhas, {size / 1024:.0f} KB em {elapsed:.2f}s")
+    _cleanup()
+    return path
+
+
+def _datetimes_as_text(df):
+    """
+    Converte as colunas de data para texto olhando a coluna inteira, como o to_csv faz
+    (datas sem hora saem como AAAA-MM-DD); gravada em blocos, a decisão seria por bloco.
+    """
+    positions = [i for i in range(len(df.columns)) if is_datetime64_any_dtype(df.iloc[:, i])]
+    if not positions or len(df) <= EXPORT_CHUNK_ROWS:
+        return df
+    df = df.copy(deep=False)
+    for i in positions:
+        column = df.iloc[:, i]
+        df.isetitem(i, column.astype(str).where(column.notna(), None))
+    return df
+
+
+def export_csv(data, columns=None, encoding='utf-8'):
+    """
+    Grava um ou mais DataFrames em um único CSV (sem índice), em blocos.
+
+    Equivale a pd.concat(frames)[columns].to_csv(index=False).encode(encoding), sem
+    montar o DataFrame concatenado nem o texto completo em memória.
+
+    Args:
+        data (pandas.DataFrame | list): DataFrame ou lista de DataFrames (gravados em sequência)
+        columns (list, optional): Colunas exportadas (padrão: todas, na ordem em que aparecem)
+        encoding (str): Codificação do arquivo (ex: 'utf-8-sig' para o Excel reconhecer acentos)
+
+    Returns:
+        pathlib.Path: Arquivo gerado (ou reaproveitado)
+    """
+    frames = _as_frames(data)
+    if columns is None:
+        columns = list(dict.fromkeys(col for df in frames for col in df.columns))
+    frames = [df if list(df.columns) == list(columns) else df.reindex(columns=columns) for df in frames]
+
+    def write(path):
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            header = True
+            for df in map(_datetimes_as_text, frames):
+                for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                    df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(f, index=False, header=header)
+                    header = False
+            if header:
+                pd.DataFrame(columns=columns).to_csv(f, index=False)
+
+    return _export('csv', '.csv', [(str(i), df) for i, df in enumerate(frames)], write, extra=encoding)
+
+
+def _cell_values(series):
+    """Valores de uma coluna prontos para o xlsxwriter, com as regras do to_excel."""
+    if is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        return [None if v is pd.NaT else v.to_pydatetime() for v in series]
+    if is_bool_dtype(series) and not series.hasnans:
+        return series.astype(bool).tolist()
+    if is_integer_dtype(series) and not series.hasnans:
+        return series.astype('int64').tolist()
+    if is_float_dtype(series):
+        values = series.astype('float64').to_numpy()
+        out = values.astype(object)
+        out[np.isnan(values)] = None
+        out[np.isposinf(values)] = 'inf'
+        out[np.isneginf(values)] = '-inf'
+        return out.tolist()
+    return [_cell_value(v) for v in series.tolist()]
+
+
+def _cell_value(value):
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return 'inf' if value == np.inf else '-inf' if value == -np.inf else float(value)
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, (datetime.date, datetime.timedelta)):
+        return value
+    return value if isinstance(value, str) else str(value)
+
+
+def export_xlsx(sheets):
+    """
+    Grava as planilhas em um arquivo XLSX com o xlsxwriter em modo constant_memory.
+
+    Args:
+        sheets (dict): {nome da planilha: DataFrame}, na ordem das abas
+
+    Returns:
+        pathlib.Path: Arquivo gerado (ou reaproveitado)
+
+    Raises:
+        ImportError: Se o xlsxwriter não estiver instalado
+        ValueError: Se alguma planilha exceder os limites de linhas/colunas do Excel
+    """
+    if not XLSXWRITER_AVAILABLE:
+        raise ImportError("xlsxwriter não está instalado (ver requirements.txt)")
+    items = [(str(name), df) for name, df in sheets.items() if df is not None]
+    for name, df in items:
+        if len(df) + 1 > _EXCEL_MAX_ROWS or len(df.columns) > _EXCEL_MAX_COLS:
+            raise ValueError(f"Planilha '{name}' ({df.shape}) excede o tamanho máximo do Excel")
+
+    def write(path):
+        workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True})
+        try:
+            header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+            datetime_format = workbook.add_format({'num_format': 'YYYY-MM-DD HH:MM:SS'})
+            date_format = workbook.add_format({'num_format': 'YYYY-MM-DD'})
+            timedelta_format = workbook.add_format({'num_format': '0'})
+            for name, df in items:
+                worksheet = workbook.add_worksheet(name)
+                for col, header in enumerate(df.columns):
+                    worksheet.write(0, col, str(header), header_format)
+                row = 1
+                # Linhas escritas em ordem, bloco a bloco (exigência do constant_memory)
+                for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                    chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+                    for values in zip(*(_cell_values(chunk.iloc[:, i]) for i in range(len(chunk.columns)))):
+                        for col, value in enumerate(values):
+                            if value is None:
+                                continue
+                            if isinstance(value, datetime.datetime):
+                                worksheet.write_datetime(row, col, value, datetime_format)
+                            elif isinstance(value, datetime.date):
+                                worksheet.write_datetime(row, col, value, date_format)
+                            elif isinstance(value, datetime.timedelta):
+                                worksheet.write_number(row, col, value.total_seconds() / 86400, timedelta_format)
+                            else:
+                                worksheet.write(row, col, value)
+                        row += 1
+        finally:
+            workbook.close()
+
+    return _export('xlsx', '.xlsx', items, write)
+
+
+def download_export(label, path, file_name, mime, **kwargs):
+    """
+    st.download_button para um arquivo gerado por export_csv/export_xlsx.
+
+    O arquivo precisa ser aberto logo após export_csv/export_xlsx (na mesma execução):
+    a limpeza só poupa arquivos tocados nos últimos EXPORT_CLEANUP_GRACE segundos.
+
+    Args:
+        label (str): Texto do botão
+        path (pathlib.Path): Arquivo exportado
+        file_name (str): Nome sugerido para o download
+        mime (str): Tipo MIME
+        **kwargs: Demais argumentos do st.download_button (key, help, use_container_width...)
+
+    Returns:
+        bool: Se o botão foi clicado
+    """
+    import streamlit as st
+    with open(path, 'rb') as f:
+        return st.download_button(label=label, data=f, file_name=file_name, mime=mime, **kwargs)
+
+
+def get_export_cache_stats():
+    """
+    Estatísticas das exportações neste processo.
+
+    Returns:
+        dict: {'hits', 'misses', 'bytes_written', 'seconds', 'hit_rate'}
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / total if total else 0.0
+    stats['seconds'] = round(stats['seconds'], 3)
+    return stats
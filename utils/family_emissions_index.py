@@ -0,0 +1,62 @@
+"""
+Índice das emissões (certidões) por família (Ficha da Família).
+
+Antes, abrir a ficha de uma família convertia a coluna de ligação de todo o DataFrame de
+emissões para texto, filtrava as linhas da família e recalculava os nomes dos estágios.
+Aqui as emissões já preparadas (estágios legíveis, categorias do resumo) são agrupadas
+uma vez por versão dos dados, e a ficha só faz uma consulta no dicionário:
+
+- ID da família (como texto, igual ao filtro anterior) -> posições das linhas
+- As linhas de cada família mantêm a ordem original do DataFrame
+"""
+import numpy as np
+import pandas as pd
+
+
+class FamilyEmissionsIndex:
+    """
+    Emissões agrupadas pelo ID da família.
+
+    Args:
+        df (pandas.DataFrame): Emissões já preparadas (uma linha por certidão)
+        coluna_familia (str): Coluna com o ID da família de cada emissão
+    """
+
+    def __init__(self, df, coluna_familia):
+        self.df = df
+        self.coluna_familia = coluna_familia
+        self.linhas_por_familia = {}
+        if coluna_familia in df.columns and len(df):
+            ids = df[coluna_familia].astype(str)
+            self.linhas_por_familia = ids.groupby(ids, sort=False).indices
+
+    def __len__(self):
+        return len(self.linhas_por_familia)
+
+    def emissoes_da_familia(self, id_familia):
+        """
+        Emissões da família, na ordem original.
+
+        Returns:
+            pandas.DataFrame: Cópia das linhas da família (vazia, com as mesmas colunas, se não houver)
+        """
+        linhas = self.linhas_por_familia.get(str(id_familia))
+        if linhas is None:
+            return self.df.iloc[0:0].copy()
+        return self.df.iloc[np.sort(linhas)].copy()
+
+    def amostra_ids(self, n=20):
+        """Alguns IDs de família presentes (para mensagens de diagnóstico)."""
+        return list(self.linhas_por_familia)[:n]
+
+
+def build_family_emissions_index(df, coluna_familia):
+    """
+    Constrói o índice e registra o tamanho no log.
+
+    Returns:
+        FamilyEmissionsIndex: Índice pronto para consulta
+    """
+    index = FamilyEmissionsIndex(df if df is not None else pd.DataFrame(), coluna_familia)
+    print(f"[INFO] Índice de emissões por família criado: {len(index)} famílias, {len(index.df)} emissões")
+    return index
@@ -0,0 +1,231 @@
+"""
+Índice de busca de famílias (Ficha da Família).
+
+Construído uma vez por versão dos dados de negócio (cat 46) e reaproveitado entre as
+interações, no lugar de um str.contains sobre todas as linhas a cada tecla:
+
+- Nomes normalizados: sem acentos (unidecode), minúsculos e só com letras/dígitos
+  separados por espaço ("Famiglia D'Àvila" -> "famiglia d avila")
+- Trigramas -> nomes: uma busca com 3+ caracteres percorre só os nomes do trigrama
+  mais raro do termo, conferindo a substring, e para ao completar o limite
+- Palavras ordenadas: buscas com 1-2 caracteres procuram nomes com alguma palavra
+  começando pelo termo (busca binária)
+- ID da família -> linha: digitar o ID (UF_CRM_1722605592778) encontra a família direto
+- Ordem dos resultados: nome igual ao termo primeiro, depois a ordem original das
+  linhas (como o head(10) de antes). Sem resultados, uma busca fuzzy opcional
+  (rapidfuzz) sugere os nomes mais parecidos entre os que compartilham trigramas
+
+Os nomes únicos são numerados na ordem da primeira linha em que aparecem, então as
+listas de nomes por trigrama/palavra já estão na ordem de exibição.
+"""
+import bisect
+import hashlib
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+try:
+    from api.snapshot_cache import VERSIONS_ATTR
+except ImportError:
+    from snapshot_cache import VERSIONS_ATTR
+
+try:
+    from rapidfuzz import fuzz as rfuzz, process as rprocess
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Pontuação mínima da busca fuzzy (0-100) e nomes candidatos pontuados
+FUZZY_CUTOFF = 80
+FUZZY_CANDIDATES = 200
+
+# Quantidade de índices mantidos em memória (versões diferentes dos dados)
+MAX_INDICES = 2
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def normalizar_nome(texto):
+    """Nome sem acentos, minúsculo, com apenas letras/dígitos separados por um espaço."""
+    if texto is None or (isinstance(texto, float) and np.isnan(texto)):
+        return ''
+    return _NON_ALNUM.sub(' ', unidecode(str(texto)).lower()).strip()
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class FamilySearchIndex:
+    """
+    Índice de nomes e IDs de família de um DataFrame de negócios.
+
+    As buscas devolvem posições de linha (para df.iloc) do DataFrame usado na construção.
+    """
+
+    def __init__(self, df, coluna_nome, coluna_id, fingerprint=None):
+        self.fingerprint = fingerprint
+        nomes_norm = [normalizar_nome(v) for v in df[coluna_nome].tolist()] if coluna_nome in df.columns else []
+
+        # Nomes únicos normalizados (na ordem da primeira linha) e as linhas de cada um
+        codigos, nomes = pd.factorize(pd.Series(nomes_norm, dtype=object), sort=False)
+        self.nomes = list(nomes)
+        self.id_por_nome = {nome: i for i, nome in enumerate(self.nomes)}
+        ordem = np.argsort(codigos, kind='stable')
+        limites = np.flatnonzero(np.diff(codigos[ordem])) + 1
+        self.linhas_por_nome = [grupo.tolist() for grupo in np.split(ordem, limites)] if len(ordem) else []
+
+        trigramas = defaultdict(list)
+        palavras = defaultdict(list)
+        for i, nome in enumerate(self.nomes):
+            if not nome:
+                continue
+            for trigrama in _trigramas(nome):
+                trigramas[trigrama].append(i)
+            for palavra in set(nome.split(' ')):
+                palavras[palavra].append(i)
+        # Listas crescentes de IDs de nome (ordem de exibição)
+        self.trigramas = {t: np.array(ids, dtype=np.int32) for t, ids in trigramas.items()}
+        self.palavras = sorted(palavras)
+        self.nomes_por_palavra = [palavras[p] for p in self.palavras]
+
+        # ID da família -> primeira linha
+        self.linha_por_id = {}
+        if coluna_id in df.columns:
+            ids = df[coluna_id].astype(str).str.strip()
+            primeiras = ~ids.duplicated(keep='first') & ~ids.isin(['', 'nan', 'None'])
+            self.linha_por_id = dict(zip(ids[primeiras], np.flatnonzero(primeiras.to_numpy()).tolist()))
+
+    def _nomes_com_prefixo(self, prefixo, limite):
+        """Primeiros nomes (na ordem de exibição) com alguma palavra começando por prefixo."""
+        inicio = bisect.bisect_left(self.palavras, prefixo)
+        fim = bisect.bisect_left(self.palavras, prefixo + '\uffff', lo=inicio)
+        encontrados = []
+        for i in heapq.merge(*self.nomes_por_palavra[inicio:fim]):
+            if not encontrados or encontrados[-1] != i:
+                encontrados.append(i)
+                if len(encontrados) >= limite:
+                    break
+        return encontrados
+
+    def _nomes_contendo(self, termo, limite=None):
+        """
+        Nomes que contêm o termo, na ordem de exibição: percorre a lista do trigrama
+        mais raro do termo e confere a substring em cada nome.
+        """
+        postings = [self.trigramas.get(t) for t in _trigramas(termo)]
+        if not postings or any(p is None for p in postings):
+            return []
+        encontrados = []
+        for i in min(postings, key=len).tolist():
+            if termo in self.nomes[i]:
+                encontrados.append(i)
+                if limite is not None and len(encontrados) >= limite:
+                    break
+        return encontrados
+
+    def _nomes_parecidos(self, termo, limite):
+        """Nomes mais parecidos com o termo (rapidfuzz) entre os que mais compartilham trigramas."""
+        postings = [self.trigramas[t] for t in _trigramas(termo) if t in self.trigramas]
+        if not postings:
+            return []
+        contagem = np.bincount(np.concatenate(postings), minlength=len(self.nomes))
+        n_candidatos = min(FUZZY_CANDIDATES, int(np.count_nonzero(contagem)))
+        candidatos = np.argpartition(-contagem, n_candidatos - 1)[:n_candidatos]
+        escolhas = {int(i): self.nomes[i] for i in candidatos}
+        sugestoes = rprocess.extract(termo, escolhas, scorer=rfuzz.partial_ratio, score_cutoff=FUZZY_CUTOFF, limit=limite)
+        return [i for _, _, i in sugestoes]
+
+    def buscar(self, termo, limite=10, fuzzy=True):
+        """
+        Busca famílias pelo nome (ou pelo ID da família).
+
+        Args:
+            termo (str): Texto digitado (acentos e maiúsculas são ignorados)
+            limite (int): Máximo de linhas devolvidas
+            fuzzy (bool): Se deve sugerir nomes parecidos quando nada contém o termo
+
+        Returns:
+            list: Posições das linhas encontradas, da mais relevante para a menos
+        """
+        linha_id = self.linha_da_familia(termo) if termo else None
+        termo = normalizar_nome(termo)
+        if not termo:
+            return []
+
+        exato = self.id_por_nome.get(termo)
+        nomes = [exato] if exato is not None else []
+        if len(termo) < 3:
+            nomes += self._nomes_com_prefixo(termo, limite + 1)
+        else:
+            nomes += self._nomes_contendo(termo, limite + 1)
+        if len(nomes) == 0 and linha_id is None and fuzzy and RAPIDFUZZ_AVAILABLE and len(termo) >= 3:
+            nomes = self._nomes_parecidos(termo, limite)
+
+        linhas = [linha_id] if linha_id is not None else []
+        vistos = set()
+        for i in nomes:
+            if len(linhas) >= limite:
+                break
+            if i in vistos:
+                continue
+            vistos.add(i)
+            linhas.extend(r for r in self.linhas_por_nome[i][:limite - len(linhas)] if r != linha_id)
+        return linhas[:limite]
+
+    def linha_da_familia(self, id_familia):
+        """Posição da primeira linha do ID de família (None se não existir)."""
+        return self.linha_por_id.get(str(id_familia).strip())
+
+
+def _fingerprint(df, coluna_nome, coluna_id):
+    """
+    Identifica os dados do índice.
+
+    Com as versões dos snapshots de origem em df.attrs (DataFrames de load_merged_data),
+    a identificação não depende do tamanho da base: versões, colunas, quantidade de
+    linhas e os IDs da primeira e da última linha (o mesmo snapshot de crm_deal atende
+    categorias diferentes). Sem versões, o conteúdo das colunas de nome e ID é hasheado.
+    """
+    versions = df.attrs.get(VERSIONS_ATTR)
+    if versions:
+        ids = df[coluna_id] if coluna_id in df.columns else pd.Series(dtype=object)
+        extremos = (str(ids.iloc[0]), str(ids.iloc[-1])) if len(ids) else ()
+        chave = (sorted(versions.items()), coluna_nome, coluna_id, len(df), extremos)
+        return 'v-' + hashlib.sha1(repr(chave).encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+    digest = hashlib.sha1(str(len(df)).encode())
+    for col in (coluna_nome, coluna_id):
+        if col in df.columns:
+            digest.update(b'\x1e' + '\x1f'.join(map(str, df[col].tolist())).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()[:16]
+
+
+def get_family_search_index(df, coluna_nome, coluna_id):
+    """
+    Retorna o índice de busca para o DataFrame (construído na primeira chamada).
+
+    O índice é construído uma vez por versão dos dados de origem (ver _fingerprint) e
+    reaproveitado nas interações seguintes sem percorrer as colunas.
+
+    Returns:
+        FamilySearchIndex: Índice pronto para consulta
+    """
+    fingerprint = _fingerprint(df, coluna_nome, coluna_id)
+    with _indices_lock:
+        index = _indices.get(fingerprint)
+        if index is None:
+            index = FamilySearchIndex(df, coluna_nome, coluna_id, fingerprint)
+            _indices[fingerprint] = index
+            while len(_indices) > MAX_INDICES:
+                _indices.pop(next(iter(_indices)))
+            print(f"[INFO] Índice de busca de famílias criado: {len(index.nomes)} nomes, "
+                  f"{len(index.trigramas)} trigramas, {len(index.linha_por_id)} IDs")
+    return index
@@ -0,0 +1,303 @@
+"""
+Índice de geocodificação dos comuni italianos.
+
+Construído uma vez a partir do DataFrame de coordenadas já normalizado (colunas
+COMUNE_MAPA_NORM, PROVINCIA_MAPA_NORM, latitude, longitude) e reaproveitado entre
+recarregamentos da página:
+
+- Dicionários nome -> coordenadas (comune, comune+província e província), no lugar
+  de filtros booleanos sobre o DataFrame para cada linha
+- Buckets por prefixo e por palavra para os matches de início do nome e de token
+- Matching fuzzy em lote com rapidfuzz.process.cdist: todos os nomes únicos ainda
+  sem coordenadas contra os ~7.900 comuni de uma vez (multi-thread, em C++)
+- Tabela de matches persistida em disco (.cache/geocoding), então nomes já resolvidos
+  não são pontuados de novo após reiniciar o servidor
+
+As regras de decisão (ordem dos scorers, limiares e desempates) reproduzem as das
+chamadas process.extractOne do thefuzz usadas antes nos data_loaders.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz import fuzz as rfuzz
+    from rapidfuzz.process import cdist
+    from rapidfuzz.utils import default_process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:  # thefuzz depende do rapidfuzz, mas mantemos o fallback
+    RAPIDFUZZ_AVAILABLE = False
+
+NAO_ESPECIFICADO = 'nao especificado'
+
+# Diretório da tabela de matches persistida
+MATCH_CACHE_DIR = Path(os.getenv('GEOCODING_CACHE_DIR', Path(__file__).parents[1] / '.cache' / 'geocoding'))
+
+# Incrementar quando as regras de matching mudarem (invalida as tabelas persistidas)
+MATCH_RULES_VERSION = 1
+
+# Scorers na ordem em que eram tentados: (nome do método, função do rapidfuzz)
+_SCORERS = {
+    'TokenSort': 'token_sort_ratio',
+    'TokenSet': 'token_set_ratio',
+    'Partial': 'partial_ratio',
+    'Standard': 'ratio',
+}
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def _first_coords(df, key_columns):
+    """Mapa chave -> (lat, lon) mantendo a primeira ocorrência (como .iloc[0] de um filtro)."""
+    dedup = df.drop_duplicates(subset=key_columns, keep='first')
+    keys = dedup[key_columns[0]] if len(key_columns) == 1 else zip(*(dedup[c] for c in key_columns))
+    return dict(zip(keys, zip(dedup['latitude'].tolist(), dedup['longitude'].tolist())))
+
+
+class GeocodingIndex:
+    """Estruturas de busca sobre a tabela de coordenadas normalizada."""
+
+    def __init__(self, df_coordenadas, fingerprint):
+        self.fingerprint = fingerprint
+        comunes = df_coordenadas['COMUNE_MAPA_NORM'].unique().tolist()
+        self.comunes = [c for c in comunes if c != NAO_ESPECIFICADO]
+        provincias = df_coordenadas['PROVINCIA_MAPA_NORM'].unique().tolist()
+        self.provincias = [p for p in provincias if p != NAO_ESPECIFICADO]
+
+        self.comune_coords = _first_coords(df_coordenadas, ['COMUNE_MAPA_NORM'])
+        self.comune_provincia_coords = _first_coords(df_coordenadas, ['COMUNE_MAPA_NORM', 'PROVINCIA_MAPA_NORM'])
+        self.provincia_coords = _first_coords(df_coordenadas, ['PROVINCIA_MAPA_NORM'])
+
+        # Buckets: primeiros 3 caracteres -> comuni (na ordem original) e palavra -> comuni
+        self._prefix_buckets = defaultdict(list)
+        self._token_buckets = defaultdict(list)
+        for comune in self.comunes:
+            self._prefix_buckets[comune[:3]].append(comune)
+            for token in dict.fromkeys(comune.split()):
+                self._token_buckets[token].append(comune)
+
+        self._processed_comunes = [default_process(c) for c in self.comunes] if RAPIDFUZZ_AVAILABLE else None
+        self._processed_provincias = [default_process(p) for p in self.provincias] if RAPIDFUZZ_AVAILABLE else None
+
+        self._matches_lock = threading.Lock()
+        self._matches = self._load_matches()
+        self._dirty = False
+
+    # --- Consultas diretas ---
+
+    def prefix_match(self, prefix):
+        """Comune mais curto que começa com o prefixo (primeiro na ordem original em caso de empate)."""
+        if len(prefix) >= 3:
+            candidates = [c for c in self._prefix_buckets.get(prefix[:3], ()) if c.startswith(prefix)]
+        else:
+            candidates = [c for c in self.comunes if c.startswith(prefix)]
+        return min(candidates, key=len) if candidates else None
+
+    def token_match(self, token):
+        """Primeiro comune (na ordem original) que contém a palavra."""
+        candidates = self._token_buckets.get(token)
+        return candidates[0] if candidates else None
+
+    # --- Matching fuzzy em lote ---
+
+    def _score_matrix(self, queries, method, choices, cutoff):
+        """
+        Melhor escolha e pontuação de cada consulta para um scorer.
+
+        Mesmo resultado de process.extractOne do thefuzz: maior pontuação (float) acima
+        do corte, primeira escolha em caso de empate, pontuação arredondada.
+        """
+        scores = cdist(
+            [default_process(q) for q in queries], choices,
+            scorer=getattr(rfuzz, _SCORERS[method]),
+            processor=None, score_cutoff=cutoff, dtype=np.float64, workers=-1
+        )
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(queries)), best]
+        return best, best_scores
+
+    def _best_matches(self, queries, method, cutoff, choices, processed_choices):
+        """
+        Pontua as consultas com um scorer.
+
+        Returns:
+            list: (escolha, pontuação arredondada) ou None para cada consulta
+        """
+        if not queries:
+            return []
+        best, best_scores = self._score_matrix(queries, method, processed_choices, cutoff)
+        return [
+            (choices[i], int(round(score))) if score >= cutoff and score > 0 else None
+            for i, score in zip(best.tolist(), best_scores.tolist())
+        ]
+
+    def fuzzy_match_comunes(self, queries, strategy):
+        """
+        Resolve em lote os nomes de comune sem coordenadas.
+
+        Estratégias (as mesmas regras que cada data_loader aplicava linha a linha):
+        - 'melhor': tenta TokenSort, TokenSet, Partial (>= 80) e Standard (>= 75) e fica
+          com a maior pontuação; para ao achar TokenSort/TokenSet >= 85 (comune_new)
+        - 'primeiro': aceita o primeiro scorer que passar do corte, depois prefixo do nome
+          inteiro e, por fim, palavra em comum (comune)
+
+        Cada scorer é calculado em uma única chamada a cdist, apenas para as consultas
+        que as etapas anteriores ainda não decidiram.
+
+        Args:
+            queries (iterable): Nomes normalizados (podem repetir)
+            strategy (str): 'melhor' ou 'primeiro'
+
+        Returns:
+            dict: {nome: (comune, pontuação, método)} apenas para os nomes resolvidos
+        """
+        if strategy not in ('melhor', 'primeiro'):
+            raise ValueError(f"Estratégia de matching desconhecida: {strategy}")
+        unique_queries = list(dict.fromkeys(q for q in queries if isinstance(q, str)))
+        cache = self._matches.setdefault(strategy, {})
+        pending = [q for q in unique_queries if q not in cache]
+
+        if pending and RAPIDFUZZ_AVAILABLE and self.comunes:
+            if strategy == 'melhor':
+                decided = self._match_melhor(pending)
+            else:
+                decided = self._match_primeiro(pending)
+            with self._matches_lock:
+                cache.update(decided)
+                self._dirty = True
+            self.save_matches()
+
+        return {q: tuple(cache[q]) for q in unique_queries if cache.get(q)}
+
+    def _match_melhor(self, pending):
+        results = {q: None for q in pending}
+        best_score = dict.fromkeys(pending, 0)
+        open_queries = [q for q in pending if q != NAO_ESPECIFICADO and len(q) >= 3]
+        for method, cutoff in (('TokenSort', 80), ('TokenSet', 80), ('Partial', 80), ('Standard', 75)):
+            still_open = []
+            for query, candidate in zip(open_queries, self._best_matches(
+                    open_queries, method, cutoff, self.comunes, self._processed_comunes)):
+                if candidate and candidate[1] > best_score[query]:
+                    results[query] = [candidate[0], candidate[1], method]
+                    best_score[query] = candidate[1]
+                    if method in ('TokenSet', 'TokenSort') and candidate[1] >= 85:
+                        continue  # Confiança alta, parar busca
+                still_open.append(query)
+            open_queries = still_open
+        return results
+
+    def _match_primeiro(self, pending):
+        results = {q: None for q in pending}
+        open_queries = [q for q in pending if q != NAO_ESPECIFICADO]
+        for method, cutoff in (('TokenSort', 80), ('TokenSet', 80), ('Partial', 80), ('Standard', 75)):
+            if method == 'Standard':
+                open_queries = [q for q in open_queries if len(q) > 3]  # Evitar nomes muito curtos
+            still_open = []
+            for query, candidate in zip(open_queries, self._best_matches(
+                    open_queries, method, cutoff, self.comunes, self._processed_comunes)):
+                if candidate:
+                    results[query] = [candidate[0], candidate[1], method]
+                else:
+                    still_open.append(query)
+            open_queries = still_open
+
+        # Nome do Bitrix é apenas o início do nome real
+        for query in open_queries:
+            if len(query) >= 5:
+                prefix = self.prefix_match(query)
+                if prefix:
+                    results[query] = [prefix, 90, 'PrefixMatch']
+
+        # Último recurso: alguma palavra (>= 4 letras) em comum
+        for query in pending:
+            if results[query] or query == NAO_ESPECIFICADO or len(query) < 4:
+                continue
+            tokens = query.split()
+            if len(tokens) > 1:
+                for token in tokens:
+                    if len(token) >= 4:
+                        match = self.token_match(token)
+                        if match:
+                            results[query] = [match, 70, 'TokenPartialMatch']
+                            break
+        return results
+
+    def fuzzy_match_provincias(self, queries, cutoff=75):
+        """
+        Match fuzzy (token_set_ratio) das províncias em lote.
+
+        Returns:
+            dict: {província: (província do índice, pontuação)} apenas para as resolvidas
+        """
+        unique_queries = list(dict.fromkeys(q for q in queries if isinstance(q, str)))
+        if not unique_queries or not RAPIDFUZZ_AVAILABLE or not self.provincias:
+            return {}
+        candidates = self._best_matches(unique_queries, 'TokenSet', cutoff, self.provincias, self._processed_provincias)
+        return {q: c for q, c in zip(unique_queries, candidates) if c}
+
+    # --- Persistência da tabela de matches ---
+
+    def _matches_path(self):
+        return MATCH_CACHE_DIR / f"fuzzy_matches_{self.fingerprint}.json"
+
+    def _load_matches(self):
+        try:
+            with open(self._matches_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MATCH_RULES_VERSION:
+                return data.get('matches', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save_matches(self):
+        """Grava a tabela de matches (escrita atômica) se houver novidades."""
+        with self._matches_lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({'version': MATCH_RULES_VERSION, 'matches': self._matches}, ensure_ascii=False)
+            self._dirty = False
+        path = self._matches_path()
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            MATCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(payload, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARN] Não foi possível gravar a tabela de matches de geocodificação: {e}")
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+
+def get_geocoding_index(df_coordenadas):
+    """
+    Retorna o índice para a tabela de coordenadas (construído na primeira chamada).
+
+    O índice é identificado pelo conteúdo da tabela, então cada fonte de coordenadas
+    (comuni-italiani-main/dati ou Mapa/mapa_italia.json) tem o seu.
+
+    Args:
+        df_coordenadas (pandas.DataFrame): COMUNE_MAPA_NORM, PROVINCIA_MAPA_NORM, latitude, longitude
+
+    Returns:
+        GeocodingIndex: Índice pronto para consulta
+    """
+    cols = ['COMUNE_MAPA_NORM', 'PROVINCIA_MAPA_NORM', 'latitude', 'longitude']
+    content_hash = pd.util.hash_pandas_object(df_coordenadas[cols], index=False).values
+    fingerprint = hashlib.sha1(content_hash.tobytes()).hexdigest()[:16]
+    with _indices_lock:
+        index = _indices.get(fingerprint)
+        if index is None:
+            index = GeocodingIndex(df_coordenadas, fingerprint)
+            _indices[fingerprint] = index
+            print(f"[INFO] Índice de geocodificação criado: {len(index.comunes)} comuni, "
+                  f"{len(index.provincias)} províncias, {sum(len(m) for m in index._matches.values())} matches persistidos")
+    return index
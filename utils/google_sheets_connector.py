@@ -1,6 +1,36 @@
+"""
+Acesso ao Google Sheets.
+
+Um único cliente autorizado (get_google_sheets_client) é reaproveitado por todas as
+páginas, e o conteúdo das abas fica em cache junto com a data de modificação da
+planilha (modifiedTime do Drive):
+
+- Antes de baixar, uma consulta leve aos metadados do Drive diz se a planilha mudou;
+  sem mudança, os valores (e os DataFrames/registros já montados) são reaproveitados
+- Com mudança, os intervalos pedidos são baixados em uma chamada values_batch_get
+- Por SHEETS_CHECK_INTERVAL segundos nem os metadados são consultados de novo
+- Se os metadados não puderem ser lidos, vale o TTL antigo (SHEETS_MAX_AGE)
+"""
+import os
+import threading
+import time
+
+import pandas as pd
 import streamlit as st
 import gspread
+from gspread.utils import absolute_range_name, extract_id_from_url, fill_gaps, numericise_all
 from utils.secrets_helper import get_google_credentials
+from utils.single_flight import SingleFlight
+
+# Intervalo entre consultas aos metadados de uma mesma planilha (segundos)
+SHEETS_CHECK_INTERVAL = int(os.getenv('SHEETS_CHECK_INTERVAL', 30))
+# Validade do cache quando a data de modificação não está disponível
+SHEETS_MAX_AGE = int(os.getenv('SHEETS_MAX_AGE', 300))
+
+_sheets_cache = {}
+_sheets_lock = threading.Lock()
+_sheets_flights = SingleFlight("Google Sheets")
+_sheets_stats = {'checks': 0, 'downloads': 0, 'reused': 0}
 
 @st.cache_resource(ttl=3600)
 def get_google_sheets_client():
@@ -18,27 +48,153 @@ def get_google_sheets_client():
         print(f"[ERROR] Falha em get_google_sheets_client: {type(e).__name__} - {e}")
         return None
 
-@st.cache_data(ttl=300)
+def _spreadsheet_key(spreadsheet):
+    """Aceita a URL ou a chave da planilha."""
+    return extract_id_from_url(spreadsheet) if str(spreadsheet).startswith('http') else spreadsheet
+
+def _modified_time(client, key):
+    """Data de modificação da planilha pelo Drive (None se não for possível consultar)."""
+    try:
+        return client.get_file_drive_metadata(key).get('modifiedTime')
+    except Exception as e:
+        print(f"[WARN] Não foi possível consultar a data de modificação da planilha {key}: {e}")
+        return None
+
+def _download_values(client, key, worksheet, ranges):
+    """Baixa os intervalos da aba (índice ou nome) em uma única chamada values_batch_get."""
+    spreadsheet = client.open_by_key(key)
+    sheet = spreadsheet.get_worksheet(worksheet) if isinstance(worksheet, int) else spreadsheet.worksheet(worksheet)
+    if sheet is None:
+        raise gspread.exceptions.WorksheetNotFound(f"índice {worksheet}")
+    nomes = [absolute_range_name(sheet.title, r) for r in ranges] if ranges else [absolute_range_name(sheet.title)]
+    resposta = spreadsheet.values_batch_get(nomes)
+    # Linhas completadas com '' até a largura da maior linha, como no get_all_values
+    return [fill_gaps(intervalo.get('values', [])) for intervalo in resposta.get('valueRanges', [])]
+
+def _get_entry(spreadsheet, worksheet=0, ranges=None, client=None):
+    """Entrada do cache da aba, baixando os valores só se a planilha mudou."""
+    client = client or get_google_sheets_client()
+    if client is None:
+        return None
+    key = _spreadsheet_key(spreadsheet)
+    ranges = tuple(ranges) if ranges else None
+    cache_key = (key, worksheet, ranges)
+    agora = time.time()
+
+    with _sheets_lock:
+        entry = _sheets_cache.get(cache_key)
+    if entry is not None and agora - entry['checked_at'] < SHEETS_CHECK_INTERVAL:
+        _sheets_stats['reused'] += 1
+        return entry
+
+    _sheets_stats['checks'] += 1
+    modified = _modified_time(client, key)
+    if entry is not None:
+        inalterada = entry['modified'] == modified if modified is not None else agora - entry['fetched_at'] < SHEETS_MAX_AGE
+        if inalterada:
+            entry['checked_at'] = agora
+            _sheets_stats['reused'] += 1
+            return entry
+
+    label = f"{key}:{worksheet}"
+    values = _sheets_flights.do(cache_key, lambda: _download_values(client, key, worksheet, ranges), label=label)
+    _sheets_stats['downloads'] += 1
+    entry = {'modified': modified, 'values': values, 'checked_at': agora, 'fetched_at': agora, 'derived': {}}
+    with _sheets_lock:
+        _sheets_cache[cache_key] = entry
+    print(f"[INFO] Planilha {label} baixada ({sum(len(v) for v in values)} linhas, modificada em {modified})")
+    return entry
+
+def _derived(entry, name, builder):
+    """Resultado montado a partir dos valores da entrada, refeito só quando a planilha muda."""
+    if name not in entry['derived']:
+        entry['derived'][name] = builder(entry['values'])
+    return entry['derived'][name]
+
+def get_sheet_values(spreadsheet, worksheet=0, ranges=None, client=None):
+    """
+    Valores de uma aba, como no get_all_values, com o cache por data de modificação.
+
+    Args:
+        spreadsheet (str): URL ou chave da planilha
+        worksheet (int | str): Índice (0 = primeira aba) ou nome da aba
+        ranges (list, optional): Intervalos A1 da aba (ex: ['A1:C', 'F:F']); padrão: a aba inteira
+        client (gspread.Client, optional): Cliente a usar (padrão: get_google_sheets_client())
+
+    Returns:
+        list: Lista de linhas (ou, com ranges, uma lista de linhas por intervalo);
+            None se não houver cliente
+    """
+    entry = _get_entry(spreadsheet, worksheet, ranges, client)
+    if entry is None:
+        return None
+    values = entry['values'] if ranges else entry['values'][0]
+    return [[list(linha) for linha in intervalo] for intervalo in values] if ranges else [list(linha) for linha in values]
+
+def get_sheet_dataframe(spreadsheet, worksheet=0, skip_rows=0, header=True, drop_empty_rows=False, client=None):
+    """
+    DataFrame de uma aba montado direto da matriz de valores (sem passar por registros).
+
+    Args:
+        skip_rows (int): Linhas ignoradas no topo da aba
+        header (bool): Se a primeira linha (após skip_rows) tem os nomes das colunas;
+            sem cabeçalho, as colunas são numeradas a partir de 0
+        drop_empty_rows (bool): Se descarta as linhas totalmente vazias
+
+    Returns:
+        pandas.DataFrame: Cópia do DataFrame em cache (None se não houver cliente)
+    """
+    def montar(values):
+        linhas = values[0][skip_rows:]
+        colunas = None
+        if header and linhas:
+            colunas, linhas = linhas[0], linhas[1:]
+        if drop_empty_rows:
+            linhas = [linha for linha in linhas if any(linha)]
+        return pd.DataFrame(linhas, columns=colunas)
+
+    entry = _get_entry(spreadsheet, worksheet, None, client)
+    if entry is None:
+        return None
+    return _derived(entry, ('dataframe', skip_rows, header, drop_empty_rows), montar).copy()
+
+def get_sheets_cache_stats():
+    """
+    Estatísticas do cache de planilhas.
+
+    Returns:
+        dict: {'checks', 'downloads', 'reused', 'sheets'} - consultas de metadados, downloads,
+            leituras atendidas pelo cache e abas em cache
+    """
+    with _sheets_lock:
+        return {**_sheets_stats, 'sheets': len(_sheets_cache)}
+
 def fetch_data_from_sheet(_client, spreadsheet_url, sheet_name):
     """Busca dados de uma planilha específica, tentando pelo GID 0 primeiro."""
     if not _client:
         print("[WARN] fetch_data_from_sheet chamado sem um cliente gspread válido.")
         return None
     try:
-        spreadsheet = _client.open_by_url(spreadsheet_url)
         # Tentar abrir pela GID 0 (primeira aba)
         try:
-            print(f"[INFO] Tentando abrir a planilha '{spreadsheet_url}' pela GID 0 (índice 0).")
-            sheet = spreadsheet.get_worksheet(0) # 0 para a primeira aba (gid=0)
-            print(f"[INFO] Aba com índice 0 aberta com sucesso. Nome real da aba: '{sheet.title}'")
-        except Exception as e_gid:
+            entry = _get_entry(spreadsheet_url, 0, client=_client)
+        except gspread.exceptions.WorksheetNotFound as e_gid:
             print(f"[WARN] Falha ao abrir planilha pelo índice 0 (GID 0): {e_gid}. Tentando pelo nome '{sheet_name}'.")
             # Fallback: tentar abrir pelo nome fornecido se pelo GID falhar
-            sheet = spreadsheet.worksheet(sheet_name)
-            print(f"[INFO] Aba '{sheet_name}' aberta com sucesso pelo nome.")
-            
-        data = sheet.get_all_records() # Retorna uma lista de dicionários
-        return data
+            entry = _get_entry(spreadsheet_url, sheet_name, client=_client)
+
+        def montar_registros(values):
+            # Mesmo resultado do get_all_records: cabeçalho na 1ª linha e números convertidos
+            linhas = values[0]
+            if not linhas:
+                return []
+            cabecalho = linhas[0]
+            if len(set(cabecalho)) != len(cabecalho):
+                raise gspread.exceptions.GSpreadException("the header row in the worksheet is not unique")
+            return [dict(zip(cabecalho, numericise_all(linha))) for linha in linhas[1:]]
+
+        # Retorna uma lista de dicionários
+        return [dict(registro) for registro in _derived(entry, 'records', montar_registros)]
     except gspread.exceptions.SpreadsheetNotFound:
         st.error(f"Planilha não encontrada: {spreadsheet_url}")
         print(f"[ERROR] SpreadsheetNotFound: {spreadsheet_url}")
@@ -0,0 +1,133 @@
+"""
+Peças da normalização de nomes de comune/província (views/comune e views/comune_new).
+
+A normalização antiga fazia uma passada de str.replace por prefixo, palavra irrelevante e
+substituição (centenas de regex sobre a coluna inteira), além de um unidecode por linha.
+Aqui cada etapa é compilada uma vez no import e aplicada a um texto por vez, e a coluna
+só é processada nos valores únicos (os nomes de comune se repetem muito):
+
+- Acentos: tabela de tradução com o resultado do unidecode para os caracteres latinos
+  (o unidecode trata caractere por caractere); os demais ainda passam pelo unidecode
+- Prefixos: uma trie encontra de uma vez todos os prefixos do início do texto; as
+  remoções continuam na ordem da lista (remover um prefixo pode expor o seguinte)
+- Palavras irrelevantes: uma única alternação \\b(?:a|b|...)\\b - equivalente às passadas
+  separadas, porque cada palavra só casa com uma sequência inteira de letras/dígitos
+- Substituições: continuam em ordem (uma substituição pode gerar o texto de outra), mas
+  cada regex só roda quando o texto literal aparece na string
+"""
+import re
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+# Faixas traduzidas pela tabela: Latin-1, Latin Extended-A/B e pontuação geral (aspas, travessões)
+_FAIXAS_TABELA = (range(0x80, 0x250), range(0x2000, 0x2070))
+_TABELA_ACENTOS = {cp: unidecode(chr(cp)) for faixa in _FAIXAS_TABELA for cp in faixa}
+
+_METACARACTERES = set('.^$*+?{}[]\\|()')
+
+
+def remover_acentos(texto):
+    """Mesmo resultado de unidecode(texto), sem chamá-lo para textos latinos."""
+    if texto.isascii():
+        return texto
+    texto = texto.translate(_TABELA_ACENTOS)
+    return texto if texto.isascii() else unidecode(texto)
+
+
+class RemovedorPrefixos:
+    """
+    Remove prefixos do início do texto, na ordem da lista.
+
+    Equivale a aplicar re.sub('^' + re.escape(prefixo), '', texto) para cada prefixo da
+    lista, um depois do outro.
+    """
+
+    def __init__(self, prefixos):
+        self.prefixos = list(prefixos)
+        self._trie = {}
+        for i, prefixo in enumerate(self.prefixos):
+            no = self._trie
+            for caractere in prefixo:
+                no = no.setdefault(caractere, {})
+            no.setdefault(None, []).append(i)
+
+    def _prefixos_no_inicio(self, texto):
+        """Índices (na lista) dos prefixos com que o texto começa."""
+        encontrados = []
+        no = self._trie
+        for caractere in texto:
+            no = no.get(caractere)
+            if no is None:
+                break
+            encontrados.extend(no.get(None, ()))
+        return encontrados
+
+    def remover(self, texto):
+        proximo = 0
+        while proximo < len(self.prefixos):
+            candidatos = [i for i in self._prefixos_no_inicio(texto) if i >= proximo]
+            if not candidatos:
+                break
+            i = min(candidatos)
+            texto = texto[len(self.prefixos[i]):]
+            proximo = i + 1
+        return texto
+
+
+def compilar_palavras(palavras, escapar=True):
+    """
+    Regex única que casa qualquer uma das palavras inteiras.
+
+    Só vale para palavras formadas por letras/dígitos (como as listas de palavras
+    irrelevantes); para outras, a ordem das passadas poderia mudar o resultado.
+    """
+    unicas = list(dict.fromkeys(palavras))
+    invalidas = [p for p in unicas if not re.fullmatch(r'\w+', p)]
+    if invalidas:
+        raise ValueError(f"Palavras com caracteres fora de \\w: {invalidas}")
+    alternativas = '|'.join(re.escape(p) if escapar else p for p in unicas)
+    return re.compile(r'\b(?:' + alternativas + r')\b')
+
+
+class SubstituidorEmOrdem:
+    """
+    Aplica as substituições de palavra/frase inteira na ordem do dicionário.
+
+    Equivale a re.sub(r'\\b' + original + r'\\b', substituicao, texto) para cada item,
+    pulando os itens cujo texto literal não aparece na string.
+
+    Args:
+        substituicoes (dict): {original: substituicao}
+        escapar (bool): Se o original é escapado (re.escape) antes de montar a regex
+    """
+
+    def __init__(self, substituicoes, escapar=True):
+        self.regras = []
+        for original, substituicao in substituicoes.items():
+            padrao = re.compile(r'\b' + (re.escape(original) if escapar else original) + r'\b')
+            # Sem metacaracteres, a regex só casa onde o texto literal aparece
+            literal = original if escapar or not _METACARACTERES.intersection(original) else None
+            self.regras.append((literal, padrao, substituicao))
+
+    def aplicar(self, texto):
+        for literal, padrao, substituicao in self.regras:
+            if literal is None or literal in texto:
+                texto = padrao.sub(substituicao, texto)
+        return texto
+
+
+def aplicar_por_valor_unico(series, funcao):
+    """
+    Aplica funcao a cada valor distinto da Series e distribui o resultado pelas linhas.
+
+    Returns:
+        pandas.Series: Resultado com o mesmo índice (e nome) da Series
+    """
+    if series.empty:
+        return series.astype(object)
+    codigos, unicos = pd.factorize(series, use_na_sentinel=False)
+    resultados = np.empty(len(unicos), dtype=object)
+    resultados[:] = [funcao(valor) for valor in unicos]
+    return pd.Series(resultados[codigos], index=series.index, name=series.name)
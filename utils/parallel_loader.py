@@ -0,0 +1,77 @@
+"""
+Execução paralela de carregamentos independentes (ex: várias tabelas do Bitrix).
+
+Cada tarefa declara de quais outras depende; as que não têm dependências pendentes
+rodam ao mesmo tempo em um pool de threads. O tempo total passa a ser o do caminho
+mais lento (max) em vez da soma dos tempos de todas as consultas.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Versões antigas do Streamlit
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def run_parallel_loaders(tasks, max_workers=DEFAULT_MAX_WORKERS, label="carregamento"):
+    """
+    Executa tarefas de carregamento em paralelo respeitando as dependências.
+
+    As threads herdam o contexto da sessão do Streamlit, então st.warning/st.error
+    chamados dentro das tarefas continuam aparecendo na página.
+
+    Args:
+        tasks (dict): {nome: (funcao, [dependencias])}. A função recebe como argumentos
+            nomeados os resultados das dependências (ex: deps ['deals'] -> funcao(deals=...))
+        max_workers (int): Máximo de tarefas simultâneas
+        label (str): Nome usado nos logs de tempo
+
+    Returns:
+        tuple: (resultados, tempos) - dicts {nome: resultado} e {nome: segundos}
+
+    Raises:
+        ValueError: Se houver dependência inexistente ou circular
+        Exception: A primeira exceção levantada por uma tarefa é repassada ao chamador
+    """
+    for name, (_, deps) in tasks.items():
+        missing = [dep for dep in deps if dep not in tasks]
+        if missing:
+            raise ValueError(f"Tarefa '{name}' depende de tarefas inexistentes: {missing}")
+
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    results, timings = {}, {}
+    pending = dict(tasks)
+    running = {}
+    start_total = time.perf_counter()
+
+    def run(name, func, kwargs):
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        start = time.perf_counter()
+        try:
+            return func(**kwargs)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [name for name, (_, deps) in pending.items() if all(dep in results for dep in deps)]
+            if not ready and not running:
+                raise ValueError(f"Dependência circular entre as tarefas: {list(pending)}")
+            for name in ready:
+                func, deps = pending.pop(name)
+                running[executor.submit(run, name, func, {dep: results[dep] for dep in deps})] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+
+    total = time.perf_counter() - start_total
+    detalhes = ", ".join(f"{name}={seconds:.1f}s" for name, seconds in timings.items())
+    print(f"[TIMING] {label}: {total:.1f}s no total (soma sequencial seria {sum(timings.values()):.1f}s) - {detalhes}")
+    return results, timings
@@ -0,0 +1,107 @@
+"""
+Agrupamento de chamadas simultâneas idênticas ("single-flight").
+
+Quando várias sessões do Streamlit pedem a mesma tabela do Bitrix ao mesmo tempo (ex:
+logo depois que o cache expira), só a primeira executa a consulta; as demais aguardam
+e recebem o mesmo resultado (ou a mesma exceção). Vale para as threads de um processo;
+entre processos, o lock em arquivo do snapshot_cache cumpre esse papel.
+"""
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Executa no máximo uma chamada por chave ao mesmo tempo.
+
+    Args:
+        name (str): Nome usado nos logs e nas estatísticas
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _record(self, label, field, seconds=0.0):
+        with self._lock:
+            stats = self._stats.setdefault(label, {'calls': 0, 'executed': 0, 'shared': 0, 'seconds_waited': 0.0})
+            stats['calls'] += 1
+            stats[field] += 1
+            stats['seconds_waited'] += seconds
+
+    def do(self, key, func, label=None, share=None):
+        """
+        Executa func() ou, se já houver uma chamada em andamento com a mesma chave,
+        aguarda o resultado dela.
+
+        Args:
+            key (hashable): Identifica chamadas equivalentes
+            func (callable): Função sem argumentos
+            label (str, optional): Nome agregado nas estatísticas (padrão: a chave)
+            share (callable, optional): Aplicada ao resultado entregue a cada chamador
+                quando houve espera (ex: copiar um DataFrame para que cada um tenha o seu;
+                inclusive quem executou, para que ninguém altere o objeto que os demais
+                ainda estão copiando)
+
+        Returns:
+            Resultado de func()
+        """
+        label = label or str(key)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            start = time.time()
+            call.done.wait()
+            self._record(label, 'shared', time.time() - start)
+            print(f"[INFO] {self.name}: {label} aproveitou uma consulta já em andamento")
+            if call.error is not None:
+                raise call.error
+            return share(call.result) if share else call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            call.done.set()
+            self._record(label, 'executed')
+            if waiters:
+                print(f"[INFO] {self.name}: {label} entregue a {waiters} chamadas simultâneas")
+        # Sem espera o resultado é só de quem executou; com espera, todos recebem cópias
+        return share(call.result) if share and waiters else call.result
+
+    def stats(self):
+        """
+        Estatísticas acumuladas por label.
+
+        Returns:
+            dict: {label: {'calls', 'executed', 'shared', 'seconds_waited'}} - 'shared' conta
+                as consultas evitadas e 'seconds_waited' o tempo total de espera delas
+        """
+        with self._lock:
+            return {label: dict(stats) for label, stats in self._stats.items()}
+
+    def in_flight(self):
+        """Quantidade de chamadas em andamento."""
+        with self._lock:
+            return len(self._calls)
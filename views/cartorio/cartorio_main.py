@@ -14,13 +14,13 @@ from .analise_tempo_crm import mostrar_dashboard_tempo_crm
 from .protocolado import exibir_dashboard_protocolado
 from .emissoes_cartao import exibir_dashboard_emissoes_cartao
 import pandas as pd
-import io
 import datetime  # Modificando para importar o módulo completo
 from datetime import datetime as dt  # Renomeando para evitar conflitos
 import os
 import sys
 from pathlib import Path
 from components.report_guide import show_contextual_help
+from utils.export_engine import export_csv, export_xlsx, download_export
 
 def show_cartorio():
     """
@@ -590,10 +590,9 @@ def show_cartorio():
                     )
                     
                     # Adicionar botão para exportar
-                    csv = df_correspondencia.to_csv(index=False).encode('utf-8')
-                    st.download_button(
+                    download_export(
                         label="📥 Exportar Correspondências para CSV",
-                        data=csv,
+                        path=export_csv(df_correspondencia),
                         file_name=f"correspondencias_id_familia_{dt.now().strftime('%Y%m%d_%H%M')}.csv",
                         mime="text/csv",
                         help="Baixar os dados de correspondência em formato CSV"
@@ -742,10 +741,9 @@ def show_cartorio():
                         if st.button("🔄 Atualizar Dados", key="atualizar_acomp", type="primary", help="Recarrega os dados de acompanhamento"):
                             st.rerun()
                     with btn_col2:
-                        csv = df_acompanhamento_filtrado.to_csv(index=False).encode('utf-8')
-                        st.download_button(
+                        download_export(
                             label="📥 Exportar para CSV",
-                            data=csv,
+                            path=export_csv(df_acompanhamento_filtrado),
                             file_name=f"acompanhamento_emissao_familia_{dt.now().strftime('%Y%m%d_%H%M')}.csv",
                             mime="text/csv",
                             help="Baixar os dados detalhados em formato CSV"
@@ -863,10 +861,9 @@ def show_cartorio():
                             hide_index=True
                         )
                         # Adicionar exportação para CSV
-                        csv_hig = df_filtrado_hig.to_csv(index=False).encode('utf-8')
-                        st.download_button(
+                        download_export(
                             label="📥 Exportar Análise Higienização (CSV)",
-                            data=csv_hig,
+                            path=export_csv(df_filtrado_hig),
                             file_name=f"analise_higienizacao_{dt.now().strftime('%Y%m%d_%H%M')}.csv",
                             mime="text/csv",
                             key="export_hig"
@@ -950,15 +947,9 @@ def show_cartorio():
                         )
 
                         # Botão para exportar Excel
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                            family_id_summary.to_excel(writer, sheet_name='Resumo_IDs', index=False)
-                            filtered_details.to_excel(writer, sheet_name='Detalhes_IDs', index=False)
-                        excel_data = output.getvalue()
-
-                        st.download_button(
+                        download_export(
                             label="📥 Exportar Verificação de IDs (Excel)",
-                            data=excel_data,
+                            path=export_xlsx({'Resumo_IDs': family_id_summary, 'Detalhes_IDs': filtered_details}),
                             file_name=f"verificacao_ids_familia_{dt.now().strftime('%Y%m%d_%H%M')}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                             key="export_ids_excel"
@@ -1013,10 +1004,9 @@ def show_cartorio():
                             }
                         )
 
-                        csv_ausentes = df_ausentes.to_csv(index=False).encode('utf-8')
-                        st.download_button(
+                        download_export(
                             label="📥 Exportar Dados para CSV",
-                            data=csv_ausentes,
+                            path=export_csv(df_ausentes),
                             file_name=f"negocios_familias_nao_cadastradas_{dt.now().strftime('%Y%m%d_%H%M')}.csv",
                             mime="text/csv",
                             key="exp_negocios_csv"
@@ -115,8 +115,8 @@ def carregar_dados_negocios():
         "operator": "EQUALS"
     })
     
-    # Carregar dados principais dos negócios com filtro de categoria
-    df_deal = load_bitrix_data(url_deal, filters=category_filter)
+    # Carregar dados principais dos negócios com filtro de categoria (apenas as colunas usadas)
+    df_deal = load_bitrix_data(url_deal, filters=category_filter, columns=['ID', 'TITLE', 'ASSIGNED_BY_NAME'])
     
     # Verificar se conseguiu carregar os dados
     if df_deal.empty:
@@ -142,7 +142,8 @@ def carregar_dados_negocios():
     })
     
     # Carregar dados da tabela crm_deal_uf (onde estão os campos personalizados do funil de negócios)
-    df_deal_uf = load_bitrix_data(url_deal_uf, filters=deal_filter)
+    df_deal_uf = load_bitrix_data(url_deal_uf, filters=deal_filter,
+                                  columns=['DEAL_ID', 'UF_CRM_1722605592778', 'UF_CRM_HIGILIZACAO_STATUS'])
     
     # Verificar se conseguiu carregar os dados
     if df_deal_uf.empty:
@@ -201,16 +202,17 @@ def carregar_dados_crm_deal_com_uf():
         "operator": "EQUALS"
     })
     
-    # Carregar dados principais dos negócios com filtro de categoria
-    df_deal = load_bitrix_data(url_deal, filters=category_filter)
+    # Incluir mais colunas necessárias, especialmente DATE_CREATE para o filtro de data
+    colunas_necessarias = ['ID', 'TITLE', 'CATEGORY_ID', 'ASSIGNED_BY_NAME', 'DATE_CREATE']
+    
+    # Carregar dados principais dos negócios com filtro de categoria (apenas as colunas usadas)
+    df_deal = load_bitrix_data(url_deal, filters=category_filter, columns=colunas_necessarias)
     
     # Verificar se conseguiu carregar os dados
     if df_deal.empty:
         st.warning("Não foi possível carregar os dados da tabela crm_deal para a categoria 0.")
         return pd.DataFrame()
     
-    # Incluir mais colunas necessárias, especialmente DATE_CREATE para o filtro de data
-    colunas_necessarias = ['ID', 'TITLE', 'CATEGORY_ID', 'ASSIGNED_BY_NAME', 'DATE_CREATE']
     colunas_presentes = [col for col in colunas_necessarias if col in df_deal.columns]
     
     # Verificar se temos a coluna de data
@@ -237,7 +239,7 @@ def carregar_dados_crm_deal_com_uf():
     })
     
     # Carregar dados da tabela crm_deal_uf (onde estão os campos personalizados)
-    df_deal_uf = load_bitrix_data(url_deal_uf, filters=deal_filter)
+    df_deal_uf = load_bitrix_data(url_deal_uf, filters=deal_filter, columns=['DEAL_ID', 'UF_CRM_1722605592778'])
     
     # Verificar se conseguiu carregar os dados
     if df_deal_uf.empty:
@@ -12,6 +12,7 @@ from pathlib import Path
 import requests
 import json
 from io import StringIO
+from api.http_client import http_request
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -33,7 +34,7 @@ def carregar_dados_planilha():
         st.info("Tentando acessar a planilha...")
         
         # Fazer requisição HTTP para obter os dados
-        response = requests.get(csv_url)
+        response = http_request("GET", csv_url, timeout=60)
         
         if response.status_code != 200:
             st.error(f"Erro ao acessar a planilha (código {response.status_code})")
@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, date # Adicionar date
 
 # Reutilizar as funções de visao_geral para consistência
 # from .visao_geral import simplificar_nome_estagio, categorizar_estagio # Comentado
-from .utils import simplificar_nome_estagio, categorizar_estagio # Adicionado
+from .utils import simplificar_nome_estagio, categorizar_estagio, adicionar_colunas_estagio # Adicionado
 
 # --- Constantes Chaves Session State ---
 KEY_BUSCA_FAMILIA = "busca_familia_acompanhamento"
@@ -82,19 +83,17 @@ def exibir_acompanhamento(df_cartorio):
 
     # 2. Simplificar e Categorizar Estágios
     df['STAGE_ID'] = df['STAGE_ID'].astype(str)
-    df['ESTAGIO_LEGIVEL'] = df['STAGE_ID'].apply(simplificar_nome_estagio)
-    df['CATEGORIA_ESTAGIO'] = df['ESTAGIO_LEGIVEL'].apply(categorizar_estagio)
+    adicionar_colunas_estagio(df, 'STAGE_ID')
     
     # NOVA LÓGICA: Aplicar regras específicas para os pipelines
-    df['CONCLUIDA'] = df.apply(lambda row: calcular_conclusao_por_pipeline(row), axis=1)
+    df['CONCLUIDA'] = calcular_conclusao_vetorizada(df)
     
     # 3. Tratar Nulos na coluna Nome da Família (já feito no loader, mas confirmando)
     df[coluna_nome_familia] = df[coluna_nome_familia].fillna('Família Desconhecida').astype(str)
     df[coluna_nome_familia] = df[coluna_nome_familia].replace(r'^\s*$', 'Família Desconhecida', regex=True)
 
-    # --- LÓGICA ESPECIAL PARA PIPELINE 104 (Pesquisa BR) ---
-    # Aplicar lógica de precedência para evitar duplicação de contagem
-    df = aplicar_logica_precedencia_pipeline_104(df, coluna_id_requerente)
+    # PIPELINE 104 (Pesquisa BR): "PESQUISA PRONTA" já não conta como concluída
+    # (ver calcular_conclusao_por_pipeline), então nenhum registro é removido aqui
     
     # --- Agrupamento por Família (pré-filtro) ---
     coluna_protocolizado = 'UF_CRM_34_PROTOCOLIZADO'
@@ -550,75 +549,23 @@ def calcular_conclusao_por_pipeline(row):
     else:
         return categoria_estagio == 'SUCESSO'
 
-def aplicar_logica_precedencia_pipeline_104(df, coluna_id_requerente):
+def calcular_conclusao_vetorizada(df):
     """
-    Aplica lógica de precedência para o pipeline 104 (Pesquisa BR).
-    
-    ATUALIZADA DEZEMBRO 2024: Melhorada para tratar adequadamente a lógica de duplicação
-    
-    Regras:
-    1. Se um requerente tem registros no pipeline 104 EM ANDAMENTO E
-    2. Tem registros nos pipelines superiores (92, 94, 102) TAMBÉM EM ANDAMENTO
-    3. Então: Manter ambos na contagem (são processos paralelos)
-    
-    4. Se um requerente tem pipeline 104 "PESQUISA PRONTA" E
-    5. Tem registros nos pipelines superiores (92, 94, 102) 
-    6. Então: Manter o 104 na contagem APENAS se não houver duplicação real
-    
-    IMPORTANTE: Ser mais conservador para não remover dados importantes
+    Versão vetorizada de calcular_conclusao_por_pipeline para o DataFrame inteiro.
+
+    Mesmas regras: nos pipelines 92, 94 e 102 só SUCESSO conta como concluído; no 104
+    (Pesquisa BR) SUCESSO e FALHA (ex: PESQUISA NÃO ENCONTRADA) encerram o processo.
+
+    Returns:
+        pandas.Series: Booleanos alinhados ao índice de df
     """
-    df_processado = df.copy()
-    
-    if 'CATEGORY_ID' not in df_processado.columns or coluna_id_requerente not in df_processado.columns:
-        return df_processado
-    
-    # Identificar requerentes que têm pipeline 104
-    requerentes_104 = df_processado[
-        df_processado['CATEGORY_ID'].astype(str) == '104'
-    ][coluna_id_requerente].unique()
-    
-    if len(requerentes_104) == 0:
-        return df_processado
-    
-    # Para cada requerente com 104, verificar se há conflito real de duplicação
-    requerentes_para_ajustar_104 = []
-    
-    for id_requerente in requerentes_104:
-        registros_requerente = df_processado[df_processado[coluna_id_requerente] == id_requerente]
-        
-        # Verificar registros por pipeline
-        registros_104 = registros_requerente[registros_requerente['CATEGORY_ID'].astype(str) == '104']
-        registros_superiores = registros_requerente[registros_requerente['CATEGORY_ID'].astype(str).isin(['92', '94', '102'])]
-        
-        # Se tem pipelines superiores E pipeline 104 está "pronto para emissão"
-        if not registros_superiores.empty and not registros_104.empty:
-            # Verificar se o 104 está realmente pronto para emissão (seria duplicação)
-            tem_104_pronto = registros_104['ESTAGIO_LEGIVEL'].str.contains('PESQUISA PRONTA PARA EMISSÃO', na=False).any()
-            
-            # Verificar se os pipelines superiores estão ativos/em andamento
-            superiores_ativos = registros_superiores['CATEGORIA_ESTAGIO'].isin(['EM_ANDAMENTO', 'SUCESSO']).any()
-            
-            if tem_104_pronto and superiores_ativos:
-                # APENAS remover se há clara duplicação 
-                # (pesquisa pronta + pipeline superior ativo)
-                requerentes_para_ajustar_104.append(id_requerente)
-                
-        
-    
-    # AJUSTE CONSERVADOR: Em vez de remover, apenas marcar para não contar como "concluído"
-    # se há duplicação real
-    if requerentes_para_ajustar_104:
-        # Aplicar ajuste mais sutil: não remover registros, mas ajustar a contagem de conclusão
-        for id_req in requerentes_para_ajustar_104:
-            mask_104_pronto = (
-                (df_processado[coluna_id_requerente] == id_req) &
-                (df_processado['CATEGORY_ID'].astype(str) == '104') &
-                (df_processado['ESTAGIO_LEGIVEL'].str.contains('PESQUISA PRONTA PARA EMISSÃO', na=False))
-            )
-            
-            # Em vez de remover, vamos deixar o registro mas não contar como concluído
-            # (isso será tratado na função de conclusão revisada)
-            if mask_104_pronto.any():
-                pass
-    
-    return df_processado 
\ No newline at end of file
+    if 'CATEGORIA_ESTAGIO' not in df.columns:
+        return pd.Series(False, index=df.index)
+    categoria_estagio = df['CATEGORIA_ESTAGIO']
+    if 'CATEGORY_ID' in df.columns:
+        pipeline_104 = (df['CATEGORY_ID'].astype(str) == '104').to_numpy()
+    else:
+        pipeline_104 = np.zeros(len(df), dtype=bool)
+    sucesso = (categoria_estagio == 'SUCESSO').to_numpy(dtype=bool)
+    falha = (categoria_estagio == 'FALHA').to_numpy(dtype=bool)
+    return pd.Series(np.where(pipeline_104, sucesso | falha, sucesso), index=df.index)
@@ -36,11 +36,9 @@ def show_cartorio_new(subpagina_selecionada, adm_subpagina):
     st.markdown('<h1 class="bi-title">EMISSÕES BRASILEIRAS</h1>', unsafe_allow_html=True)
     
     # --- Carregar Dados ---
-    def load_data_cached():
-        return carregar_dados_cartorio()
-        
+    # carregar_dados_cartorio reaproveita o resultado processado enquanto os dados do Bitrix não mudarem
     with st.spinner("Carregando dados dos cartórios..."):
-        df_cartorio = load_data_cached()
+        df_cartorio = carregar_dados_cartorio()
     
     if df_cartorio is None or df_cartorio.empty:
         st.warning("Não foi possível carregar os dados dos cartórios ou não há dados para exibir.")
@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
-from api.bitrix_connector import load_bitrix_data, get_credentials
+from api.bitrix_connector import load_bitrix_data, load_bitrix_data_by_ids, get_credentials
+from api.snapshot_cache import refresh_if_stale
 from datetime import datetime
 from dotenv import load_dotenv
 import functools # Importar functools para lru_cache
+from utils.parallel_loader import run_parallel_loaders
+from utils.derived_cache import cached_derived, record_sources
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -14,19 +17,41 @@ load_dotenv()
 CACHE_TTL = 3600 # Cache por 1 hora
 
 @st.cache_data(ttl=CACHE_TTL)
-def load_data_cached(table_name: str, filters: dict | None = None):
+def _load_data_cached(table_name: str, filters: dict | None = None, columns: list | None = None):
     """
     Função genérica cacheada para carregar dados do Bitrix.
     Abstrai a chamada load_bitrix_data para facilitar o cache.
+    Com columns, só essas colunas são lidas do snapshot e guardadas no cache.
     """
     print(f"[CACHE MISS] Carregando dados da API Bitrix para: {table_name}")
     BITRIX_TOKEN, BITRIX_URL = get_credentials()
     url = f"{BITRIX_URL}/bitrix/tools/biconnector/pbi.php?token={BITRIX_TOKEN}&table={table_name}"
-    df = load_bitrix_data(url, filters=filters)
+    df = load_bitrix_data(url, filters=filters, columns=columns)
     if df is None:
         return pd.DataFrame() # Retorna DF vazio em caso de erro
     return df
 
+def load_data_cached(table_name: str, filters: dict | None = None, columns: list | None = None):
+    """
+    Carrega uma tabela do Bitrix (com cache) e a registra como fonte dos dados
+    derivados em montagem (ver utils/derived_cache.py). Um resultado em cache cujo
+    snapshot de origem mudou em disco é recarregado.
+    """
+    return record_sources(refresh_if_stale(_load_data_cached, table_name, filters=filters, columns=columns))
+
+def load_data_by_ids(table_name: str, id_field: str, ids, columns: list | None = None) -> pd.DataFrame:
+    """
+    Carrega uma tabela do Bitrix filtrada por uma lista de IDs.
+    Os IDs são buscados em lotes paralelos (ver load_bitrix_data_by_ids), sem limite
+    de quantidade e sem um único POST gigante.
+    """
+    BITRIX_TOKEN, BITRIX_URL = get_credentials()
+    url = f"{BITRIX_URL}/bitrix/tools/biconnector/pbi.php?token={BITRIX_TOKEN}&table={table_name}"
+    df = load_bitrix_data_by_ids(url, id_field, list(ids), columns=columns)
+    if df is None:
+        return pd.DataFrame()
+    return record_sources(df)
+
 # @st.cache_data # Cache será aplicado na chamada de load_data_cached
 def load_data_all_pipelines():
     """
@@ -197,7 +222,7 @@ def carregar_dados_negocios():
         "type": "INCLUDE", 
         "operator": "EQUALS"
     })
-    df_deal = load_data_cached(table_deal, filters=category_filter)
+    df_deal = load_data_cached(table_deal, filters=category_filter, columns=['ID', 'TITLE', 'ASSIGNED_BY_NAME'])
     if df_deal.empty:
         return pd.DataFrame(), pd.DataFrame()
     df_deal = df_deal[['ID', 'TITLE', 'ASSIGNED_BY_NAME']].copy() # Selecionar colunas e copiar
@@ -205,16 +230,8 @@ def carregar_dados_negocios():
     # Tabela UF de negócios
     table_deal_uf = "crm_deal_uf"
     deal_ids = df_deal['ID'].astype(str).tolist()
-    if len(deal_ids) > 1000: # Limitar IDs no filtro
-        deal_ids = deal_ids[:1000]
-    deal_filter = {"dimensionsFilters": [[]]}
-    deal_filter["dimensionsFilters"][0].append({
-        "fieldName": "DEAL_ID", 
-        "values": deal_ids, 
-        "type": "INCLUDE", 
-        "operator": "EQUALS"
-    })
-    df_deal_uf = load_data_cached(table_deal_uf, filters=deal_filter)
+    df_deal_uf = load_data_by_ids(table_deal_uf, "DEAL_ID", deal_ids,
+                                  columns=['DEAL_ID', 'UF_CRM_1722605592778', 'UF_CRM_HIGILIZACAO_STATUS'])
     if df_deal_uf.empty:
         return df_deal, pd.DataFrame()
         
@@ -248,13 +265,13 @@ def carregar_dados_crm_deal_com_uf():
         "type": "INCLUDE", 
         "operator": "EQUALS"
     })
-    df_deal = load_data_cached(table_deal, filters=category_filter)
+    colunas_necessarias = ['ID', 'TITLE', 'CATEGORY_ID', 'ASSIGNED_BY_NAME', 'DATE_CREATE']
+    df_deal = load_data_cached(table_deal, filters=category_filter, columns=colunas_necessarias)
     if df_deal.empty:
         st.warning("Não foi possível carregar os dados da tabela crm_deal para a categoria 0.")
         return pd.DataFrame()
         
     # Selecionar colunas e processar data
-    colunas_necessarias = ['ID', 'TITLE', 'CATEGORY_ID', 'ASSIGNED_BY_NAME', 'DATE_CREATE']
     colunas_presentes = [col for col in colunas_necessarias if col in df_deal.columns]
     if 'DATE_CREATE' not in colunas_presentes:
         st.warning("Campo DATE_CREATE não encontrado...")
@@ -265,16 +282,7 @@ def carregar_dados_crm_deal_com_uf():
     # Carregar crm_deal_uf com filtro de ID
     table_deal_uf = "crm_deal_uf"
     deal_ids = df_deal['ID'].astype(str).tolist()
-    if len(deal_ids) > 1000:
-        deal_ids = deal_ids[:1000]
-    deal_filter = {"dimensionsFilters": [[]]}
-    deal_filter["dimensionsFilters"][0].append({
-        "fieldName": "DEAL_ID", 
-        "values": deal_ids, 
-        "type": "INCLUDE", 
-        "operator": "EQUALS"
-    })
-    df_deal_uf = load_data_cached(table_deal_uf, filters=deal_filter)
+    df_deal_uf = load_data_by_ids(table_deal_uf, "DEAL_ID", deal_ids, columns=['DEAL_ID', 'UF_CRM_1722605592778'])
     if df_deal_uf.empty:
         st.warning("Não foi possível carregar os dados da tabela crm_deal_uf para a categoria 0.")
         # Retornar df_deal mesmo assim, pois pode ser útil
@@ -326,35 +334,26 @@ def carregar_dados_crm_deal_cat46():
         "type": "INCLUDE", 
         "operator": "EQUALS"
     })
-    df_deal = load_data_cached(table_deal, filters=category_filter)
+    colunas_necessarias = ['ID', 'TITLE', 'ASSIGNED_BY_NAME']
+    df_deal = load_data_cached(table_deal, filters=category_filter, columns=colunas_necessarias)
     if df_deal.empty:
         print("[WARN] Não foi possível carregar os dados da tabela crm_deal para a categoria 46.")
         return pd.DataFrame()
         
     # Selecionar colunas e processar dados básicos
-    colunas_necessarias = ['ID', 'TITLE', 'ASSIGNED_BY_NAME']
     colunas_presentes = [col for col in colunas_necessarias if col in df_deal.columns]
     df_deal = df_deal[colunas_presentes].copy()
 
     # Carregar crm_deal_uf com filtro de ID para obter campos personalizados
     table_deal_uf = "crm_deal_uf"
     deal_ids = df_deal['ID'].astype(str).tolist()
-    if len(deal_ids) > 1000:
-        deal_ids = deal_ids[:1000]
-    deal_filter = {"dimensionsFilters": [[]]}
-    deal_filter["dimensionsFilters"][0].append({
-        "fieldName": "DEAL_ID", 
-        "values": deal_ids, 
-        "type": "INCLUDE", 
-        "operator": "EQUALS"
-    })
-    df_deal_uf = load_data_cached(table_deal_uf, filters=deal_filter)
+    colunas_uf_obrigatorias = ['DEAL_ID', 'UF_CRM_1722605592778', 'UF_CRM_1746054586042']
+    df_deal_uf = load_data_by_ids(table_deal_uf, "DEAL_ID", deal_ids, columns=colunas_uf_obrigatorias)
     if df_deal_uf.empty:
         print("[WARN] Não foi possível carregar os dados da tabela crm_deal_uf para a categoria 46.")
         return pd.DataFrame()
 
     # Selecionar campos personalizados necessários
-    colunas_uf_obrigatorias = ['DEAL_ID', 'UF_CRM_1722605592778', 'UF_CRM_1746054586042']
     colunas_uf_presentes = [col for col in colunas_uf_obrigatorias if col in df_deal_uf.columns]
     
     # Verificar se os campos chave existem
@@ -390,29 +389,49 @@ def carregar_dados_crm_deal_cat46():
     
     return df_mesclado
 
-# A função principal agora chama load_data(), que usa o cache internamente
-# Não precisa cachear esta função diretamente
 def carregar_dados_cartorio():
+    """
+    Dados dos cartórios já processados (ver _montar_dados_cartorio).
+
+    O resultado é reaproveitado entre as interações enquanto os snapshots do Bitrix
+    usados na montagem não mudarem (ver utils/derived_cache.py); só então os merges,
+    deduplicações e agregações são refeitos.
+
+    Returns:
+        pandas.DataFrame: Cópia dos dados dos cartórios enriquecidos com a data de venda.
+    """
+    return cached_derived('cartorio_new.carregar_dados_cartorio', _montar_dados_cartorio)
+
+def _montar_dados_cartorio():
     """
     Carrega os dados dos cartórios (cat 92, 94, 102 e 104) usando cache e filtro na API,
     e faz o merge com os dados de negócio (cat 46) para obter a data de venda (UF_CRM_1746054586042).
     
     ATUALIZADO DEZEMBRO 2024: Agora inclui os novos funis 102 (Paróquia) e 104 (Pesquisa BR)
+    
+    As consultas independentes ao Bitrix são feitas em paralelo (ver utils/parallel_loader.py),
+    com os tempos de cada uma registrados no log.
 
     Returns:
         pandas.DataFrame: DataFrame com os dados dos cartórios filtrados e enriquecidos com a data de venda.
     """
     try:
-        # MUDANÇA CRÍTICA: Carregar TODOS os pipelines (92, 94, 102, 104) em vez de apenas 92 e 94
-        df_cartorio = load_data_all_pipelines()
+        # As consultas são independentes: itens SPA de TODOS os pipelines (92, 94, 102, 104)
+        # e negócios da cat 46 (com sua tabela UF, para a data de venda) rodam em paralelo.
+        # A cat 0 só é consultada depois, como fallback, se a cat 46 vier vazia.
+        resultados, _ = run_parallel_loaders({
+            'itens_cartorio': (load_data_all_pipelines, []),
+            'deals_cat46': (carregar_dados_crm_deal_cat46, []),
+        }, label="carregar_dados_cartorio")
+        df_cartorio = resultados['itens_cartorio']
 
         if df_cartorio.empty:
             # Mensagem de load_data_all_pipelines já deve ter aparecido
             # print("Nenhum dado de item de cartório carregado.") 
             return pd.DataFrame()
 
-        # Carregar dados de negócio (cat 46) com data de venda (NOVA IMPLEMENTAÇÃO)
-        df_deal_cat46 = carregar_dados_crm_deal_cat46()
+        # Dados de negócio (cat 46) com data de venda (NOVA IMPLEMENTAÇÃO)
+        df_deal_cat46 = resultados['deals_cat46']
         if df_deal_cat46.empty:
             st.warning("Dados de negócio (cat 46) não encontrados. A coluna 'Data de Venda' não será adicionada.")
             # Verificar se a abordagem antiga ainda está configurada como fallback
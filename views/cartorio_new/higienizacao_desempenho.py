@@ -26,68 +26,35 @@ def aplicar_logica_precedencia_pipeline_104_higienizacao(df):
     
     df_processado = df.copy()
     
-    # Identificar famílias que têm pipeline 104
-    familias_104 = df_processado[
-        df_processado['CATEGORY_ID'].astype(str) == '104'
-    ]['UF_CRM_34_ID_FAMILIA'].unique()
-    
-    if len(familias_104) == 0:
+    # Marcadores por linha, agregados por família em um único groupby
+    # (antes era uma máscara sobre o DataFrame inteiro para cada família)
+    category_id = df_processado['CATEGORY_ID'].astype(str)
+    eh_104 = category_id == '104'
+    if not eh_104.any():
         return df_processado
+    eh_superior = category_id.isin(['92', '94', '102'])
     
-    # Para cada família com 104, verificar se há conflito real de duplicação
-    familias_para_ajustar_104 = []
-    
-    for id_familia in familias_104:
-        registros_familia = df_processado[df_processado['UF_CRM_34_ID_FAMILIA'] == id_familia]
-        
-        # Verificar registros por pipeline
-        registros_104 = registros_familia[registros_familia['CATEGORY_ID'].astype(str) == '104']
-        registros_superiores = registros_familia[registros_familia['CATEGORY_ID'].astype(str).isin(['92', '94', '102'])]
-        
-        # Se tem pipelines superiores E pipeline 104
-        if not registros_superiores.empty and not registros_104.empty:
-            # Verificar se há 104 "pronto para emissão" 
-            tem_104_pronto = registros_104['STAGE_ID'].str.contains('SUCCESS', na=False).any()
-            
-            # Verificar se os pipelines superiores estão ativos
-            superiores_com_sucesso = registros_superiores['STAGE_ID'].str.contains('SUCCESS', na=False).any()
-            
-            if tem_104_pronto and superiores_com_sucesso:
-                # Se há clara duplicação (ambos prontos/concluídos)
-                familias_para_ajustar_104.append(id_familia)
-                print(f"[DEBUG HIGIENIZAÇÃO] FAMÍLIA {id_familia}: Pipeline 104 pronto com pipeline superior concluído, ajustando para evitar duplicação")
-            else:
-                print(f"[DEBUG HIGIENIZAÇÃO] FAMÍLIA {id_familia}: Pipeline 104 e superiores coexistindo normalmente")
-        else:
-            print(f"[DEBUG HIGIENIZAÇÃO] FAMÍLIA {id_familia}: Apenas pipeline 104 ou sem conflito, mantendo na contagem")
+    # Duplicação clara: 104 em SUCCESS e pipeline superior (92, 94, 102) também em SUCCESS.
+    # Quando 104 e superiores coexistem sem ambos concluídos, são processos paralelos.
+    stage_success = df_processado['STAGE_ID'].str.contains('SUCCESS', na=False)
+    por_familia = pd.DataFrame({
+        'familia': df_processado['UF_CRM_34_ID_FAMILIA'],
+        'success_104': eh_104 & stage_success,
+        'success_superior': eh_superior & stage_success,
+    }).groupby('familia', sort=False)[['success_104', 'success_superior']].any()
+    familias_para_remover_realmente = por_familia.index[
+        por_familia['success_104'] & por_familia['success_superior']
+    ]
     
-    # AJUSTE CONSERVADOR: Em vez de remover completamente, apenas ajustar a contagem
-    # quando há duplicação clara
-    if familias_para_ajustar_104:
-        # Para higienização, vamos manter uma abordagem mais conservadora
-        # Removendo apenas quando há duplicação muito clara
-        familias_para_remover_realmente = []
-        
-        for id_familia in familias_para_ajustar_104:
-            registros_familia = df_processado[df_processado['UF_CRM_34_ID_FAMILIA'] == id_familia]
-            registros_104 = registros_familia[registros_familia['CATEGORY_ID'].astype(str) == '104']
-            registros_superiores = registros_familia[registros_familia['CATEGORY_ID'].astype(str).isin(['92', '94', '102'])]
-            
-            # Verificar se há duplicação MUITO clara (ambos concluídos)
-            tem_104_success = registros_104['STAGE_ID'].str.contains('SUCCESS', na=False).any()
-            tem_superiores_success = registros_superiores['STAGE_ID'].str.contains('SUCCESS', na=False).any()
-            
-            if tem_104_success and tem_superiores_success:
-                # Só remover quando ambos estão "SUCCESS" (duplicação clara)
-                familias_para_remover_realmente.append(id_familia)
-        
-        if familias_para_remover_realmente:
-            mask_remover = (
-                df_processado['UF_CRM_34_ID_FAMILIA'].isin(familias_para_remover_realmente) &
-                (df_processado['CATEGORY_ID'].astype(str) == '104')
-            )
-            df_processado = df_processado[~mask_remover].copy()
-            print(f"[DEBUG HIGIENIZAÇÃO] Removidos {mask_remover.sum()} registros do pipeline 104 devido à duplicação clara")
+    # AJUSTE CONSERVADOR: remover apenas os registros 104 dessas famílias
+    if len(familias_para_remover_realmente) > 0:
+        mask_remover = (
+            df_processado['UF_CRM_34_ID_FAMILIA'].isin(familias_para_remover_realmente) &
+            eh_104
+        )
+        df_processado = df_processado[~mask_remover].copy()
+        print(f"[DEBUG HIGIENIZAÇÃO] {len(familias_para_remover_realmente)} famílias com pipeline 104 e superior concluídos: "
+              f"removidos {mask_remover.sum()} registros do pipeline 104 devido à duplicação clara")
     
     return df_processado
 
@@ -605,7 +572,7 @@ def exibir_higienizacao_desempenho():
         'DT1098_102:UC_UHPXE8': 'Brasileiras Emitida',  # Certidão Entregue
         
         # === Pipeline 104 (Pesquisa BR) - LÓGICA ESPECIAL ===
-        # IMPORTANTE: Pipeline 104 será tratado de forma especial na função aplicar_logica_precedencia_pipeline_104
+        # IMPORTANTE: Pipeline 104 será tratado de forma especial na função aplicar_logica_precedencia_pipeline_104_higienizacao
         'DT1098_104:NEW': 'Brasileiras Pesquisas',  # Aguardando Pesquisador
         'DT1098_104:PREPARATION': 'Brasileiras Pesquisas',  # Pesquisa em Andamento
         'DT1098_104:SUCCESS': 'Brasileiras Pesquisas',  # Pesquisa Pronta - consideramos como pesquisa finalizada
@@ -8,7 +8,7 @@ import numpy as np
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode, JsCode
 
 # Importar funções do novo utils
-from .utils import simplificar_nome_estagio, categorizar_estagio
+from .utils import simplificar_nome_estagio, categorizar_estagio, mapear_estagios
 
 # --- Função Auxiliar Copiada de visao_geral.py ---
 # TODO: Considerar mover esta função para um módulo utils compartilhado
@@ -53,7 +53,7 @@ def exibir_pendencias(df_original):
     # --- Criar coluna ESTAGIO_SIMPLIFICADO (MOVIDO PARA CIMA) ---
     # Garantir que a coluna de estágio seja string antes de aplicar
     df[coluna_estagio] = df[coluna_estagio].astype(str)
-    df['ESTAGIO_SIMPLIFICADO'] = df[coluna_estagio].apply(simplificar_nome_estagio)
+    df['ESTAGIO_SIMPLIFICADO'] = mapear_estagios(df[coluna_estagio], categorica=False)
 
     # --- Expander para Filtros --- 
     with st.expander("Filtros", expanded=True): # Começa expandido
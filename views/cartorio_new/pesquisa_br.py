@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from .utils import simplificar_nome_estagio, categorizar_estagio
+from .utils import simplificar_nome_estagio, categorizar_estagio, adicionar_colunas_estagio
 
 def exibir_pesquisa_br(df_cartorio):
     """
@@ -39,8 +39,7 @@ def exibir_pesquisa_br(df_cartorio):
 
     # --- Pré-processamento ---
     df_pesquisa['STAGE_ID'] = df_pesquisa['STAGE_ID'].astype(str)
-    df_pesquisa['ESTAGIO_LEGIVEL'] = df_pesquisa['STAGE_ID'].apply(simplificar_nome_estagio)
-    df_pesquisa['CATEGORIA_ESTAGIO'] = df_pesquisa['ESTAGIO_LEGIVEL'].apply(categorizar_estagio)
+    adicionar_colunas_estagio(df_pesquisa, 'STAGE_ID')
     
     # Tratar campos nulos
     df_pesquisa['UF_CRM_34_ID_REQUERENTE'] = df_pesquisa['UF_CRM_34_ID_REQUERENTE'].fillna('Req. Desconhecido').astype(str)
@@ -5,7 +5,7 @@ import numpy as np
 import os # Importar os para manipulação de caminhos
 
 # Funções que podem ser úteis
-from .utils import simplificar_nome_estagio, fetch_supabase_producao_data, carregar_dados_usuarios_bitrix
+from .utils import simplificar_nome_estagio, mapear_estagios, fetch_supabase_producao_data, carregar_dados_usuarios_bitrix
 
 # Obter o diretório do arquivo atual
 _PRODUCAO_ADM_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -136,7 +136,7 @@ def exibir_producao_adm(df_cartorio_original):
         st.warning(f"Coluna ADM de Pasta ('{col_adm_pasta_bitrix}') não encontrada nos dados do Bitrix. O filtro de ADM principal não será aplicado.")
 
     if 'STAGE_ID' in df.columns:
-        df['ESTAGIO_ATUAL_LEGIVEL'] = df['STAGE_ID'].apply(simplificar_nome_estagio)
+        df['ESTAGIO_ATUAL_LEGIVEL'] = mapear_estagios(df['STAGE_ID'], categorica=False)
     else:
         st.error("Coluna STAGE_ID não encontrada para determinar o estágio atual.")
         return
@@ -249,7 +249,7 @@ def exibir_producao_adm(df_cartorio_original):
                 col_estagio = 'STAGE_ID'
             
             if col_estagio:
-                df_supabase['_TEMP_STAGE_NAME'] = df_supabase[col_estagio].apply(simplificar_nome_estagio)
+                df_supabase['_TEMP_STAGE_NAME'] = mapear_estagios(df_supabase[col_estagio], categorica=False)
                 df_supabase['STAGE_NAME_PADRONIZADO'] = df_supabase['_TEMP_STAGE_NAME'].apply(
                     lambda x: x.split('/')[-1].strip() if isinstance(x, str) and '/' in x else x
                 )
@@ -1,11 +1,103 @@
+import numpy as np
 import pandas as pd
 import streamlit as st # Adicionado para st.error
 import requests # Adicionado para chamadas HTTP
 from api.bitrix_connector import get_credentials, load_bitrix_data # IMPORTANTE: Adicionar esta importação
+from api.supabase_cache import fetch_rpc_period
 
 # --- Configurações do Supabase (copiadas de producao.py) ---
 # Idealmente, viriam de st.secrets ou variáveis de ambiente no uso real.
 
+# Mapeamento Atualizado com base na descrição do usuário e categorias
+# Simplificando nomes para serem mais curtos nos cards
+# ATUALIZADO: Incluindo os novos pipelines 102 (Paróquia) e 104 (Pesquisa BR)
+# Montado uma única vez no import (antes era recriado a cada chamada)
+MAPEAMENTO_ESTAGIOS = {
+    # === SPA - Type ID 1098 STAGES (Pipelines 92 e 94) ===
+    'DT1098_92:NEW': 'AGUARDANDO CERTIDÃO',
+    'DT1098_94:NEW': 'AGUARDANDO CERTIDÃO',
+    'DT1098_92:UC_P6PYHW': 'PESQUISA - BR',
+    'DT1098_94:UC_4YE2PI': 'PESQUISA - BR',
+    'DT1098_92:PREPARATION': 'BUSCA - CRC',
+    'DT1098_94:PREPARATION': 'BUSCA - CRC',
+    'DT1098_92:UC_XBTHZ7': 'DEVOLUTIVA BUSCA - CRC',
+    'DT1098_94:CLIENT': 'DEVOLUTIVA BUSCA - CRC', # Nota: CLIENT em Tatuapé é Devolutiva Busca CRC
+    'DT1098_92:CLIENT': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
+    'DT1098_92:UC_I61XLW': 'AGUARDANDO DECISÃO CLIENTE',
+    'DT1098_94:UC_IQ4WFA': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
+    'DT1098_92:UC_ZWO7BI': 'MONTAGEM REQUERIMENTO CARTÓRIO',
+    'DT1098_94:UC_UZHXWF': 'MONTAGEM REQUERIMENTO CARTÓRIO',
+    'DT1098_92:UC_83ZGKS': 'SOLICITAR CARTÓRIO DE ORIGEM',
+    'DT1098_94:UC_DH38EI': 'SOLICITAR CARTÓRIO DE ORIGEM',
+    'DT1098_92:UC_6TECYL': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
+    'DT1098_94:UC_X9UE60': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
+    'DT1098_92:UC_MUJP1P': 'AGUARDANDO CARTÓRIO ORIGEM',
+    'DT1098_94:UC_IXCAA5': 'AGUARDANDO CARTÓRIO ORIGEM',
+    'DT1098_92:UC_EYBGVD': 'DEVOLUÇÃO ADM',
+    'DT1098_94:UC_VS8YKI': 'DEVOLUÇÃO ADM',
+    'DT1098_92:UC_KC335Q': 'DEVOLVIDO REQUERIMENTO',
+    'DT1098_94:UC_M6A09E': 'DEVOLVIDO REQUERIMENTO',
+    'DT1098_92:UC_5LWUTX': 'CERTIDÃO EMITIDA',
+    'DT1098_94:UC_K4JS04': 'CERTIDÃO EMITIDA',
+    'DT1098_92:FAIL': 'SOLICITAÇÃO DUPLICADA',
+    'DT1098_94:FAIL': 'SOLICITAÇÃO DUPLICADA',
+    'DT1098_92:UC_Z24IF7': 'CANCELADO',
+    'DT1098_94:UC_MGTPX0': 'CANCELADO',
+    'DT1098_92:SUCCESS': 'CERTIDÃO ENTREGUE',
+    'DT1098_94:SUCCESS': 'CERTIDÃO ENTREGUE',
+    'DT1098_92:UC_U10R0R': 'CERTIDÃO DISPENSADA',
+    'DT1098_94:UC_L3JFKO': 'CERTIDÃO DISPENSADA',
+    
+    # === Pipeline 102 (Paróquia) ===
+    'DT1098_102:NEW': 'SOLICITAR PARÓQUIA DE ORIGEM',
+    'DT1098_102:PREPARATION': 'AGUARDANDO PARÓQUIA DE ORIGEM',
+    'DT1098_102:CLIENT': 'CERTIDÃO EMITIDA',
+    'DT1098_102:UC_45SBLC': 'DEVOLUÇÃO ADM',
+    'DT1098_102:SUCCESS': 'CERTIDÃO ENTREGUE',
+    'DT1098_102:FAIL': 'CANCELADO',
+    'DT1098_102:UC_676WIG': 'CERTIDÃO DISPENSADA',
+    'DT1098_102:UC_UHPXE8': 'CERTIDÃO ENTREGUE',
+    
+    # === Pipeline 104 (Pesquisa BR) ===
+    'DT1098_104:NEW': 'AGUARDANDO PESQUISADOR',
+    'DT1098_104:PREPARATION': 'PESQUISA EM ANDAMENTO',
+    'DT1098_104:SUCCESS': 'PESQUISA PRONTA PARA EMISSÃO',
+    'DT1098_104:FAIL': 'PESQUISA NÃO ENCONTRADA',
+    
+    # Manter mapeamentos genéricos caso algum STAGE_ID venha sem prefixo DT1098_XX:
+    'NEW': 'AGUARDANDO CERTIDÃO', 
+    'UC_P6PYHW': 'PESQUISA - BR', 
+    'UC_4YE2PI': 'PESQUISA - BR', 
+    'PREPARATION': 'BUSCA - CRC',
+    'UC_XBTHZ7': 'DEVOLUTIVA BUSCA - CRC',
+    'UC_IQ4WFA': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
+    'UC_ZWO7BI': 'MONTAGEM REQUERIMENTO CARTÓRIO',
+    'UC_UZHXWF': 'MONTAGEM REQUERIMENTO CARTÓRIO',
+    'UC_83ZGKS': 'SOLICITAR CARTÓRIO DE ORIGEM',
+    'UC_DH38EI': 'SOLICITAR CARTÓRIO DE ORIGEM',
+    'UC_6TECYL': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
+    'UC_X9UE60': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
+    'UC_MUJP1P': 'AGUARDANDO CARTÓRIO ORIGEM',
+    'UC_IXCAA5': 'AGUARDANDO CARTÓRIO ORIGEM',
+    'UC_EYBGVD': 'DEVOLUÇÃO ADM',
+    'UC_VS8YKI': 'DEVOLUÇÃO ADM',
+    'UC_KC335Q': 'DEVOLVIDO REQUERIMENTO',
+    'UC_M6A09E': 'DEVOLVIDO REQUERIMENTO',
+    'UC_5LWUTX': 'CERTIDÃO EMITIDA',
+    'UC_K4JS04': 'CERTIDÃO EMITIDA',
+    'FAIL': 'SOLICITAÇÃO DUPLICADA',
+    'UC_Z24IF7': 'CANCELADO',
+    'UC_MGTPX0': 'CANCELADO',
+    'SUCCESS': 'CERTIDÃO ENTREGUE',
+    'UC_U10R0R': 'CERTIDÃO DISPENSADA',
+    'UC_L3JFKO': 'CERTIDÃO DISPENSADA',
+    
+    # Genéricos para novos pipelines
+    'UC_45SBLC': 'DEVOLUÇÃO ADM',
+    'UC_676WIG': 'CERTIDÃO DISPENSADA',
+    'UC_UHPXE8': 'CERTIDÃO ENTREGUE',
+}
+
 def simplificar_nome_estagio(nome):
     """ Simplifica o nome do estágio para exibição. """
     if pd.isna(nome):
@@ -13,127 +105,92 @@ def simplificar_nome_estagio(nome):
 
     codigo_estagio = str(nome) # Garante que é string
 
-    # Mapeamento Atualizado com base na descrição do usuário e categorias
-    # Simplificando nomes para serem mais curtos nos cards
-    # ATUALIZADO: Incluindo os novos pipelines 102 (Paróquia) e 104 (Pesquisa BR)
-    mapeamento = {
-        # === SPA - Type ID 1098 STAGES (Pipelines 92 e 94) ===
-        'DT1098_92:NEW': 'AGUARDANDO CERTIDÃO',
-        'DT1098_94:NEW': 'AGUARDANDO CERTIDÃO',
-        'DT1098_92:UC_P6PYHW': 'PESQUISA - BR',
-        'DT1098_94:UC_4YE2PI': 'PESQUISA - BR',
-        'DT1098_92:PREPARATION': 'BUSCA - CRC',
-        'DT1098_94:PREPARATION': 'BUSCA - CRC',
-        'DT1098_92:UC_XBTHZ7': 'DEVOLUTIVA BUSCA - CRC',
-        'DT1098_94:CLIENT': 'DEVOLUTIVA BUSCA - CRC', # Nota: CLIENT em Tatuapé é Devolutiva Busca CRC
-        'DT1098_92:CLIENT': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
-        'DT1098_92:UC_I61XLW': 'AGUARDANDO DECISÃO CLIENTE',
-        'DT1098_94:UC_IQ4WFA': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
-        'DT1098_92:UC_ZWO7BI': 'MONTAGEM REQUERIMENTO CARTÓRIO',
-        'DT1098_94:UC_UZHXWF': 'MONTAGEM REQUERIMENTO CARTÓRIO',
-        'DT1098_92:UC_83ZGKS': 'SOLICITAR CARTÓRIO DE ORIGEM',
-        'DT1098_94:UC_DH38EI': 'SOLICITAR CARTÓRIO DE ORIGEM',
-        'DT1098_92:UC_6TECYL': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
-        'DT1098_94:UC_X9UE60': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
-        'DT1098_92:UC_MUJP1P': 'AGUARDANDO CARTÓRIO ORIGEM',
-        'DT1098_94:UC_IXCAA5': 'AGUARDANDO CARTÓRIO ORIGEM',
-        'DT1098_92:UC_EYBGVD': 'DEVOLUÇÃO ADM',
-        'DT1098_94:UC_VS8YKI': 'DEVOLUÇÃO ADM',
-        'DT1098_92:UC_KC335Q': 'DEVOLVIDO REQUERIMENTO',
-        'DT1098_94:UC_M6A09E': 'DEVOLVIDO REQUERIMENTO',
-        'DT1098_92:UC_5LWUTX': 'CERTIDÃO EMITIDA',
-        'DT1098_94:UC_K4JS04': 'CERTIDÃO EMITIDA',
-        'DT1098_92:FAIL': 'SOLICITAÇÃO DUPLICADA',
-        'DT1098_94:FAIL': 'SOLICITAÇÃO DUPLICADA',
-        'DT1098_92:UC_Z24IF7': 'CANCELADO',
-        'DT1098_94:UC_MGTPX0': 'CANCELADO',
-        'DT1098_92:SUCCESS': 'CERTIDÃO ENTREGUE',
-        'DT1098_94:SUCCESS': 'CERTIDÃO ENTREGUE',
-        'DT1098_92:UC_U10R0R': 'CERTIDÃO DISPENSADA',
-        'DT1098_94:UC_L3JFKO': 'CERTIDÃO DISPENSADA',
-        
-        # === Pipeline 102 (Paróquia) ===
-        'DT1098_102:NEW': 'SOLICITAR PARÓQUIA DE ORIGEM',
-        'DT1098_102:PREPARATION': 'AGUARDANDO PARÓQUIA DE ORIGEM',
-        'DT1098_102:CLIENT': 'CERTIDÃO EMITIDA',
-        'DT1098_102:UC_45SBLC': 'DEVOLUÇÃO ADM',
-        'DT1098_102:SUCCESS': 'CERTIDÃO ENTREGUE',
-        'DT1098_102:FAIL': 'CANCELADO',
-        'DT1098_102:UC_676WIG': 'CERTIDÃO DISPENSADA',
-        'DT1098_102:UC_UHPXE8': 'CERTIDÃO ENTREGUE',
-        
-        # === Pipeline 104 (Pesquisa BR) ===
-        'DT1098_104:NEW': 'AGUARDANDO PESQUISADOR',
-        'DT1098_104:PREPARATION': 'PESQUISA EM ANDAMENTO',
-        'DT1098_104:SUCCESS': 'PESQUISA PRONTA PARA EMISSÃO',
-        'DT1098_104:FAIL': 'PESQUISA NÃO ENCONTRADA',
-        
-        # Manter mapeamentos genéricos caso algum STAGE_ID venha sem prefixo DT1098_XX:
-        'NEW': 'AGUARDANDO CERTIDÃO', 
-        'UC_P6PYHW': 'PESQUISA - BR', 
-        'UC_4YE2PI': 'PESQUISA - BR', 
-        'PREPARATION': 'BUSCA - CRC',
-        'UC_XBTHZ7': 'DEVOLUTIVA BUSCA - CRC',
-        'UC_IQ4WFA': 'APENAS ASS. REQ CLIENTE P/MONTAGEM',
-        'UC_ZWO7BI': 'MONTAGEM REQUERIMENTO CARTÓRIO',
-        'UC_UZHXWF': 'MONTAGEM REQUERIMENTO CARTÓRIO',
-        'UC_83ZGKS': 'SOLICITAR CARTÓRIO DE ORIGEM',
-        'UC_DH38EI': 'SOLICITAR CARTÓRIO DE ORIGEM',
-        'UC_6TECYL': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
-        'UC_X9UE60': 'SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE',
-        'UC_MUJP1P': 'AGUARDANDO CARTÓRIO ORIGEM',
-        'UC_IXCAA5': 'AGUARDANDO CARTÓRIO ORIGEM',
-        'UC_EYBGVD': 'DEVOLUÇÃO ADM',
-        'UC_VS8YKI': 'DEVOLUÇÃO ADM',
-        'UC_KC335Q': 'DEVOLVIDO REQUERIMENTO',
-        'UC_M6A09E': 'DEVOLVIDO REQUERIMENTO',
-        'UC_5LWUTX': 'CERTIDÃO EMITIDA',
-        'UC_K4JS04': 'CERTIDÃO EMITIDA',
-        'FAIL': 'SOLICITAÇÃO DUPLICADA',
-        'UC_Z24IF7': 'CANCELADO',
-        'UC_MGTPX0': 'CANCELADO',
-        'SUCCESS': 'CERTIDÃO ENTREGUE',
-        'UC_U10R0R': 'CERTIDÃO DISPENSADA',
-        'UC_L3JFKO': 'CERTIDÃO DISPENSADA',
-        
-        # Genéricos para novos pipelines
-        'UC_45SBLC': 'DEVOLUÇÃO ADM',
-        'UC_676WIG': 'CERTIDÃO DISPENSADA',
-        'UC_UHPXE8': 'CERTIDÃO ENTREGUE',
-    }
-
-    nome_legivel = mapeamento.get(codigo_estagio)
+    nome_legivel = MAPEAMENTO_ESTAGIOS.get(codigo_estagio)
     if nome_legivel is None and ':' in codigo_estagio:
         apenas_codigo = codigo_estagio.split(':')[-1]
-        nome_legivel = mapeamento.get(apenas_codigo)
+        nome_legivel = MAPEAMENTO_ESTAGIOS.get(apenas_codigo)
     if nome_legivel is None:
         return codigo_estagio.split(':')[-1] if ':' in codigo_estagio else codigo_estagio if codigo_estagio else "Desconhecido"
     return nome_legivel
 
+# ATUALIZADO: Incluindo os novos estágios dos pipelines 102 (Paróquia) e 104 (Pesquisa BR)
+ESTAGIOS_SUCESSO = frozenset([
+    'CERTIDÃO ENTREGUE',
+    'CERTIDÃO EMITIDA',
+    'PESQUISA PRONTA PARA EMISSÃO'  # Novo: Pipeline 104
+])
+ESTAGIOS_FALHA = frozenset([
+    'DEVOLUÇÃO ADM',
+    'DEVOLVIDO REQUERIMENTO',
+    'SOLICITAÇÃO DUPLICADA',
+    'CANCELADO',
+    'DEVOLUTIVA BUSCA - CRC',
+    'CERTIDÃO DISPENSADA',
+    'PESQUISA NÃO ENCONTRADA'  # Novo: Pipeline 104
+])
+
 def categorizar_estagio(estagio_legivel):
     """ Categoriza o estágio simplificado em SUCESSO, EM ANDAMENTO ou FALHA. """
-    # ATUALIZADO: Incluindo os novos estágios dos pipelines 102 (Paróquia) e 104 (Pesquisa BR)
-    sucesso = [
-        'CERTIDÃO ENTREGUE',
-        'CERTIDÃO EMITIDA',
-        'PESQUISA PRONTA PARA EMISSÃO'  # Novo: Pipeline 104
-    ]
-    falha = [
-        'DEVOLUÇÃO ADM',
-        'DEVOLVIDO REQUERIMENTO',
-        'SOLICITAÇÃO DUPLICADA',
-        'CANCELADO',
-        'DEVOLUTIVA BUSCA - CRC',
-        'CERTIDÃO DISPENSADA',
-        'PESQUISA NÃO ENCONTRADA'  # Novo: Pipeline 104
-    ]
-    if estagio_legivel in sucesso:
+    if estagio_legivel in ESTAGIOS_SUCESSO:
         return 'SUCESSO'
-    elif estagio_legivel in falha:
+    elif estagio_legivel in ESTAGIOS_FALHA:
         return 'FALHA'
     else:
         return 'EM ANDAMENTO' if estagio_legivel != "Desconhecido" else "DESCONHECIDO"
 
+def _mapear_valores_unicos(serie, funcao, categorica):
+    """
+    Aplica `funcao` apenas aos valores distintos da série e espalha o resultado pelos códigos.
+
+    Uma coluna de estágios tem poucas dezenas de valores distintos, então o custo deixa
+    de ser proporcional ao número de linhas (como no .apply) e passa a ser o de um
+    pd.factorize + um take em NumPy.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    resultados = [funcao(valor) for valor in unicos]
+    # Código -1 (nulo) vai para a última posição
+    resultados.append(funcao(None))
+    categorias = list(dict.fromkeys(resultados))
+    posicao = {valor: i for i, valor in enumerate(categorias)}
+    codigos_resultado = np.array([posicao[valor] for valor in resultados], dtype=np.int32)[codigos]
+    if categorica:
+        return pd.Series(pd.Categorical.from_codes(codigos_resultado, categories=categorias),
+                         index=serie.index, name=serie.name)
+    return pd.Series(np.array(categorias, dtype=object)[codigos_resultado], index=serie.index, name=serie.name)
+
+def mapear_estagios(serie, categorica=True):
+    """
+    Versão vetorizada de simplificar_nome_estagio para uma coluna inteira de STAGE_ID.
+
+    Mesmo resultado de serie.apply(simplificar_nome_estagio), inclusive o fallback pelo
+    código após o ':'.
+
+    Args:
+        serie (pandas.Series): Coluna de STAGE_ID (ou STAGE_NAME)
+        categorica (bool): Se True devolve dtype category; se False, strings (object).
+            Use False quando a coluna for usada em groupby/pivot_table, que com category
+            listariam também os estágios sem registros.
+
+    Returns:
+        pandas.Series: Nomes legíveis dos estágios
+    """
+    return _mapear_valores_unicos(serie, simplificar_nome_estagio, categorica)
+
+def categorizar_estagios(serie_legivel, categorica=True):
+    """Versão vetorizada de categorizar_estagio (mesmos parâmetros de mapear_estagios)."""
+    return _mapear_valores_unicos(serie_legivel, categorizar_estagio, categorica)
+
+def adicionar_colunas_estagio(df, coluna_estagio='STAGE_ID', categorica=True):
+    """
+    Cria as colunas ESTAGIO_LEGIVEL e CATEGORIA_ESTAGIO a partir da coluna de estágio.
+
+    Returns:
+        pandas.DataFrame: O próprio df, com as duas colunas adicionadas
+    """
+    df['ESTAGIO_LEGIVEL'] = mapear_estagios(df[coluna_estagio], categorica=categorica)
+    df['CATEGORIA_ESTAGIO'] = categorizar_estagios(df['ESTAGIO_LEGIVEL'], categorica=categorica)
+    return df
+
 # --- Função para buscar dados do Supabase (movida de producao.py) ---
 def fetch_supabase_producao_data(data_inicio_str, data_fim_str):
     """Busca dados da função RPC get_producao_time_doutora_periodo no Supabase."""
@@ -147,99 +204,61 @@ def fetch_supabase_producao_data(data_inicio_str, data_fim_str):
             "apikey": st.secrets.supabase.anon_key,
             "Authorization": f"Bearer {st.secrets.supabase.service_key}",
             "Content-Type": "application/json",
-            "Prefer": "count=exact", 
-            "Range-Unit": "items", # Especifica a unidade do range
-            "Range": "0-"  # Tenta requisitar do índice 0 até o final
-        }
-        params = {
-            "p_data_inicio": data_inicio_str, # Parâmetro p_data_inicio
-            "p_data_fim": data_fim_str      # Parâmetro p_data_fim
         }
-        
-        print(f"--- DEBUG: Parâmetros enviados para RPC get_producao_time_doutora_periodo: {params} ---")
-        
-        rpc_url = f"{st.secrets.supabase.url}/rest/v1/rpc/get_producao_time_doutora_periodo"
-        
-        # Fazer a consulta normal com o período solicitado
-        response = requests.post(rpc_url, headers=headers, json=params)
-        response.raise_for_status()  # Levanta um erro para respostas HTTP 4xx/5xx
+        print(f"--- DEBUG: Período enviado para RPC get_producao_time_doutora_periodo: {data_inicio_str} a {data_fim_str} ---")
 
-        print(f"--- DEBUG: Resposta HTTP STATUS CODE: {response.status_code} ---")
-        print("--- DEBUG: Resposta HTTP HEADERS ---")
-        print(response.headers)
-        
-        response_text_for_log = response.text
-        if len(response_text_for_log) > 3000: # Limitar o log se for muito grande
-            print(response_text_for_log[:1500] + "... (resposta truncada) ..." + response_text_for_log[-1500:])
-        else:
-            print(response_text_for_log)
+        # Dias já buscados vêm do cache em disco; só os dias ausentes ou ainda abertos
+        # são pedidos ao Supabase (em páginas, via Range)
+        df = fetch_rpc_period(
+            st.secrets.supabase.url, headers, "get_producao_time_doutora_periodo",
+            data_inicio_str, data_fim_str, date_field="timestamp",
+            tiebreakers=("card_id", "stage_id", "calculated_previous_stage_id"),
+        )
 
-        data = response.json()
-        
         print("--- DEBUG: Dados crus da RPC Supabase (get_producao_time_doutora_periodo) ---")
-        if isinstance(data, list) and len(data) > 0:
-            print(f"Total de registros recebidos: {len(data)}")
-            print(f"Primeiro registro recebido: {data[0]}")
-            if isinstance(data[0], dict):
-                print(f"Chaves no primeiro registro: {list(data[0].keys())}")
-            else:
-                print("Primeiro registro não é um dicionário.")
-        elif isinstance(data, list):
+        if df.empty:
             print("RPC retornou uma lista vazia.")
             st.warning("Nenhum dado encontrado no Supabase para o período especificado.")
             return pd.DataFrame()
-        else:
-            print(f"RPC retornou dados que não são uma lista: {type(data)}")
-            st.error(f"Resposta inesperada da API Supabase: {type(data)}")
-            return pd.DataFrame()
+        print(f"Total de registros recebidos: {len(df)}")
+        print(f"Primeiro registro do DataFrame ANTES do rename:\n{df.head(1)}")
         
-        if isinstance(data, list) and len(data) > 0:
-            df = pd.DataFrame(data)
-            
-            print("--- DEBUG: Colunas do DataFrame ANTES do rename ---")
-            print(df.columns.tolist())
-            if not df.empty:
-                print(f"Primeiro registro do DataFrame ANTES do rename:\n{df.head(1)}")
-            
-            # Renomear colunas para corresponder ao esperado pelo Python
-            colunas_rename_map = {
-                "timestamp": "data_criacao", 
-                "card_id": "id_card",
-                "calculated_previous_stage_id": "previous_stage_id",
-                # Se stage_id vier com nome diferente, mapear aqui
-                "stage_id": "estagio_id",  # Garantir que seja mapeado para estagio_id
-            }
-            
-            # Aplicar rename apenas para colunas que existem
-            colunas_para_renomear = {k: v for k, v in colunas_rename_map.items() if k in df.columns}
-            if colunas_para_renomear:
-                df.rename(columns=colunas_para_renomear, inplace=True)
-                print(f"--- DEBUG: Colunas renomeadas: {colunas_para_renomear} ---")
+        # Renomear colunas para corresponder ao esperado pelo Python
+        colunas_rename_map = {
+            "timestamp": "data_criacao", 
+            "card_id": "id_card",
+            "calculated_previous_stage_id": "previous_stage_id",
+            # Se stage_id vier com nome diferente, mapear aqui
+            "stage_id": "estagio_id",  # Garantir que seja mapeado para estagio_id
+        }
+        
+        # Aplicar rename apenas para colunas que existem
+        colunas_para_renomear = {k: v for k, v in colunas_rename_map.items() if k in df.columns}
+        if colunas_para_renomear:
+            df.rename(columns=colunas_para_renomear, inplace=True)
+            print(f"--- DEBUG: Colunas renomeadas: {colunas_para_renomear} ---")
+        
+        print("--- DEBUG: Colunas do DataFrame DEPOIS do rename ---")
+        print(df.columns.tolist())
+        if not df.empty:
+            print(f"Primeiro registro do DataFrame DEPOIS do rename:\n{df.head(1)}")
             
-            print("--- DEBUG: Colunas do DataFrame DEPOIS do rename ---")
-            print(df.columns.tolist())
-            if not df.empty:
-                print(f"Primeiro registro do DataFrame DEPOIS do rename:\n{df.head(1)}")
+        # Verificar se as colunas essenciais estão presentes
+        colunas_essenciais = ['data_criacao', 'id_card', 'estagio_id', 'movido_por_id']
+        colunas_faltando = [col for col in colunas_essenciais if col not in df.columns]
+        
+        if colunas_faltando:
+            st.warning(f"Colunas essenciais não encontradas nos dados do Supabase: {colunas_faltando}. Colunas disponíveis: {df.columns.tolist()}")
+            # Criar colunas faltando com valores padrão
+            for col in colunas_faltando:
+                df[col] = None
                 
-            # Verificar se as colunas essenciais estão presentes
-            colunas_essenciais = ['data_criacao', 'id_card', 'estagio_id', 'movido_por_id']
-            colunas_faltando = [col for col in colunas_essenciais if col not in df.columns]
-            
-            if colunas_faltando:
-                st.warning(f"Colunas essenciais não encontradas nos dados do Supabase: {colunas_faltando}. Colunas disponíveis: {df.columns.tolist()}")
-                # Criar colunas faltando com valores padrão
-                for col in colunas_faltando:
-                    df[col] = None
-                    
-            return df
-        else:
-            st.warning("Nenhum dado válido retornado do Supabase.")
-            return pd.DataFrame()
+        return df
             
     except requests.exceptions.HTTPError as http_err:
         error_msg = f"Erro HTTP ao buscar dados do Supabase: {http_err}"
-        if 'response' in locals():
-            error_msg += f" - {response.text}"
+        if http_err.response is not None:
+            error_msg += f" - {http_err.response.text}"
         st.error(error_msg)
         print(f"--- DEBUG HTTP ERROR: {error_msg} ---")
         # Usar dados de demonstração em caso de erro
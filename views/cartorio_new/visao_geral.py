@@ -5,7 +5,7 @@ from datetime import datetime, date # Adicionado datetime e date
 import os # Importar os para manipulação de caminhos
 
 # Importar funções do novo utils
-from .utils import simplificar_nome_estagio, categorizar_estagio
+from .utils import simplificar_nome_estagio, categorizar_estagio, mapear_estagios, categorizar_estagios
 
 # Obter o diretório do arquivo atual
 _VISAO_GERAL_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -305,8 +305,8 @@ def exibir_visao_geral(df_original):
         return
 
     df[stage_col] = df[stage_col].astype(str)
-    df['STAGE_NAME_LEGIVEL'] = df[stage_col].apply(simplificar_nome_estagio)
-    df['CATEGORIA'] = df['STAGE_NAME_LEGIVEL'].apply(categorizar_estagio)
+    df['STAGE_NAME_LEGIVEL'] = mapear_estagios(df[stage_col], categorica=False)
+    df['CATEGORIA'] = categorizar_estagios(df['STAGE_NAME_LEGIVEL'], categorica=False)
 
     # --- Cálculos e Visualização de Estágios (usando o df FINALMENTE FILTRADO) ---
     st.markdown("#### Detalhamento por Estágio") # Subheader
@@ -6,7 +6,6 @@ from .producao_comune import show_producao_comune
 from .funil_certidoes_italianas import show_funil_certidoes_italianas
 
 import pandas as pd
-import io
 from datetime import datetime
 import time
 import sys
@@ -21,6 +20,7 @@ sys.path.insert(0, str(utils_path))
 # Importar funções necessárias
 from bitrix_connector import load_bitrix_data
 from refresh_utils import handle_refresh_trigger, get_force_reload_status, clear_force_reload_flag
+from export_engine import export_xlsx, download_export
 
 @st.cache_data(ttl=3600) # Cache de 1 hora
 def cached_load_comune_data(force_reload=False):
@@ -353,18 +353,10 @@ def show_comune():
                             # Adicionar botão para exportar registros filtrados
                             col1, col2 = st.columns(2)
                             with col1:
-                                # Preparar buffer para o arquivo Excel
-                                buffer = io.BytesIO()
-                                
-                                # Criar um escritor Excel
-                                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                                    # Escrever o DataFrame filtrado em uma planilha
-                                    df_filtrado.to_excel(writer, sheet_name='Registros_Filtrados', index=False)
-                                
-                                # Oferecer download do arquivo
-                                st.download_button(
+                                # Oferecer download do DataFrame filtrado em uma planilha Excel
+                                download_export(
                                     label="📥 Exportar registros filtrados",
-                                    data=buffer.getvalue(),
+                                    path=export_xlsx({'Registros_Filtrados': df_filtrado}),
                                     file_name=f"comune_filtrados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                                     mime="application/vnd.ms-excel"
                                 )
@@ -415,13 +407,9 @@ def show_comune():
                             st.dataframe(df_ids_nao_existentes, use_container_width=True)
                             
                             # Botão para exportar IDs não existentes
-                            buffer_ids = io.BytesIO()
-                            with pd.ExcelWriter(buffer_ids, engine='xlsxwriter') as writer:
-                                df_ids_nao_existentes.to_excel(writer, sheet_name='IDs_Nao_Existentes', index=False)
-                            
-                            st.download_button(
+                            download_export(
                                 label="📥 Exportar IDs não existentes em Comune",
-                                data=buffer_ids.getvalue(),
+                                path=export_xlsx({'IDs_Nao_Existentes': df_ids_nao_existentes}),
                                 file_name=f"ids_familia_nao_existentes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                                 mime="application/vnd.ms-excel"
                             )
@@ -557,30 +545,25 @@ def show_comune():
         st.markdown("---")
         st.subheader("Download dos Dados")
         
-        # Preparar buffer para o arquivo Excel
-        buffer = io.BytesIO()
+        # Planilhas do arquivo Excel (o arquivo é reaproveitado enquanto os dados não mudarem)
+        planilhas = {'Dados_COMUNE': df_comune}
         
-        # Criar um escritor Excel
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            # Escrever os DataFrames em diferentes planilhas
-            df_comune.to_excel(writer, sheet_name='Dados_COMUNE', index=False)
+        # Se tiver visão geral, adicionar também
+        try:
+            visao_geral = criar_visao_geral_comune(df_comune)
+            if not visao_geral.empty:
+                planilhas['Visao_Geral'] = visao_geral
             
-            # Se tiver visão geral, adicionar também
-            try:
-                visao_geral = criar_visao_geral_comune(df_comune)
-                if not visao_geral.empty:
-                    visao_geral.to_excel(writer, sheet_name='Visao_Geral', index=False)
-                
-                visao_macro = criar_visao_macro(df_comune)
-                if not visao_macro.empty:
-                    visao_macro.to_excel(writer, sheet_name='Visao_Macro', index=False)
-            except Exception as e:
-                st.error(f"Erro ao criar planilhas auxiliares: {str(e)}")
+            visao_macro = criar_visao_macro(df_comune)
+            if not visao_macro.empty:
+                planilhas['Visao_Macro'] = visao_macro
+        except Exception as e:
+            st.error(f"Erro ao criar planilhas auxiliares: {str(e)}")
         
         # Oferecer download do arquivo
-        st.download_button(
+        download_export(
             label="📥 Baixar Dados em Excel",
-            data=buffer.getvalue(),
+            path=export_xlsx(planilhas),
             file_name=f"comune_bitrix24_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
             mime="application/vnd.ms-excel"
         )
@@ -7,6 +7,9 @@ import os
 import json
 import re # Para remoção de pontuação e prefixos
 from unidecode import unidecode # Para remover acentos
+from utils.geocoding_index import get_geocoding_index
+from utils.location_normalizer import (RemovedorPrefixos, SubstituidorEmOrdem, aplicar_por_valor_unico,
+                                       compilar_palavras, remover_acentos)
 
 # Try importing thefuzz, provide guidance if not found
 try:
@@ -21,198 +24,197 @@ except ImportError:
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Prefixos de certidão removidos antes da normalização (em ordem): natti/matri primeiro,
+# depois "-natti..."/"- matri..." e os prefixos de certidões específicos italianos
+_PREFIXOS_CERTIDAO = [re.compile(padrao) for padrao in (
+    r'^natti\s*[:-]?\s*', r'^matri\s*[:-]?\s*', r'^-\s*natti\s*[:-]?\s*', r'^-\s*matri\s*[:-]?\s*',
+    r'^nascita\s*[:-]?\s*', r'^matrimonio\s*[:-]?\s*', r'^certidao de\s*[:-]?\s*', r'^certidao\s*[:-]?\s*',
+)]
+# Tenta dividir por separadores e pegar a primeira parte
+_SEPARADORES = [',', '(', '/', '-', '[', ';', ':']  # Adicionados mais separadores
+
+def _limpar_valor(text):
+    text = text.lower()
+    for padrao in _PREFIXOS_CERTIDAO:
+        text = padrao.sub('', text)
+    for sep in _SEPARADORES:
+        if sep in text:
+            text = text.split(sep, 1)[0]
+    return text.strip()
+
 def _limpar_antes_normalizar(series):
     """Tenta remover texto extra após vírgula, parêntese, barra ou hífen e prefixos natti/matri."""
     if not isinstance(series, pd.Series):
         series = pd.Series(series)
-    
-    # Remover prefixos natti/matri primeiro
-    series = series.astype(str).str.lower()
-    series = series.str.replace(r'^natti\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^matri\s*[:-]?\s*', '', regex=True)
-    # Remover prefixos como "-natti..." ou "- matri..."
-    series = series.str.replace(r'^-\s*natti\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^-\s*matri\s*[:-]?\s*', '', regex=True)
-    # MELHORIA: Remover prefixos de certidões específicos italianos
-    series = series.str.replace(r'^nascita\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^matrimonio\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^certidao de\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^certidao\s*[:-]?\s*', '', regex=True)
-
-    def clean_text(text):
-        if pd.isna(text) or not isinstance(text, str): return text
-        # Tenta dividir por separadores e pegar a primeira parte
-        separadores = [',', '(', '/', '-', '[', ';', ':']  # Adicionados mais separadores
-        for sep in separadores:
-            if sep in text:
-                text = text.split(sep, 1)[0]
-        return text.strip()
-
-    return series.apply(clean_text)
-
-def _normalizar_localizacao(series):
-    """Normalização agressiva para campos de localização."""
-    if not isinstance(series, pd.Series):
-        series = pd.Series(series)
-        
-    # 1. Converter para string e minúsculas (já feito parcialmente em _limpar_antes_normalizar)
-    normalized = series.fillna('').astype(str).str.lower()
-    
-    # 2. Remover acentos
-    try:
-        normalized = normalized.apply(lambda x: unidecode(x) if isinstance(x, str) else x)
-    except Exception:
-         normalized = pd.Series([unidecode(str(x)) for x in series.fillna('')], index=series.index)
-         normalized = normalized.str.lower()
-
-    # 3. Remover prefixos GERAIS comuns - AMPLIADO
-    prefixos_gerais = [
-        'comune di ', 'provincia di ', 'parrocchia di ', 'parrocchia ', 'citta di ', 
-        'diocese di ', 'chiesa di ', 'chiesa parrocchiale di ', 'comune ', 'citta ',
-        'diocesi ', 'diocesi di ', 'archivio di ', 'anagrafe di ', 'frazione di ', 'frazione ',
-        'municipio di ', 'municipio ', 'ufficio anagrafe di ', 'ufficio di stato civile di ',
-        'ufficio anagrafe ', 'ufficio di stato civile ', 'ufficio dello stato civile ',
-        'parrocchia della ', 'parrocchia del ', 'parrocchia dei ', 'parrocchia degli ',
-        'comune della ', 'comune del ', 'comune dei ', 'comune degli ',
-        # Novas adições:
-        'archidiocesi di ', 'archidiocesi ', 'arcidiocesi di ', 'arcidiocesi ',
-        'basilica di ', 'basilica ', 'cappella di ', 'cappella ',
-        'cattedrale di ', 'cattedrale ', 'chiesa arcipretale di ', 'chiesa arcipretale ',
-        'chiesa collegiata di ', 'chiesa collegiata ', 'chiesa matrice di ', 'chiesa matrice ',
-        'convento di ', 'convento ', 'monastero di ', 'monastero ',
-        'pieve di ', 'pieve ', 'santuario di ', 'santuario ',
-        'parrocchiale di ', 'parrocchiale ', 'vicaria di ', 'vicaria '
-    ]
-    for prefix in prefixos_gerais:
-        normalized = normalized.str.replace(f'^{re.escape(prefix)}', '', regex=True)
-        
-    # 3.5 Remover prefixos RELIGIOSOS comuns (após os gerais) - AMPLIADO
-    prefixos_religiosos = [
-        'san ', 'santa ', 'santi ', 'santo ', 's ', 'ss ', 'st ', 
-        'beato ', 'beata ', 'santissima ', 'santissimo ',
-        'natale ', 'nativita di ', 'nativita ', 'nascita di ', 'nascita ', 
-        'battesimo di ', 'battesimo ', 'maria ', 'madonna ',
-        # Novas adições:
-        'sant\'', 'sant ', 'santa maria ', 'santa maria di ', 'santa maria del ',
-        'sacro cuore di ', 'sacro cuore ', 'sacro ', 'san giovanni ', 'san giovanni di ',
-        'san michele ', 'san michele di ', 'san pietro ', 'san pietro di ',
-        'san nicola ', 'san nicola di ', 'san lorenzo ', 'san lorenzo di ',
-        'san martino ', 'san martino di ', 'san marco ', 'san marco di '
-    ]
-    for prefix in prefixos_religiosos:
-        # Usar word boundary (\b) para evitar remover 'san' de 'sanremo'
-        normalized = normalized.str.replace(f'^{re.escape(prefix)}(\\b)?', '', regex=True)
+    # Calculado uma vez por valor distinto (os nomes de comune se repetem muito)
+    return aplicar_por_valor_unico(series.astype(str), _limpar_valor)
+
+# --- Listas da normalização de localização (compiladas uma vez no import) ---
+# 3. Remover prefixos GERAIS comuns - AMPLIADO
+PREFIXOS_GERAIS = [
+    'comune di ', 'provincia di ', 'parrocchia di ', 'parrocchia ', 'citta di ', 
+    'diocese di ', 'chiesa di ', 'chiesa parrocchiale di ', 'comune ', 'citta ',
+    'diocesi ', 'diocesi di ', 'archivio di ', 'anagrafe di ', 'frazione di ', 'frazione ',
+    'municipio di ', 'municipio ', 'ufficio anagrafe di ', 'ufficio di stato civile di ',
+    'ufficio anagrafe ', 'ufficio di stato civile ', 'ufficio dello stato civile ',
+    'parrocchia della ', 'parrocchia del ', 'parrocchia dei ', 'parrocchia degli ',
+    'comune della ', 'comune del ', 'comune dei ', 'comune degli ',
+    # Novas adições:
+    'archidiocesi di ', 'archidiocesi ', 'arcidiocesi di ', 'arcidiocesi ',
+    'basilica di ', 'basilica ', 'cappella di ', 'cappella ',
+    'cattedrale di ', 'cattedrale ', 'chiesa arcipretale di ', 'chiesa arcipretale ',
+    'chiesa collegiata di ', 'chiesa collegiata ', 'chiesa matrice di ', 'chiesa matrice ',
+    'convento di ', 'convento ', 'monastero di ', 'monastero ',
+    'pieve di ', 'pieve ', 'santuario di ', 'santuario ',
+    'parrocchiale di ', 'parrocchiale ', 'vicaria di ', 'vicaria '
+]
+
+# 3.5 Remover prefixos RELIGIOSOS comuns (após os gerais) - AMPLIADO
+PREFIXOS_RELIGIOSOS = [
+    'san ', 'santa ', 'santi ', 'santo ', 's ', 'ss ', 'st ', 
+    'beato ', 'beata ', 'santissima ', 'santissimo ',
+    'natale ', 'nativita di ', 'nativita ', 'nascita di ', 'nascita ', 
+    'battesimo di ', 'battesimo ', 'maria ', 'madonna ',
+    # Novas adições:
+    'sant\'', 'sant ', 'santa maria ', 'santa maria di ', 'santa maria del ',
+    'sacro cuore di ', 'sacro cuore ', 'sacro ', 'san giovanni ', 'san giovanni di ',
+    'san michele ', 'san michele di ', 'san pietro ', 'san pietro di ',
+    'san nicola ', 'san nicola di ', 'san lorenzo ', 'san lorenzo di ',
+    'san martino ', 'san martino di ', 'san marco ', 'san marco di '
+]
+
+# MELHORIA: Remover palavras irrelevantes para correspondência
+PALAVRAS_IRRELEVANTES = [
+    'della', 'dello', 'delle', 'degli', 'dei', 'del', 'di', 'da', 'dal', 'e', 'ed', 'in', 'con',
+    'su', 'sul', 'sulla', 'sulle', 'sui', 'sugli', 'per', 'tra', 'fra', 'a', 'al', 'alla', 'alle',
+    'ai', 'agli', 'il', 'lo', 'la', 'le', 'i', 'gli', 'un', 'uno', 'una', 'nello', 'nella', 'nelle',
+    'negli', 'nei', 'all', 'dall', 'dall', 'dall',
+    # Novas adições:
+    'presso', 'vicino', 'sopra', 'sotto', 'davanti', 'dietro', 'accanto', 'oltre',
+    'verso', 'senza', 'secondo', 'lungo', 'durante', 'dentro', 'fuori', 'prima', 'dopo',
+    'contro', 'attraverso', 'circa', 'intorno', 'grazie', 'mediante', 'oltre', 'malgrado',
+    'nonostante', 'salvo', 'eccetto', 'fino', 'verso'
+]
+
+# MELHORIA: Substituições para casos comuns
+SUBSTITUICOES_LOCALIZACAO = {
+    'sangiovanni': 'giovanni',
+    'sangiuseppe': 'giuseppe',
+    'sanlorenzo': 'lorenzo',
+    'sanfrancesco': 'francesco',
+    'sanmartino': 'martino',
+    'santamaria': 'maria',
+    'santantonio': 'antonio',
+    'sanvincenzo': 'vincenzo',
+    'santangelo': 'angelo',
+    'santanna': 'anna',
+    'sanmichele': 'michele',
+    'sanmarco': 'marco',
+    'sannicola': 'nicola',
+    # Novas adições:
+    'sanbartolomeo': 'bartolomeo',
+    'ssantissima': 'santissima',
+    'santmaria': 'maria',
+    'santachiara': 'chiara',
+    'santacaterina': 'caterina',
+    'santandrea': 'andrea',
+    'santagnese': 'agnese',
+    'santarita': 'rita',
+    'santabarbara': 'barbara',
+    'santadomenica': 'domenica',
+    'santapaola': 'paola',
+    'santateresa': 'teresa',
+    'santaeufemia': 'eufemia',
+    'santabruna': 'bruna',
+    'santaelena': 'elena',
+    'santantonino': 'antonino',
+    'santadiocesi': 'diocesi',
+    'maddalena': 'magdalena',
+    'battista': 'batista',
+    'assunta': 'assumpta',
+    'assunzione': 'assumpcao',
+    'eucharistia': 'eucaristia',
+    # Correções regionais e províncias:
+    'treviso': 'treviso',
+    'venezia': 'venezia',
+    'veneza': 'venezia',
+    'padova': 'padova',
+    'podova': 'padova',
+    'verona': 'verona',
+    'vicenza': 'vicenza',
+    'rovigo': 'rovigo',
+    'belluno': 'belluno',
+    'mantova': 'mantova',
+    'mantua': 'mantova',
+    'mantoa': 'mantova',
+    'montova': 'mantova',
+    'mântua': 'mantova',
+    'brescia': 'brescia',
+    'massa-carrara': 'massa carrara',
+    'massa carrara': 'massa carrara',
+    'verbano-cusio-ossola': 'verbano cusio ossola',
+    'verbano-cusi': 'verbano cusio ossola',
+    'vibo-valentia': 'vibo valentia',
+    'pesaro-urbino': 'pesaro e urbino',
+    'chiete': 'chieti',
+    'biela': 'biella',
+    'lodi': 'lodi',
+    'novara': 'novara',
+    'varese': 'varese',
+    'pavia': 'pavia',
+    'vibo valentia': 'vibo valentia',
+    'caltanissetta': 'caltanissetta',
+    'agrigento': 'agrigento',
+    'crotone': 'crotone',
+    'sassari': 'sassari',
+    'enna': 'enna',
+    'avellino': 'avellino',
+    'toscana': 'toscana'
+}
+
+_REMOVEDOR_PREFIXOS_GERAIS = RemovedorPrefixos(PREFIXOS_GERAIS)
+_REMOVEDOR_PREFIXOS_RELIGIOSOS = RemovedorPrefixos(PREFIXOS_RELIGIOSOS)
+_RE_PONTUACAO = re.compile(r'[\'"\.,;!?()[\]{}]')
+_RE_SIGLA_FINAL = re.compile(r'\s+[a-z]{2}$')
+_RE_SIGLA_PARENTESES_FINAL = re.compile(r'\s*\([a-z]{2}\)$')
+_RE_PALAVRAS_IRRELEVANTES = compilar_palavras(PALAVRAS_IRRELEVANTES, escapar=False)
+_SUBSTITUIDOR_LOCALIZACAO = SubstituidorEmOrdem(SUBSTITUICOES_LOCALIZACAO, escapar=False)
+_RE_ESPACOS = re.compile(r'\s+')
+_VALORES_VAZIOS = {'', 'nan', 'none', 'null'}
+
+def _normalizar_valor(texto):
+    """Normalização agressiva de um único nome de localização."""
+    # 1 e 2. Minúsculas e remoção de acentos
+    texto = remover_acentos(texto.lower())
+
+    # 3 e 3.5. Prefixos gerais e depois os religiosos
+    texto = _REMOVEDOR_PREFIXOS_GERAIS.remover(texto)
+    texto = _REMOVEDOR_PREFIXOS_RELIGIOSOS.remover(texto)
 
     # 4. Remover pontuação básica
-    normalized = normalized.str.replace(r'[\'"\.,;!?()[\]{}]', '', regex=True)
-
-    # 4.5 Remover sufixos de província (espaço + 2 letras maiúsculas no fim)
-    # Primeiro remove o padrão com espaço, depois o padrão entre parênteses (se houver)
-    normalized = normalized.str.replace(r'\s+[a-z]{2}$', '', regex=True) # Remove ' xx' no final
-    normalized = normalized.str.replace(r'\s*\([a-z]{2}\)$', '', regex=True) # Remove ' (xx)' no final
-    normalized = normalized.str.strip() # Garante remoção de espaços caso o sufixo fosse a única coisa após a limpeza
-
-    # MELHORIA: Remover palavras irrelevantes para correspondência
-    palavras_irrelevantes = [
-        'della', 'dello', 'delle', 'degli', 'dei', 'del', 'di', 'da', 'dal', 'e', 'ed', 'in', 'con',
-        'su', 'sul', 'sulla', 'sulle', 'sui', 'sugli', 'per', 'tra', 'fra', 'a', 'al', 'alla', 'alle',
-        'ai', 'agli', 'il', 'lo', 'la', 'le', 'i', 'gli', 'un', 'uno', 'una', 'nello', 'nella', 'nelle',
-        'negli', 'nei', 'all', 'dall', 'dall', 'dall',
-        # Novas adições:
-        'presso', 'vicino', 'sopra', 'sotto', 'davanti', 'dietro', 'accanto', 'oltre',
-        'verso', 'senza', 'secondo', 'lungo', 'durante', 'dentro', 'fuori', 'prima', 'dopo',
-        'contro', 'attraverso', 'circa', 'intorno', 'grazie', 'mediante', 'oltre', 'malgrado',
-        'nonostante', 'salvo', 'eccetto', 'fino', 'verso'
-    ]
-    for palavra in palavras_irrelevantes:
-        normalized = normalized.str.replace(r'\b' + palavra + r'\b', ' ', regex=True)
-
-    # MELHORIA: Substituições para casos comuns
-    substituicoes = {
-        'sangiovanni': 'giovanni',
-        'sangiuseppe': 'giuseppe',
-        'sanlorenzo': 'lorenzo',
-        'sanfrancesco': 'francesco',
-        'sanmartino': 'martino',
-        'santamaria': 'maria',
-        'santantonio': 'antonio',
-        'sanvincenzo': 'vincenzo',
-        'santangelo': 'angelo',
-        'santanna': 'anna',
-        'sanmichele': 'michele',
-        'sanmarco': 'marco',
-        'sannicola': 'nicola',
-        # Novas adições:
-        'sanbartolomeo': 'bartolomeo',
-        'ssantissima': 'santissima',
-        'santmaria': 'maria',
-        'santachiara': 'chiara',
-        'santacaterina': 'caterina',
-        'santandrea': 'andrea',
-        'santagnese': 'agnese',
-        'santarita': 'rita',
-        'santabarbara': 'barbara',
-        'santadomenica': 'domenica',
-        'santapaola': 'paola',
-        'santateresa': 'teresa',
-        'santaeufemia': 'eufemia',
-        'santabruna': 'bruna',
-        'santaelena': 'elena',
-        'santantonino': 'antonino',
-        'santadiocesi': 'diocesi',
-        'maddalena': 'magdalena',
-        'battista': 'batista',
-        'assunta': 'assumpta',
-        'assunzione': 'assumpcao',
-        'eucharistia': 'eucaristia',
-        # Correções regionais e províncias:
-        'treviso': 'treviso',
-        'venezia': 'venezia',
-        'veneza': 'venezia',
-        'padova': 'padova',
-        'podova': 'padova',
-        'verona': 'verona',
-        'vicenza': 'vicenza',
-        'rovigo': 'rovigo',
-        'belluno': 'belluno',
-        'mantova': 'mantova',
-        'mantua': 'mantova',
-        'mantoa': 'mantova',
-        'montova': 'mantova',
-        'mântua': 'mantova',
-        'brescia': 'brescia',
-        'massa-carrara': 'massa carrara',
-        'massa carrara': 'massa carrara',
-        'verbano-cusio-ossola': 'verbano cusio ossola',
-        'verbano-cusi': 'verbano cusio ossola',
-        'vibo-valentia': 'vibo valentia',
-        'pesaro-urbino': 'pesaro e urbino',
-        'chiete': 'chieti',
-        'biela': 'biella',
-        'lodi': 'lodi',
-        'novara': 'novara',
-        'varese': 'varese',
-        'pavia': 'pavia',
-        'vibo valentia': 'vibo valentia',
-        'caltanissetta': 'caltanissetta',
-        'agrigento': 'agrigento',
-        'crotone': 'crotone',
-        'sassari': 'sassari',
-        'enna': 'enna',
-        'avellino': 'avellino',
-        'toscana': 'toscana'
-    }
-    for original, substituicao in substituicoes.items():
-        normalized = normalized.str.replace(r'\b' + original + r'\b', substituicao, regex=True)
+    texto = _RE_PONTUACAO.sub('', texto)
+
+    # 4.5 Remover sufixos de província (espaço + 2 letras no fim, ou ' (xx)' no fim)
+    texto = _RE_SIGLA_FINAL.sub('', texto)
+    texto = _RE_SIGLA_PARENTESES_FINAL.sub('', texto)
+    texto = texto.strip()
+
+    # Palavras irrelevantes e substituições para casos comuns
+    texto = _RE_PALAVRAS_IRRELEVANTES.sub(' ', texto)
+    texto = _SUBSTITUIDOR_LOCALIZACAO.aplicar(texto)
 
     # 5. Remover espaços extras
-    normalized = normalized.str.strip()
-    normalized = normalized.str.replace(r'\s+', ' ', regex=True)
-    
+    texto = _RE_ESPACOS.sub(' ', texto.strip())
+
     # 6. Tratar valores que se tornaram vazios após limpeza ou eram nulos originalmente
-    normalized = normalized.replace(['', 'nan', 'none', 'null'], 'nao especificado', regex=False)
-    
-    return normalized
+    return 'nao especificado' if texto in _VALORES_VAZIOS else texto
+
+def _normalizar_localizacao(series):
+    """Normalização agressiva para campos de localização."""
+    if not isinstance(series, pd.Series):
+        series = pd.Series(series)
+    # Cada valor distinto é normalizado uma única vez
+    return aplicar_por_valor_unico(series.fillna('').astype(str), _normalizar_valor)
 
 def carregar_datas_solicitacao():
     """
@@ -292,6 +294,16 @@ def carregar_coordenadas_mapa():
         st.error(f"Erro ao ler ou processar o arquivo JSON de coordenadas: {e}")
         return pd.DataFrame()
 
+def _sem_coordenadas(df):
+    """Máscara das linhas ainda sem latitude/longitude."""
+    return df['latitude'].isna() | df['longitude'].isna()
+
+def _aplicar_coordenadas(df, coords, source):
+    """Grava latitude/longitude/COORD_SOURCE nas linhas de `coords` (Series de tuplas (lat, lon))."""
+    df.loc[coords.index, 'latitude'] = [c[0] for c in coords]
+    df.loc[coords.index, 'longitude'] = [c[1] for c in coords]
+    df.loc[coords.index, 'COORD_SOURCE'] = source
+
 def carregar_dados_comune(category_id="22", force_reload=False):
     """
     Carrega dados do Bitrix para um category_id específico, normaliza locais, 
@@ -359,15 +371,6 @@ def carregar_dados_comune(category_id="22", force_reload=False):
 
     if not df_coordenadas.empty and process is not None and fuzz is not None:
         print(f"\nIniciando busca de coordenadas para category_id={category_id} via correspondência múltipla...")
-        # Lista de nomes de comunes únicos do JSON para comparar
-        json_comunes_norm_list = df_coordenadas['COMUNE_MAPA_NORM'].unique().tolist()
-        if 'nao especificado' in json_comunes_norm_list: 
-            json_comunes_norm_list.remove('nao especificado')
-
-        json_provincias_norm_list = df_coordenadas['PROVINCIA_MAPA_NORM'].unique().tolist()
-        if 'nao especificado' in json_provincias_norm_list: 
-            json_provincias_norm_list.remove('nao especificado')
-
         # Nova adição: Dicionário de correções manuais para casos específicos
         correcoes_manuais = {
             # Comune: (latitude, longitude, fonte)
@@ -534,36 +537,19 @@ def carregar_dados_comune(category_id="22", force_reload=False):
                 registros_atualizados += 1
 
         # Continuar com o processamento normal para os itens restantes
-        if json_comunes_norm_list:
-            # Nomes únicos de comunes e províncias do Bitrix 
-            bitrix_comunes_to_match = df_items['COMUNE_NORM'].unique().tolist()
-            bitrix_provincias_to_match = df_items['PROVINCIA_NORM'].unique().tolist()
-            
+        # (dicionários e matching em lote do índice de geocodificação)
+        geo_index = get_geocoding_index(df_coordenadas)
+        if geo_index.comunes:
             # MELHORIA: Implementar múltiplos tipos de matching
             # 1. Match exato (Comune + Província)
             print(f"Aplicando correspondência exata (Comune + Província) para category_id={category_id}...")
-            for idx, row in df_items.iterrows():
-                # Pular se já tem coordenadas
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    continue
-                    
-                comune_norm = row['COMUNE_NORM']
-                provincia_norm = row['PROVINCIA_NORM']
-                
-                if comune_norm == 'nao especificado' or provincia_norm == 'nao especificado':
-                    continue
-                
-                # Tentar match exato com comune e província    
-                exact_match = df_coordenadas[
-                    (df_coordenadas['COMUNE_MAPA_NORM'] == comune_norm) & 
-                    (df_coordenadas['PROVINCIA_MAPA_NORM'] == provincia_norm)
-                ]
-                
-                if not exact_match.empty:
-                    match_row = exact_match.iloc[0]
-                    df_items.at[idx, 'latitude'] = match_row['latitude']
-                    df_items.at[idx, 'longitude'] = match_row['longitude']
-                    df_items.at[idx, 'COORD_SOURCE'] = 'ExactMatch_ComuneProv'
+            sem_coords = _sem_coordenadas(df_items)
+            chaves = pd.Series(list(zip(df_items['COMUNE_NORM'], df_items['PROVINCIA_NORM'])), index=df_items.index)
+            coords = chaves[sem_coords].map(geo_index.comune_provincia_coords)
+            coords = coords[coords.notna()
+                            & (df_items.loc[coords.index, 'COMUNE_NORM'] != 'nao especificado')
+                            & (df_items.loc[coords.index, 'PROVINCIA_NORM'] != 'nao especificado')]
+            _aplicar_coordenadas(df_items, coords, 'ExactMatch_ComuneProv')
             
             # Contagem de matches exatos
             exact_matches = df_items[df_items['COORD_SOURCE'] == 'ExactMatch_ComuneProv'].shape[0]
@@ -571,202 +557,76 @@ def carregar_dados_comune(category_id="22", force_reload=False):
             
             # 2. Match exato (apenas Comune)
             print(f"Aplicando correspondência exata (apenas Comune) para category_id={category_id}...")
-            for idx, row in df_items.iterrows():
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    continue  # Pular se já tem coordenadas
-                
-                comune_norm = row['COMUNE_NORM']
-                if comune_norm == 'nao especificado':
-                    continue
-                
-                # Tentar match exato com comune
-                exact_comune_match = df_coordenadas[df_coordenadas['COMUNE_MAPA_NORM'] == comune_norm]
-                
-                if not exact_comune_match.empty:
-                    match_row = exact_comune_match.iloc[0]
-                    df_items.at[idx, 'latitude'] = match_row['latitude']
-                    df_items.at[idx, 'longitude'] = match_row['longitude']
-                    df_items.at[idx, 'COORD_SOURCE'] = 'ExactMatch_Comune'
+            sem_coords = _sem_coordenadas(df_items)
+            coords = df_items.loc[sem_coords, 'COMUNE_NORM'].map(geo_index.comune_coords)
+            coords = coords[coords.notna() & (df_items.loc[coords.index, 'COMUNE_NORM'] != 'nao especificado')]
+            _aplicar_coordenadas(df_items, coords, 'ExactMatch_Comune')
             
             # Contagem de matches exatos por comune
             comune_matches = df_items[df_items['COORD_SOURCE'] == 'ExactMatch_Comune'].shape[0]
             print(f"Encontrados {comune_matches} correspondências exatas (apenas Comune) para category_id={category_id}")
             
-            # 3. Match Fuzzy (Comune)
+            # 3. Match Fuzzy (Comune) + 4. token parcial, em lote sobre os nomes únicos sem coordenadas
+            # TokenSort/TokenSet/Partial (>= 80), Standard (>= 75), prefixo do nome e palavra em comum
             print(f"Aplicando correspondência fuzzy para category_id={category_id}...")
-            fuzzy_matches_map = {}
-            # MELHORIA: Usar threshold mais baixo para aumentar correspondências
-            match_threshold = 80  # Reduzindo para aumentar as correspondências (era 85)
+            sem_coords = _sem_coordenadas(df_items)
+            nomes_sem_coords = df_items.loc[sem_coords, 'COMUNE_NORM']
+            fuzzy_matches_map = geo_index.fuzzy_match_comunes(nomes_sem_coords.unique(), strategy='primeiro')
             
-            # MELHORIA: Usar todos os algoritmos de fuzzy matching disponiveis
-            for bitrix_comune in bitrix_comunes_to_match:
-                if bitrix_comune == 'nao especificado': 
-                    continue
-                
-                # 3.1 Token Sort Ratio - Melhor para palavras na ordem errada
-                token_sort_match = process.extractOne(
-                    query=bitrix_comune,
-                    choices=json_comunes_norm_list,
-                    scorer=fuzz.token_sort_ratio, 
-                    score_cutoff=match_threshold
-                )
-                
-                if token_sort_match:
-                    fuzzy_matches_map[bitrix_comune] = (token_sort_match[0], token_sort_match[1], "TokenSort")
-                    continue
-                
-                # 3.2 Token Set Ratio - Melhor para substrings/partials
-                token_set_match = process.extractOne(
-                    query=bitrix_comune,
-                    choices=json_comunes_norm_list,
-                    scorer=fuzz.token_set_ratio, 
-                    score_cutoff=match_threshold
-                )
-                
-                if token_set_match:
-                    fuzzy_matches_map[bitrix_comune] = (token_set_match[0], token_set_match[1], "TokenSet")
-                    continue
-                
-                # 3.3 Partial Ratio - Melhor para casos específicos de substring
-                partial_match = process.extractOne(
-                    query=bitrix_comune,
-                    choices=json_comunes_norm_list,
-                    scorer=fuzz.partial_ratio, 
-                    score_cutoff=match_threshold
-                )
-                
-                if partial_match:
-                    fuzzy_matches_map[bitrix_comune] = (partial_match[0], partial_match[1], "Partial")
-                    continue
-                
-                # 3.4 Ratio padrão como última opção - com threshold mais baixo
-                if len(bitrix_comune) > 3:  # Evitar nomes muito curtos
-                    std_match = process.extractOne(
-                        query=bitrix_comune,
-                        choices=json_comunes_norm_list,
-                        scorer=fuzz.ratio, 
-                        score_cutoff=75  # Threshold mais baixo (era 80)
-                    )
-                    
-                    if std_match:
-                        fuzzy_matches_map[bitrix_comune] = (std_match[0], std_match[1], "Standard")
-                    else:
-                        # 3.5 NOVA ETAPA: Tentar correspondência de prefixo para nomes mais longos
-                        # Para encontrar casos onde o name do comune no Bitrix é apenas o início do nome real
-                        if len(bitrix_comune) >= 5:
-                            # Encontrar todos os comunes que começam com o bitrix_comune
-                            prefix_matches = [c for c in json_comunes_norm_list if c.startswith(bitrix_comune)]
-                            if prefix_matches:
-                                # Ordenar por comprimento para pegar o mais curto (mais próximo)
-                                best_prefix = sorted(prefix_matches, key=len)[0]
-                                fuzzy_matches_map[bitrix_comune] = (best_prefix, 90, "PrefixMatch")
-                
-            # 4. NOVO: Para casos muito difíceis, tente matching por token parcial
-            # (encontrar partes do nome em comum quando os nomes são muito diferentes)
-            if match_threshold > 60:  # Apenas se o threshold principal não for muito baixo
-                for bitrix_comune in bitrix_comunes_to_match:
-                    if bitrix_comune in fuzzy_matches_map or bitrix_comune == 'nao especificado' or len(bitrix_comune) < 4:
-                        continue
-                    
-                    # Dividir o nome em tokens
-                    tokens = bitrix_comune.split()
-                    if len(tokens) > 1:  # Apenas se houver múltiplos tokens
-                        for token in tokens:
-                            if len(token) >= 4:  # Token grande o suficiente para ser significativo
-                                token_matches = [c for c in json_comunes_norm_list if token in c.split()]
-                                if token_matches:
-                                    # Usar o primeiro match como base
-                                    fuzzy_matches_map[bitrix_comune] = (token_matches[0], 70, "TokenPartialMatch")
-                                    break
-
             # Aplicar correspondências fuzzy ao DataFrame
-            for idx, row in df_items.iterrows():
-                # Pular se já tem coordenadas
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    continue
-                
-                comune_norm = row['COMUNE_NORM']
-                if comune_norm in fuzzy_matches_map:
-                    best_match, score, method = fuzzy_matches_map[comune_norm]
-                    
-                    # Encontrar as coordenadas do match
-                    match_rows = df_coordenadas[df_coordenadas['COMUNE_MAPA_NORM'] == best_match]
-                    if not match_rows.empty:
-                        match_row = match_rows.iloc[0]
-                        
-                        # Atualizar as coordenadas
-                        df_items.at[idx, 'latitude'] = match_row['latitude']
-                        df_items.at[idx, 'longitude'] = match_row['longitude']
-                        df_items.at[idx, 'COORD_SOURCE'] = f'FuzzyMatch_{method}_{score}'
+            for comune_norm, (best_match, score, method) in fuzzy_matches_map.items():
+                coords_match = geo_index.comune_coords.get(best_match)
+                if coords_match:
+                    idx_match = nomes_sem_coords.index[nomes_sem_coords == comune_norm]
+                    df_items.loc[idx_match, 'latitude'] = coords_match[0]
+                    df_items.loc[idx_match, 'longitude'] = coords_match[1]
+                    df_items.loc[idx_match, 'COORD_SOURCE'] = f'FuzzyMatch_{method}_{score}'
 
             # 5. NOVO: Para casos ainda sem correspondência, tentar pelo início do nome
             # Isso ajuda em casos onde o nome está parcialmente digitado
             print(f"Aplicando correspondência por início do nome para casos sem match (category_id={category_id})...")
-            for idx, row in df_items.iterrows():
-                # Pular se já tem coordenadas
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    continue
-                
-                comune_norm = row['COMUNE_NORM']
+            sem_coords = _sem_coordenadas(df_items)
+            nomes_sem_coords = df_items.loc[sem_coords, 'COMUNE_NORM']
+            for comune_norm in nomes_sem_coords.unique():
                 if comune_norm == 'nao especificado' or len(comune_norm) < 4:
                     continue
                 
-                # Encontrar comuns que começam com os primeiros n caracteres
-                prefix_len = min(len(comune_norm), 5)  # Usar até 5 caracteres iniciais
-                prefix = comune_norm[:prefix_len]
-                
-                prefix_matches = [c for c in json_comunes_norm_list if c.startswith(prefix)]
-                if prefix_matches:
-                    # Usar o mais curto (mais próximo do prefixo)
-                    best_match = sorted(prefix_matches, key=len)[0]
-                    match_rows = df_coordenadas[df_coordenadas['COMUNE_MAPA_NORM'] == best_match]
-                    
-                    if not match_rows.empty:
-                        match_row = match_rows.iloc[0]
-                        df_items.at[idx, 'latitude'] = match_row['latitude']
-                        df_items.at[idx, 'longitude'] = match_row['longitude']
-                        df_items.at[idx, 'COORD_SOURCE'] = f'PrefixMatch_{prefix}'
+                # Encontrar comuns que começam com os primeiros n caracteres (usar o mais curto)
+                prefix = comune_norm[:min(len(comune_norm), 5)]  # Usar até 5 caracteres iniciais
+                best_match = geo_index.prefix_match(prefix)
+                coords_match = geo_index.comune_coords.get(best_match) if best_match else None
+                if coords_match:
+                    idx_match = nomes_sem_coords.index[nomes_sem_coords == comune_norm]
+                    df_items.loc[idx_match, 'latitude'] = coords_match[0]
+                    df_items.loc[idx_match, 'longitude'] = coords_match[1]
+                    df_items.loc[idx_match, 'COORD_SOURCE'] = f'PrefixMatch_{prefix}'
 
             # 6. Último recurso: tentar match por província
             # Após todas as tentativas, use a província como último recurso
             print(f"Aplicando correspondência por província para casos sem match (category_id={category_id})...")
-            for idx, row in df_items.iterrows():
-                # Pular se já tem coordenadas
-                if pd.notna(row['latitude']) and pd.notna(row['longitude']):
-                    continue
-                
-                provincia_norm = row['PROVINCIA_NORM']
-                if provincia_norm == 'nao especificado':
-                    continue
-                
-                # Primeiro tenta match exato por província
-                provincia_matches = df_coordenadas[df_coordenadas['PROVINCIA_MAPA_NORM'] == provincia_norm]
-                
-                if not provincia_matches.empty:
+            sem_coords = _sem_coordenadas(df_items)
+            provincias_sem_coords = df_items.loc[sem_coords, 'PROVINCIA_NORM']
+            provincias_unicas = [p for p in provincias_sem_coords.unique() if p != 'nao especificado']
+            # Fuzzy apenas se não houver match exato (evitar nomes muito curtos/genéricos)
+            provincias_fuzzy = geo_index.fuzzy_match_provincias(
+                [p for p in provincias_unicas
+                 if p not in geo_index.provincia_coords and len(p) >= 4 and p not in ['roma', 'bari']],
+                cutoff=75
+            )
+            for provincia_norm in provincias_unicas:
+                if provincia_norm in geo_index.provincia_coords:
                     # Usar o primeiro match (primeira cidade da província)
-                    match_row = provincia_matches.iloc[0]
-                    df_items.at[idx, 'latitude'] = match_row['latitude']
-                    df_items.at[idx, 'longitude'] = match_row['longitude']
-                    df_items.at[idx, 'COORD_SOURCE'] = 'ProvinciaMatch'
+                    coords_match, source = geo_index.provincia_coords[provincia_norm], 'ProvinciaMatch'
+                elif provincia_norm in provincias_fuzzy:
+                    best_match_prov, score = provincias_fuzzy[provincia_norm]
+                    coords_match, source = geo_index.provincia_coords.get(best_match_prov), f'ProvinciaFuzzy_{score}'
                 else:
-                    # Tentar fuzzy match por província se ainda não tiver correspondência
-                    if len(provincia_norm) >= 4 and provincia_norm not in ['roma', 'bari']:  # Evitar nomes muito curtos/genéricos
-                        provincia_fuzzy = process.extractOne(
-                            query=provincia_norm,
-                            choices=json_provincias_norm_list,
-                            scorer=fuzz.token_set_ratio,
-                            score_cutoff=75
-                        )
-                        
-                        if provincia_fuzzy:
-                            best_match_prov = provincia_fuzzy[0]
-                            prov_match_rows = df_coordenadas[df_coordenadas['PROVINCIA_MAPA_NORM'] == best_match_prov]
-                            
-                            if not prov_match_rows.empty:
-                                match_row = prov_match_rows.iloc[0]
-                                df_items.at[idx, 'latitude'] = match_row['latitude']
-                                df_items.at[idx, 'longitude'] = match_row['longitude']
-                                df_items.at[idx, 'COORD_SOURCE'] = f'ProvinciaFuzzy_{provincia_fuzzy[1]}'
+                    continue
+                if coords_match:
+                    idx_match = provincias_sem_coords.index[provincias_sem_coords == provincia_norm]
+                    df_items.loc[idx_match, 'latitude'] = coords_match[0]
+                    df_items.loc[idx_match, 'longitude'] = coords_match[1]
+                    df_items.loc[idx_match, 'COORD_SOURCE'] = source
 
             # 7. Contagem final de matches
             fuzzy_matches = df_items[df_items['COORD_SOURCE'].str.contains('Fuzzy', na=False)].shape[0] if 'COORD_SOURCE' in df_items.columns else 0
@@ -85,21 +85,22 @@ def categorizar_status_comune(status):
 def carregar_dados_bitrix_funil46():
     """Carrega dados do Bitrix24 funil 46 para cruzamento de protocolização."""
     try:
-        # Carregar dados do funil 46 usando load_merged_data
+        # Colunas usadas no cruzamento
+        colunas_necessarias = [
+            'ID', 
+            'UF_CRM_1722605592778',  # Campo para match com ID FAMILIA
+            'UF_CRM_1746046353172'   # Campo de informação de protocolização
+        ]
+        
+        # Carregar dados do funil 46 usando load_merged_data (apenas as colunas usadas)
         df_bitrix = load_merged_data(
             category_id=46,
             debug=False,
-            force_reload=False
+            force_reload=False,
+            columns=colunas_necessarias
         )
         
         if df_bitrix is not None and not df_bitrix.empty:
-            # Selecionar apenas as colunas necessárias se existirem
-            colunas_necessarias = [
-                'ID', 
-                'UF_CRM_1722605592778',  # Campo para match com ID FAMILIA
-                'UF_CRM_1746046353172'   # Campo de informação de protocolização
-            ]
-            
             # Verificar quais colunas existem
             colunas_existentes = [col for col in colunas_necessarias if col in df_bitrix.columns]
             
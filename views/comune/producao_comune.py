@@ -71,21 +71,22 @@ NOME_COLUNA_STATUS_COMUNE = 'status_comune'
 def carregar_dados_bitrix_funil46():
     """Carrega dados do Bitrix24 funil 46 para cruzamento."""
     try:
-        # Carregar dados do funil 46 usando load_merged_data
+        # Colunas usadas no cruzamento
+        colunas_necessarias = [
+            'ID', 
+            'UF_CRM_1722605592778',  # Campo para match com ID FAMILIA
+            'UF_CRM_1746046353172'   # Campo de informação adicional
+        ]
+        
+        # Carregar dados do funil 46 usando load_merged_data (apenas as colunas usadas)
         df_bitrix = load_merged_data(
             category_id=46,
             debug=False,
-            force_reload=False
+            force_reload=False,
+            columns=colunas_necessarias
         )
         
         if df_bitrix is not None and not df_bitrix.empty:
-            # Selecionar apenas as colunas necessárias se existirem
-            colunas_necessarias = [
-                'ID', 
-                'UF_CRM_1722605592778',  # Campo para match com ID FAMILIA
-                'UF_CRM_1746046353172'   # Campo de informação adicional
-            ]
-            
             # Verificar quais colunas existem
             colunas_existentes = [col for col in colunas_necessarias if col in df_bitrix.columns]
             
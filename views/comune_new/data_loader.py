@@ -12,6 +12,9 @@ from pathlib import Path
 import unicodedata
 from thefuzz import fuzz, process
 from utils.refresh_utils import load_csv_with_refresh
+from utils.geocoding_index import get_geocoding_index
+from utils.location_normalizer import (RemovedorPrefixos, SubstituidorEmOrdem, aplicar_por_valor_unico,
+                                       compilar_palavras, remover_acentos)
 
 # Tentar importar thefuzz
 try:
@@ -25,465 +28,499 @@ except ImportError:
 load_dotenv()
 
 # --- Funções Auxiliares de Normalização (do data_loader antigo) ---
+# Prefixos de certidão removidos antes da normalização (em ordem) e separadores do texto extra
+_PREFIXOS_CERTIDAO = [re.compile(padrao) for padrao in (
+    r'^natti\s*[:-]?\s*', r'^matri\s*[:-]?\s*', r'^-\s*natti\s*[:-]?\s*', r'^-\s*matri\s*[:-]?\s*',
+    r'^nascita\s*[:-]?\s*', r'^matrimonio\s*[:-]?\s*', r'^certidao de\s*[:-]?\s*', r'^certidao\s*[:-]?\s*',
+)]
+_SEPARADORES = [',', '(', '/', '-', '[', ';', ':']
+
+def _limpar_valor(text):
+    text = text.lower()
+    for padrao in _PREFIXOS_CERTIDAO:
+        text = padrao.sub('', text)
+    for sep in _SEPARADORES:
+        if sep in text:
+            text = text.split(sep, 1)[0]
+    return text.strip()
+
 def _limpar_antes_normalizar(series):
     # Implementação copiada de views/comune/data_loader.py ...
     if not isinstance(series, pd.Series):
         series = pd.Series(series)
-    series = series.astype(str).str.lower()
-    series = series.str.replace(r'^natti\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^matri\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^-\s*natti\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^-\s*matri\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^nascita\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^matrimonio\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^certidao de\s*[:-]?\s*', '', regex=True)
-    series = series.str.replace(r'^certidao\s*[:-]?\s*', '', regex=True)
-    def clean_text(text):
-        if pd.isna(text) or not isinstance(text, str): return text
-        separadores = [',', '(', '/', '-', '[', ';', ':']
-        for sep in separadores:
-            if sep in text:
-                text = text.split(sep, 1)[0]
-        return text.strip()
-    return series.apply(clean_text)
+    # Calculado uma vez por valor distinto
+    return aplicar_por_valor_unico(series.astype(str), _limpar_valor)
 
-def _normalizar_localizacao(series):
-    # Implementação copiada de views/comune/data_loader.py ...
-    if not isinstance(series, pd.Series):
-        series = pd.Series(series)
-    normalized = series.fillna('').astype(str).str.lower()
-    try:
-        normalized = normalized.apply(lambda x: unidecode(x) if isinstance(x, str) else x)
-    except Exception:
-        normalized = pd.Series([unidecode(str(x)) for x in series.fillna('')], index=series.index)
-        normalized = normalized.str.lower()
+# --- Listas da normalização de localização (compiladas uma vez no import) ---
+# 3. Remover prefixos GERAIS comuns - EXPANDIDO
+PREFIXOS_GERAIS = [
+    'comune di ', 'provincia di ', 'parrocchia di ', 'parrocchia ', 'citta di ', 
+    'diocese di ', 'chiesa di ', 'chiesa parrocchiale di ', 'comune ', 'citta ',
+    'diocesi ', 'diocesi di ', 'archivio di ', 'anagrafe di ', 'frazione di ', 'frazione ',
+    'municipio di ', 'municipio ', 'ufficio anagrafe di ', 'ufficio di stato civile di ',
+    'ufficio anagrafe ', 'ufficio di stato civile ', 'ufficio dello stato civile ',
+    'parrocchia della ', 'parrocchia del ', 'parrocchia dei ', 'parrocchia degli ',
+    'comune della ', 'comune del ', 'comune dei ', 'comune degli ',
+    'archidiocesi di ', 'archidiocesi ', 'arcidiocesi di ', 'arcidiocesi ',
+    'basilica di ', 'basilica ', 'cappella di ', 'cappella ',
+    'cattedrale di ', 'cattedrale ', 'chiesa arcipretale di ', 'chiesa arcipretale ',
+    'chiesa collegiata di ', 'chiesa collegiata ', 'chiesa matrice di ', 'chiesa matrice ',
+    'convento di ', 'convento ', 'monastero di ', 'monastero ',
+    'pieve di ', 'pieve ', 'santuario di ', 'santuario ',
+    'parrocchiale di ', 'parrocchiale ', 'vicaria di ', 'vicaria ',
+    'localita ', 'contrada ', 'curia vescovile di ', 'curia vescovile '
+]
 
-    # 3. Remover prefixos GERAIS comuns - EXPANDIDO
-    prefixos_gerais = [
-        'comune di ', 'provincia di ', 'parrocchia di ', 'parrocchia ', 'citta di ', 
-        'diocese di ', 'chiesa di ', 'chiesa parrocchiale di ', 'comune ', 'citta ',
-        'diocesi ', 'diocesi di ', 'archivio di ', 'anagrafe di ', 'frazione di ', 'frazione ',
-        'municipio di ', 'municipio ', 'ufficio anagrafe di ', 'ufficio di stato civile di ',
-        'ufficio anagrafe ', 'ufficio di stato civile ', 'ufficio dello stato civile ',
-        'parrocchia della ', 'parrocchia del ', 'parrocchia dei ', 'parrocchia degli ',
-        'comune della ', 'comune del ', 'comune dei ', 'comune degli ',
-        'archidiocesi di ', 'archidiocesi ', 'arcidiocesi di ', 'arcidiocesi ',
-        'basilica di ', 'basilica ', 'cappella di ', 'cappella ',
-        'cattedrale di ', 'cattedrale ', 'chiesa arcipretale di ', 'chiesa arcipretale ',
-        'chiesa collegiata di ', 'chiesa collegiata ', 'chiesa matrice di ', 'chiesa matrice ',
-        'convento di ', 'convento ', 'monastero di ', 'monastero ',
-        'pieve di ', 'pieve ', 'santuario di ', 'santuario ',
-        'parrocchiale di ', 'parrocchiale ', 'vicaria di ', 'vicaria ',
-        'localita ', 'contrada ', 'curia vescovile di ', 'curia vescovile '
-    ]
-    for prefix in prefixos_gerais:
-        normalized = normalized.str.replace(f'^{re.escape(prefix)}', '', regex=True)
-        
-    # 3.5 Remover prefixos RELIGIOSOS comuns 
-    prefixos_religiosos = [
-        'san ', 'santa ', 'santi ', 'santo ', 's ', 'ss ', 'st ', 
-        'beato ', 'beata ', 'santissima ', 'santissimo ',
-        'natale ', 'nativita di ', 'nativita ', 'nascita di ', 'nascita ', 
-        'battesimo di ', 'battesimo ', 'maria ', 'madonna ',
-        'sant\'', 'sant ', 'santa maria ', 'santa maria di ', 'santa maria del ',
-        'sacro cuore di ', 'sacro cuore ', 'sacro ', 'san giovanni ', 'san giovanni di ',
-        'san michele ', 'san michele di ', 'san pietro ', 'san pietro di ',
-        'san nicola ', 'san nicola di ', 'san lorenzo ', 'san lorenzo di ',
-        'san martino ', 'san martino di ', 'san marco ', 'san marco di '
-    ]
-    for prefix in prefixos_religiosos:
-        normalized = normalized.str.replace(f'^{re.escape(prefix)}(\\b)?', '', regex=True)
+# 3.5 Remover prefixos RELIGIOSOS comuns 
+PREFIXOS_RELIGIOSOS = [
+    'san ', 'santa ', 'santi ', 'santo ', 's ', 'ss ', 'st ', 
+    'beato ', 'beata ', 'santissima ', 'santissimo ',
+    'natale ', 'nativita di ', 'nativita ', 'nascita di ', 'nascita ', 
+    'battesimo di ', 'battesimo ', 'maria ', 'madonna ',
+    'sant\'', 'sant ', 'santa maria ', 'santa maria di ', 'santa maria del ',
+    'sacro cuore di ', 'sacro cuore ', 'sacro ', 'san giovanni ', 'san giovanni di ',
+    'san michele ', 'san michele di ', 'san pietro ', 'san pietro di ',
+    'san nicola ', 'san nicola di ', 'san lorenzo ', 'san lorenzo di ',
+    'san martino ', 'san martino di ', 'san marco ', 'san marco di '
+]
+
+# MELHORIA: Remover palavras irrelevantes para correspondência
+PALAVRAS_IRRELEVANTES = [
+    'della', 'dello', 'delle', 'degli', 'dei', 'del', 'di', 'da', 'dal', 'e', 'ed', 'in', 'con',
+    'su', 'sul', 'sulla', 'sulle', 'sui', 'sugli', 'per', 'tra', 'fra', 'a', 'al', 'alla', 'alle',
+    'ai', 'agli', 'il', 'lo', 'la', 'le', 'i', 'gli', 'un', 'uno', 'una', 'nello', 'nella', 'nelle',
+    'negli', 'nei', 'all', 'dall', 'dall', 'dall',
+    'presso', 'vicino', 'sopra', 'sotto', 'davanti', 'dietro', 'accanto', 'oltre',
+    'verso', 'senza', 'secondo', 'lungo', 'durante', 'dentro', 'fuori', 'prima', 'dopo',
+    'contro', 'attraverso', 'circa', 'intorno', 'grazie', 'mediante', 'oltre', 'malgrado',
+    'nonostante', 'salvo', 'eccetto', 'fino', 'verso',
+    # Novas: comuns em nomes de igrejas/paróquias
+    'apostolo', 'martire', 'vescovo', 'vergine', 'assunta', 'nativita', 'annunciazione', 'abate',
+    'santos', 'sao', 'paroquia', 'parocchia', 'parrochia', 'chiesa', 'arcangelo', 'cap', # Adicionadas 
+    'localita', 'italia' # Adicionadas
+]
+
+# MELHORIA: Substituições para casos comuns - EXPANDIDO
+SUBSTITUICOES_LOCALIZACAO = {
+    'sangiovanni': 'giovanni', 'sangiuseppe': 'giuseppe', 'sanlorenzo': 'lorenzo', 'sanfrancesco': 'francesco', 
+    'sanmartino': 'martino', 'santamaria': 'maria', 'santantonio': 'antonio', 'sanvincenzo': 'vincenzo', 
+    'santangelo': 'angelo', 'santanna': 'anna', 'sanmichele': 'michele', 'sanmarco': 'marco', 'sannicola': 'nicola',
+    'sanbartolomeo': 'bartolomeo', 'ssantissima': 'santissima', 'santmaria': 'maria', 'santachiara': 'chiara', 
+    'santacaterina': 'caterina', 'santandrea': 'andrea', 'santagnese': 'agnese', 'santarita': 'rita', 
+    'santabarbara': 'barbara', 'santadomenica': 'domenica', 'santapaola': 'paola', 'santateresa': 'teresa', 
+    'santaeufemia': 'eufemia', 'santabruna': 'bruna', 'santaelena': 'elena', 'santantonino': 'antonino', 
+    'santadiocesi': 'diocesi', 'maddalena': 'magdalena', 'battista': 'batista', 'assunta': 'assumpta', 
+    'assunzione': 'assumpcao', 'eucharistia': 'eucaristia', 'treviso': 'treviso', 'venezia': 'venezia', 
+    'veneza': 'venezia', 'padova': 'padova', 'podova': 'padova', 'verona': 'verona', 'vicenza': 'vicenza', 
+    'rovigo': 'rovigo', 'belluno': 'belluno', 'mantova': 'mantova', 'mantua': 'mantova', 'mantoa': 'mantova', 
+    'montova': 'mantova', 'mântua': 'mantova', 'brescia': 'brescia', 'massa-carrara': 'massa carrara', 
+    'massa carrara': 'massa carrara', 'verbano-cusio-ossola': 'verbano cusio ossola', 'verbano-cusi': 'verbano cusio ossola', 
+    'vibo-valentia': 'vibo valentia', 'pesaro-urbino': 'pesaro urbino', 'chiete': 'chieti', 'biela': 'biella', 
+    'lodi': 'lodi', 'novara': 'novara', 'varese': 'varese', 'pavia': 'pavia', 'vibo valentia': 'vibo valentia', 
+    'caltanissetta': 'caltanissetta', 'agrigento': 'agrigento', 'crotone': 'crotone', 'sassari': 'sassari', 
+    'enna': 'enna', 'avellino': 'avellino', 'toscana': 'toscana',
+    # Novas baseadas no debug e nomes comuns:
+    'margherita martire godega': 'godega', # Para CHIESA PARROCCHIALE DI S. MARGHERITA MARTIRE, GODEGA DI S. URBANO
+    's urbano': '', # Remover S. Urbano que pode sobrar
+    'ponte piave': 'ponte piave', # Para Parrocchia Ponte di Piave
+    's andrea apostolo mason vicentino': 'mason vicentino',
+    'santi pietro paolo coreglia antelminelli': 'coreglia antelminelli',
+    'eusebio cortiglione asti': 'cortiglione asti', # Adicionado para caso Parrocchia S. Eusebio
+    'zenone vescovo martire': 'zenone',
+    'villa conte': 'villa conte', # Para VILLA DEL CONTE
+    'pier disonzo': 'san pier isonzo',
+    'crespano dela grappa': 'crespano grappa',
+    'giacciano baruchella': 'giacciano baruchella',
+    'baselice benevento': 'baselice',
+    'paderno cremonese': 'paderno ponchielli', # Nome oficial é Paderno Ponchielli
+    'guardia sanframondi': 'guardia sanframondi',
+    'sermide felonica': 'sermide felonica',
+    'cervarese santa croce': 'cervarese santa croce',
+    'ambrogio valpolicella': 'sant ambrogio valpolicella', 
+    'piazza mons giuseppe scarpa': 'cavarzere', # Forçando resultado para este padrão de endereço
+    'via pietro leopoldo': 'san marcello pistoiese', # Forçando
+    'piazza r trento': 'cariati', # Forçando
+    'via garibaldi': 'oderzo', # Forçando
+    'fiume veneto pn': 'fiume veneto',
+    'silea tv': 'silea',
+    'piovene rocchette vi': 'piovene rocchette', # Correção
+    'persico dosimo cr': 'persico dosimo', # Correção
+    'vazzola tv': 'vazzola', # Correção
+    'fuscaldo cs': 'fuscaldo', # Correção
+    'oratino cb': 'oratino', # Correção
+    'cavezzo modena': 'cavezzo', # Correção
+    'vasto ch': 'vasto', # Correção
+    'bussero mi': 'bussero', # Correção
+    'molinella bo': 'molinella', # Correção
+    'castello di godego': 'godego', # Mapear para godego
+    'sessa aurunca caserta': 'sessa aurunca',
+    'cavaglio spoccia verbano cusi ossola': 'cavaglio spoccia',
+    'coreglia antelminelli lucca': 'coreglia antelminelli',
+    'parghelia cosenza': 'parghelia',
+    'pietragalla potenza': 'pietragalla',
+    'valgi di sotto lucca': 'vagli sotto', # Mapear para nome mais comum
+    'pistoia toscana': 'pistoia',
+    'filadelfia vibo valentia': 'filadelfia',
+    'morigerati salerno': 'morigerati',
+    'sambiase catanzaro': 'sambiase',
+    'praduro e sasso bologna': 'sasso marconi', # Praduro e Sasso é fração de Sasso Marconi
+    'quarrata pistoia': 'quarrata',
+    'sorbano del vescov lucca': 'lucca', # Sorbano é fração de Lucca
+    'chieti chieti': 'chieti',
+    'niscemi caltanissetta': 'niscemi',
+    'lodi lodi': 'lodi',
+    'saracena cosenza': 'saracena',
+    'grotte agrigento': 'grotte',
+    'ottaviano napoli': 'ottaviano',
+    'drapia catanzaro': 'drapia',
+    'torcchiara salerno': 'torchiara', # Corrigido
+    'torano castello cosenza': 'torano castello',
+    'tramutola potenza': 'tramutola',
+    'scandale crotone': 'scandale',
+    'pontremoli massa carrara': 'pontremoli',
+    'suno novara': 'suno',
+    'contrada avellino': 'contrada',
+    'spoltore pescara': 'spoltore',
+    'stilo catanzaro': 'stilo',
+    'grezzago milano': 'grezzago',
+    'fontanella bergamo': 'fontanella',
+    'sab pier arena genova': 'genova', # Sampierdarena é bairro de Gênova
+    'sersale catanzaro': 'sersale',
+    'fara gera adda bergamo': 'fara gera adda',
+    'conflenti catanzaro': 'conflenti',
+    'san ferdinando napoli': 'napoli', # Bairro de Nápoles
+    'santa luce pisa': 'santa luce',
+    'rivello potenza': 'rivello',
+    'daverio varese': 'daverio',
+    'codevigno podova': 'codevigo', # Corrigido nome e provincia
+    'fossombrone pesaro e urbino': 'fossombrone',
+    'sannazzaro burgondi pavia': 'sannazzaro burgondi',
+    'quatrelle avellino': 'avellino', # Fração de Avellino
+    'grimaldi cosenza': 'grimaldi',
+    'almenno san salvatore bergamo': 'almenno san salvatore',
+    'dolo veneza': 'dolo',
+    'nanantola modena': 'nonantola', # Corrigido
+    'impruneta firenze': 'impruneta',
+    'sante marie aquila': 'sante marie',
+    'santeramo in colle bari': 'santeramo in colle',
+    'polesine zibello parma': 'polesine zibello',
+    'frosolone isernia': 'frosolone',
+    'termoli campobasso': 'termoli',
+    'broni pavia': 'broni',
+    'francica catanzaro': 'francica',
+    'palazzolo sulloglio brescia': 'palazzolo sulloglio',
+    'frisa chieti': 'frisa',
+    'savelli crotone': 'savelli',
+    'sustinente montova': 'sustinente', # Corrigido provincia
+    'stazzema lucca': 'stazzema',
+    'conselve padova': 'conselve', # Corrigido provincia
+    'cupello chieti': 'cupello',
+    'ferentino frosinone': 'ferentino',
+    'torraca salerno': 'torraca',
+    'lombardia bergamo': 'bergamo', # Mapear região para capital da província? Ou deixar N/A? Deixar N/A por enquanto.
+    'tissi sassari': 'tissi',
+    'taormina messina': 'taormina',
+    'tessennano viterbo': 'tessennano',
+    'san daniele ripa po cremona': 'san daniele po', # Nome oficial
+    'bagnatica bergamo': 'bagnatica',
+    'torraca salerno': 'torraca',
+    'desenzano del garda brescia': 'desenzano del garda',
+    'baselice benevento': 'baselice',
+    'cella dati cremona': 'cella dati',
+    'fossalto campobasso': 'fossalto',
+    'torricella del pizzo cremona': 'torricella del pizzo',
+    'cellara cosenza': 'cellara',
+    'biela biela': 'biella', # Corrigido
+    'mongrassano cosenza': 'mongrassano',
+    'san pier isonzo gorizia': 'san pier isonzo',
+    'regalbuto enna': 'regalbuto',
+    'gravina in puglia bari': 'gravina in puglia',
+    'firenze toscana': 'firenze',
+    'rivarolo mantovano mantua': 'rivarolo mantovano',
+    'san benedetto po mantua': 'san benedetto po',
+    'sant alberto ravenna': 'ravenna', # Fração de Ravenna
+    'castiglione a casauria pescara': 'castiglione a casauria',
+    'lioni avellino': 'lioni',
+    'zaccanopoli vibo valentina': 'zaccanopoli',
+    'manerba brescia': 'manerba',
+    'guardia sanframondi benevento': 'guardia sanframondi',
+    'firenzuola florenza': 'firenzuola', # Corrigido provincia
+    # Mapeamentos de paróquias/endereços para comunes conhecidos
+    'parrocchia s. maria immacolata veneza': 'venezia',
+    'parrocchia benabbio bagni luca': 'bagni di lucca',
+    'parrocchia san lorenzo martire voghera': 'voghera',
+    'parrocchia sant ambrogio dego dego': 'dego',
+    'parrocchia santi pietro e paolo coreglia antelminelli': 'coreglia antelminelli',
+    'chiesa parrocchiale tempio sassari': 'tempio pausania', # Nome oficial
+    'parrocchia santa fosca a roncadelle brescia': 'roncadelle',
+    'via roma 67 cap 36010 - chiuppano': 'chiuppano',
+    'paroquia maria ss. assunta collegiata': 'offida', # Mapeamento pelo contexto
+    'parrocchia santa gertrude rotzo': 'rotzo', # Adicionado mapeamento direto
+    'parrocchia s.giovanni battista - montesarchio': 'montesarchio',
+    'parrocchia san michele arcangelo quarto altino': 'quarto altino', # Adicionado mapeamento direto
+    'piazza san marco 1 - cap 35043 monselice': 'monselice',
+    'via dante maiocchi 55 - cap 01100 roccalvecce': 'viterbo', # Fração de Viterbo
+    'via europa 10 - cap 55030 - vagli sotto': 'vagli sotto',
+    'piazza aldo moro 24 - cap 45010 villadose': 'villadose',
+    'piazza caduti 1- cap 31024 ormelle': 'ormelle',
+    'via umberto i 2 - cap 30014 cavarzere': 'cavarzere',
+    'via roma 115 - cap 88825 savelli': 'savelli',
+    'via garibaldi 14 - cap 31046 oderzo': 'oderzo',
+    'careggine lu': 'careggine',
+    'viale papa giovanni xxiii 2 - cap 31030 castelcucco': 'castelcucco',
+    'longarone bl': 'longarone',
+    'san bartolomeo in galdo bn': 'san bartolomeo in galdo',
+    'ceggia ve': 'ceggia',
+    'paola cs': 'paola',
+    'mira ve': 'mira',
+    'san zenone al po pv': 'san zenone al po',
+    'favaro veneto': 'venezia', # Bairro de Veneza
+    'fonte tv': 'fonte',
+    'fardella pz': 'fardella',
+    'molazzana lu': 'molazzana',
+    'norbello or': 'norbello',
+    'pedace cs': 'pedace',
+    'ittiri ss': 'ittiri',
+    'leonforte en': 'leonforte',
+    'samassi su': 'samassi', # SU é província Sud Sardegna
+    'arcugnano vi': 'arcugnano',
+    'molinella bo': 'molinella',
+    'piazza iv novembre 10 - 37022 - fumane': 'fumane',
+    'loiano bo': 'loiano',
+    'piazza xiv dicembre 5 - 28019 - suno': 'suno',
+    'soave vr': 'soave',
+    'ottaviano na': 'ottaviano',
+    'via pietro leopoldo 24 - 51028 - san marcello pistoiese': 'san marcello piteglio', # Nome atual
+    'grezzago mi': 'grezzago',
+    'piazza martiri della liberta 3 - 31040 - cessalto': 'cessalto',
+    'via xxi luglio cap 81037 sessa aurunca': 'sessa aurunca',
+    'via giuseppe garibaldi 60 35020 - correzzola': 'correzzola',
+    'zero branco tv': 'zero branco',
+    'fumachi': 'colognola ai colli', # Mapeamento pelo contexto
+    'filippini': 'perugia', # Mapeamento pelo contexto
+    'de lucca': 'gaiarine', # Mapeamento pelo contexto
+    'censi': 'san giovanni lupatoto', # Mapeamento pelo contexto
+    'davi': 'villa bartolomea', # Mapeamento pelo contexto (pode ser Bovolone também, priorizar o primeiro)
+    'fabbiani': 'bellombra', # Mapeamento pelo contexto (Adria?) -> Bellombra é fração de Adria
+    'simoncello': 'ronca', # Mapeamento pelo contexto
+    'gabrieli': 'modena', # Mapeamento pelo contexto
+    'simonetto': 'san pietro in gu', # Mapeamento pelo contexto
+    'ortolan': 'caneva', # Mapeamento pelo contexto
+    'costellini': 'mogliano veneto', # Mapeamento pelo contexto
+    'vanzelli': 'rovigo', # Mapeamento pelo contexto (pode ser Canaro também)
+    'defalco': 'brindisi', # Mapeamento pelo contexto
+    'garofalo': 'cosenza', # Mapeamento pelo contexto (San Giovanni in Fiore?)
+    'conti': 'roverbella', # Mapeamento pelo contexto
+    'pizzinat': 'vittorio veneto', # Mapeamento pelo contexto
+    'bernardini': 'foiano della chiana', # Mapeamento pelo contexto (pode ser Bettolle também)
+    'via roma 29 - cap 46031 - bagnolo san vito': 'bagnolo san vito',
+    'rissi': 'scandolara ravara', # Mapeamento pelo contexto
+    'linguanotto': 'basalghelle', # Mapeamento pelo contexto
+    'quinzi': 'poggio san lorenzo', # Mapeamento pelo contexto (pode ser Rocca Sinibalda)
+    'colombo': 'cassano adda', # Corrigido
+    'ragonezi': 'castelforte', # Mapeamento pelo contexto
+    'morandin': 'vedelago', # Mapeamento pelo contexto
+    'zanatta': 'treviso', # Mapeamento pelo contexto
+    'guerra': 'montefiore conca', # Mapeamento pelo contexto
+    'cerantola': 'castelfranco veneto', # Mapeamento pelo contexto
+    'da re': 'villorba', # Mapeamento pelo contexto
+    'maggiolo': 'vigodarzere', # Mapeamento pelo contexto
+    'pagotto': 'arcade', # Mapeamento pelo contexto
+    'cagnotto': 'cavarzere', # Mapeamento pelo contexto
+    'possenatto': 'brognoligo-costalunga', # Mapeamento pelo contexto
+    'galante': 'urbana', # Mapeamento pelo contexto
+    'ravgnani': 'rovigo', # Mapeamento pelo contexto
+    'giacomin': 'casale sul sile', # Mapeamento pelo contexto
+    'morelli': 'ravenna', # Mapeamento pelo contexto
+    'bussadori': 'castelmassa', # Mapeamento pelo contexto
+    'rizotto': 'alano piave', # Corrigido
+    'galuppo': 'lusia', # Mapeamento pelo contexto
+    'zerbinati': 'sermide felonica', # Mapeamento pelo contexto
+    'buosi': 'fontanelle', # Mapeamento pelo contexto (pode ser Oderzo)
+    'maiolo': 'vibo valentia', # Mapeamento pelo contexto
+    'magnani': 'quistello', # Mapeamento pelo contexto
+    'dal ponte': 'pozzoleone', # Mapeamento pelo contexto
+    'bettin': 'piombino dese', # Mapeamento pelo contexto
+    'bovi': 'bigarello', # Mapeamento pelo contexto
+    'fante': 'bevilacqua', # Mapeamento pelo contexto
+    'ravasio': 'mapello', # Mapeamento pelo contexto
+    'rosa': 'mantova', # Mapeamento pelo contexto (Marmirolo?)
+    'pagliarone': 'san vito chietino', # Mapeamento pelo contexto
+    'pagliari': 'viterbo', # Mapeamento pelo contexto (Roccalvecce é fração)
+    'zuccon': 'zenson piave', # Corrigido
+    'zambotti': 'bigarello', # Mapeamento pelo contexto (Stradella é fração)
+    'zoccaratto': 'santa giustina in colle', # Mapeamento pelo contexto
+    'ferronato': 'cittadella', # Mapeamento pelo contexto
+    'rossato': 'belfiore', # Mapeamento pelo contexto
+    'marin': 'san dona piave', # Corrigido
+    'bobbo': 'venezia', # Mapeamento pelo contexto
+    'ungarelli': 'molinella', # Mapeamento pelo contexto
+    'mariani': 'annicco', # Mapeamento pelo contexto
+    'pace': 'pavia', # Mapeamento pelo contexto
+    'bertoncello': 'marostica', # Mapeamento pelo contexto
+    'camaduro': 'ormelle', # Mapeamento pelo contexto
+    'lombello': 'cartura', # Mapeamento pelo contexto
+    'furlan': 'chioggia', # Mapeamento pelo contexto
+    'asinelli': 'torino', # Mapeamento pelo contexto
+    'gualtieri': 'savelli', # Mapeamento pelo contexto
+    'ferri': 'zanica', # Mapeamento pelo contexto
+    'borelli': 'poggio rusco', # Mapeamento pelo contexto
+    'facchini': 'canaro', # Mapeamento pelo contexto (pode ser Felonica)
+    'marchesin': 'oderzo', # Mapeamento pelo contexto
+    'rizzati': 'bergantino', # Mapeamento pelo contexto
+    'andruccioli': 'montefiore conca', # Mapeamento pelo contexto
+    'conti': 'careggine', # Mapeamento pelo contexto
+    'nesi': 'levate', # Mapeamento pelo contexto
+    'bailo': 'monfumo', # Mapeamento pelo contexto
+    'gabrielli': 'modena', # Mapeamento pelo contexto
+    'faragutti': 'finale emilia', # Mapeamento pelo contexto
+    'gobbi': 'torrebelvicino', # Mapeamento pelo contexto
+    'biguetto': 'tombolo', # Mapeamento pelo contexto
+    'cola': 'castelcucco', # Mapeamento pelo contexto
+    'zonatto': 'chiampo', # Mapeamento pelo contexto
+    'massarotto': 'crespino', # Mapeamento pelo contexto
+    'marruchella': 'san bartolomeo in galdo', # Mapeamento pelo contexto
+    'rampazzo': 'sant angelo piove sacco', # Corrigido
+    'perissoto': 'ceggia', # Mapeamento pelo contexto (pode ser Eraclea)
+    'esposte': 'sasso marconi', # Mapeamento pelo contexto
+    'chiebao': 'cavarzere', # Mapeamento pelo contexto
+    'musacco': 'isola del giglio', # Mapeamento pelo contexto
+    'misurelli': 'rende', # Mapeamento pelo contexto
+    'perrone': 'mormanno', # Mapeamento pelo contexto
+    'ghisoni': 'san zenone al po', # Mapeamento pelo contexto
+    'massoni': 'casaleone', # Mapeamento pelo contexto (Verona?)
+    'scappini': 'motta baluffi', # Mapeamento pelo contexto
+    'magri': 'poggio rusco', # Mapeamento pelo contexto
+    'andreoli': 'fonte', # Mapeamento pelo contexto
+    'toffolo': 'bologna', # Mapeamento pelo contexto
+    'bettanin': 'lusiana', # Mapeamento pelo contexto
+    'sabbadini': 'calcio', # Mapeamento pelo contexto
+    'franchini': 'villimpenta', # Mapeamento pelo contexto
+    'dall osto': 'montecchio precalcino', # Mapeamento pelo contexto (pode ser Mason Vicentino)
+    'flora': 'maratea', # Mapeamento pelo contexto
+    'giordano': 'montemilone', # Mapeamento pelo contexto
+    'marchiori': 'malo', # Mapeamento pelo contexto
+    'rettore': 'leonforte', # Mapeamento pelo contexto
+    'fontanella': 'longarone', # Mapeamento pelo contexto
+    'furlanetto': 'meolo', # Mapeamento pelo contexto
+    'corradini': 'gazzo veronese', # Mapeamento pelo contexto
+    'michielon': 'montebelluna', # Mapeamento pelo contexto
+    'pedace': 'pedace', # Mapeamento pelo contexto
+    'romio': 'montebello vicentino', # Mapeamento pelo contexto
+    'zampiva': 'brogliano', # Mapeamento pelo contexto
+    'sabbadin': 'cittadella', # Mapeamento pelo contexto
+    'perette': 'villafranca verona', # Corrigido
+    'rizzon deon': 'montebelluna', # Mapeamento pelo contexto
+    'polo': 'isola vicentina', # Mapeamento pelo contexto
+    'dettori': 'ittiri', # Mapeamento pelo contexto
+    'bulgarelli': 'gonzaga', # Mapeamento pelo contexto
+    'peruchi': 'peschiera del garda', # Mapeamento pelo contexto
+    'squizzato': 'loreggia', # Mapeamento pelo contexto
+    'rissi': 'scandolara ravara', # Mapeamento pelo contexto (pode ser Motta Baluffi)
+    'meotti': 'fumane', # Mapeamento pelo contexto
+    'galletti': 'farnese', # Mapeamento pelo contexto (pode ser Viterbo)
+    'chinelato': 'monastier treviso', # Corrigido
+    'begalli': 'verona', # Mapeamento pelo contexto
+    'petrone': 'nao especificado', # Não claro
+    'bovo': 'venezia', # Mapeamento pelo contexto (Martellago?) -> Martellago é comum
+    'massarelli': 'terracina', # Mapeamento pelo contexto
+    'rigazzo': 'bianze', # Corrigido
+    'pagnota': 'avellino', # Mapeamento pelo contexto
+    'olivo': 'borgo a mozzano', # Mapeamento pelo contexto
+    'biondi': 'san marcello piteglio', # Mapeamento pelo contexto
+    'masarut': 'cordovado', # Mapeamento pelo contexto
+    'escopo': 'seren del grappa', # Mapeamento pelo contexto
+    'funghi': 'pitigliano', # Mapeamento pelo contexto
+    'azzolini': 'viadana', # Mapeamento pelo contexto
+    'naressi': 'cessalto', # Mapeamento pelo contexto
+    'pra nichele': 'belluno', # Mapeamento pelo contexto
+    'stasio': 'sessa aurunca', # Mapeamento pelo contexto
+    'marson': 'torre mosto', # Corrigido
+    'zocconelli': 'ferrara', # Mapeamento pelo contexto
+    'lovato': 'campolongo sul brenta', # Mapeamento pelo contexto
+    'cicuto': 'annone veneto', # Mapeamento pelo contexto
+    'ruzzon': 'cona', # Mapeamento pelo contexto (pode ser Conselve)
+    'carazzo': 'trissino', # Mapeamento pelo contexto
+    'benito': 'roseto abruzzi', # Corrigido
+    'bressan': 'correzzola', # Mapeamento pelo contexto
+    'casadei': 'cesena', # Mapeamento pelo contexto
+    'gobbo': 'arcade' # Mapeamento pelo contexto
+}
+
+_REMOVEDOR_PREFIXOS_GERAIS = RemovedorPrefixos(PREFIXOS_GERAIS)
+_REMOVEDOR_PREFIXOS_RELIGIOSOS = RemovedorPrefixos(PREFIXOS_RELIGIOSOS)
+_RE_PONTUACAO = re.compile(r'[\'"\.,;!?()[\]{}]')
+_RE_SIGLA_PARENTESES = re.compile(r'\s*\([a-z]{2}\)\s*')
+_RE_SIGLA_FINAL = re.compile(r'\s+[a-z]{2}$')
+_RE_NUMERO = re.compile(r'\b(n|n\.)\s*\d+\b')
+_RE_LETRA_ISOLADA = re.compile(r'\b[a-z]\b')
+_RE_PALAVRAS_IRRELEVANTES = compilar_palavras(PALAVRAS_IRRELEVANTES)
+_SUBSTITUIDOR_LOCALIZACAO = SubstituidorEmOrdem(SUBSTITUICOES_LOCALIZACAO)
+_RE_ESPACOS = re.compile(r'\s{2,}')
+_VALORES_VAZIOS = {'', 'nan', 'none', 'null'}
+
+def _normalizar_valor(texto):
+    """Normaliza um único nome de localização (mesmas etapas, na mesma ordem, de antes)."""
+    texto = remover_acentos(texto.lower())
+
+    # 3 e 3.5. Prefixos gerais e religiosos
+    texto = _REMOVEDOR_PREFIXOS_GERAIS.remover(texto)
+    texto = _REMOVEDOR_PREFIXOS_RELIGIOSOS.remover(texto)
 
     # 4. Remover pontuação básica
-    normalized = normalized.str.replace(r'[\'"\.,;!?()[\]{}]', '', regex=True)
+    texto = _RE_PONTUACAO.sub('', texto)
 
     # 4.5 Remover sufixos e siglas de província (xx ou (xx)) - Em qualquer lugar
     #   (VI) -> '' , TV -> ''
-    normalized = normalized.str.replace(r'\s*\([a-z]{2}\)\s*', ' ', regex=True) 
-    normalized = normalized.str.replace(r'\s+[a-z]{2}$', '', regex=True) # Remove no final
-    
-    # 4.6 Remover N de número e letras isoladas (podem ser erros ou iniciais)
-    normalized = normalized.str.replace(r'\b(n|n\.)\s*\d+\b', ' ', regex=True) # Remover n 1, n. 12 etc.
-    normalized = normalized.str.replace(r'\b[a-z]\b', ' ', regex=True) # Remover letras isoladas
-    
-    normalized = normalized.str.strip()
+    texto = _RE_SIGLA_PARENTESES.sub(' ', texto)
+    texto = _RE_SIGLA_FINAL.sub('', texto) # Remove no final
 
-    # MELHORIA: Remover palavras irrelevantes para correspondência
-    palavras_irrelevantes = [
-        'della', 'dello', 'delle', 'degli', 'dei', 'del', 'di', 'da', 'dal', 'e', 'ed', 'in', 'con',
-        'su', 'sul', 'sulla', 'sulle', 'sui', 'sugli', 'per', 'tra', 'fra', 'a', 'al', 'alla', 'alle',
-        'ai', 'agli', 'il', 'lo', 'la', 'le', 'i', 'gli', 'un', 'uno', 'una', 'nello', 'nella', 'nelle',
-        'negli', 'nei', 'all', 'dall', 'dall', 'dall',
-        'presso', 'vicino', 'sopra', 'sotto', 'davanti', 'dietro', 'accanto', 'oltre',
-        'verso', 'senza', 'secondo', 'lungo', 'durante', 'dentro', 'fuori', 'prima', 'dopo',
-        'contro', 'attraverso', 'circa', 'intorno', 'grazie', 'mediante', 'oltre', 'malgrado',
-        'nonostante', 'salvo', 'eccetto', 'fino', 'verso',
-        # Novas: comuns em nomes de igrejas/paróquias
-        'apostolo', 'martire', 'vescovo', 'vergine', 'assunta', 'nativita', 'annunciazione', 'abate',
-        'santos', 'sao', 'paroquia', 'parocchia', 'parrochia', 'chiesa', 'arcangelo', 'cap', # Adicionadas 
-        'localita', 'italia' # Adicionadas
-    ]
-    for palavra in palavras_irrelevantes:
-        normalized = normalized.str.replace(r'\b' + re.escape(palavra) + r'\b', ' ', regex=True)
+    # 4.6 Remover N de número e letras isoladas (podem ser erros ou iniciais)
+    texto = _RE_NUMERO.sub(' ', texto) # Remover n 1, n. 12 etc.
+    texto = _RE_LETRA_ISOLADA.sub(' ', texto) # Remover letras isoladas
+    texto = texto.strip()
 
-    # MELHORIA: Substituições para casos comuns - EXPANDIDO
-    substituicoes = {
-        'sangiovanni': 'giovanni', 'sangiuseppe': 'giuseppe', 'sanlorenzo': 'lorenzo', 'sanfrancesco': 'francesco', 
-        'sanmartino': 'martino', 'santamaria': 'maria', 'santantonio': 'antonio', 'sanvincenzo': 'vincenzo', 
-        'santangelo': 'angelo', 'santanna': 'anna', 'sanmichele': 'michele', 'sanmarco': 'marco', 'sannicola': 'nicola',
-        'sanbartolomeo': 'bartolomeo', 'ssantissima': 'santissima', 'santmaria': 'maria', 'santachiara': 'chiara', 
-        'santacaterina': 'caterina', 'santandrea': 'andrea', 'santagnese': 'agnese', 'santarita': 'rita', 
-        'santabarbara': 'barbara', 'santadomenica': 'domenica', 'santapaola': 'paola', 'santateresa': 'teresa', 
-        'santaeufemia': 'eufemia', 'santabruna': 'bruna', 'santaelena': 'elena', 'santantonino': 'antonino', 
-        'santadiocesi': 'diocesi', 'maddalena': 'magdalena', 'battista': 'batista', 'assunta': 'assumpta', 
-        'assunzione': 'assumpcao', 'eucharistia': 'eucaristia', 'treviso': 'treviso', 'venezia': 'venezia', 
-        'veneza': 'venezia', 'padova': 'padova', 'podova': 'padova', 'verona': 'verona', 'vicenza': 'vicenza', 
-        'rovigo': 'rovigo', 'belluno': 'belluno', 'mantova': 'mantova', 'mantua': 'mantova', 'mantoa': 'mantova', 
-        'montova': 'mantova', 'mântua': 'mantova', 'brescia': 'brescia', 'massa-carrara': 'massa carrara', 
-        'massa carrara': 'massa carrara', 'verbano-cusio-ossola': 'verbano cusio ossola', 'verbano-cusi': 'verbano cusio ossola', 
-        'vibo-valentia': 'vibo valentia', 'pesaro-urbino': 'pesaro urbino', 'chiete': 'chieti', 'biela': 'biella', 
-        'lodi': 'lodi', 'novara': 'novara', 'varese': 'varese', 'pavia': 'pavia', 'vibo valentia': 'vibo valentia', 
-        'caltanissetta': 'caltanissetta', 'agrigento': 'agrigento', 'crotone': 'crotone', 'sassari': 'sassari', 
-        'enna': 'enna', 'avellino': 'avellino', 'toscana': 'toscana',
-        # Novas baseadas no debug e nomes comuns:
-        'margherita martire godega': 'godega', # Para CHIESA PARROCCHIALE DI S. MARGHERITA MARTIRE, GODEGA DI S. URBANO
-        's urbano': '', # Remover S. Urbano que pode sobrar
-        'ponte piave': 'ponte piave', # Para Parrocchia Ponte di Piave
-        's andrea apostolo mason vicentino': 'mason vicentino',
-        'santi pietro paolo coreglia antelminelli': 'coreglia antelminelli',
-        'eusebio cortiglione asti': 'cortiglione asti', # Adicionado para caso Parrocchia S. Eusebio
-        'zenone vescovo martire': 'zenone',
-        'villa conte': 'villa conte', # Para VILLA DEL CONTE
-        'pier disonzo': 'san pier isonzo',
-        'crespano dela grappa': 'crespano grappa',
-        'giacciano baruchella': 'giacciano baruchella',
-        'baselice benevento': 'baselice',
-        'paderno cremonese': 'paderno ponchielli', # Nome oficial é Paderno Ponchielli
-        'guardia sanframondi': 'guardia sanframondi',
-        'sermide felonica': 'sermide felonica',
-        'cervarese santa croce': 'cervarese santa croce',
-        'ambrogio valpolicella': 'sant ambrogio valpolicella', 
-        'piazza mons giuseppe scarpa': 'cavarzere', # Forçando resultado para este padrão de endereço
-        'via pietro leopoldo': 'san marcello pistoiese', # Forçando
-        'piazza r trento': 'cariati', # Forçando
-        'via garibaldi': 'oderzo', # Forçando
-        'fiume veneto pn': 'fiume veneto',
-        'silea tv': 'silea',
-        'piovene rocchette vi': 'piovene rocchette', # Correção
-        'persico dosimo cr': 'persico dosimo', # Correção
-        'vazzola tv': 'vazzola', # Correção
-        'fuscaldo cs': 'fuscaldo', # Correção
-        'oratino cb': 'oratino', # Correção
-        'cavezzo modena': 'cavezzo', # Correção
-        'vasto ch': 'vasto', # Correção
-        'bussero mi': 'bussero', # Correção
-        'molinella bo': 'molinella', # Correção
-        'castello di godego': 'godego', # Mapear para godego
-        'sessa aurunca caserta': 'sessa aurunca',
-        'cavaglio spoccia verbano cusi ossola': 'cavaglio spoccia',
-        'coreglia antelminelli lucca': 'coreglia antelminelli',
-        'parghelia cosenza': 'parghelia',
-        'pietragalla potenza': 'pietragalla',
-        'valgi di sotto lucca': 'vagli sotto', # Mapear para nome mais comum
-        'pistoia toscana': 'pistoia',
-        'filadelfia vibo valentia': 'filadelfia',
-        'morigerati salerno': 'morigerati',
-        'sambiase catanzaro': 'sambiase',
-        'praduro e sasso bologna': 'sasso marconi', # Praduro e Sasso é fração de Sasso Marconi
-        'quarrata pistoia': 'quarrata',
-        'sorbano del vescov lucca': 'lucca', # Sorbano é fração de Lucca
-        'chieti chieti': 'chieti',
-        'niscemi caltanissetta': 'niscemi',
-        'lodi lodi': 'lodi',
-        'saracena cosenza': 'saracena',
-        'grotte agrigento': 'grotte',
-        'ottaviano napoli': 'ottaviano',
-        'drapia catanzaro': 'drapia',
-        'torcchiara salerno': 'torchiara', # Corrigido
-        'torano castello cosenza': 'torano castello',
-        'tramutola potenza': 'tramutola',
-        'scandale crotone': 'scandale',
-        'pontremoli massa carrara': 'pontremoli',
-        'suno novara': 'suno',
-        'contrada avellino': 'contrada',
-        'spoltore pescara': 'spoltore',
-        'stilo catanzaro': 'stilo',
-        'grezzago milano': 'grezzago',
-        'fontanella bergamo': 'fontanella',
-        'sab pier arena genova': 'genova', # Sampierdarena é bairro de Gênova
-        'sersale catanzaro': 'sersale',
-        'fara gera adda bergamo': 'fara gera adda',
-        'conflenti catanzaro': 'conflenti',
-        'san ferdinando napoli': 'napoli', # Bairro de Nápoles
-        'santa luce pisa': 'santa luce',
-        'rivello potenza': 'rivello',
-        'daverio varese': 'daverio',
-        'codevigno podova': 'codevigo', # Corrigido nome e provincia
-        'fossombrone pesaro e urbino': 'fossombrone',
-        'sannazzaro burgondi pavia': 'sannazzaro burgondi',
-        'quatrelle avellino': 'avellino', # Fração de Avellino
-        'grimaldi cosenza': 'grimaldi',
-        'almenno san salvatore bergamo': 'almenno san salvatore',
-        'dolo veneza': 'dolo',
-        'nanantola modena': 'nonantola', # Corrigido
-        'impruneta firenze': 'impruneta',
-        'sante marie aquila': 'sante marie',
-        'santeramo in colle bari': 'santeramo in colle',
-        'polesine zibello parma': 'polesine zibello',
-        'frosolone isernia': 'frosolone',
-        'termoli campobasso': 'termoli',
-        'broni pavia': 'broni',
-        'francica catanzaro': 'francica',
-        'palazzolo sulloglio brescia': 'palazzolo sulloglio',
-        'frisa chieti': 'frisa',
-        'savelli crotone': 'savelli',
-        'sustinente montova': 'sustinente', # Corrigido provincia
-        'stazzema lucca': 'stazzema',
-        'conselve padova': 'conselve', # Corrigido provincia
-        'cupello chieti': 'cupello',
-        'ferentino frosinone': 'ferentino',
-        'torraca salerno': 'torraca',
-        'lombardia bergamo': 'bergamo', # Mapear região para capital da província? Ou deixar N/A? Deixar N/A por enquanto.
-        'tissi sassari': 'tissi',
-        'taormina messina': 'taormina',
-        'tessennano viterbo': 'tessennano',
-        'san daniele ripa po cremona': 'san daniele po', # Nome oficial
-        'bagnatica bergamo': 'bagnatica',
-        'torraca salerno': 'torraca',
-        'desenzano del garda brescia': 'desenzano del garda',
-        'baselice benevento': 'baselice',
-        'cella dati cremona': 'cella dati',
-        'fossalto campobasso': 'fossalto',
-        'torricella del pizzo cremona': 'torricella del pizzo',
-        'cellara cosenza': 'cellara',
-        'biela biela': 'biella', # Corrigido
-        'mongrassano cosenza': 'mongrassano',
-        'san pier isonzo gorizia': 'san pier isonzo',
-        'regalbuto enna': 'regalbuto',
-        'gravina in puglia bari': 'gravina in puglia',
-        'firenze toscana': 'firenze',
-        'rivarolo mantovano mantua': 'rivarolo mantovano',
-        'san benedetto po mantua': 'san benedetto po',
-        'sant alberto ravenna': 'ravenna', # Fração de Ravenna
-        'castiglione a casauria pescara': 'castiglione a casauria',
-        'lioni avellino': 'lioni',
-        'zaccanopoli vibo valentina': 'zaccanopoli',
-        'manerba brescia': 'manerba',
-        'guardia sanframondi benevento': 'guardia sanframondi',
-        'firenzuola florenza': 'firenzuola', # Corrigido provincia
-        # Mapeamentos de paróquias/endereços para comunes conhecidos
-        'parrocchia s. maria immacolata veneza': 'venezia',
-        'parrocchia benabbio bagni luca': 'bagni di lucca',
-        'parrocchia san lorenzo martire voghera': 'voghera',
-        'parrocchia sant ambrogio dego dego': 'dego',
-        'parrocchia santi pietro e paolo coreglia antelminelli': 'coreglia antelminelli',
-        'chiesa parrocchiale tempio sassari': 'tempio pausania', # Nome oficial
-        'parrocchia santa fosca a roncadelle brescia': 'roncadelle',
-        'via roma 67 cap 36010 - chiuppano': 'chiuppano',
-        'paroquia maria ss. assunta collegiata': 'offida', # Mapeamento pelo contexto
-        'parrocchia santa gertrude rotzo': 'rotzo', # Adicionado mapeamento direto
-        'parrocchia s.giovanni battista - montesarchio': 'montesarchio',
-        'parrocchia san michele arcangelo quarto altino': 'quarto altino', # Adicionado mapeamento direto
-        'piazza san marco 1 - cap 35043 monselice': 'monselice',
-        'via dante maiocchi 55 - cap 01100 roccalvecce': 'viterbo', # Fração de Viterbo
-        'via europa 10 - cap 55030 - vagli sotto': 'vagli sotto',
-        'piazza aldo moro 24 - cap 45010 villadose': 'villadose',
-        'piazza caduti 1- cap 31024 ormelle': 'ormelle',
-        'via umberto i 2 - cap 30014 cavarzere': 'cavarzere',
-        'via roma 115 - cap 88825 savelli': 'savelli',
-        'via garibaldi 14 - cap 31046 oderzo': 'oderzo',
-        'careggine lu': 'careggine',
-        'viale papa giovanni xxiii 2 - cap 31030 castelcucco': 'castelcucco',
-        'longarone bl': 'longarone',
-        'san bartolomeo in galdo bn': 'san bartolomeo in galdo',
-        'ceggia ve': 'ceggia',
-        'paola cs': 'paola',
-        'mira ve': 'mira',
-        'san zenone al po pv': 'san zenone al po',
-        'favaro veneto': 'venezia', # Bairro de Veneza
-        'fonte tv': 'fonte',
-        'fardella pz': 'fardella',
-        'molazzana lu': 'molazzana',
-        'norbello or': 'norbello',
-        'pedace cs': 'pedace',
-        'ittiri ss': 'ittiri',
-        'leonforte en': 'leonforte',
-        'samassi su': 'samassi', # SU é província Sud Sardegna
-        'arcugnano vi': 'arcugnano',
-        'molinella bo': 'molinella',
-        'piazza iv novembre 10 - 37022 - fumane': 'fumane',
-        'loiano bo': 'loiano',
-        'piazza xiv dicembre 5 - 28019 - suno': 'suno',
-        'soave vr': 'soave',
-        'ottaviano na': 'ottaviano',
-        'via pietro leopoldo 24 - 51028 - san marcello pistoiese': 'san marcello piteglio', # Nome atual
-        'grezzago mi': 'grezzago',
-        'piazza martiri della liberta 3 - 31040 - cessalto': 'cessalto',
-        'via xxi luglio cap 81037 sessa aurunca': 'sessa aurunca',
-        'via giuseppe garibaldi 60 35020 - correzzola': 'correzzola',
-        'zero branco tv': 'zero branco',
-        'fumachi': 'colognola ai colli', # Mapeamento pelo contexto
-        'filippini': 'perugia', # Mapeamento pelo contexto
-        'de lucca': 'gaiarine', # Mapeamento pelo contexto
-        'censi': 'san giovanni lupatoto', # Mapeamento pelo contexto
-        'davi': 'villa bartolomea', # Mapeamento pelo contexto (pode ser Bovolone também, priorizar o primeiro)
-        'fabbiani': 'bellombra', # Mapeamento pelo contexto (Adria?) -> Bellombra é fração de Adria
-        'simoncello': 'ronca', # Mapeamento pelo contexto
-        'gabrieli': 'modena', # Mapeamento pelo contexto
-        'simonetto': 'san pietro in gu', # Mapeamento pelo contexto
-        'ortolan': 'caneva', # Mapeamento pelo contexto
-        'costellini': 'mogliano veneto', # Mapeamento pelo contexto
-        'vanzelli': 'rovigo', # Mapeamento pelo contexto (pode ser Canaro também)
-        'defalco': 'brindisi', # Mapeamento pelo contexto
-        'garofalo': 'cosenza', # Mapeamento pelo contexto (San Giovanni in Fiore?)
-        'conti': 'roverbella', # Mapeamento pelo contexto
-        'pizzinat': 'vittorio veneto', # Mapeamento pelo contexto
-        'bernardini': 'foiano della chiana', # Mapeamento pelo contexto (pode ser Bettolle também)
-        'via roma 29 - cap 46031 - bagnolo san vito': 'bagnolo san vito',
-        'rissi': 'scandolara ravara', # Mapeamento pelo contexto
-        'linguanotto': 'basalghelle', # Mapeamento pelo contexto
-        'quinzi': 'poggio san lorenzo', # Mapeamento pelo contexto (pode ser Rocca Sinibalda)
-        'colombo': 'cassano adda', # Corrigido
-        'ragonezi': 'castelforte', # Mapeamento pelo contexto
-        'morandin': 'vedelago', # Mapeamento pelo contexto
-        'zanatta': 'treviso', # Mapeamento pelo contexto
-        'guerra': 'montefiore conca', # Mapeamento pelo contexto
-        'cerantola': 'castelfranco veneto', # Mapeamento pelo contexto
-        'da re': 'villorba', # Mapeamento pelo contexto
-        'maggiolo': 'vigodarzere', # Mapeamento pelo contexto
-        'pagotto': 'arcade', # Mapeamento pelo contexto
-        'cagnotto': 'cavarzere', # Mapeamento pelo contexto
-        'possenatto': 'brognoligo-costalunga', # Mapeamento pelo contexto
-        'galante': 'urbana', # Mapeamento pelo contexto
-        'ravgnani': 'rovigo', # Mapeamento pelo contexto
-        'giacomin': 'casale sul sile', # Mapeamento pelo contexto
-        'morelli': 'ravenna', # Mapeamento pelo contexto
-        'bussadori': 'castelmassa', # Mapeamento pelo contexto
-        'rizotto': 'alano piave', # Corrigido
-        'galuppo': 'lusia', # Mapeamento pelo contexto
-        'zerbinati': 'sermide felonica', # Mapeamento pelo contexto
-        'buosi': 'fontanelle', # Mapeamento pelo contexto (pode ser Oderzo)
-        'maiolo': 'vibo valentia', # Mapeamento pelo contexto
-        'magnani': 'quistello', # Mapeamento pelo contexto
-        'dal ponte': 'pozzoleone', # Mapeamento pelo contexto
-        'bettin': 'piombino dese', # Mapeamento pelo contexto
-        'bovi': 'bigarello', # Mapeamento pelo contexto
-        'fante': 'bevilacqua', # Mapeamento pelo contexto
-        'ravasio': 'mapello', # Mapeamento pelo contexto
-        'rosa': 'mantova', # Mapeamento pelo contexto (Marmirolo?)
-        'pagliarone': 'san vito chietino', # Mapeamento pelo contexto
-        'pagliari': 'viterbo', # Mapeamento pelo contexto (Roccalvecce é fração)
-        'zuccon': 'zenson piave', # Corrigido
-        'zambotti': 'bigarello', # Mapeamento pelo contexto (Stradella é fração)
-        'zoccaratto': 'santa giustina in colle', # Mapeamento pelo contexto
-        'ferronato': 'cittadella', # Mapeamento pelo contexto
-        'rossato': 'belfiore', # Mapeamento pelo contexto
-        'marin': 'san dona piave', # Corrigido
-        'bobbo': 'venezia', # Mapeamento pelo contexto
-        'ungarelli': 'molinella', # Mapeamento pelo contexto
-        'mariani': 'annicco', # Mapeamento pelo contexto
-        'pace': 'pavia', # Mapeamento pelo contexto
-        'bertoncello': 'marostica', # Mapeamento pelo contexto
-        'camaduro': 'ormelle', # Mapeamento pelo contexto
-        'lombello': 'cartura', # Mapeamento pelo contexto
-        'furlan': 'chioggia', # Mapeamento pelo contexto
-        'asinelli': 'torino', # Mapeamento pelo contexto
-        'gualtieri': 'savelli', # Mapeamento pelo contexto
-        'ferri': 'zanica', # Mapeamento pelo contexto
-        'borelli': 'poggio rusco', # Mapeamento pelo contexto
-        'facchini': 'canaro', # Mapeamento pelo contexto (pode ser Felonica)
-        'marchesin': 'oderzo', # Mapeamento pelo contexto
-        'rizzati': 'bergantino', # Mapeamento pelo contexto
-        'andruccioli': 'montefiore conca', # Mapeamento pelo contexto
-        'conti': 'careggine', # Mapeamento pelo contexto
-        'nesi': 'levate', # Mapeamento pelo contexto
-        'bailo': 'monfumo', # Mapeamento pelo contexto
-        'gabrielli': 'modena', # Mapeamento pelo contexto
-        'faragutti': 'finale emilia', # Mapeamento pelo contexto
-        'gobbi': 'torrebelvicino', # Mapeamento pelo contexto
-        'biguetto': 'tombolo', # Mapeamento pelo contexto
-        'cola': 'castelcucco', # Mapeamento pelo contexto
-        'zonatto': 'chiampo', # Mapeamento pelo contexto
-        'massarotto': 'crespino', # Mapeamento pelo contexto
-        'marruchella': 'san bartolomeo in galdo', # Mapeamento pelo contexto
-        'rampazzo': 'sant angelo piove sacco', # Corrigido
-        'perissoto': 'ceggia', # Mapeamento pelo contexto (pode ser Eraclea)
-        'esposte': 'sasso marconi', # Mapeamento pelo contexto
-        'chiebao': 'cavarzere', # Mapeamento pelo contexto
-        'musacco': 'isola del giglio', # Mapeamento pelo contexto
-        'misurelli': 'rende', # Mapeamento pelo contexto
-        'perrone': 'mormanno', # Mapeamento pelo contexto
-        'ghisoni': 'san zenone al po', # Mapeamento pelo contexto
-        'massoni': 'casaleone', # Mapeamento pelo contexto (Verona?)
-        'scappini': 'motta baluffi', # Mapeamento pelo contexto
-        'magri': 'poggio rusco', # Mapeamento pelo contexto
-        'andreoli': 'fonte', # Mapeamento pelo contexto
-        'toffolo': 'bologna', # Mapeamento pelo contexto
-        'bettanin': 'lusiana', # Mapeamento pelo contexto
-        'sabbadini': 'calcio', # Mapeamento pelo contexto
-        'franchini': 'villimpenta', # Mapeamento pelo contexto
-        'dall osto': 'montecchio precalcino', # Mapeamento pelo contexto (pode ser Mason Vicentino)
-        'flora': 'maratea', # Mapeamento pelo contexto
-        'giordano': 'montemilone', # Mapeamento pelo contexto
-        'marchiori': 'malo', # Mapeamento pelo contexto
-        'rettore': 'leonforte', # Mapeamento pelo contexto
-        'fontanella': 'longarone', # Mapeamento pelo contexto
-        'furlanetto': 'meolo', # Mapeamento pelo contexto
-        'corradini': 'gazzo veronese', # Mapeamento pelo contexto
-        'michielon': 'montebelluna', # Mapeamento pelo contexto
-        'pedace': 'pedace', # Mapeamento pelo contexto
-        'romio': 'montebello vicentino', # Mapeamento pelo contexto
-        'zampiva': 'brogliano', # Mapeamento pelo contexto
-        'sabbadin': 'cittadella', # Mapeamento pelo contexto
-        'perette': 'villafranca verona', # Corrigido
-        'rizzon deon': 'montebelluna', # Mapeamento pelo contexto
-        'polo': 'isola vicentina', # Mapeamento pelo contexto
-        'dettori': 'ittiri', # Mapeamento pelo contexto
-        'bulgarelli': 'gonzaga', # Mapeamento pelo contexto
-        'peruchi': 'peschiera del garda', # Mapeamento pelo contexto
-        'squizzato': 'loreggia', # Mapeamento pelo contexto
-        'rissi': 'scandolara ravara', # Mapeamento pelo contexto (pode ser Motta Baluffi)
-        'meotti': 'fumane', # Mapeamento pelo contexto
-        'galletti': 'farnese', # Mapeamento pelo contexto (pode ser Viterbo)
-        'chinelato': 'monastier treviso', # Corrigido
-        'begalli': 'verona', # Mapeamento pelo contexto
-        'petrone': 'nao especificado', # Não claro
-        'bovo': 'venezia', # Mapeamento pelo contexto (Martellago?) -> Martellago é comum
-        'massarelli': 'terracina', # Mapeamento pelo contexto
-        'rigazzo': 'bianze', # Corrigido
-        'pagnota': 'avellino', # Mapeamento pelo contexto
-        'olivo': 'borgo a mozzano', # Mapeamento pelo contexto
-        'biondi': 'san marcello piteglio', # Mapeamento pelo contexto
-        'masarut': 'cordovado', # Mapeamento pelo contexto
-        'escopo': 'seren del grappa', # Mapeamento pelo contexto
-        'funghi': 'pitigliano', # Mapeamento pelo contexto
-        'azzolini': 'viadana', # Mapeamento pelo contexto
-        'naressi': 'cessalto', # Mapeamento pelo contexto
-        'pra nichele': 'belluno', # Mapeamento pelo contexto
-        'stasio': 'sessa aurunca', # Mapeamento pelo contexto
-        'marson': 'torre mosto', # Corrigido
-        'zocconelli': 'ferrara', # Mapeamento pelo contexto
-        'lovato': 'campolongo sul brenta', # Mapeamento pelo contexto
-        'cicuto': 'annone veneto', # Mapeamento pelo contexto
-        'ruzzon': 'cona', # Mapeamento pelo contexto (pode ser Conselve)
-        'carazzo': 'trissino', # Mapeamento pelo contexto
-        'benito': 'roseto abruzzi', # Corrigido
-        'bressan': 'correzzola', # Mapeamento pelo contexto
-        'casadei': 'cesena', # Mapeamento pelo contexto
-        'gobbo': 'arcade' # Mapeamento pelo contexto
-    }
-    for original, substituicao in substituicoes.items():
-        # Usar regex para substituir apenas a palavra/frase inteira
-        normalized = normalized.str.replace(r'\b' + re.escape(original) + r'\b', substituicao, regex=True)
+    # Palavras irrelevantes e substituições para casos comuns
+    texto = _RE_PALAVRAS_IRRELEVANTES.sub(' ', texto)
+    texto = _SUBSTITUIDOR_LOCALIZACAO.aplicar(texto)
 
     # 5. Remover espaços extras novamente após substituições
-    normalized = normalized.str.strip()
-    normalized = normalized.str.replace(r'\s{2,}', ' ', regex=True)
-    
+    texto = _RE_ESPACOS.sub(' ', texto.strip())
+
     # 6. Tratar valores que se tornaram vazios ou eram nulos
-    normalized = normalized.replace(['', 'nan', 'none', 'null'], 'nao especificado', regex=False)
-    
-    return normalized
+    return 'nao especificado' if texto in _VALORES_VAZIOS else texto
+
+def _normalizar_localizacao(series):
+    # Implementação copiada de views/comune/data_loader.py ...
+    if not isinstance(series, pd.Series):
+        series = pd.Series(series)
+    # Os nomes se repetem muito: cada valor distinto é normalizado uma única vez
+    return aplicar_por_valor_unico(series.fillna('').astype(str), _normalizar_valor)
+
+def _aplicar_coordenadas(df, coords, source):
+    """Grava latitude/longitude/COORD_SOURCE nas linhas de `coords` (Series de tuplas (lat, lon))."""
+    df.loc[coords.index, 'latitude'] = [c[0] for c in coords]
+    df.loc[coords.index, 'longitude'] = [c[1] for c in coords]
+    df.loc[coords.index, 'COORD_SOURCE'] = source
+
+def _aplicar_coordenadas_por_nome(df, nomes, matches):
+    """
+    Grava as coordenadas encontradas por nome em todas as linhas com esse nome.
+
+    Args:
+        df (pandas.DataFrame): DataFrame de destino
+        nomes (pandas.Series): Nomes normalizados das linhas sem coordenadas (índice de df)
+        matches (dict): {nome: (lat, lon, source)}
+
+    Returns:
+        int: Quantidade de linhas preenchidas
+    """
+    # Um único map da tabela de matches sobre a coluna (sem varrer a Series por nome)
+    encontrados = nomes.map(matches).dropna()
+    if encontrados.empty:
+        return 0
+    _aplicar_coordenadas(df, encontrados, encontrados.map(lambda match: match[2]))
+    return len(encontrados)
 
 # --- Função para carregar coordenadas (adaptada) ---
 @st.cache_data(ttl=86400) # Cache de 1 dia
@@ -730,24 +767,16 @@ def load_comune_data(force_reload: bool = False) -> pd.DataFrame:
         if not df_coordenadas.empty:
             # --- LÓGICA DE MATCHING REESTRUTURADA ---
 
+            # Índice de geocodificação (dicionários, buckets e matches persistidos)
+            geo_index = get_geocoding_index(df_coordenadas)
+
             # 1. Match Exato (Apenas Comune) - PRIORIZADO
-            exact_matches_c = 0
-            # Criar um mapa de comune_norm para coordenadas para lookup rápido
-            comune_coord_map = (df_coordenadas
-                                .drop_duplicates(subset=['COMUNE_MAPA_NORM'], keep='first')
-                                .set_index('COMUNE_MAPA_NORM')[['latitude', 'longitude']]
-                                .to_dict('index')
-                               )
-                                                
-            # Iterar sobre TODAS as linhas inicialmente
-            for idx in df_final.index:
-                comune_norm = df_final.at[idx, 'COMUNE_NORM']
-                if comune_norm != 'nao especificado' and comune_norm in comune_coord_map:
-                    coords = comune_coord_map[comune_norm]
-                    df_final.at[idx, 'latitude'] = coords['latitude']
-                    df_final.at[idx, 'longitude'] = coords['longitude']
-                    df_final.at[idx, 'COORD_SOURCE'] = 'ExactMatch_Comune'
-                    exact_matches_c += 1
+            # Lookup vetorizado no mapa comune_norm -> coordenadas
+            coords_exatas = df_final['COMUNE_NORM'].map(geo_index.comune_coords)
+            mask_exato = coords_exatas.notna() & (df_final['COMUNE_NORM'] != 'nao especificado')
+            exact_matches_c = int(mask_exato.sum())
+            if exact_matches_c:
+                _aplicar_coordenadas(df_final, coords_exatas[mask_exato], 'ExactMatch_Comune')
             
             # Máscara para identificar linhas que AINDA não têm coordenadas
             no_coords_mask = df_final['latitude'].isna()
@@ -984,66 +1013,19 @@ def load_comune_data(force_reload: bool = False) -> pd.DataFrame:
                 no_coords_mask = df_final['latitude'].isna() # Atualizar máscara
                 print(f"{no_coords_mask.sum()} registros ainda sem coordenadas.")
             
-            # 4. Match Fuzzy (Múltiplos Métodos)
+            # 4. Match Fuzzy (Múltiplos Métodos) - em lote sobre os nomes únicos sem coordenadas
             if no_coords_mask.any() and process is not None and fuzz is not None:
                 print("Etapa 4: Match Fuzzy (Múltiplos Métodos)")
-                fuzzy_matches_count = 0
-                match_threshold = 80 
-                
-                # Lista de comunes do JSON para comparar
-                json_comunes_norm_list = df_coordenadas['COMUNE_MAPA_NORM'].unique().tolist()
-                if 'nao especificado' in json_comunes_norm_list: json_comunes_norm_list.remove('nao especificado')
-                
-                # Cache para evitar recalcular matches
-                fuzzy_matches_cache = {}
+                nomes_sem_coords = df_final.loc[no_coords_mask, 'COMUNE_NORM']
+                fuzzy_matches = geo_index.fuzzy_match_comunes(nomes_sem_coords.unique(), strategy='melhor')
                 
-                # Iterar apenas nos que ainda não têm coordenadas
-                for idx in df_final[no_coords_mask].index:
-                    comune_norm = df_final.at[idx, 'COMUNE_NORM']
-                    if comune_norm == 'nao especificado' or len(comune_norm) < 3:
-                        continue
-                    
-                    best_match, score, method = None, 0, None
-                    
-                    # Verificar cache
-                    if comune_norm in fuzzy_matches_cache:
-                         best_match, score, method = fuzzy_matches_cache[comune_norm]
-                    else:
-                        # Tentar diferentes métodos fuzzy
-                        scorers = {
-                            'TokenSort': fuzz.token_sort_ratio,
-                            'TokenSet': fuzz.token_set_ratio,
-                            'Partial': fuzz.partial_ratio,
-                            'Standard': fuzz.ratio
-                        }
-                        current_best_score = 0
-                        
-                        for method_name, scorer_func in scorers.items():
-                             cutoff = match_threshold if method_name != 'Standard' else 75 # Threshold menor para Standard
-                             match_result = process.extractOne(
-                                 query=comune_norm,
-                                 choices=json_comunes_norm_list,
-                                 scorer=scorer_func, 
-                                 score_cutoff=cutoff
-                             )
-                             if match_result and match_result[1] > current_best_score:
-                                  best_match, score, method = match_result[0], match_result[1], method_name
-                                  current_best_score = score
-                                  # Prioridade alta para TokenSet e TokenSort
-                                  if method_name in ['TokenSet', 'TokenSort'] and score >= 85: 
-                                       break # Confiança alta, parar busca
-                                       
-                        fuzzy_matches_cache[comune_norm] = (best_match, score, method) # Cache result (inclui falhas)
-
-                    # Aplicar o melhor match encontrado
-                    if best_match:
-                        match_rows = df_coordenadas[df_coordenadas['COMUNE_MAPA_NORM'] == best_match]
-                        if not match_rows.empty:
-                            match_row = match_rows.iloc[0]
-                            df_final.at[idx, 'latitude'] = match_row['latitude']
-                            df_final.at[idx, 'longitude'] = match_row['longitude']
-                            df_final.at[idx, 'COORD_SOURCE'] = f'FuzzyMatch_{method}_{score}'
-                            fuzzy_matches_count += 1
+                # Aplicar o melhor match encontrado
+                matches_fuzzy = {}
+                for comune_norm, (best_match, score, method) in fuzzy_matches.items():
+                    coords = geo_index.comune_coords.get(best_match)
+                    if coords:
+                        matches_fuzzy[comune_norm] = (coords[0], coords[1], f'FuzzyMatch_{method}_{score}')
+                fuzzy_matches_count = _aplicar_coordenadas_por_nome(df_final, nomes_sem_coords, matches_fuzzy)
                             
                 print(f"{fuzzy_matches_count} coordenadas adicionadas por Match Fuzzy.")
                 no_coords_mask = df_final['latitude'].isna() # Atualizar máscara
@@ -1054,25 +1036,18 @@ def load_comune_data(force_reload: bool = False) -> pd.DataFrame:
             # 5. Match por Início do Nome (Prefix Match)
             if no_coords_mask.any():
                 print("Etapa 5: Match por Início do Nome (Prefixo)")
-                prefix_matches_count = 0
-                for idx in df_final[no_coords_mask].index:
-                    comune_norm = df_final.at[idx, 'COMUNE_NORM']
+                matches_prefixo = {}
+                nomes_sem_coords = df_final.loc[no_coords_mask, 'COMUNE_NORM']
+                for comune_norm in nomes_sem_coords.unique():
                     if comune_norm == 'nao especificado' or len(comune_norm) < 4:
                         continue
                     
-                    prefix_len = min(len(comune_norm), 5)
-                    prefix = comune_norm[:prefix_len]
-                    possible_matches = [c for c in json_comunes_norm_list if c.startswith(prefix)]
-                    
-                    if possible_matches:
-                        best_match = sorted(possible_matches, key=len)[0] # O mais curto
-                        match_rows = df_coordenadas[df_coordenadas['COMUNE_MAPA_NORM'] == best_match]
-                        if not match_rows.empty:
-                            match_row = match_rows.iloc[0]
-                            df_final.at[idx, 'latitude'] = match_row['latitude']
-                            df_final.at[idx, 'longitude'] = match_row['longitude']
-                            df_final.at[idx, 'COORD_SOURCE'] = f'PrefixMatch_{prefix}'
-                            prefix_matches_count += 1
+                    prefix = comune_norm[:min(len(comune_norm), 5)]
+                    best_match = geo_index.prefix_match(prefix) # O mais curto
+                    coords = geo_index.comune_coords.get(best_match) if best_match else None
+                    if coords:
+                        matches_prefixo[comune_norm] = (coords[0], coords[1], f'PrefixMatch_{prefix}')
+                prefix_matches_count = _aplicar_coordenadas_por_nome(df_final, nomes_sem_coords, matches_prefixo)
                             
                 print(f"{prefix_matches_count} coordenadas adicionadas por Match de Prefixo.")
                 no_coords_mask = df_final['latitude'].isna() # Atualizar máscara
@@ -1081,46 +1056,33 @@ def load_comune_data(force_reload: bool = False) -> pd.DataFrame:
             # 6. Último Recurso: Match por Província (Exato e Fuzzy)
             if no_coords_mask.any():
                 print("Etapa 6: Match por Província (Exato e Fuzzy)")
-                provincia_matches_count = 0
-                json_provincias_norm_list = df_coordenadas['PROVINCIA_MAPA_NORM'].unique().tolist()
-                if 'nao especificado' in json_provincias_norm_list: json_provincias_norm_list.remove('nao especificado')
+                matches_provincia = {}
+                provincias_sem_coords = df_final.loc[no_coords_mask, 'PROVINCIA_NORM']
+                provincias_unicas = [p for p in provincias_sem_coords.unique() if p != 'nao especificado']
                 
-                # Corrigido (envolvido em parênteses)
-                provincia_coord_map = (df_coordenadas
-                                       .drop_duplicates(subset=['PROVINCIA_MAPA_NORM'], keep='first')
-                                       .set_index('PROVINCIA_MAPA_NORM')[['latitude', 'longitude']]
-                                       .to_dict('index')
-                                      )
+                # Fuzzy em lote apenas para as províncias sem match exato
+                provincias_fuzzy = {}
+                if process is not None and fuzz is not None:
+                    provincias_fuzzy = geo_index.fuzzy_match_provincias(
+                        [p for p in provincias_unicas if p not in geo_index.provincia_coords and len(p) >= 4],
+                        cutoff=75
+                    )
                 
-                for idx in df_final[no_coords_mask].index:
-                    provincia_norm = df_final.at[idx, 'PROVINCIA_NORM']
+                for provincia_norm in provincias_unicas:
                     coords = None
                     source = None
-                    
-                    if provincia_norm != 'nao especificado':
-                        # Tentar match exato da província
-                        if provincia_norm in provincia_coord_map:
-                             coords = provincia_coord_map[provincia_norm]
-                             source = 'ProvinciaMatch'
-                        # Se falhar e tiver thefuzz, tentar fuzzy
-                        elif process is not None and fuzz is not None and len(provincia_norm) >= 4:
-                            match_result = process.extractOne(
-                                query=provincia_norm,
-                                choices=json_provincias_norm_list,
-                                scorer=fuzz.token_set_ratio,
-                                score_cutoff=75
-                            )
-                            if match_result:
-                                best_match_prov = match_result[0]
-                                if best_match_prov in provincia_coord_map:
-                                     coords = provincia_coord_map[best_match_prov]
-                                     source = f'ProvinciaFuzzy_{match_result[1]}'
+                    # Tentar match exato da província
+                    if provincia_norm in geo_index.provincia_coords:
+                        coords = geo_index.provincia_coords[provincia_norm]
+                        source = 'ProvinciaMatch'
+                    elif provincia_norm in provincias_fuzzy:
+                        best_match_prov, score = provincias_fuzzy[provincia_norm]
+                        coords = geo_index.provincia_coords.get(best_match_prov)
+                        source = f'ProvinciaFuzzy_{score}'
                     
                     if coords:
-                         df_final.at[idx, 'latitude'] = coords['latitude']
-                         df_final.at[idx, 'longitude'] = coords['longitude']
-                         df_final.at[idx, 'COORD_SOURCE'] = source
-                         provincia_matches_count += 1
+                        matches_provincia[provincia_norm] = (coords[0], coords[1], source)
+                provincia_matches_count = _aplicar_coordenadas_por_nome(df_final, provincias_sem_coords, matches_provincia)
                          
                 print(f"{provincia_matches_count} coordenadas adicionadas por Match de Província (Exato/Fuzzy).")
                 no_coords_mask = df_final['latitude'].isna() # Atualizar máscara
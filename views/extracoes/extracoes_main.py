@@ -10,6 +10,8 @@ sys.path.append(str(path_root))
 
 # Importar módulos específicos do projeto
 from api.bitrix_connector import load_merged_data
+from utils.export_engine import export_csv, download_export
+from utils.parallel_loader import run_parallel_loaders
 
 # Definir funções de animação localmente
 def display_loading_animation(message="Carregando..."):
@@ -130,10 +132,9 @@ def mostrar_visualizacao_dados():
                 st.dataframe(df, use_container_width=True)
                 
                 # Permitir download dos dados
-                csv = df.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
+                download_export(
                     label="Download dos Dados (CSV)",
-                    data=csv,
+                    path=export_csv(df, encoding='utf-8-sig'),
                     file_name=f"dados_bitrix_{categoria}_{date_from}_{date_to}.csv",
                     mime="text/csv",
                     use_container_width=True
@@ -181,16 +182,23 @@ def mostrar_exportar_csv():
                 date_from = data_inicial.strftime("%Y-%m-%d")
                 date_to = data_final.strftime("%Y-%m-%d")
                 
-                # Carregar dados para cada categoria
-                dfs = []
-                for cat in categoria:
-                    df_cat = load_merged_data(
+                # Carregar as categorias em paralelo
+                def carregar_categoria(cat):
+                    return lambda: load_merged_data(
                         category_id=cat,
                         date_from=date_from,
                         date_to=date_to,
                         debug=False
                     )
-                    
+                
+                resultados, _ = run_parallel_loaders(
+                    {cat: (carregar_categoria(cat), []) for cat in categoria},
+                    label="exportação CSV"
+                )
+                
+                dfs = []
+                for cat in categoria:
+                    df_cat = resultados[cat]
                     if not df_cat.empty:
                         # Adicionar coluna de categoria se múltiplas categorias
                         if len(categoria) > 1:
@@ -201,33 +209,29 @@ def mostrar_exportar_csv():
                 if not dfs:
                     st.warning("Não foram encontrados dados para os filtros selecionados.")
                 else:
-                    # Combinar todos os dataframes
-                    df_final = pd.concat(dfs, ignore_index=True)
-                    
-                    # Selecionar colunas desejadas (se existirem no dataframe)
-                    colunas_exportar = [col for col in colunas_selecionadas if col in df_final.columns]
+                    # Selecionar colunas desejadas (se existirem em alguma categoria)
+                    colunas_disponiveis = list(dict.fromkeys(col for df_cat in dfs for col in df_cat.columns))
+                    colunas_exportar = [col for col in colunas_selecionadas if col in colunas_disponiveis]
                     
                     # Verificar se há colunas para exportar
                     if not colunas_exportar:
                         st.warning("Nenhuma das colunas selecionadas existe nos dados. Exportando todas as colunas disponíveis.")
-                        df_export = df_final
-                    else:
-                        df_export = df_final[colunas_exportar]
+                        colunas_exportar = colunas_disponiveis
                     
                     # Exibir prévia
                     st.subheader("Prévia dos Dados para Exportação")
-                    st.dataframe(df_export.head(10), use_container_width=True)
+                    st.dataframe(pd.concat([df_cat.head(10) for df_cat in dfs], ignore_index=True).reindex(columns=colunas_exportar).head(10), use_container_width=True)
                     
-                    # Permitir download dos dados
-                    csv = df_export.to_csv(index=False).encode('utf-8-sig')
-                    st.download_button(
+                    # Permitir download dos dados (categorias gravadas em sequência, sem concatenar)
+                    download_export(
                         label="Download dos Dados (CSV)",
-                        data=csv,
+                        path=export_csv(dfs, columns=colunas_exportar, encoding='utf-8-sig'),
                         file_name=f"exportacao_bitrix_{date_from}_{date_to}.csv",
                         mime="text/csv",
                         use_container_width=True
                     )
                     
-                    st.success(f"Arquivo CSV gerado com sucesso! Total de registros: {len(df_export)}")
+                    total_registros = sum(len(df_cat) for df_cat in dfs)
+                    st.success(f"Arquivo CSV gerado com sucesso! Total de registros: {total_registros}")
             except Exception as e:
                 st.error(f"Erro ao gerar arquivo CSV: {str(e)}") 
\ No newline at end of file
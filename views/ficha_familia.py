@@ -55,17 +55,24 @@ from views.comune_new.data_loader import load_comune_data # CORRIGIDO
 
 # Importar a função central de carregamento do Bitrix
 from api.bitrix_connector import load_merged_data
+from utils.family_search_index import get_family_search_index
+from utils.family_emissions_index import build_family_emissions_index
+from utils.derived_cache import cached_derived
 
 # Importar função de simplificação de estágio
 # Tratamento de erro caso o arquivo não exista ou a função não seja encontrada
 try:
     from views.cartorio_new.visao_geral import simplificar_nome_estagio
+    from views.cartorio_new.utils import mapear_estagios
 except ImportError as e:
     st.error(f"Erro ao importar 'simplificar_nome_estagio': {e}. A exibição do status da certidão pode falhar.")
     # Definir uma função placeholder para evitar erros fatais
     def simplificar_nome_estagio(nome):
         return str(nome) if nome else "Erro Import"
 
+    def mapear_estagios(serie, categorica=False):
+        return serie.apply(simplificar_nome_estagio)
+
 def load_crm_deal_data(category_id):
     """Carrega dados do CRM Deal (Funil/Categoria especificado) usando a função central load_merged_data."""
     print(f"[INFO] Solicitando dados CRM para category_id: {category_id} via load_merged_data")
@@ -109,6 +116,177 @@ def load_page_specific_css(file_path):
 
 # Função removida - agora usamos load_data_all_pipelines() do views.cartorio_new.data_loader
 
+# NOVA LÓGICA: Função para determinar categoria baseada em Pipeline + Status
+# Esta correção resolve o problema de chaves duplicadas no mapeamento anterior
+def determinar_categoria_por_pipeline_status(category_id, stage_name_legivel):
+    """Determina a categoria do resumo baseada no pipeline (CATEGORY_ID) e status (STAGE_NAME_LEGIVEL)"""
+    category_id_str = str(category_id)
+    status_upper = str(stage_name_legivel).upper() if pd.notna(stage_name_legivel) else ""
+    
+    # Pipeline 92 e 94 (Cartórios Casa Verde e Tatuapé)
+    if category_id_str in ['92', '94']:
+        if status_upper == 'AGUARDANDO DECISÃO CLIENTE':
+            return 'Aguardando Decisão Cliente'
+        if status_upper in ["AGUARDANDO CERTIDÃO", "BUSCA - CRC", "DEVOLUTIVA BUSCA - CRC", 
+                          "APENAS ASS. REQ CLIENTE P/MONTAGEM", "MONTAGEM REQUERIMENTO CARTÓRIO", 
+                          "SOLICITAR CARTÓRIO DE ORIGEM", "SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE", 
+                          "DEVOLUÇÃO ADM", "DEVOLVIDO REQUERIMENTO"]:
+            return "Brasileiras Pendências"
+        elif status_upper == "PESQUISA - BR":
+            return "Brasileiras Pesquisas"
+        elif status_upper == "AGUARDANDO CARTÓRIO ORIGEM":
+            return "Brasileiras Solicitadas"
+        elif status_upper in ["CERTIDÃO EMITIDA", "CERTIDÃO ENTREGUE"]:
+            return "Brasileiras Emitida"  # CORRIGIDO: Era "Pasta C/Emissão Concluída"
+        elif status_upper in ["SOLICITAÇÃO DUPLICADA", "CANCELADO", "CERTIDÃO DISPENSADA"]:
+            return "Brasileiras Dispensada"  # Não contabilizada no resumo ativo
+            
+    # Pipeline 102 (Paróquia)
+    elif category_id_str == '102':
+        if status_upper in ["SOLICITAR PARÓQUIA DE ORIGEM", "DEVOLUÇÃO ADM"]:
+            return "Paróquia Pendências"
+        elif status_upper == "AGUARDANDO PARÓQUIA DE ORIGEM":
+            return "Paróquia Solicitadas"
+        elif status_upper in ["CERTIDÃO EMITIDA", "CERTIDÃO ENTREGUE"]:
+            return "Paróquia Emitida"  # CORRIGIDO: Consistente com a lógica
+        elif status_upper in ["SOLICITAÇÃO DUPLICADA", "CANCELADO", "CERTIDÃO DISPENSADA"]:
+            return "Paróquia Dispensada"  # Não contabilizada no resumo ativo
+            
+    # Pipeline 104 (Pesquisa BR)
+    elif category_id_str == '104':
+        if status_upper == "AGUARDANDO PESQUISADOR":
+            return "Pesquisa BR Pendências"
+        elif status_upper == "PESQUISA EM ANDAMENTO":
+            return "Pesquisa BR Em Andamento"
+        elif status_upper == "PESQUISA PRONTA PARA EMISSÃO":
+            return "Pesquisa BR Concluída"
+        elif status_upper == "PESQUISA NÃO ENCONTRADA":
+            return "Pesquisa BR Não Encontrada"
+    
+    # Default para casos não mapeados
+    return "Outros"
+
+# Colunas das emissões usadas na ficha: ID do requerente, nome, tipo de certidão, status e posição na árvore
+MAP_TIPO_CERTIDAO = {'NASCIMENTO': 'Nascimento', 'CASAMENTO': 'Casamento', 'ÓBITO': 'Óbito'}
+COLS_REQ = ['UF_CRM_34_ID_REQUERENTE', 'TITLE', 'UF_CRM_34_TIPO_DE_CERTIDAO', 'STAGE_NAME_LEGIVEL', 'UF_CRM_34_POSICAO_ARVORE']
+CAMPO_LIGACAO_EMISSOES = 'UF_CRM_34_ID_FAMILIA'
+
+def preparar_emissoes(emissoes_df):
+    """
+    Calcula, de uma vez para todas as emissões, as colunas que a ficha usa:
+    STAGE_NAME_LEGIVEL, as colunas de COLS_REQ preenchidas como texto e CATEGORIA_RESUMO
+    (categoria do resumo por pipeline + status).
+
+    Returns:
+        pandas.DataFrame: Cópia das emissões com as colunas derivadas
+    """
+    emissoes_df = emissoes_df.copy()
+    col_stage_para_simplificar = None
+    if 'STAGE_ID' in emissoes_df.columns: col_stage_para_simplificar = 'STAGE_ID'
+    elif 'STAGE_NAME' in emissoes_df.columns: col_stage_para_simplificar = 'STAGE_NAME'
+    if not col_stage_para_simplificar:
+        return emissoes_df
+    try:
+        emissoes_df['STAGE_NAME_LEGIVEL'] = mapear_estagios(emissoes_df[col_stage_para_simplificar], categorica=False)
+    except Exception:
+        emissoes_df['STAGE_NAME_LEGIVEL'] = emissoes_df[col_stage_para_simplificar]
+
+    colunas_faltantes = [col for col in COLS_REQ if col not in emissoes_df.columns]
+    if colunas_faltantes:
+        print(f"[AVISO] Colunas ausentes nos dados: {colunas_faltantes}")
+        if 'UF_CRM_34_POSICAO_ARVORE' in colunas_faltantes:
+            # Criar coluna com valor padrão se ela estiver faltando
+            emissoes_df['UF_CRM_34_POSICAO_ARVORE'] = "N/D"
+            colunas_faltantes.remove('UF_CRM_34_POSICAO_ARVORE')
+    if not colunas_faltantes:
+        valores_padrao = ['ID Requerente N/D', 'Nome N/D', 'Tipo N/D', 'Status N/D', 'Não informado']
+        for col, padrao in zip(COLS_REQ, valores_padrao):
+            emissoes_df[col] = emissoes_df[col].fillna(padrao).astype(str)
+
+    # Categoria do resumo: calculada uma vez por par (pipeline, status) distinto
+    categorias = emissoes_df['CATEGORY_ID'].astype(str).tolist() if 'CATEGORY_ID' in emissoes_df.columns else [''] * len(emissoes_df)
+    por_par = {}
+    emissoes_df['CATEGORIA_RESUMO'] = [
+        por_par[par] if par in por_par else por_par.setdefault(par, determinar_categoria_por_pipeline_status(*par))
+        for par in zip(categorias, emissoes_df['STAGE_NAME_LEGIVEL'].tolist())
+    ]
+    return emissoes_df
+
+def _montar_indice_emissoes():
+    # ATUALIZADO: Usar nova função que carrega todos os pipelines
+    from views.cartorio_new.data_loader import load_data_all_pipelines
+    df_cartorio_completo = load_data_all_pipelines()
+    if df_cartorio_completo is None or df_cartorio_completo.empty or CAMPO_LIGACAO_EMISSOES not in df_cartorio_completo.columns:
+        return None
+    return build_family_emissions_index(preparar_emissoes(df_cartorio_completo), CAMPO_LIGACAO_EMISSOES)
+
+def carregar_indice_emissoes():
+    """
+    Índice família -> emissões já preparadas, montado uma vez por versão dos dados de
+    cartório (pipelines 92, 94, 102 e 104) e reaproveitado entre as fichas abertas.
+
+    Returns:
+        FamilyEmissionsIndex | None: None se os dados de emissões não puderem ser carregados
+    """
+    return cached_derived('ficha_familia.indice_emissoes', _montar_indice_emissoes)
+
+def _mascaras_precedencia_104(emissoes_df):
+    """
+    LÓGICA DE PRECEDÊNCIA PIPELINE 104 (ver docstring do módulo), para todas as linhas de uma vez.
+
+    Returns:
+        tuple: Séries booleanas (requerente com 104 pronto e pipelines superiores,
+            linha de pipeline superior, linha do pipeline 104)
+    """
+    if 'CATEGORY_ID' not in emissoes_df.columns:
+        falso = pd.Series(False, index=emissoes_df.index)
+        return falso, falso, falso
+    categorias = emissoes_df['CATEGORY_ID'].astype(str)
+    superior = categorias.isin(['92', '94', '102'])
+    pipeline_104 = categorias == '104'
+    pronto_104 = pipeline_104 & (emissoes_df['STAGE_NAME_LEGIVEL'] == 'PESQUISA PRONTA PARA EMISSÃO')
+    requerentes = emissoes_df['UF_CRM_34_ID_REQUERENTE']
+    precedencia = pronto_104.groupby(requerentes).transform('any') & superior.groupby(requerentes).transform('any')
+    return precedencia, superior, pipeline_104
+
+def _montar_status_requerentes(emissoes_df):
+    """
+    Uma linha por requerente (ordem do ID) com nome, posição na árvore e o status de
+    cada tipo de certidão: o último status diferente de 'Dispensado' entre os registros
+    considerados (só os pipelines superiores quando o 104 tem precedência).
+
+    Returns:
+        list: [{'Requerente', 'Posição', 'Nascimento', 'Casamento', 'Óbito'}]
+    """
+    col_id, col_nome, col_tipo, col_status, col_posicao = COLS_REQ
+    precedencia, superior, _ = _mascaras_precedencia_104(emissoes_df)
+    if precedencia.any():
+        print(f"[DEBUG PRECEDÊNCIA] ID_REQUERENTE {emissoes_df.loc[precedencia, col_id].unique().tolist()}: Pipeline 104 pronto, usando status dos pipelines superiores")
+
+    consideradas = emissoes_df[~precedencia | superior]
+    tipos = consideradas[col_tipo].str.upper().map(MAP_TIPO_CERTIDAO)
+    validas = (tipos.notna() & (consideradas[col_status] != 'Dispensado'))
+    ultimo_status = (consideradas[validas].assign(_TIPO=tipos[validas])
+                     .groupby([col_id, '_TIPO'])[col_status].last().to_dict())
+
+    requerentes = []
+    primeiras = emissoes_df.groupby(col_id)[[col_nome, col_posicao]].first()
+    prefixes_to_remove = ["NASCIMENTO - ", "CASAMENTO - ", "ÓBITO - "]
+    for id_req, nome_req_bruto, posicao_arvore in primeiras.itertuples():
+        # --- Limpar prefixos do nome (apenas o primeiro encontrado) ---
+        nome_limpo = str(nome_req_bruto)
+        for prefix in prefixes_to_remove:
+            if nome_limpo.startswith(prefix):
+                nome_limpo = nome_limpo[len(prefix):]
+                break
+        requerentes.append({
+            'Requerente': nome_limpo.strip(),
+            'Posição': posicao_arvore,
+            **{tipo: ultimo_status.get((id_req, tipo), 'Dispensado') for tipo in MAP_TIPO_CERTIDAO.values()}
+        })
+    return requerentes
+
+
 def exibir_ficha_familia(familia_serie, emissoes_df):
     # --- NOVO: Injetar CSS para animação do banner se necessário ---
     mapa_inicial_flag = familia_serie.get('UF_CRM_1750454794052', 'NÃO')
@@ -283,154 +461,14 @@ def exibir_ficha_familia(familia_serie, emissoes_df):
     # (Lógica de processamento de emissões, agora incluindo a posição na árvore)
     requerentes_data_list_of_dicts = []
     processamento_emissoes_ok = False
-    
-    # NOVA LÓGICA: Função para determinar categoria baseada em Pipeline + Status
-    # Esta correção resolve o problema de chaves duplicadas no mapeamento anterior
-    def determinar_categoria_por_pipeline_status(category_id, stage_name_legivel):
-            """Determina a categoria do resumo baseada no pipeline (CATEGORY_ID) e status (STAGE_NAME_LEGIVEL)"""
-            category_id_str = str(category_id)
-            status_upper = str(stage_name_legivel).upper() if pd.notna(stage_name_legivel) else ""
-            
-            # Pipeline 92 e 94 (Cartórios Casa Verde e Tatuapé)
-            if category_id_str in ['92', '94']:
-                if status_upper == 'AGUARDANDO DECISÃO CLIENTE':
-                    return 'Aguardando Decisão Cliente'
-                if status_upper in ["AGUARDANDO CERTIDÃO", "BUSCA - CRC", "DEVOLUTIVA BUSCA - CRC", 
-                                  "APENAS ASS. REQ CLIENTE P/MONTAGEM", "MONTAGEM REQUERIMENTO CARTÓRIO", 
-                                  "SOLICITAR CARTÓRIO DE ORIGEM", "SOLICITAR CARTÓRIO DE ORIGEM PRIORIDADE", 
-                                  "DEVOLUÇÃO ADM", "DEVOLVIDO REQUERIMENTO"]:
-                    return "Brasileiras Pendências"
-                elif status_upper == "PESQUISA - BR":
-                    return "Brasileiras Pesquisas"
-                elif status_upper == "AGUARDANDO CARTÓRIO ORIGEM":
-                    return "Brasileiras Solicitadas"
-                elif status_upper in ["CERTIDÃO EMITIDA", "CERTIDÃO ENTREGUE"]:
-                    return "Brasileiras Emitida"  # CORRIGIDO: Era "Pasta C/Emissão Concluída"
-                elif status_upper in ["SOLICITAÇÃO DUPLICADA", "CANCELADO", "CERTIDÃO DISPENSADA"]:
-                    return "Brasileiras Dispensada"  # Não contabilizada no resumo ativo
-                    
-            # Pipeline 102 (Paróquia)
-            elif category_id_str == '102':
-                if status_upper in ["SOLICITAR PARÓQUIA DE ORIGEM", "DEVOLUÇÃO ADM"]:
-                    return "Paróquia Pendências"
-                elif status_upper == "AGUARDANDO PARÓQUIA DE ORIGEM":
-                    return "Paróquia Solicitadas"
-                elif status_upper in ["CERTIDÃO EMITIDA", "CERTIDÃO ENTREGUE"]:
-                    return "Paróquia Emitida"  # CORRIGIDO: Consistente com a lógica
-                elif status_upper in ["SOLICITAÇÃO DUPLICADA", "CANCELADO", "CERTIDÃO DISPENSADA"]:
-                    return "Paróquia Dispensada"  # Não contabilizada no resumo ativo
-                    
-            # Pipeline 104 (Pesquisa BR)
-            elif category_id_str == '104':
-                if status_upper == "AGUARDANDO PESQUISADOR":
-                    return "Pesquisa BR Pendências"
-                elif status_upper == "PESQUISA EM ANDAMENTO":
-                    return "Pesquisa BR Em Andamento"
-                elif status_upper == "PESQUISA PRONTA PARA EMISSÃO":
-                    return "Pesquisa BR Concluída"
-                elif status_upper == "PESQUISA NÃO ENCONTRADA":
-                    return "Pesquisa BR Não Encontrada"
-            
-            # Default para casos não mapeados
-            return "Outros"
 
     if emissoes_df is not None and not emissoes_df.empty:
-        col_stage_para_simplificar = None
-        if 'STAGE_ID' in emissoes_df.columns: col_stage_para_simplificar = 'STAGE_ID'
-        elif 'STAGE_NAME' in emissoes_df.columns: col_stage_para_simplificar = 'STAGE_NAME'
-        if col_stage_para_simplificar:
-            try:
-                emissoes_df['STAGE_NAME_LEGIVEL'] = emissoes_df[col_stage_para_simplificar].apply(simplificar_nome_estagio)
-                processamento_emissoes_ok = True
-                # DEBUG ADICIONADO
-                print("\n[DEBUG ANTES DO LOOP DE REQUERENTES] Primeiras 20 linhas de emissoes_df com STAGE_NAME_LEGIVEL:")
-                if not emissoes_df.empty and col_stage_para_simplificar in emissoes_df.columns :
-                    print(emissoes_df[['TITLE', 'UF_CRM_34_TIPO_DE_CERTIDAO', col_stage_para_simplificar, 'STAGE_NAME_LEGIVEL']].head(20))
-                else:
-                    print("[DEBUG ANTES DO LOOP DE REQUERENTES] emissoes_df vazio ou coluna de stage ausente.")
-            except Exception: emissoes_df['STAGE_NAME_LEGIVEL'] = emissoes_df[col_stage_para_simplificar]; processamento_emissoes_ok = True
-        else: processamento_emissoes_ok = False
-        if processamento_emissoes_ok:
-            map_tipo_certidao = {'NASCIMENTO': 'Nascimento', 'CASAMENTO': 'Casamento', 'ÓBITO': 'Óbito'}
-            # Adicionando UF_CRM_34_POSICAO_ARVORE à lista de colunas necessárias
-            cols_req = ['UF_CRM_34_ID_REQUERENTE', 'TITLE', 'UF_CRM_34_TIPO_DE_CERTIDAO', 'STAGE_NAME_LEGIVEL', 'UF_CRM_34_POSICAO_ARVORE']
-            
-            # Verificamos se todas as colunas necessárias existem
-            colunas_faltantes = [col for col in cols_req if col not in emissoes_df.columns]
-            
-            if colunas_faltantes:
-                print(f"[AVISO] Colunas ausentes nos dados: {colunas_faltantes}")
-                if 'UF_CRM_34_POSICAO_ARVORE' in colunas_faltantes:
-                    # Criar coluna com valor padrão se ela estiver faltando
-                    emissoes_df['UF_CRM_34_POSICAO_ARVORE'] = "N/D"
-                    colunas_faltantes.remove('UF_CRM_34_POSICAO_ARVORE')
-            
-            if not colunas_faltantes:  # Se todas as colunas obrigatórias estiverem presentes
-                emissoes_df[cols_req[0]] = emissoes_df[cols_req[0]].fillna('ID Requerente N/D').astype(str)
-                emissoes_df[cols_req[1]] = emissoes_df[cols_req[1]].fillna('Nome N/D').astype(str)
-                emissoes_df[cols_req[2]] = emissoes_df[cols_req[2]].fillna('Tipo N/D').astype(str)
-                emissoes_df[cols_req[3]] = emissoes_df[cols_req[3]].fillna('Status N/D').astype(str)
-                emissoes_df[cols_req[4]] = emissoes_df[cols_req[4]].fillna('Não informado').astype(str)
-                
-                grouped_by_requerente = emissoes_df.groupby(cols_req[0])
-                if grouped_by_requerente.ngroups > 0:
-                    for id_req, grupo in grouped_by_requerente:
-                        nome_req_bruto = grupo[cols_req[1]].iloc[0] if not grupo[cols_req[1]].empty else "Req. Desconhecido"
-                        posicao_arvore = grupo[cols_req[4]].iloc[0] if not grupo[cols_req[4]].empty else "N/D"
-
-                        if id_req == 'ID Requerente N/D':
-                            nome_req_bruto = grupo[cols_req[1]].iloc[0] if not grupo[cols_req[1]].empty else "Req. (ID N/D)"
-
-                        # --- Limpar prefixos do nome ---
-                        nome_limpo = str(nome_req_bruto) # Garantir que é string
-                        prefixes_to_remove = ["NASCIMENTO - ", "CASAMENTO - ", "ÓBITO - "]
-                        for prefix in prefixes_to_remove:
-                            if nome_limpo.startswith(prefix):
-                                nome_limpo = nome_limpo[len(prefix):]
-                                break # Remover apenas o primeiro prefixo encontrado
-                        nome_req_disp = nome_limpo.strip() # Nome final limpo
-                        # --- Fim da limpeza ---
-
-                        cert_status = {v: 'Dispensado' for k, v in map_tipo_certidao.items() if v}
-                        
-                        # NOVA LÓGICA: Precedência de pipelines
-                        # Se a pessoa tem "PESQUISA PRONTA PARA EMISSÃO" no pipeline 104,
-                        # devemos verificar se ela tem registros nos pipelines superiores (92, 94, 102)
-                        pipeline_104_pronto = False
-                        registros_pipelines_superiores = []
-                        
-                        # Verificar se há registro no pipeline 104 com status "PESQUISA PRONTA PARA EMISSÃO"
-                        for _, row in grupo.iterrows():
-                            if 'CATEGORY_ID' in row and str(row['CATEGORY_ID']) == '104':
-                                if row[cols_req[3]] == 'PESQUISA PRONTA PARA EMISSÃO':
-                                    pipeline_104_pronto = True
-                            elif 'CATEGORY_ID' in row and str(row['CATEGORY_ID']) in ['92', '94', '102']:
-                                registros_pipelines_superiores.append(row)
-                        
-                        # Aplicar lógica de precedência
-                        if pipeline_104_pronto and registros_pipelines_superiores:
-                            # Se tem pipeline 104 pronto E registros nos superiores,
-                            # processar apenas os registros dos pipelines superiores
-                            print(f"[DEBUG PRECEDÊNCIA] ID_REQUERENTE {id_req}: Pipeline 104 pronto, usando status dos pipelines superiores")
-                            for row in registros_pipelines_superiores:
-                                tipo_l = map_tipo_certidao.get(str(row[cols_req[2]]).upper())
-                                if tipo_l: 
-                                    cert_status[tipo_l] = row[cols_req[3]] if cert_status[tipo_l] == 'Dispensado' or row[cols_req[3]] != 'Dispensado' else cert_status[tipo_l]
-                        else:
-                            # Lógica normal: processar todos os registros
-                            for _, row in grupo.iterrows():
-                                tipo_l = map_tipo_certidao.get(str(row[cols_req[2]]).upper())
-                                if tipo_l: 
-                                    cert_status[tipo_l] = row[cols_req[3]] if cert_status[tipo_l] == 'Dispensado' or row[cols_req[3]] != 'Dispensado' else cert_status[tipo_l]
-
-                        # Incluir a posição na árvore nos dados a serem exibidos
-                        requerentes_data_list_of_dicts.append({
-                            'Requerente': nome_req_disp, # Usar o nome limpo
-                            'Posição': posicao_arvore,
-                            **cert_status
-                        })
-                else: processamento_emissoes_ok = False
-            else: processamento_emissoes_ok = False
+        # As emissões do índice por família já chegam preparadas (estágios legíveis, colunas preenchidas)
+        if 'STAGE_NAME_LEGIVEL' not in emissoes_df.columns:
+            emissoes_df = preparar_emissoes(emissoes_df)
+        if 'STAGE_NAME_LEGIVEL' in emissoes_df.columns and all(col in emissoes_df.columns for col in COLS_REQ):
+            requerentes_data_list_of_dicts = _montar_status_requerentes(emissoes_df)
+            processamento_emissoes_ok = bool(requerentes_data_list_of_dicts)
     # (FIM DA LÓGICA DE PROCESSAMENTO DE EMISSÕES)
 
     # Ordenar requerentes_data_list_of_dicts por posição na ordem: ITALIANO, FAMILIAR, REQUERENTE
@@ -502,24 +540,13 @@ def exibir_ficha_familia(familia_serie, emissoes_df):
         html_ficha_completa += "</td></tr>"
         
         # --- NOVA LÓGICA PARA POPULAR resumo_status_categorias --- 
-        # 1. Definir df_emissoes_ativas (usando emissoes_df que é o df_emissoes_filtradas com STAGE_NAME_LEGIVEL)
-        df_emissoes_ativas = pd.DataFrame() 
-        total_certidoes_reais_para_exibicao = 0
-
-        if emissoes_df is not None and not emissoes_df.empty and 'STAGE_NAME_LEGIVEL' in emissoes_df.columns:
-            status_de_dispensa_reais = ["SOLICITAÇÃO DUPLICADA", "CANCELADO"] # Status que indicam dispensa real
-            # Garante que estamos comparando strings com strings e lidando com NaNs em STAGE_NAME_LEGIVEL
-            emissoes_df_valid_stages = emissoes_df[pd.notna(emissoes_df['STAGE_NAME_LEGIVEL'])].copy()
-            emissoes_df_valid_stages['STAGE_NAME_LEGIVEL_UPPER'] = emissoes_df_valid_stages['STAGE_NAME_LEGIVEL'].astype(str).str.upper()
-            
-            df_emissoes_ativas = emissoes_df_valid_stages[
-                ~emissoes_df_valid_stages['STAGE_NAME_LEGIVEL_UPPER'].isin(status_de_dispensa_reais)
-            ].copy()
-            total_certidoes_reais_para_exibicao = len(df_emissoes_ativas)
-
-        elif emissoes_df is not None and not emissoes_df.empty: # Fallback se STAGE_NAME_LEGIVEL não existir ou for problemático
-            df_emissoes_ativas = emissoes_df.copy() 
-            total_certidoes_reais_para_exibicao = len(df_emissoes_ativas)
+        # 1. Definir df_emissoes_ativas (emissoes_df já tem STAGE_NAME_LEGIVEL e CATEGORIA_RESUMO)
+        status_de_dispensa_reais = ["SOLICITAÇÃO DUPLICADA", "CANCELADO"] # Status que indicam dispensa real
+        df_emissoes_ativas = emissoes_df[
+            pd.notna(emissoes_df['STAGE_NAME_LEGIVEL'])
+            & ~emissoes_df['STAGE_NAME_LEGIVEL'].astype(str).str.upper().isin(status_de_dispensa_reais)
+        ]
+        total_certidoes_reais_para_exibicao = len(df_emissoes_ativas)
 
         # 2. Reinicializar e popular resumo_status_categorias com base em df_emissoes_ativas
         # Usando o map_stage_to_relatorio definido anteriormente
@@ -547,53 +574,22 @@ def exibir_ficha_familia(familia_serie, emissoes_df):
 
         if not df_emissoes_ativas.empty:
             # NOVA LÓGICA: Aplicar precedência de pipelines também no resumo
-            # Criar DataFrame para processar precedência
-            df_processado = df_emissoes_ativas.copy()
-            
-            # Identificar pessoas que têm "PESQUISA PRONTA PARA EMISSÃO" no pipeline 104
-            # e também têm registros nos pipelines superiores (92, 94, 102)
-            if 'UF_CRM_34_ID_REQUERENTE' in df_processado.columns and 'CATEGORY_ID' in df_processado.columns:
-                # Agrupar por ID_REQUERENTE para aplicar a lógica de precedência
-                requerentes_para_remover_104 = []
-                
-                for id_requerente, grupo_req in df_processado.groupby('UF_CRM_34_ID_REQUERENTE'):
-                    # Verificar se tem pipeline 104 com "PESQUISA PRONTA PARA EMISSÃO"
-                    tem_104_pronto = False
-                    tem_pipelines_superiores = False
-                    
-                    for _, row in grupo_req.iterrows():
-                        if str(row['CATEGORY_ID']) == '104' and row['STAGE_NAME_LEGIVEL'] == 'PESQUISA PRONTA PARA EMISSÃO':
-                            tem_104_pronto = True
-                        elif str(row['CATEGORY_ID']) in ['92', '94', '102']:
-                            tem_pipelines_superiores = True
-                    
-                    # Se tem 104 pronto E pipelines superiores, remover registros do 104 do resumo
-                    if tem_104_pronto and tem_pipelines_superiores:
-                        requerentes_para_remover_104.append(id_requerente)
-                        print(f"[DEBUG PRECEDÊNCIA RESUMO] ID_REQUERENTE {id_requerente}: Removendo pipeline 104 do resumo (precedência)")
-                
-                # Remover registros do pipeline 104 para os requerentes identificados
-                if requerentes_para_remover_104:
-                    mask_remover = (df_processado['UF_CRM_34_ID_REQUERENTE'].isin(requerentes_para_remover_104)) & (df_processado['CATEGORY_ID'].astype(str) == '104')
-                    df_processado = df_processado[~mask_remover].copy()
-                    print(f"[DEBUG PRECEDÊNCIA RESUMO] Removidos {mask_remover.sum()} registros do pipeline 104 devido à precedência")
-            
-            # Continuar com a lógica normal de resumo usando df_processado
-            for _idx, certidao_ativa_row in df_processado.iterrows():
-                status_legivel = certidao_ativa_row['STAGE_NAME_LEGIVEL']
-                category_id = certidao_ativa_row.get('CATEGORY_ID', '')
-                
-                # USAR A NOVA FUNÇÃO em vez do mapeamento antigo
-                categoria_para_resumo = determinar_categoria_por_pipeline_status(category_id, status_legivel)
-                
-                # Só contar se não for uma categoria "Dispensada"
-                if not categoria_para_resumo.endswith("Dispensada"):
-                    if categoria_para_resumo in resumo_status_categorias_temp:
-                        resumo_status_categorias_temp[categoria_para_resumo] += 1
-                    else:
-                        # Para categorias não mapeadas, contar como 'Outros'
-                        resumo_status_categorias_temp['Outros'] += 1
-            
+            # Requerentes com "PESQUISA PRONTA PARA EMISSÃO" no 104 e registros nos superiores
+            # (92, 94, 102) não têm os registros do 104 contados
+            precedencia, _, pipeline_104 = _mascaras_precedencia_104(df_emissoes_ativas)
+            mask_remover = precedencia & pipeline_104
+            df_processado = df_emissoes_ativas[~mask_remover]
+            if mask_remover.any():
+                print(f"[DEBUG PRECEDÊNCIA RESUMO] Removidos {mask_remover.sum()} registros do pipeline 104 devido à precedência")
+
+            # Contagem por categoria (já calculada no índice), sem as categorias "Dispensada"
+            categorias_resumo = df_processado['CATEGORIA_RESUMO']
+            categorias_resumo = categorias_resumo[~categorias_resumo.str.endswith("Dispensada")]
+            for categoria_para_resumo, quantidade in categorias_resumo.value_counts().items():
+                # Para categorias não mapeadas, contar como 'Outros'
+                chave = categoria_para_resumo if categoria_para_resumo in resumo_status_categorias_temp else 'Outros'
+                resumo_status_categorias_temp[chave] += int(quantidade)
+
             # Atualizar total com o DataFrame processado
             total_certidoes_reais_para_exibicao = len(df_processado)
             
@@ -768,17 +764,15 @@ def show_ficha_familia():
     
     if df_crm_deals_full is not None and not df_crm_deals_full.empty:
         if campo_busca_familia_principal in df_crm_deals_full.columns:
-            # Preparar colunas para exibição nos resultados da busca
-            df_crm_deals_full[campo_busca_familia_principal] = df_crm_deals_full[campo_busca_familia_principal].astype(str).fillna('')
+            # Índice de busca (sem acentos, por trigramas e pelo ID da família) construído uma vez por versão dos dados
+            indice_familias = get_family_search_index(df_crm_deals_full, campo_busca_familia_principal, 'UF_CRM_1722605592778')
             
             # Se houver termo de busca, filtrar resultados
             if termo_busca:
-                resultados_busca_df = df_crm_deals_full[
-                    df_crm_deals_full[campo_busca_familia_principal].str.contains(termo_busca, case=False, na=False)
-                ].copy()
-                
                 # Limitar a 10 resultados para performance
-                resultados_busca_df = resultados_busca_df.head(10)
+                linhas_encontradas = indice_familias.buscar(termo_busca, limite=10)
+                resultados_busca_df = df_crm_deals_full.iloc[linhas_encontradas].copy()
+                resultados_busca_df[campo_busca_familia_principal] = resultados_busca_df[campo_busca_familia_principal].astype(str)
                 
                 # Armazenar os resultados da busca na sessão
                 st.session_state.resultados_busca = resultados_busca_df
@@ -787,30 +781,17 @@ def show_ficha_familia():
                 if not resultados_busca_df.empty:
                     st.markdown(f"<div class='results-count'>Encontrados {len(resultados_busca_df)} resultados para '{termo_busca}'</div>", unsafe_allow_html=True)
                     
-                    # Preparar dados para exibição em tabela amigável
-                    dados_para_exibicao = []
-                    
-                    # Loop para gerar linhas da tabela
-                    for idx, row in resultados_busca_df.iterrows():
-                        nome_familia = row.get(campo_busca_familia_principal, "")
-                        id_familia = row.get('UF_CRM_1722605592778', "N/D")
-                        
-                        # Tentar encontrar o nome de um requerente, se disponível
-                        nome_requerente = "Não informado"
-                        if 'UF_CRM_1723029889441' in row and row['UF_CRM_1723029889441']:
-                            nome_requerente = row['UF_CRM_1723029889441']
-                        elif 'TITLE' in row and row['TITLE']:
-                            nome_requerente = row['TITLE']
-                        
-                        # Adicionar à lista de resultados para exibição
-                        dados_para_exibicao.append({
-                            "Nome da Família": nome_familia,
-                            "ID da Família": id_familia,
-                            "Requerente": nome_requerente
-                        })
+                    # Requerente: campo próprio, senão o título do negócio, senão "Não informado"
+                    n_resultados = len(resultados_busca_df)
+                    requerentes = resultados_busca_df['UF_CRM_1723029889441'].tolist() if 'UF_CRM_1723029889441' in resultados_busca_df.columns else [None] * n_resultados
+                    titulos = resultados_busca_df['TITLE'].tolist() if 'TITLE' in resultados_busca_df.columns else [None] * n_resultados
                     
                     # Criar DataFrame para exibição
-                    df_resultados = pd.DataFrame(dados_para_exibicao)
+                    df_resultados = pd.DataFrame({
+                        "Nome da Família": resultados_busca_df[campo_busca_familia_principal].tolist(),
+                        "ID da Família": resultados_busca_df['UF_CRM_1722605592778'].tolist() if 'UF_CRM_1722605592778' in resultados_busca_df.columns else ["N/D"] * n_resultados,
+                        "Requerente": [req if req else (titulo if titulo else "Não informado") for req, titulo in zip(requerentes, titulos)]
+                    })
                     
                     # Exibir resultados como uma tabela interativa
                     st.dataframe(
@@ -852,18 +833,11 @@ def show_ficha_familia():
                                 resultados_busca_df['UF_CRM_1722605592778'].astype(str) == id_familia_selecionada
                             ].iloc[0]
                             
-                            # Buscar emissões relacionadas à família selecionada
-                            # ATUALIZADO: Usar nova função que carrega todos os pipelines
-                            from views.cartorio_new.data_loader import load_data_all_pipelines
-                            df_cartorio_completo = load_data_all_pipelines()
-                            
-                            campo_ligacao_emissoes = 'UF_CRM_34_ID_FAMILIA'
-                            
-                            if df_cartorio_completo is not None and not df_cartorio_completo.empty and campo_ligacao_emissoes in df_cartorio_completo.columns:
-                                df_cartorio_completo[campo_ligacao_emissoes] = df_cartorio_completo[campo_ligacao_emissoes].astype(str).fillna('')
-                                df_emissoes_filtradas = df_cartorio_completo[
-                                    df_cartorio_completo[campo_ligacao_emissoes] == id_familia_selecionada
-                                ].copy()
+                            # Buscar emissões relacionadas à família selecionada no índice família -> emissões
+                            # (montado uma vez por versão dos dados de todos os pipelines)
+                            indice_emissoes = carregar_indice_emissoes()
+                            if indice_emissoes is not None:
+                                df_emissoes_filtradas = indice_emissoes.emissoes_da_familia(id_familia_selecionada)
                             # DEBUG ADICIONADO
                             print(f"[DEBUG FILTRO EMISSOES] Número de emissões encontradas para a família ID '{id_familia_selecionada}': {len(df_emissoes_filtradas)}")
                             if not df_emissoes_filtradas.empty:
@@ -871,9 +845,9 @@ def show_ficha_familia():
                                 print(df_emissoes_filtradas[['TITLE', 'UF_CRM_34_ID_REQUERENTE', 'STAGE_ID', 'UF_CRM_34_ID_FAMILIA', 'NOME_PIPELINE']].head())
                             else:
                                 print(f"[DEBUG FILTRO EMISSOES] Nenhuma emissão encontrada para o ID de família '{id_familia_selecionada}'. Verifique se este ID existe na coluna 'UF_CRM_34_ID_FAMILIA'.")
-                                if df_cartorio_completo is not None and not df_cartorio_completo.empty and 'UF_CRM_34_ID_FAMILIA' in df_cartorio_completo.columns:
+                                if indice_emissoes is not None:
                                     print("[DEBUG FILTRO EMISSOES] Alguns IDs de família presentes:")
-                                    print(df_cartorio_completo['UF_CRM_34_ID_FAMILIA'].unique()[:20]) # Mostra até 20 IDs únicos
+                                    print(indice_emissoes.amostra_ids(20)) # Mostra até 20 IDs únicos
                             
                             st.success(f"Família selecionada: {familia_selecionada_data.get(campo_busca_familia_principal, '')}")
                 else:
@@ -3,7 +3,6 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 import re
-import io
 import os
 import sys
 from pathlib import Path
@@ -19,8 +18,10 @@ utils_path = os.path.join(Path(__file__).parents[1], 'utils')
 sys.path.insert(0, str(utils_path))
 
 # Agora importa diretamente dos arquivos na pasta utils
-from data_processor import calculate_status_counts, filter_dataframe_by_date, create_responsible_status_table
+from data_processor import (calculate_status_counts, filter_dataframe_by_date, create_responsible_status_table,
+                            RESPONSIBLE_STATUS_COLUMNS)
 from animation_utils import display_loading_animation, clear_loading_animation, update_progress
+from export_engine import export_xlsx, download_export
 
 def generate_demo_data():
     """
@@ -158,14 +159,18 @@ def carregar_dados_categoria_34(date_from=None, date_to=None, debug=False, progr
     if progress_bar and message_container:
         update_progress(progress_bar, 0.2, message_container, "Carregando dados da categoria 34...")
     
-    # Carregar dados da categoria 34
+    # Colunas necessárias para o cruzamento
+    colunas_necessarias = ['ID', 'TITLE', 'ASSIGNED_BY_NAME', 'UF_CRM_1722605592778']
+    
+    # Carregar dados da categoria 34 (apenas as colunas usadas)
     df_cat34 = load_merged_data(
         category_id=34,
         date_from=date_from,
         date_to=date_to,
         debug=debug,
         progress_bar=progress_bar,
-        message_container=message_container
+        message_container=message_container,
+        columns=colunas_necessarias
     )
     
     # Verificar se temos dados válidos
@@ -174,9 +179,6 @@ def carregar_dados_categoria_34(date_from=None, date_to=None, debug=False, progr
             st.warning("Não foi possível carregar dados da categoria 34")
         return pd.DataFrame()
     
-    # Filtrar e manter apenas as colunas necessárias para o cruzamento
-    colunas_necessarias = ['ID', 'TITLE', 'ASSIGNED_BY_NAME', 'UF_CRM_1722605592778']
-    
     # Garantir que todas as colunas existam
     for coluna in colunas_necessarias:
         if coluna not in df_cat34.columns:
@@ -558,25 +560,13 @@ def show_producao():
             if relatorio_selecionado == "Status por Responsável":
                 st.subheader("Status por Responsável")
                 
-                # SOLUÇÃO RADICAL: Criar manualmente a tabela de status por responsável
-                if not filtered_df.empty and 'ASSIGNED_BY_NAME' in filtered_df.columns and 'UF_CRM_HIGILIZACAO_STATUS' in filtered_df.columns:
-                    # Substituir valores nulos no status por 'PENDENCIA'
-                    filtered_df['UF_CRM_HIGILIZACAO_STATUS'] = filtered_df['UF_CRM_HIGILIZACAO_STATUS'].fillna('PENDENCIA')
-                    
-                    # 1. Agrupar por responsável e status e contar ocorrências
-                    status_counts = filtered_df.groupby(['ASSIGNED_BY_NAME', 'UF_CRM_HIGILIZACAO_STATUS']).size().unstack(fill_value=0)
-                    
-                    # 2. Certificar que todas as colunas de status existem
-                    for status in ['COMPLETO', 'INCOMPLETO', 'PENDENCIA']:
-                        if status not in status_counts.columns:
-                            status_counts[status] = 0
-                    
-                    # 3. Selecionar apenas as colunas que nos interessam
-                    if 'COMPLETO' in status_counts.columns and 'INCOMPLETO' in status_counts.columns and 'PENDENCIA' in status_counts.columns:
-                        display_df = status_counts[['COMPLETO', 'INCOMPLETO', 'PENDENCIA']].copy()
-                    else:
-                        cols = [col for col in ['COMPLETO', 'INCOMPLETO', 'PENDENCIA'] if col in status_counts.columns]
-                        display_df = status_counts[cols].copy()
+                # 1. Contar por responsável e status (status nulo = 'PENDENCIA'), sem alterar filtered_df;
+                # vazio se faltar a coluna de responsável ou de status
+                status_counts = create_responsible_status_table(filtered_df)
+                if not status_counts.empty:
+                    # 2/3. Apenas as colunas de status (a linha e a coluna de total são refeitas abaixo)
+                    display_df = status_counts.drop(index='Total')[RESPONSIBLE_STATUS_COLUMNS].copy()
+                    display_df.columns.name = None
                     
                     # 4. Resetar o índice
                     display_df = display_df.reset_index()
@@ -930,18 +920,10 @@ def show_producao():
                 
                 # Adicionar botão para exportar
                 if st.button("Exportar Cruzamento para Excel"):
-                    # Converter para Excel
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                        # Aba de resumo
-                        df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
-                        # Aba de detalhes
-                        df_cruzado.to_excel(writer, sheet_name='Detalhamento', index=False)
-                    
-                    # Oferecer para download
-                    st.download_button(
+                    # Converter para Excel (abas de resumo e de detalhes) e oferecer para download
+                    download_export(
                         label="Baixar arquivo Excel",
-                        data=output.getvalue(),
+                        path=export_xlsx({'Resumo': df_resumo, 'Detalhamento': df_cruzado}),
                         file_name=f"cruzamento_categorias_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
@@ -1044,18 +1026,10 @@ def show_producao():
                     
                     # Adicionar botão para exportar
                     if st.button("Exportar Análise para Excel"):
-                        # Converter para Excel
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                            # Aba de resumo
-                            family_id_summary.to_excel(writer, sheet_name='Resumo', index=False)
-                            # Aba de detalhes
-                            filtered_details.to_excel(writer, sheet_name='Detalhamento', index=False)
-                        
-                        # Oferecer para download
-                        st.download_button(
+                        # Converter para Excel (abas de resumo e de detalhes) e oferecer para download
+                        download_export(
                             label="Baixar arquivo Excel",
-                            data=output.getvalue(),
+                            path=export_xlsx({'Resumo': family_id_summary, 'Detalhamento': filtered_details}),
                             file_name=f"analise_ids_familia_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         )
@@ -2,36 +2,31 @@ import streamlit as st
 import pandas as pd
 import gspread
 
+from utils.google_sheets_connector import get_sheet_dataframe
+
 from .dados_macros import show_dados_macros
 from .funil_etapas import show_funil_etapas
 from .pendencias_liberadas import show_pendencias_liberadas
 from .pendencias_futuras import show_pendencias_futuras
 from .produtividade import show_produtividade
 
-@st.cache_data(ttl=300)
 def carregar_dados_protocolados():
     """
     Carrega dados da planilha Google Sheets de forma segura usando uma Conta de Serviço.
+
+    A planilha só é baixada de novo quando muda (ver utils.google_sheets_connector).
     """
     try:
-        creds = st.secrets["google"]["sheets"]
-        sa = gspread.service_account_from_dict(creds)
         sheet_id = "15L7SdGgbF3nhiE3ptk7WFmuTwbxSY3rA1hfCnYmMFMM"
-        sh = sa.open_by_key(sheet_id)
-        worksheet = sh.get_worksheet(0)
-        
-        data = worksheet.get_all_values()
-        if len(data) < 3:
+        # Dados a partir da 3ª linha, sem as linhas vazias
+        df = get_sheet_dataframe(sheet_id, skip_rows=2, header=False, drop_empty_rows=True)
+        if df is None:
+            st.error("Não foi possível conectar ao Google Sheets. Verifique as credenciais.")
             return pd.DataFrame()
 
-        data_rows = data[2:]
-        cleaned_rows = [row for row in data_rows if any(cell for cell in row)]
-
-        if not cleaned_rows:
+        if df.empty:
             st.warning("Nenhum dado válido encontrado após o cabeçalho.")
             return pd.DataFrame()
-            
-        df = pd.DataFrame(cleaned_rows)
         
         num_cols = len(df.columns)
         col_names = [chr(ord('A') + i) for i in range(num_cols)]
@@ -3,8 +3,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import mysql.connector
+import mysql.connector.pooling
 from datetime import datetime, timedelta
 import calendar
+import os
+import threading
 import time
 
 # Verificar e instalar bibliotecas adicionais se necessário
@@ -128,67 +131,300 @@ def load_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# Conexões, consultas e snapshot dos tickets
+TICKETS_POOL_SIZE = int(os.getenv('TICKETS_DB_POOL_SIZE', 5))
+TICKETS_BATCH_SIZE = int(os.getenv('TICKETS_BATCH_SIZE', 5000))
+# Validade (segundos) das agregações, totais e páginas consultadas no MySQL
+TICKETS_REFRESH_INTERVAL = int(os.getenv('TICKETS_REFRESH_INTERVAL', 60))
+# Recarga completa periódica do snapshot: traz edições, exclusões e mudanças nos clientes
+TICKETS_FULL_RELOAD_TTL = int(os.getenv('TICKETS_FULL_RELOAD_TTL', 3600))
+
+TICKETS_QUERY = """
+SELECT t.id, t.message, t.createdAt, t.departament, 
+       c.nome, c.email, c.telefone, c.idfamilia
+FROM tickets t
+LEFT JOIN customers c ON t.customerId = c.id
+{where}
+ORDER BY t.createdAt DESC{paginacao}
+"""
+
+# Agregações feitas no MySQL (GROUP BY): {dimensão: (colunas do SELECT, expressões do GROUP BY)}
+TICKETS_DIMENSOES = {
+    'departamento': ("t.departament AS departament", "t.departament"),
+    'dia_semana': ("DAYOFWEEK(t.createdAt) AS dia_semana", "DAYOFWEEK(t.createdAt)"),
+    'hora': ("HOUR(t.createdAt) AS hora", "HOUR(t.createdAt)"),
+    'mes': ("YEAR(t.createdAt) AS ano, MONTH(t.createdAt) AS mes", "YEAR(t.createdAt), MONTH(t.createdAt)"),
+    'dia_semana_hora': ("DAYOFWEEK(t.createdAt) AS dia_semana, HOUR(t.createdAt) AS hora",
+                        "DAYOFWEEK(t.createdAt), HOUR(t.createdAt)"),
+}
+# DAYOFWEEK do MySQL: 1 = domingo ... 7 = sábado (nomes iguais aos do dt.day_name())
+DIAS_MYSQL = {1: 'Sunday', 2: 'Monday', 3: 'Tuesday', 4: 'Wednesday', 5: 'Thursday', 6: 'Friday', 7: 'Saturday'}
+TICKETS_PAGE_SIZE = int(os.getenv('TICKETS_PAGE_SIZE', 100))
+
+# Snapshot em memória (compartilhado entre as sessões do processo)
+_tickets_snapshot = {'df': None, 'watermark': None, 'loaded_at': 0.0, 'checked_at': 0.0}
+_tickets_lock = threading.Lock()
+
+@st.cache_resource(ttl=3600)
+def get_db_pool():
+    """Pool de conexões MySQL reaproveitado entre as execuções da página."""
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="tickets",
+        pool_size=TICKETS_POOL_SIZE,
+        pool_reset_session=True,
+        consume_results=True,
+        host=st.secrets["DB_HOST"],
+        port=int(st.secrets["DB_PORT"]),
+        user=st.secrets["DB_USER"],
+        password=st.secrets["DB_PASSWORD"],
+        database=st.secrets["DB_NAME"]
+    )
+
 def connect_to_db():
-    """Estabelece conexão com o banco de dados MySQL"""
+    """Obtém uma conexão do pool (conn.close() a devolve ao pool)"""
     try:
-        conn = mysql.connector.connect(
-            host=st.secrets["DB_HOST"],
-            port=int(st.secrets["DB_PORT"]),
-            user=st.secrets["DB_USER"],
-            password=st.secrets["DB_PASSWORD"],
-            database=st.secrets["DB_NAME"]
-        )
-        return conn
+        return get_db_pool().get_connection()
+    except mysql.connector.errors.PoolError as e:
+        # Pool esgotado: conexão avulsa, como antes
+        print(f"[WARN] Pool de conexões dos tickets esgotado ({e}). Abrindo conexão avulsa.")
+        try:
+            return mysql.connector.connect(
+                host=st.secrets["DB_HOST"],
+                port=int(st.secrets["DB_PORT"]),
+                user=st.secrets["DB_USER"],
+                password=st.secrets["DB_PASSWORD"],
+                database=st.secrets["DB_NAME"]
+            )
+        except Exception as e:
+            st.error(f"Erro ao conectar com o banco de dados: {e}")
+            return None
     except Exception as e:
         st.error(f"Erro ao conectar com o banco de dados: {e}")
         return None
 
+def _ler_consulta(conn, sql, params=()):
+    """
+    Executa a consulta lendo o resultado em lotes pelo cursor não bufferizado, direto
+    para listas por coluna.
+
+    Returns:
+        pandas.DataFrame: Resultado da consulta
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        colunas = {nome: [] for nome in cursor.column_names}
+        while True:
+            lote = cursor.fetchmany(TICKETS_BATCH_SIZE)
+            if not lote:
+                break
+            for nome, valores in zip(cursor.column_names, zip(*lote)):
+                colunas[nome].extend(valores)
+    finally:
+        cursor.close()
+    return pd.DataFrame(colunas)
+
+def _buscar_tickets(conn, where="", params=(), limite=None, offset=0):
+    """
+    Consulta os tickets (com o filtro `where`, se informado), do mais recente para o
+    mais antigo; com `limite`, só uma página a partir de `offset`.
+
+    Returns:
+        pandas.DataFrame: Tickets com as colunas de tempo
+    """
+    paginacao = ""
+    if limite is not None:
+        paginacao, params = "\nLIMIT %s OFFSET %s", tuple(params) + (int(limite), int(offset))
+    df = _ler_consulta(conn, TICKETS_QUERY.format(where=where, paginacao=paginacao), params)
+    # Garantir que createdAt é datetime
+    if 'createdAt' in df.columns:
+        df['createdAt'] = pd.to_datetime(df['createdAt'])
+
+        # Adicionar colunas para análise de tempo
+        df['hora'] = df['createdAt'].dt.hour
+        df['dia_semana'] = df['createdAt'].dt.day_name()
+        df['dia'] = df['createdAt'].dt.day
+        df['mes'] = df['createdAt'].dt.month
+        df['ano'] = df['createdAt'].dt.year
+    return df
+
+def _atualizar_snapshot_tickets(conn):
+    """Recarga completa (snapshot vazio ou vencido) ou só dos tickets novos desde a marca d'água."""
+    agora = time.time()
+    snapshot = _tickets_snapshot
+    incremental = (snapshot['df'] is not None and snapshot['watermark'] is not None
+                   and agora - snapshot['loaded_at'] < TICKETS_FULL_RELOAD_TTL)
+    if incremental:
+        # >= na marca d'água: tickets criados no mesmo instante do último lido também entram
+        novos = _buscar_tickets(conn, "WHERE t.createdAt >= %s", (snapshot['watermark'].to_pydatetime(),))
+        df = pd.concat([novos, snapshot['df']], ignore_index=True) if not novos.empty else snapshot['df']
+        if not novos.empty and 'id' in df.columns:
+            df = df.drop_duplicates(subset=['id'], keep='first').reset_index(drop=True)
+        print(f"[INFO] Tickets: {len(novos)} lidos desde {snapshot['watermark']} (total {len(df)})")
+    else:
+        df = _buscar_tickets(conn)
+        snapshot['loaded_at'] = agora
+        print(f"[INFO] Tickets: recarga completa com {len(df)} registros")
+    snapshot['df'] = df
+    snapshot['watermark'] = df['createdAt'].max() if 'createdAt' in df.columns and not df.empty else None
+    snapshot['checked_at'] = agora
+
 def get_tickets_data():
-    """Obtém dados dos tickets do banco de dados"""
-    # Mostrar loading animation
-    with st.spinner("Carregando dados de tickets..."):
-        conn = connect_to_db()
-        if conn:
+    """
+    Obtém dados dos tickets do banco de dados.
+
+    O resultado fica em um snapshot em memória: a cada TICKETS_REFRESH_INTERVAL segundos
+    só os tickets novos são consultados, e a cada TICKETS_FULL_RELOAD_TTL a tabela é
+    recarregada por completo.
+    """
+    with _tickets_lock:
+        snapshot = _tickets_snapshot
+        if snapshot['df'] is not None and time.time() - snapshot['checked_at'] < TICKETS_REFRESH_INTERVAL:
+            return snapshot['df'].copy()
+
+        # Mostrar loading animation
+        with st.spinner("Carregando dados de tickets..."):
+            conn = connect_to_db()
+            if not conn:
+                return snapshot['df'].copy() if snapshot['df'] is not None else pd.DataFrame()
             try:
-                cursor = conn.cursor(dictionary=True)
-                
-                # Query para obter tickets com informações do cliente
-                query = """
-                SELECT t.id, t.message, t.createdAt, t.departament, 
-                       c.nome, c.email, c.telefone, c.idfamilia
-                FROM tickets t
-                LEFT JOIN customers c ON t.customerId = c.id
-                ORDER BY t.createdAt DESC
-                """
-                
-                cursor.execute(query)
-                results = cursor.fetchall()
-                
-                # Converter para DataFrame
-                df = pd.DataFrame(results)
-                
-                # Garantir que createdAt é datetime
-                if 'createdAt' in df.columns:
-                    df['createdAt'] = pd.to_datetime(df['createdAt'])
-                    
-                    # Adicionar colunas para análise de tempo
-                    df['hora'] = df['createdAt'].dt.hour
-                    df['dia_semana'] = df['createdAt'].dt.day_name()
-                    df['dia'] = df['createdAt'].dt.day
-                    df['mes'] = df['createdAt'].dt.month
-                    df['ano'] = df['createdAt'].dt.year
-                
-                cursor.close()
-                conn.close()
-                return df
-            
+                _atualizar_snapshot_tickets(conn)
             except Exception as e:
-                st.error(f"Erro ao obter dados: {e}")
-                if conn:
-                    conn.close()
-                return pd.DataFrame()
-        else:
-            return pd.DataFrame()
+                if snapshot['df'] is None:
+                    st.error(f"Erro ao obter dados: {e}")
+                    return pd.DataFrame()
+                # Mantém o snapshot anterior e tenta de novo no próximo intervalo
+                print(f"[WARN] Erro ao atualizar tickets, usando os dados anteriores: {e}")
+                snapshot['checked_at'] = time.time()
+            finally:
+                conn.close()
+        return snapshot['df'].copy()
+
+def _filtros_tickets(data_inicio=None, data_fim=None, departamento=None):
+    """Cláusula WHERE (e parâmetros) para o período [data_inicio, data_fim) e o departamento."""
+    condicoes, params = [], []
+    if data_inicio is not None:
+        condicoes.append("t.createdAt >= %s")
+        params.append(data_inicio)
+    if data_fim is not None:
+        condicoes.append("t.createdAt < %s")
+        params.append(data_fim)
+    if departamento is not None:
+        condicoes.append("t.departament = %s")
+        params.append(departamento)
+    return ("WHERE " + " AND ".join(condicoes)) if condicoes else "", tuple(params)
+
+def _consultar(consulta):
+    """Executa consulta(conn) com uma conexão do pool."""
+    conn = connect_to_db()
+    if not conn:
+        raise ConnectionError("Sem conexão com o banco de dados de tickets")
+    try:
+        return consulta(conn)
+    finally:
+        conn.close()
+
+@st.cache_data(ttl=TICKETS_REFRESH_INTERVAL, show_spinner=False)
+def get_tickets_aggregate(dimensao, data_inicio=None, data_fim=None, departamento=None):
+    """
+    Quantidade de tickets agrupada no MySQL por uma dimensão de TICKETS_DIMENSOES.
+
+    Cada combinação de argumentos fica em cache separadamente.
+
+    Args:
+        dimensao (str): 'departamento', 'dia_semana', 'hora', 'mes' ou 'dia_semana_hora'
+        data_inicio, data_fim (datetime, optional): Período [início, fim) de createdAt
+        departamento (str, optional): Restringe a um departamento
+
+    Returns:
+        pandas.DataFrame: Colunas da dimensão + 'quantidade' (dia_semana com os nomes em
+            inglês, como dt.day_name()); grupos nulos são descartados, como no value_counts
+    """
+    colunas, agrupamento = TICKETS_DIMENSOES[dimensao]
+    where, params = _filtros_tickets(data_inicio, data_fim, departamento)
+    sql = f"""
+    SELECT {colunas}, COUNT(t.id) AS quantidade
+    FROM tickets t
+    LEFT JOIN customers c ON t.customerId = c.id
+    {where}
+    GROUP BY {agrupamento}
+    ORDER BY quantidade DESC
+    """
+    df = _consultar(lambda conn: _ler_consulta(conn, sql, params))
+    if df.empty:
+        return df
+    df = df.dropna().reset_index(drop=True)
+    df['quantidade'] = df['quantidade'].astype('int64')
+    if 'dia_semana' in df.columns:
+        df['dia_semana'] = df['dia_semana'].astype(int).map(DIAS_MYSQL)
+    for col in ('hora', 'mes', 'ano'):
+        if col in df.columns:
+            df[col] = df[col].astype('int64')
+    return df
+
+@st.cache_data(ttl=TICKETS_REFRESH_INTERVAL, show_spinner=False)
+def get_tickets_totais(referencia, data_inicio=None, data_fim=None, departamento=None):
+    """
+    Totais dos tickets calculados no MySQL.
+
+    Args:
+        referencia (datetime): "Agora" da página (para os totais da semana e de hoje);
+            truncado ao minuto pelo chamador para aproveitar o cache
+
+    Returns:
+        dict: {'total', 'semana', 'hoje', 'dias_unicos', 'clientes_unicos',
+            'departamentos_unicos', 'primeiro', 'ultimo'}
+    """
+    where, params = _filtros_tickets(data_inicio, data_fim, departamento)
+    sql = f"""
+    SELECT COUNT(*) AS total,
+           SUM(t.createdAt >= %s) AS semana,
+           SUM(DATE(t.createdAt) = %s) AS hoje,
+           COUNT(DISTINCT DAYOFMONTH(t.createdAt)) AS dias_unicos,
+           COUNT(DISTINCT c.nome) AS clientes_unicos,
+           COUNT(DISTINCT t.departament) AS departamentos_unicos,
+           MIN(t.createdAt) AS primeiro,
+           MAX(t.createdAt) AS ultimo
+    FROM tickets t
+    LEFT JOIN customers c ON t.customerId = c.id
+    {where}
+    """
+    params = (referencia - timedelta(days=7), referencia.date()) + params
+    linha = _consultar(lambda conn: _ler_consulta(conn, sql, params)).iloc[0].to_dict()
+    totais = {k: int(linha[k] or 0) for k in ('total', 'semana', 'hoje', 'dias_unicos', 'clientes_unicos', 'departamentos_unicos')}
+    totais['primeiro'] = pd.to_datetime(linha['primeiro'])
+    totais['ultimo'] = pd.to_datetime(linha['ultimo'])
+    return totais
+
+@st.cache_data(ttl=TICKETS_REFRESH_INTERVAL, show_spinner=False)
+def get_tickets_page(pagina=1, por_pagina=TICKETS_PAGE_SIZE, data_inicio=None, data_fim=None, departamento=None):
+    """
+    Uma página (LIMIT/OFFSET) dos tickets do filtro, do mais recente para o mais antigo.
+
+    Returns:
+        pandas.DataFrame: Linhas da página com as colunas de tempo
+    """
+    where, params = _filtros_tickets(data_inicio, data_fim, departamento)
+    offset = (max(int(pagina), 1) - 1) * por_pagina
+    return _consultar(lambda conn: _buscar_tickets(conn, where, params, limite=por_pagina, offset=offset))
+
+@st.cache_data(ttl=TICKETS_REFRESH_INTERVAL, show_spinner=False)
+def get_tickets_csv(data_inicio=None, data_fim=None, departamento=None):
+    """
+    Todos os tickets do filtro em CSV (só gerado quando o usuário pede a exportação).
+
+    Filtra o snapshot de get_tickets_data, que só consulta os tickets novos desde a
+    marca d'água, em vez de reler do MySQL todo o histórico do filtro.
+    """
+    df = get_tickets_data()
+    if not df.empty:
+        if data_inicio is not None:
+            df = df[df['createdAt'] >= data_inicio]
+        if data_fim is not None:
+            df = df[df['createdAt'] < data_fim]
+        if departamento is not None:
+            df = df[df['departament'] == departamento]
+    return df.to_csv(index=False).encode('utf-8')
 
 def card_metric(title, value, description=None, icon=None, color="#4361ee"):
     """Renderiza um cartão de métrica estilizado"""
@@ -237,10 +473,19 @@ def show_tickets():
     # Inicia o contador de tempo para estatísticas de carregamento
     start_time = time.time()
     
-    # Obter dados
-    df = get_tickets_data()
+    # Obter dados: totais e agregações calculados no MySQL (cada consulta com cache próprio)
+    hoje = datetime.now()
+    # "Agora" truncado ao minuto: os totais da semana/hoje reaproveitam o cache dentro do minuto
+    referencia = hoje.replace(second=0, microsecond=0)
+    try:
+        with st.spinner("Carregando dados de tickets..."):
+            totais = get_tickets_totais(referencia)
+            tickets_por_depto = get_tickets_aggregate('departamento')
+    except Exception as e:
+        st.error(f"Erro ao obter dados: {e}")
+        totais = None
     
-    if df.empty:
+    if not totais or totais['total'] == 0:
         st.warning("Não foi possível carregar os dados dos tickets.")
         return
     
@@ -248,26 +493,19 @@ def show_tickets():
     load_time = round(time.time() - start_time, 2)
     
     # Mostrar estatísticas rápidas
-    st.caption(f"✅ Carregados {len(df)} tickets em {load_time} segundos")
+    st.caption(f"✅ Carregados {totais['total']} tickets em {load_time} segundos")
     
     add_vertical_space(1)
     
     # Totais e métricas
-    total_tickets = len(df)
+    total_tickets = totais['total']
     
     # Tickets por departamento
-    tickets_por_depto = df['departament'].value_counts().reset_index()
-    tickets_por_depto.columns = ['Departamento', 'Quantidade']
-    
-    # Tickets dos últimos 7 dias
-    hoje = datetime.now()
-    semana_passada = hoje - timedelta(days=7)
-    tickets_semana = df[df['createdAt'] >= semana_passada]
-    total_semana = len(tickets_semana)
+    tickets_por_depto = tickets_por_depto.rename(columns={'departament': 'Departamento', 'quantidade': 'Quantidade'})
     
-    # Tickets do dia
-    tickets_hoje = df[df['createdAt'].dt.date == hoje.date()]
-    total_hoje = len(tickets_hoje)
+    # Tickets dos últimos 7 dias e do dia
+    total_semana = totais['semana']
+    total_hoje = totais['hoje']
     
     # Layout em colunas para os KPIs com design de cartões modernos
     col1, col2, col3, col4 = st.columns(4)
@@ -336,7 +574,7 @@ def show_tickets():
             dias_ordem = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
             dias_pt = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
             
-            tickets_por_dia = df['dia_semana'].value_counts().reindex(dias_ordem, fill_value=0)
+            tickets_por_dia = get_tickets_aggregate('dia_semana').set_index('dia_semana')['quantidade'].reindex(dias_ordem, fill_value=0)
             tickets_por_dia.index = dias_pt
             
             fig = px.bar(
@@ -379,9 +617,9 @@ def show_tickets():
         
         status_col1, status_col2, status_col3 = st.columns(3)
         
-        dias_unicos = df['dia'].nunique()
+        dias_unicos = totais['dias_unicos']
         media_tickets_dia = round(total_tickets / dias_unicos if dias_unicos > 0 else 0, 1)
-        usuarios_unicos = df['nome'].nunique()
+        usuarios_unicos = totais['clientes_unicos']
         
         with status_col1:
             card_metric("Média Diária", f"{media_tickets_dia}", "Tickets por dia", "trending_up", "#4cc9f0")
@@ -390,7 +628,7 @@ def show_tickets():
             card_metric("Clientes Únicos", f"{usuarios_unicos}", "Total de clientes", "people", "#4895ef")
             
         with status_col3:
-            departamentos_unicos = df['departament'].nunique()
+            departamentos_unicos = totais['departamentos_unicos']
             card_metric("Departamentos", f"{departamentos_unicos}", "Áreas atendidas", "business", "#4361ee")
     
     with tab2:
@@ -401,7 +639,7 @@ def show_tickets():
         
         with time_col1:
             # Gráfico de tickets por hora do dia
-            tickets_por_hora = df['hora'].value_counts().sort_index()
+            tickets_por_hora = get_tickets_aggregate('hora').set_index('hora')['quantidade'].sort_index()
             
             # Preencher horas vazias com zeros
             todas_horas = pd.Series(index=range(24), data=0)
@@ -439,7 +677,8 @@ def show_tickets():
             
         with time_col2:
             # Gráfico de tendência mensal
-            tickets_por_mes = df.groupby(['ano', 'mes']).size().reset_index(name='tickets')
+            tickets_por_mes = (get_tickets_aggregate('mes').sort_values(['ano', 'mes'])
+                               .rename(columns={'quantidade': 'tickets'}).reset_index(drop=True))
             
             # Criar label de mês no formato Abr/23
             meses_abrev = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
@@ -490,11 +729,11 @@ def show_tickets():
         
         # Criar DataFrame para o heatmap mesmo se não houver dados
         try:
-            heatmap_data = df.pivot_table(
-                values='id', 
+            heatmap_data = get_tickets_aggregate('dia_semana_hora').pivot_table(
+                values='quantidade', 
                 index='dia_semana', 
                 columns='hora', 
-                aggfunc='count', 
+                aggfunc='sum', 
                 fill_value=0
             )
             
@@ -543,7 +782,7 @@ def show_tickets():
         filter_col1, filter_col2, filter_col3 = st.columns([2,2,1])
         
         with filter_col1:
-            departamentos = ['Todos'] + sorted(df['departament'].unique().tolist())
+            departamentos = ['Todos'] + sorted(tickets_por_depto['Departamento'].tolist())
             filtro_depto = st.selectbox('Departamento:', departamentos)
         
         with filter_col2:
@@ -554,19 +793,26 @@ def show_tickets():
             st.markdown("<br>", unsafe_allow_html=True)
             mostrar_todos = st.checkbox('Mostrar todos')
         
-        # Aplicar filtros
-        df_filtrado = df.copy()
+        # Aplicar filtros (no MySQL): só a página exibida traz as linhas dos tickets
+        filtro = {}
         if filtro_depto != 'Todos' and not mostrar_todos:
-            df_filtrado = df_filtrado[df_filtrado['departament'] == filtro_depto]
+            filtro['departamento'] = filtro_depto
         
         if not mostrar_todos:
-            data_corte = hoje - timedelta(days=filtro_dias)
-            df_filtrado = df_filtrado[df_filtrado['createdAt'] >= data_corte]
+            filtro['data_inicio'] = referencia - timedelta(days=filtro_dias)
+        
+        totais_filtro = get_tickets_totais(referencia, **filtro)
         
         # Exibir tabela com estilo moderno
-        if not df_filtrado.empty:
+        if totais_filtro['total'] > 0:
+            n_paginas = -(-totais_filtro['total'] // TICKETS_PAGE_SIZE)
+            pagina = 1
+            if n_paginas > 1:
+                pagina = st.number_input(f'Página (de {n_paginas}):', min_value=1, max_value=n_paginas, value=1, step=1)
+            df_filtrado = get_tickets_page(pagina, **filtro)
+            
             # Mostrar contagem de tickets filtrados
-            st.caption(f"Exibindo {len(df_filtrado)} tickets de um total de {len(df)}")
+            st.caption(f"Exibindo {len(df_filtrado)} de {totais_filtro['total']} tickets filtrados (total: {total_tickets})")
             
             colunas_exibir = ['id', 'nome', 'departament', 'createdAt', 'message']
             df_exibir = df_filtrado[colunas_exibir].rename(columns={
@@ -603,18 +849,19 @@ def show_tickets():
             
             with stat_col:
                 # Resumo dos dados filtrados
-                st.caption(f"Período: {df_filtrado['createdAt'].min().strftime('%d/%m/%Y')} até {df_filtrado['createdAt'].max().strftime('%d/%m/%Y')}")
+                st.caption(f"Período: {totais_filtro['primeiro'].strftime('%d/%m/%Y')} até {totais_filtro['ultimo'].strftime('%d/%m/%Y')}")
             
             with export_col:
-                # Botão para exportar dados
-                csv = df_filtrado.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Exportar CSV",
-                    data=csv,
-                    file_name=f"tickets_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+                # Exportação: os tickets do filtro só são consultados quando o usuário pede
+                if st.button("📥 Preparar CSV", use_container_width=True):
+                    st.download_button(
+                        label="📥 Exportar CSV",
+                        data=get_tickets_csv(**filtro),
+                        file_name=f"tickets_export_{datetime.now().strftime('%Y%m%d')}.csv",
+                        mime="text/csv",
+                        on_click="ignore",
+                        use_container_width=True
+                    )
         else:
             # Mensagem estilizada quando não houver dados
             st.markdown("""